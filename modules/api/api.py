@@ -4,7 +4,7 @@ from secrets import compare_digest
 from fastapi import FastAPI, APIRouter, Depends, Request
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.exceptions import HTTPException
-from modules import errors, shared, paths
+from modules import errors, shared, paths, metrics
 from modules.logger import log
 from modules.api import models, endpoints, script, helpers, server, generate, process, control, docs, gpu
 
@@ -30,9 +30,9 @@ class Api:
             docs.create_redocs(app)
         self.app = app
         self.queue_lock = queue_lock
-        self.generate = generate.APIGenerate(queue_lock)
-        self.process = process.APIProcess(queue_lock)
-        self.control = control.APIControl(queue_lock)
+        self.generate = generate.APIGenerate(metrics.TimedLock(queue_lock, 'generate'))
+        self.process = process.APIProcess(metrics.TimedLock(queue_lock, 'process'))
+        self.control = control.APIControl(metrics.TimedLock(queue_lock, 'control'))
         # compatibility api
         self.text2imgapi = self.generate.post_text2img
         self.img2imgapi = self.generate.post_img2img
@@ -59,6 +59,7 @@ class Api:
         self.add_api_route("/sdapi/v1/cmd-flags", server.get_cmd_flags, methods=["GET"], response_model=models.FlagsModel)
         self.add_api_route("/sdapi/v1/gpu", gpu.get_gpu, methods=["GET"])
         self.add_api_route("/sdapi/v1/gpu-smi", gpu.get_gpu_smi, methods=["GET"], response_model=list[models.ResGPU])
+        self.add_api_route("/metrics", server.get_metrics, methods=["GET"])
 
         # core api using locking
         self.add_api_route("/sdapi/v1/txt2img", self.generate.post_text2img, methods=["POST"], response_model=models.ResTxt2Img, tags=["Generation"])
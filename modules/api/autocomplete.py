@@ -13,7 +13,8 @@ import os
 from fastapi.exceptions import HTTPException
 
 from modules import shared
-from modules.api.models import ItemAutocomplete, ItemAutocompleteContent, ItemAutocompleteRemote
+from modules.api import autocomplete_index
+from modules.api.models import ItemAutocomplete, ItemAutocompleteContent, ItemAutocompleteMatch, ItemAutocompleteRemote
 from modules.logger import log
 
 
@@ -115,14 +116,13 @@ def list_all_sync() -> list[ItemAutocomplete]:
             continue  # companion file, served via the parent dict's `translations` field
         name = filename.rsplit('.', 1)[0]
         try:
-            entry = get_cached(name)
-            meta = entry['meta']
+            meta = get_index(name).meta # listing reads index metadata instead of holding every parsed file in cache
             items.append(ItemAutocomplete(
-                name=meta['name'],
+                name=meta['name'] or name,
                 version=meta['version'],
                 tag_count=meta['tag_count'],
                 categories=meta['categories'],
-                size=entry['size'],
+                size=meta['state']['size'],
             ))
         except Exception:
             pass
@@ -154,6 +154,31 @@ async def get_content(name: str) -> ItemAutocompleteContent:
     )
 
 
+def get_index(name: str) -> autocomplete_index.TagIndex:
+    if '/' in name or '\\' in name or '..' in name:
+        raise HTTPException(status_code=400, detail="Invalid name")
+    if not os.path.isfile(os.path.join(autocomplete_dir, f"{name}.json")):
+        get_cached(name) # handles auto-download and not-found
+        cache.pop(name, None)
+    translations_enabled = bool(shared.opts.data.get('autocomplete_translations', False))
+    translations_path = os.path.join(autocomplete_dir, f"{name}.translations.json") if translations_enabled else None
+    return autocomplete_index.get_index(autocomplete_dir, name, translations_path)
+
+
+async def search(name: str, prefix: str, category: int | None = None, limit: int = 20) -> list[ItemAutocompleteMatch]:
+    """Search a tag file by prefix of tag name, alias or translation; returns top tags by post count."""
+    limit = min(max(1, limit), 200)
+    def _search():
+        return get_index(name).search(prefix, category=category, limit=limit)
+    try:
+        results = await asyncio.to_thread(_search)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    return [ItemAutocompleteMatch(**result) for result in results]
+
+
 # -- Remote management --
 
 def fetch_manifest_sync() -> list[dict]:
@@ -330,6 +355,7 @@ async def delete(name: str):
         raise HTTPException(status_code=404, detail=f"Not found: {name}")
     await asyncio.to_thread(os.remove, path)
     cache.pop(name, None)
+    await asyncio.to_thread(autocomplete_index.remove, autocomplete_dir, name)
     return {"status": "deleted", "name": name}
 
 
@@ -337,5 +363,6 @@ def register_api(api):
     api.add_api_route("/sdapi/v1/autocomplete", list_all, methods=["GET"], response_model=list[ItemAutocomplete], tags=["Enumerators"])
     api.add_api_route("/sdapi/v1/autocomplete/remote", list_remote, methods=["GET"], response_model=list[ItemAutocompleteRemote], tags=["Enumerators"])
     api.add_api_route("/sdapi/v1/autocomplete/{name}", get_content, methods=["GET"], response_model=ItemAutocompleteContent, tags=["Enumerators"])
+    api.add_api_route("/sdapi/v1/autocomplete/{name}/search", search, methods=["GET"], response_model=list[ItemAutocompleteMatch], tags=["Enumerators"])
     api.add_api_route("/sdapi/v1/autocomplete/{name}/download", download, methods=["POST"], response_model=ItemAutocomplete, tags=["Enumerators"])
     api.add_api_route("/sdapi/v1/autocomplete/{name}", delete, methods=["DELETE"], tags=["Enumerators"])
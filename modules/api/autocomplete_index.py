@@ -0,0 +1,217 @@
+"""Compact prefix index for tag autocomplete files.
+
+Tag files are parsed once and converted into a sorted key array stored in `.index/<name>.idx` next to the source file.
+The index file is memory-mapped, so searches touch only the pages they need and nothing is kept as python objects.
+
+Layout after a fixed header, all arrays are native-endian uint32 or int32:
+- per tag: post count, category id, name offset into names blob
+- per key: offset into keys blob and tag number, alias and translation keys have the high bit set
+- names blob and keys blob, utf-8
+Keys are lowercase tag names, aliases and optional translations with spaces as underscores, sorted bytewise.
+"""
+import os
+import sys
+import json
+import mmap
+import heapq
+import struct
+import bisect
+import threading
+from array import array
+from modules.logger import log
+
+
+index_version = 1
+assert array('I').itemsize == 4, 'autocomplete index requires 32-bit array items'
+header = struct.Struct('<4sIIIII') # magic, version, tags, keys, names bytes, keys bytes
+alias_flag = 0x80000000
+lock = threading.Lock()
+indexes: dict = {} # name -> TagIndex
+
+
+def normalize(text: str) -> str:
+    return text.strip().lower().replace(' ', '_')
+
+
+class KeyView:
+    """Sequence of key bytes for bisect without materializing all keys."""
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.keys
+
+    def __getitem__(self, i):
+        return self.index.key(i)
+
+
+class TagIndex:
+    def __init__(self, filename: str, meta: dict):
+        self.filename = filename
+        self.meta = meta
+        with open(filename, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.tags, self.keys, names_size, keys_size = header.unpack_from(self.map, 0)
+        if magic != b'SDAC' or version != index_version:
+            self.close()
+            raise ValueError(f'invalid index: {filename}')
+        self.view = memoryview(self.map)
+        offset = header.size
+        def section(count, fmt):
+            nonlocal offset
+            data = self.view[offset:offset + 4 * count].cast(fmt)
+            offset += 4 * count
+            return data
+        self.count = section(self.tags, 'I')
+        self.category = section(self.tags, 'i')
+        self.name_offsets = section(self.tags + 1, 'I')
+        self.key_offsets = section(self.keys + 1, 'I')
+        self.key_tag = section(self.keys, 'I')
+        self.names = self.view[offset:offset + names_size]
+        self.key_blob = self.view[offset + names_size:offset + names_size + keys_size]
+
+    def close(self):
+        for attr in ['count', 'category', 'name_offsets', 'key_offsets', 'key_tag', 'names', 'key_blob', 'view']:
+            item = getattr(self, attr, None)
+            if item is not None:
+                item.release()
+        self.map.close()
+
+    def key(self, i: int) -> bytes:
+        return bytes(self.key_blob[self.key_offsets[i]:self.key_offsets[i + 1]])
+
+    def name(self, tag: int) -> str:
+        return bytes(self.names[self.name_offsets[tag]:self.name_offsets[tag + 1]]).decode('utf-8')
+
+    def search(self, prefix: str, category: int | None = None, limit: int = 20) -> list[dict]:
+        """Top tags by post count whose name, alias or translation starts with prefix."""
+        prefix = normalize(prefix).encode('utf-8')
+        if len(prefix) == 0:
+            return []
+        keys = KeyView(self)
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + b'\xff', lo) # 0xff never occurs in utf-8 so it sorts after every key with this prefix
+        matched = {} # tag -> key position, direct name match preferred over alias
+        for position in range(lo, hi):
+            value = self.key_tag[position]
+            tag = value & ~alias_flag
+            if category is not None and self.category[tag] != category:
+                continue
+            if tag not in matched or not (value & alias_flag):
+                matched[tag] = position
+        top = heapq.nlargest(limit, matched, key=lambda tag: self.count[tag])
+        results = []
+        for tag in top:
+            position = matched[tag]
+            results.append({
+                'name': self.name(tag),
+                'category': self.category[tag],
+                'count': self.count[tag],
+                'alias': self.key(position).decode('utf-8') if self.key_tag[position] & alias_flag else None,
+            })
+        return results
+
+
+def build(source: str, target: str, translations: dict | None = None) -> dict:
+    with open(source, encoding='utf-8') as f:
+        data = json.load(f)
+    tags = data.get('tags', [])
+    names = bytearray()
+    name_offsets = [0]
+    counts = []
+    categories = []
+    keys = []
+    lookup = {}
+    for i, entry in enumerate(tags):
+        name = str(entry[0])
+        counts.append(min(max(int(entry[2]) if len(entry) > 2 and entry[2] else 0, 0), 0xFFFFFFFF))
+        categories.append(int(entry[1]) if len(entry) > 1 and entry[1] is not None else 0)
+        names += name.encode('utf-8')
+        name_offsets.append(len(names))
+        keys.append((normalize(name).encode('utf-8'), i))
+        lookup.setdefault(name, i)
+        aliases = entry[3] if len(entry) > 3 and isinstance(entry[3], list) else []
+        for alias in aliases:
+            keys.append((normalize(str(alias)).encode('utf-8'), i | alias_flag))
+    for term, canonical in (translations or {}).items():
+        if canonical in lookup:
+            keys.append((normalize(str(term)).encode('utf-8'), lookup[canonical] | alias_flag))
+    keys = sorted({key for key in keys if len(key[0]) > 0})
+    key_blob = bytearray()
+    key_offsets = [0]
+    for key, _tag in keys:
+        key_blob += key
+        key_offsets.append(len(key_blob))
+    meta = {
+        'name': data.get('name', ''),
+        'version': data.get('version', ''),
+        'tag_count': len(tags),
+        'categories': {str(k): v.get('name', str(k)) if isinstance(v, dict) else str(v) for k, v in data.get('categories', {}).items()},
+    }
+    del data, tags, lookup
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = target + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(header.pack(b'SDAC', index_version, len(counts), len(keys), len(names), len(key_blob)))
+        for values, fmt in [(counts, 'I'), (categories, 'i'), (name_offsets, 'I'), (key_offsets, 'I'), ([tag for _key, tag in keys], 'I')]:
+            f.write(array(fmt, values).tobytes())
+        f.write(names)
+        f.write(key_blob)
+    os.replace(tmp, target)
+    return meta
+
+
+def get_index(directory: str, name: str, translations_path: str | None = None) -> TagIndex:
+    """Return memory-mapped index for a tag file, rebuilding it when source or translations changed."""
+    import time
+    source = os.path.join(directory, f'{name}.json')
+    target = os.path.join(directory, '.index', f'{name}.idx')
+    stat = os.stat(source)
+    translations_mtime = os.stat(translations_path).st_mtime if translations_path and os.path.isfile(translations_path) else 0.0
+    state = {'mtime': stat.st_mtime, 'size': stat.st_size, 'translations_mtime': translations_mtime, 'version': index_version, 'byteorder': sys.byteorder}
+    index = indexes.get(name, None)
+    if index is not None and index.meta.get('state') == state:
+        return index
+    with lock:
+        index = indexes.get(name, None)
+        if index is not None and index.meta.get('state') == state:
+            return index
+        if index is not None: # searches in other threads may still use the old mapping, it is released once the last reference is dropped
+            indexes.pop(name, None)
+            index = None
+        meta_file = target + '.json'
+        meta = None
+        try:
+            if os.path.isfile(meta_file) and os.path.isfile(target):
+                with open(meta_file, encoding='utf-8') as f:
+                    meta = json.load(f)
+                if meta.get('state') != state:
+                    meta = None
+        except Exception:
+            meta = None
+        if meta is None:
+            t0 = time.time()
+            translations = None
+            if translations_mtime:
+                try:
+                    with open(translations_path, encoding='utf-8') as f:
+                        translations = json.load(f)
+                except Exception as e:
+                    log.warning(f'Autocomplete: failed to load translations for "{name}": {e}')
+            meta = build(source, target, translations if isinstance(translations, dict) else None)
+            meta['state'] = state
+            with open(meta_file, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            log.debug(f'Autocomplete index: name="{name}" tags={meta["tag_count"]} size={os.path.getsize(target)} time={time.time()-t0:.2f}')
+        index = TagIndex(target, meta)
+        indexes[name] = index
+        return index
+
+
+def remove(directory: str, name: str) -> None:
+    with lock:
+        indexes.pop(name, None) # mapping is released with the last reference, not closed under a running search
+        target = os.path.join(directory, '.index', f'{name}.idx')
+        for filename in [target, target + '.json']:
+            if os.path.isfile(filename):
+                os.remove(filename)
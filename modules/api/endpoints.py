@@ -1,16 +1,11 @@
+from typing import Annotated
+from fastapi import Header
 from fastapi.exceptions import HTTPException
 from fastapi.responses import JSONResponse, Response
 from modules import shared
 from modules.logger import log
-from modules.api import models, helpers
-
-
-def _format_tags(raw_tags):
-    if isinstance(raw_tags, dict):
-        return '|'.join(raw_tags.keys()) if raw_tags else None
-    if isinstance(raw_tags, str) and raw_tags:
-        return raw_tags
-    return None
+from modules.api import models, helpers, networks
+from modules.api.networks import format_tags as _format_tags
 
 
 def get_samplers():
@@ -94,35 +89,24 @@ def get_wildcards():
     from modules import ui_extra_networks_wildcards
     return [{"name": n} for n in ui_extra_networks_wildcards.list_wildcard_names()]
 
-def get_extra_networks(page: str | None = None, name: str | None = None, filename: str | None = None, title: str | None = None, fullname: str | None = None, hash: str | None = None): # pylint: disable=redefined-builtin
-    """List extra networks (LoRA, checkpoints, embeddings, etc.) with optional filtering by page, name, filename, title, fullname, or hash."""
-    res = []
-    for pg in shared.extra_networks:
-        if page is not None and pg.name != page.lower():
-            continue
-        for item in pg.items:
-            if name is not None and item.get('name', '') != name:
-                continue
-            if title is not None and item.get('title', '') != title:
-                continue
-            if filename is not None and item.get('filename', '') != filename:
-                continue
-            if fullname is not None and item.get('fullname', '') != fullname:
-                continue
-            if hash is not None and (item.get('shorthash', None) or item.get('hash')) != hash:
-                continue
-            res.append({
-                'name': item.get('name', ''),
-                'type': pg.name,
-                'title': item.get('title', None),
-                'fullname': item.get('fullname', None),
-                'filename': item.get('filename', None),
-                'hash': item.get('shorthash', None) or item.get('hash'),
-                "preview": item.get('preview', None),
-                "version": item.get('version', None),
-                "tags": _format_tags(item.get('tags', None)),
-            })
-    return res
+def get_extra_networks(page: str | None = None, name: str | None = None, filename: str | None = None, title: str | None = None, fullname: str | None = None, hash: str | None = None, fields: str | None = None, limit: int | None = None, cursor: str | None = None, if_none_match: Annotated[str | None, Header()] = None): # pylint: disable=redefined-builtin
+    """
+    List extra networks (LoRA, checkpoints, embeddings, etc.) with optional filtering by page, name, filename, title, fullname, or hash.
+
+    Filters use per-page lookup indexes, ``hash`` matches either short or full hash.
+    ``fields`` is a comma-separated list of fields to return, ``limit`` enables pagination with the next page cursor returned in ``X-Next-Cursor`` header.
+    Responses carry an ``ETag`` that changes when any listed page is rescanned, send it as ``If-None-Match`` to receive 304 for unchanged listings.
+    """
+    selected_fields = networks.parse_fields(fields)
+    matched, listing = networks.search(page, {'name': name, 'filename': filename, 'fullname': fullname, 'title': title, 'hash': hash})
+    etag = f'W/"{listing}"'
+    if if_none_match is not None and etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return Response(status_code=304, headers={'ETag': etag})
+    matched, next_cursor = networks.paginate(matched, listing, cursor=cursor, limit=limit)
+    headers = {'ETag': etag}
+    if next_cursor is not None:
+        headers['X-Next-Cursor'] = next_cursor
+    return JSONResponse(content=[networks.project(index.rows[position], selected_fields) for index, position in matched], headers=headers)
 
 def get_extra_network_detail(page: str, name: str):
     """
@@ -162,46 +146,26 @@ def get_extra_network_detail(page: str, name: str):
 def get_extra_network_details(page: str | None = None, name: str | None = None, filename: str | None = None, title: str | None = None, fullname: str | None = None, hash: str | None = None, offset: int = 0, limit: int = 50): # pylint: disable=redefined-builtin
     """Batch-fetch full detail for extra network items with optional filtering and pagination."""
     from datetime import datetime
-    matched = []
-    for pg in shared.extra_networks:
-        if page is not None and pg.name != page.lower():
-            continue
-        for item in pg.items:
-            if name is not None and item.get('name', '') != name:
-                continue
-            if title is not None and item.get('title', '') != title:
-                continue
-            if filename is not None and item.get('filename', '') != filename:
-                continue
-            if fullname is not None and item.get('fullname', '') != fullname:
-                continue
-            if hash is not None and (item.get('shorthash', None) or item.get('hash')) != hash:
-                continue
-            mtime = item.get('mtime', None)
-            if isinstance(mtime, datetime):
-                mtime = mtime.isoformat()
-            elif mtime is not None:
-                mtime = str(mtime)
-            matched.append({
-                'name': item.get('name', ''),
-                'type': pg.name,
-                'title': item.get('title', None),
-                'fullname': item.get('fullname', None),
-                'filename': item.get('filename', None),
-                'hash': item.get('shorthash', None) or item.get('hash'),
-                'preview': item.get('preview', None),
-                'alias': item.get('alias', None),
-                'size': item.get('size', None),
-                'mtime': mtime,
-                'version': item.get('version', None),
-                'tags': _format_tags(item.get('tags', None)),
-                'description': item.get('description', None),
-                'info': item.get('info', None) if isinstance(item.get('info'), dict) else None,
-            })
-    total = len(matched)
+    matched, _listing = networks.search(page, {'name': name, 'filename': filename, 'fullname': fullname, 'title': title, 'hash': hash})
+    items = []
+    for index, position in matched[offset:offset + limit]: # detail fields are only built for the requested slice
+        item = index.entries[position]
+        mtime = item.get('mtime', None)
+        if isinstance(mtime, datetime):
+            mtime = mtime.isoformat()
+        elif mtime is not None:
+            mtime = str(mtime)
+        items.append({
+            **index.rows[position],
+            'alias': item.get('alias', None),
+            'size': item.get('size', None),
+            'mtime': mtime,
+            'description': item.get('description', None),
+            'info': item.get('info', None) if isinstance(item.get('info'), dict) else None,
+        })
     return {
-        'items': matched[offset:offset + limit],
-        'total': total,
+        'items': items,
+        'total': len(matched),
         'offset': offset,
         'limit': limit,
     }
@@ -1,6 +1,6 @@
 from threading import Lock
 from fastapi.responses import JSONResponse
-from modules import errors, shared, scripts_manager, ui
+from modules import errors, shared, scripts_manager, model_affinity
 from modules.api import models, script, helpers
 from modules.processing import StableDiffusionProcessingTxt2Img, StableDiffusionProcessingImg2Img, process_images
 from modules.paths import resolve_output_path
@@ -90,7 +90,7 @@ class APIGenerate:
         script_runner = scripts_manager.scripts_txt2img
         if not script_runner.scripts:
             script_runner.initialize_scripts(False)
-            ui.create_ui(None)
+            script_runner.setup_api()
         if not self.default_script_arg_txt2img:
             self.default_script_arg_txt2img = script.init_default_script_args(script_runner)
         selectable_scripts, selectable_script_idx = script.get_selectable_script(txt2imgreq.script_name, script_runner)
@@ -103,7 +103,7 @@ class APIGenerate:
             populate.sampler_index = None  # prevent a warning later on
         args = self.sanitize_args(populate)
         send_images = args.pop('send_images', True)
-        with self.queue_lock:
+        with model_affinity.scheduler.slot(model_affinity.job_key(args.get('override_settings', None))), self.queue_lock:
             p = StableDiffusionProcessingTxt2Img(sd_model=shared.sd_model, **args)
             self.prepare_ip_adapter(txt2imgreq, p)
             p.scripts = script_runner
@@ -141,7 +141,7 @@ class APIGenerate:
         script_runner = scripts_manager.scripts_img2img
         if not script_runner.scripts:
             script_runner.initialize_scripts(True)
-            ui.create_ui(None)
+            script_runner.setup_api()
         if not self.default_script_arg_img2img:
             self.default_script_arg_img2img = script.init_default_script_args(script_runner)
         selectable_scripts, selectable_script_idx = script.get_selectable_script(img2imgreq.script_name, script_runner)
@@ -155,7 +155,7 @@ class APIGenerate:
             populate.sampler_index = None  # prevent a warning later on
         args = self.sanitize_args(populate)
         send_images = args.pop('send_images', True)
-        with self.queue_lock:
+        with model_affinity.scheduler.slot(model_affinity.job_key(args.get('override_settings', None))), self.queue_lock:
             p = StableDiffusionProcessingImg2Img(sd_model=shared.sd_model, **args)
             self.prepare_ip_adapter(img2imgreq, p)
             p.init_images = [helpers.decode_base64_to_image(x) for x in init_images]
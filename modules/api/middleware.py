@@ -11,6 +11,7 @@ from fastapi import FastAPI, Request, Response
 from fastapi.exceptions import HTTPException
 from fastapi.encoders import jsonable_encoder
 from modules.logger import log
+from modules import metrics
 import modules.errors as errors
 from modules.api.validate import validate_request, validate_log
 
@@ -38,8 +39,11 @@ def setup_middleware(app: FastAPI, cmd_opts):
         try:
             ts = time.time()
             res: Response = await call_next(req)
-            duration = str(round(time.time() - ts, 4))
+            elapsed = time.time() - ts
+            duration = str(round(elapsed, 4))
             res.headers["X-Process-Time"] = duration
+            route = req.scope.get('route', None) # matched route template keeps label cardinality bounded
+            metrics.observe_request(req.method, getattr(route, 'path', 'unmatched'), res.status_code, elapsed)
             endpoint = req.scope.get('path', 'err')
             client = req.scope.get('client', ('0:0.0.0', 0))[0]
             token = req.cookies.get("access-token") or req.cookies.get("access-token-unsecure")
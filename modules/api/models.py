@@ -420,6 +420,7 @@ class ReqDetail(BaseModel):
     detailer_segmentation: bool | None = Field(default=None, title="Use segmentation", description="Use seg-mask instead of bbox (requires a -seg model)")
     detailer_merge: bool | None = Field(default=None, title="Merge detections")
     detailer_sort: bool | None = Field(default=None, title="Sort detections", description="Sort detections left-to-right for consistency")
+    detailer_batch: bool | None = Field(default=None, title="Batch detections", description="Inpaint all detected regions in a single batched pass")
     detailer_sigma_adjust: float | None = Field(default=None, ge=0.5, le=1.5, title="Renoise sigma")
     detailer_sigma_adjust_max: float | None = Field(default=None, ge=0.0, le=1.0, title="Renoise end")
     detailer_include_detections: bool | None = Field(default=None, title="Include detections", description="Return annotated debug image alongside the detailed result")
@@ -568,6 +569,12 @@ class ItemAutocompleteContent(BaseModel):
     tags: list = Field(default_factory=list, title="Tags", description="Tag entries as [name, category_id, post_count, aliases?] tuples")
     translations: Optional[dict[str, str]] = Field(default=None, title="Translations", description="Optional foreign_term -> canonical_tag_name map")
 
+class ItemAutocompleteMatch(BaseModel):
+    name: str = Field(title="Name", description="Tag name")
+    category: int = Field(default=0, title="Category", description="Category ID")
+    count: int = Field(default=0, title="Post count", description="Number of posts using this tag")
+    alias: str | None = Field(default=None, title="Alias", description="Matched alias or translation if match was not on tag name")
+
 class ItemAutocompleteRemote(BaseModel):
     name: str = Field(title="Name", description="Autocomplete file identifier")
     description: str = Field(default="", title="Description", description="Human-readable description")
@@ -0,0 +1,122 @@
+"""Lookup indexes over extra network pages for the listing api.
+
+Each page gets an index built on first request after its item list was replaced by a rescan.
+Index holds prebuilt api rows plus exact-match lookups on name, filename, fullname, title and short/full hash.
+Every rebuild takes a new value from a global generation counter which is used as ETag and to validate pagination cursors.
+"""
+import threading
+from fastapi.exceptions import HTTPException
+from modules import shared
+
+
+fields = ['name', 'type', 'title', 'fullname', 'filename', 'hash', 'preview', 'version', 'tags']
+lookup_fields = ['name', 'filename', 'fullname', 'title', 'hash']
+lock = threading.Lock()
+indexes: dict = {} # page name -> NetworkIndex
+generation = 0
+
+
+def format_tags(raw_tags):
+    if isinstance(raw_tags, dict):
+        return '|'.join(raw_tags.keys()) if raw_tags else None
+    if isinstance(raw_tags, str) and raw_tags:
+        return raw_tags
+    return None
+
+
+class NetworkIndex:
+    def __init__(self, page, items: list, stamp: int):
+        self.name = page.name
+        self.items = items # page list this index was built from, replaced list means page was rescanned
+        self.stamp = stamp
+        self.entries = [item for item in items if item is not None]
+        self.rows = []
+        self.lookup = {field: {} for field in lookup_fields}
+        for position, item in enumerate(self.entries):
+            self.rows.append({
+                'name': item.get('name', ''),
+                'type': page.name,
+                'title': item.get('title', None),
+                'fullname': item.get('fullname', None),
+                'filename': item.get('filename', None),
+                'hash': item.get('shorthash', None) or item.get('hash'),
+                'preview': item.get('preview', None),
+                'version': item.get('version', None),
+                'tags': format_tags(item.get('tags', None)),
+            })
+            for field in ['name', 'filename', 'fullname', 'title']:
+                self.lookup[field].setdefault(item.get(field, ''), []).append(position)
+            for value in {item.get('shorthash', None), item.get('hash', None)}:
+                if value:
+                    self.lookup['hash'].setdefault(value, []).append(position)
+
+    def find(self, filters: dict) -> list[int]:
+        """Positions matching all non-empty filters, in page order."""
+        active = [(field, value) for field, value in filters.items() if value is not None]
+        if len(active) == 0:
+            return list(range(len(self.entries)))
+        candidates = [set(self.lookup[field].get(value, [])) for field, value in active]
+        candidates.sort(key=len)
+        matched = candidates[0].intersection(*candidates[1:])
+        return sorted(matched)
+
+
+def get_index(page) -> NetworkIndex:
+    global generation # pylint: disable=global-statement
+    items = page.items
+    index = indexes.get(page.name, None)
+    if index is not None and index.items is items:
+        return index
+    with lock:
+        index = indexes.get(page.name, None)
+        if index is None or index.items is not items:
+            generation += 1
+            index = NetworkIndex(page, items, generation)
+            indexes[page.name] = index
+    return index
+
+
+def get_indexes(page: str | None = None) -> list[NetworkIndex]:
+    return [get_index(pg) for pg in shared.extra_networks if page is None or pg.name == page.lower()]
+
+
+def version(selected: list[NetworkIndex]) -> str:
+    # any rebuild takes a higher stamp than all existing ones, so max stamp changes whenever a selected page changes
+    return f'{max((index.stamp for index in selected), default=0)}-{len(selected)}'
+
+
+def search(page: str | None = None, filters: dict | None = None) -> tuple[list[tuple[NetworkIndex, int]], str]:
+    """Matching (index, position) pairs across selected pages and listing version used for ETag and cursors."""
+    selected = get_indexes(page)
+    matched = [(index, position) for index in selected for position in index.find(filters or {})]
+    return matched, version(selected)
+
+
+def paginate(matched: list, listing: str, cursor: str | None = None, limit: int | None = None) -> tuple[list, str | None]:
+    """Slice matched results; cursor is opaque `<version>.<offset>` and is rejected once the listing changed."""
+    offset = 0
+    if cursor:
+        cursor_version, _sep, position = cursor.rpartition('.')
+        if cursor_version != listing or not position.isdigit():
+            raise HTTPException(status_code=409, detail='Extra networks listing changed, restart pagination')
+        offset = int(position)
+    if limit is None or limit <= 0:
+        return matched[offset:], None
+    end = offset + limit
+    return matched[offset:end], f'{listing}.{end}' if end < len(matched) else None
+
+
+def project(row: dict, selected_fields: list[str] | None) -> dict:
+    if not selected_fields:
+        return row
+    return {field: row[field] for field in selected_fields}
+
+
+def parse_fields(value: str | None) -> list[str] | None:
+    if value is None or len(value.strip()) == 0:
+        return None
+    selected = [field.strip() for field in value.split(',') if len(field.strip()) > 0]
+    unknown = [field for field in selected if field not in fields]
+    if len(unknown) > 0:
+        raise HTTPException(status_code=400, detail=f'Unknown fields: {unknown} available: {fields}')
+    return selected
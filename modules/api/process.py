@@ -159,7 +159,7 @@ class APIProcess:
             'detailer_models', 'detailer_classes', 'detailer_conf',
             'detailer_iou', 'detailer_max', 'detailer_min_size',
             'detailer_max_size', 'detailer_blur', 'detailer_padding',
-            'detailer_segmentation', 'detailer_merge', 'detailer_sort',
+            'detailer_segmentation', 'detailer_merge', 'detailer_sort', 'detailer_batch',
             'detailer_sigma_adjust', 'detailer_sigma_adjust_max',
             'detailer_include_detections',
         ) if getattr(req, attr, None) is not None}
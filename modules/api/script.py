@@ -55,6 +55,19 @@ def get_script(script_name, script_runner):
     return script_runner.scripts[script_idx]
 
 
+def script_default_args(script, script_runner):
+    """Default values of script controls, calls script ui only if defaults were not captured during ui or api setup"""
+    if script.api_defaults is None and gr is not None:
+        deferred = isinstance(script, scripts_manager.LazyScript)
+        with gr.Blocks(): # will throw errors calling ui function without this
+            controls = script.ui(script.is_img2img) or []
+        script.api_defaults = [getattr(control, 'value', None) for control in controls]
+        if deferred and script.args_to - script.args_from != len(controls): # deferred script imported on first use gets a range after all other scripts
+            script.args_from = max(s.args_to for s in script_runner.scripts)
+            script.args_to = script.args_from + len(controls)
+    return script.api_defaults or []
+
+
 def init_default_script_args(script_runner):
     # find max idx from the scripts in runner and generate a none array to init script_args
     last_arg_index = 1
@@ -65,16 +78,13 @@ def init_default_script_args(script_runner):
     script_args = [None]*last_arg_index
     script_args[0] = 0
 
-    # get default values
-    if gr is None:
-        return script_args
-    with gr.Blocks(): # will throw errors calling ui function without this
-        for script in script_runner.scripts:
-            if script.ui(script.is_img2img):
-                ui_default_values = []
-                for elem in script.ui(script.is_img2img):
-                    ui_default_values.append(elem.value)
-                script_args[script.args_from:script.args_to] = ui_default_values
+    # get default values, deferred scripts are resolved in init_script_args only when a request selects them
+    for script in script_runner.scripts:
+        if isinstance(script, scripts_manager.LazyScript):
+            continue
+        ui_default_values = script_default_args(script, script_runner)
+        if len(ui_default_values) > 0 and len(ui_default_values) == script.args_to - script.args_from:
+            script_args[script.args_from:script.args_to] = ui_default_values
     return script_args
 
 
@@ -82,6 +92,11 @@ def init_script_args(p, request, default_script_args, selectable_scripts, select
     script_args = default_script_args.copy()
     # position 0 in script_arg is the idx+1 of the selectable script that is going to be run when using scripts.scripts_*2img.run()
     if selectable_scripts:
+        ui_default_values = script_default_args(selectable_scripts, script_runner)
+        if len(script_args) < selectable_scripts.args_to:
+            script_args += [None] * (selectable_scripts.args_to - len(script_args))
+        if len(ui_default_values) == selectable_scripts.args_to - selectable_scripts.args_from:
+            script_args[selectable_scripts.args_from:selectable_scripts.args_to] = ui_default_values
         for idx in range(len(request.script_args)):
             script_args[selectable_scripts.args_from + idx] = request.script_args[idx]
         script_args[0] = selectable_script_idx + 1
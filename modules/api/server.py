@@ -165,3 +165,7 @@ def get_memory():
     except Exception as err:
         cuda = { 'error': f'{err}' }
     return models.ResMemory(ram = ram, cuda = cuda)
+
+def get_metrics():
+    from modules import metrics
+    return Response(content=metrics.render(), media_type=metrics.content_type)
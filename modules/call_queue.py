@@ -4,11 +4,12 @@ import html
 import threading
 import time
 import cProfile
-from modules import shared, progress, errors, timer
+from modules import shared, progress, errors, timer, metrics
 from modules.logger import log
 
 
 queue_lock = threading.Lock()
+timed_lock = metrics.TimedLock(queue_lock, 'ui')
 debug = os.environ.get('SD_QUEUE_DEBUG', None) is not None
 
 
@@ -16,7 +17,7 @@ def get_lock():
     if debug:
         fn = f'{sys._getframe(3).f_code.co_name}:{sys._getframe(2).f_code.co_name}:{sys._getframe(1).f_code.co_name}' # pylint: disable=protected-access
         log.debug(f'Queue: fn={fn} lock={queue_lock.locked()}')
-    return queue_lock
+    return timed_lock
 
 
 def wrap_queued_call(func):
@@ -76,26 +76,49 @@ class DeepDanbooru:
         Returns:
             Formatted tag string
         """
-        # Use settings defaults if not specified
-        general_threshold = general_threshold or shared.opts.tagger_threshold
-        include_rating = include_rating if include_rating is not None else shared.opts.tagger_include_rating
-        exclude_tags = exclude_tags or shared.opts.tagger_exclude_tags
-        max_tags = max_tags or shared.opts.tagger_max_tags
-        sort_alpha = sort_alpha if sort_alpha is not None else shared.opts.tagger_sort_alpha
-        use_spaces = use_spaces if use_spaces is not None else shared.opts.tagger_use_spaces
-        escape_brackets = escape_brackets if escape_brackets is not None else shared.opts.tagger_escape_brackets
-
+        settings = self.resolve_settings(general_threshold, include_rating, exclude_tags, max_tags, sort_alpha, use_spaces, escape_brackets)
         if isinstance(pil_image, list):
             pil_image = pil_image[0] if len(pil_image) > 0 else None
         if isinstance(pil_image, dict) and 'name' in pil_image:
             pil_image = Image.open(pil_image['name'])
         if pil_image is None:
             return ''
+        y = self.infer([self.preprocess_image(pil_image)])[0]
+        return self.format_tags(y, **settings)
+
+    def resolve_settings(
+        self,
+        general_threshold: float | None = None,
+        include_rating: bool | None = None,
+        exclude_tags: str | None = None,
+        max_tags: int | None = None,
+        sort_alpha: bool | None = None,
+        use_spaces: bool | None = None,
+        escape_brackets: bool | None = None,
+    ) -> dict:
+        """Fill unspecified tag_multi() arguments from settings defaults."""
+        return {
+            'general_threshold': general_threshold or shared.opts.tagger_threshold,
+            'include_rating': include_rating if include_rating is not None else shared.opts.tagger_include_rating,
+            'exclude_tags': exclude_tags or shared.opts.tagger_exclude_tags,
+            'max_tags': max_tags or shared.opts.tagger_max_tags,
+            'sort_alpha': sort_alpha if sort_alpha is not None else shared.opts.tagger_sort_alpha,
+            'use_spaces': use_spaces if use_spaces is not None else shared.opts.tagger_use_spaces,
+            'escape_brackets': escape_brackets if escape_brackets is not None else shared.opts.tagger_escape_brackets,
+        }
+
+    def preprocess_image(self, pil_image) -> np.ndarray:
         pic = pil_image.resize((512, 512), resample=Image.Resampling.LANCZOS).convert("RGB")
-        a = np.expand_dims(np.array(pic, dtype=np.float32), 0) / 255
+        return np.array(pic, dtype=np.float32) / 255
+
+    def infer(self, inputs: list[np.ndarray]) -> np.ndarray:
+        """Run the model once over a stack of preprocessed images."""
+        a = np.stack(inputs, axis=0)
         with devices.inference_context():
             x = torch.from_numpy(a).to(device=devices.device, dtype=devices.dtype)
-            y = self.model(x)[0].detach().float().cpu().numpy()
+            return self.model(x).detach().float().cpu().numpy()
+
+    def format_tags(self, y, general_threshold, include_rating, exclude_tags, max_tags, sort_alpha, use_spaces, escape_brackets) -> str:
         probability_dict = {}
         for current, probability in zip(self.model.tags, y, strict=False):
             if probability < general_threshold:
@@ -213,16 +236,8 @@ def batch(
     model.load()
 
     # Collect image files
-    image_files = []
-    if batch_files is not None:
-        image_files += [f.name for f in batch_files]
-    if batch_folder is not None:
-        image_files += [f.name for f in batch_folder]
-    if batch_str is not None and len(batch_str) > 0 and os.path.exists(batch_str) and os.path.isdir(batch_str):
-        image_extensions = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif'}
-        folder_path = Path(batch_str.strip())
-        for ext in image_extensions:
-            image_files.extend(str(p) for p in (folder_path.rglob(f'*{ext}') if recursive else folder_path.glob(f'*{ext}')))
+    from modules.caption import pipeline
+    image_files = pipeline.collect_files(batch_files, batch_folder, batch_str, recursive=recursive)
 
     if not image_files:
         log.warning('DeepBooru batch: no images found')
@@ -230,9 +245,12 @@ def batch(
 
     t0 = time.time()
     jobid = shared.state.begin('DeepBooru Batch')
-    log.info(f'DeepBooru batch: images={len(image_files)} write={save_output} append={save_append} recursive={recursive}')
+    batch_size = pipeline.get_batch_size()
+    log.info(f'DeepBooru batch: images={len(image_files)} batch={batch_size} write={save_output} append={save_append} recursive={recursive}')
 
     results = []
+    kwargs.pop('character_threshold', None) # shared tagger UI argument, not used by DeepBooru
+    settings = model.resolve_settings(**kwargs)
     model.start()
 
     # Progress bar
@@ -240,26 +258,35 @@ def batch(
 
     with pbar:
         task = pbar.add_task(total=len(image_files), description='starting...')
-        for file in image_files:
-            file_name = os.path.basename(file)
-            pbar.update(task, advance=1, description=file_name)
+        for batch in pipeline.prefetch(image_files, lambda file: model.preprocess_image(pipeline.load_image(file)), batch_size=batch_size):
+            if shared.state.interrupted:
+                log.info('DeepBooru batch: interrupted')
+                break
+            pbar.update(task, advance=len(batch), description=os.path.basename(batch[-1].file))
+            for item in batch:
+                if item.error is not None:
+                    log.error(f'DeepBooru batch: file="{item.file}" error={item.error}')
+                    results.append(f'{os.path.basename(item.file)}: ERROR - {item.error}')
+            batch = [item for item in batch if item.error is None]
+            if len(batch) == 0:
+                continue
             try:
-                if shared.state.interrupted:
-                    log.info('DeepBooru batch: interrupted')
-                    break
-
-                image = Image.open(file)
-                tags_str = model.tag_multi(image, **kwargs)
-
-                if save_output:
-                    from modules.caption import tagger
-                    tagger.save_tags_to_file(Path(file), tags_str, save_append)
-
-                results.append(f'{file_name}: {tags_str[:100]}...' if len(tags_str) > 100 else f'{file_name}: {tags_str}')
-
+                probs = model.infer([item.data for item in batch])
             except Exception as e:
-                log.error(f'DeepBooru batch: file="{file}" error={e}')
-                results.append(f'{file_name}: ERROR - {e}')
+                log.error(f'DeepBooru batch: files={len(batch)} error={e}')
+                results += [f'{os.path.basename(item.file)}: ERROR - {e}' for item in batch]
+                continue
+            for item, y in zip(batch, probs, strict=False):
+                file_name = os.path.basename(item.file)
+                try:
+                    tags_str = model.format_tags(y, **settings)
+                    if save_output:
+                        from modules.caption import tagger
+                        tagger.save_tags_to_file(Path(item.file), tags_str, save_append)
+                    results.append(f'{file_name}: {tags_str[:100]}...' if len(tags_str) > 100 else f'{file_name}: {tags_str}')
+                except Exception as e:
+                    log.error(f'DeepBooru batch: file="{item.file}" error={e}')
+                    results.append(f'{file_name}: ERROR - {e}')
 
     model.stop()
     elapsed = time.time() - t0
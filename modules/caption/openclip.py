@@ -267,20 +267,58 @@ def caption_image(image, clip_model, blip_model, mode, overrides=None):
     return prompt
 
 
+def encode_images(clip_inputs):
+    """Batched equivalent of Interrogator.image_to_features for preprocessed CLIP inputs."""
+    import torch
+    ci._prepare_clip()
+    with torch.no_grad(), torch.autocast('cuda', enabled=torch.cuda.is_available()):
+        features = ci.clip_model.encode_image(clip_inputs.to(ci.device))
+        features /= features.norm(dim=-1, keepdim=True)
+    return features
+
+
+def generate_captions(pixel_values):
+    """Batched equivalent of Interrogator.generate_caption for preprocessed caption inputs."""
+    ci._prepare_caption()
+    pixel_values = pixel_values.to(ci.device)
+    if not ci.config.caption_model_name.startswith('git-'):
+        pixel_values = pixel_values.to(ci.caption_model.dtype)
+    tokens = ci.caption_model.generate(pixel_values=pixel_values, max_new_tokens=ci.config.caption_max_length)
+    return [text.strip() for text in ci.caption_processor.batch_decode(tokens, skip_special_tokens=True)]
+
+
+def caption_items(items, mode):
+    """Caption a batch of (image, clip_input, caption_input) with one CLIP and one caption model pass."""
+    import torch
+    images = [image for image, _clip_input, _caption_input in items]
+    try:
+        features = encode_images(torch.stack([clip_input for _image, clip_input, _caption_input in items]))
+        if mode == 'negative':
+            captions = [None] * len(items)
+        else:
+            captions = generate_captions(torch.stack([caption_input for _image, _clip_input, caption_input in items]))
+    except Exception as e:
+        log.warning(f'CLIP batch: batched inference failed, using per-image fallback error={e}')
+        return [caption(image, mode) for image in images]
+    prompts = []
+    for i, image in enumerate(images):
+        ci.image_to_features = lambda _image, i=i: features[i:i + 1] # reuse batched features inside interrogator ranking
+        try:
+            prompts.append(caption(image, mode, base_caption=captions[i]))
+        finally:
+            del ci.image_to_features
+    return prompts
+
+
 def caption_batch(batch_files, batch_folder, batch_str, clip_model, blip_model, mode, write, append, recursive):
-    files = []
-    if batch_files is not None:
-        files += [f.name for f in batch_files]
-    if batch_folder is not None:
-        files += [f.name for f in batch_folder]
-    if batch_str is not None and len(batch_str) > 0 and os.path.exists(batch_str) and os.path.isdir(batch_str):
-        from modules.files_cache import list_files
-        files += list(list_files(batch_str, ext_filter=['.png', '.jpg', '.jpeg', '.webp', '.jxl'], recursive=recursive))
+    from modules.caption import pipeline
+    files = pipeline.collect_files(batch_files, batch_folder, batch_str, recursive=recursive)
     if len(files) == 0:
         log.warning('CLIP batch: no images found')
         return ''
     t0 = time.time()
-    log.info(f'CLIP batch: mode="{mode}" images={len(files)} clip="{clip_model}" blip="{blip_model}" write={write} append={append}')
+    batch_size = pipeline.get_batch_size()
+    log.info(f'CLIP batch: mode="{mode}" images={len(files)} batch={batch_size} clip="{clip_model}" blip="{blip_model}" write={write} append={append}')
     debug_log(f'CLIP batch: recursive={recursive} files={files[:5]}{"..." if len(files) > 5 else ""}')
     jobid = shared.state.begin('Caption batch')
     prompts = []
@@ -290,23 +328,32 @@ def caption_batch(batch_files, batch_folder, batch_str, clip_model, blip_model,
         file_mode = 'w' if not append else 'a'
         writer = BatchWriter(os.path.dirname(files[0]), mode=file_mode)
         debug_log(f'CLIP batch: writing to "{os.path.dirname(files[0])}" mode="{file_mode}"')
+
+    def preprocess(file):
+        image = pipeline.load_image(file)
+        clip_input = ci.clip_preprocess(image)
+        caption_input = ci.caption_processor(images=image, return_tensors='pt')['pixel_values'][0] if mode != 'negative' else None
+        return image, clip_input, caption_input
+
     import rich.progress as rp
     pbar = rp.Progress(rp.TextColumn('[cyan]Caption:'), rp.BarColumn(), rp.MofNCompleteColumn(), rp.TaskProgressColumn(), rp.TimeRemainingColumn(), rp.TimeElapsedColumn(), rp.TextColumn('[cyan]{task.description}'), console=console)
     with pbar:
         task = pbar.add_task(total=len(files), description='starting...')
-        for file in files:
-            pbar.update(task, advance=1, description=file)
-            try:
-                if shared.state.interrupted:
-                    log.info('CLIP batch: interrupted')
-                    break
-                image = Image.open(file).convert('RGB')
-                prompt = caption(image, mode)
+        for batch in pipeline.prefetch(files, preprocess, batch_size=batch_size):
+            if shared.state.interrupted:
+                log.info('CLIP batch: interrupted')
+                break
+            pbar.update(task, advance=len(batch), description=batch[-1].file)
+            for item in batch:
+                if item.error is not None:
+                    log.error(f'CLIP batch: file="{item.file}" error={item.error}')
+            batch = [item for item in batch if item.error is None]
+            if len(batch) == 0:
+                continue
+            for item, prompt in zip(batch, caption_items([item.data for item in batch], mode), strict=False):
                 prompts.append(prompt)
                 if write:
-                    writer.add(file, prompt)
-            except OSError as e:
-                log.error(f'CLIP batch: file="{file}" error={e}')
+                    writer.add(item.file, prompt)
     if write:
         writer.close()
     ci.config.quiet = False
@@ -0,0 +1,98 @@
+"""Shared batch pipeline for folder captioning and tagging.
+
+Collects input files and decodes/preprocesses upcoming images on a small thread pool while the
+model works on the current batch, yielding fixed-size batches in input order.
+"""
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from modules import shared
+from modules.logger import log
+
+
+debug_enabled = os.environ.get('SD_CAPTION_DEBUG', None) is not None
+debug_log = log.trace if debug_enabled else lambda *args, **kwargs: None
+image_extensions = ['.png', '.jpg', '.jpeg', '.webp', '.jxl', '.bmp', '.gif']
+Item = namedtuple('Item', ['file', 'data', 'error'])
+
+
+def collect_files(batch_files, batch_folder, batch_str, recursive=False) -> list[str]:
+    files = []
+    if batch_files is not None:
+        files += [f.name for f in batch_files]
+    if batch_folder is not None:
+        files += [f.name for f in batch_folder]
+    if batch_str is not None and len(batch_str) > 0 and os.path.exists(batch_str.strip()) and os.path.isdir(batch_str.strip()):
+        from modules.files_cache import list_files
+        files += list(list_files(batch_str.strip(), ext_filter=image_extensions, recursive=recursive))
+    return files
+
+
+def load_image(file, mode: str | None = 'RGB') -> Image.Image:
+    image = Image.open(file)
+    image.load() # force decode in the worker thread instead of lazily on first access
+    if mode is not None and image.mode != mode:
+        image = image.convert(mode)
+    return image
+
+
+def get_batch_size(batch_size: int | None = None) -> int:
+    return max(1, int(batch_size or shared.opts.caption_batch_size))
+
+
+def prefetch(files: list[str], preprocess=load_image, batch_size: int | None = None, workers: int | None = None):
+    """Yield lists of Item(file, data, error) in input order.
+
+    `preprocess(file)` runs on worker threads for up to two batches ahead of the consumer.
+    Failures are returned as items with `error` set so the caller decides how to report them.
+    With workers=0 everything runs inline on the calling thread.
+    """
+    batch_size = get_batch_size(batch_size)
+    workers = max(0, int(workers if workers is not None else shared.opts.caption_batch_workers))
+    t0 = time.time()
+    t_wait = 0
+
+    def run(file):
+        try:
+            return Item(file, preprocess(file), None)
+        except Exception as e:
+            return Item(file, None, e)
+
+    if workers == 0:
+        for i in range(0, len(files), batch_size):
+            yield [run(file) for file in files[i:i + batch_size]]
+        return
+
+    window = max(2 * batch_size, workers)
+    pending = deque()
+    remaining = iter(files)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sd-caption')
+
+    def fill():
+        while len(pending) < window:
+            file = next(remaining, None)
+            if file is None:
+                return
+            pending.append(executor.submit(run, file))
+
+    try:
+        fill()
+        batch = []
+        while pending:
+            t1 = time.time()
+            item = pending.popleft().result()
+            t_wait += time.time() - t1
+            fill()
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if len(batch) > 0:
+            yield batch
+    finally:
+        for future in pending: # consumer stopped early, e.g. interrupted
+            future.cancel()
+        executor.shutdown(wait=True)
+        debug_log(f'Caption prefetch: files={len(files)} batch={batch_size} workers={workers} wait={t_wait:.2f} time={time.time()-t0:.2f}')
@@ -1648,14 +1648,8 @@ class VQA:
         return answer
 
     def batch(self, model_name, system_prompt, batch_files, batch_folder, batch_str, question, prompt, save_txt, append_txt, save_json, recursive, prefill=None, thinking_mode=False, vlm_mode='caption'):
-        files = []
-        if batch_files is not None:
-            files += [f.name for f in batch_files]
-        if batch_folder is not None:
-            files += [f.name for f in batch_folder]
-        if batch_str is not None and len(batch_str) > 0 and os.path.exists(batch_str) and os.path.isdir(batch_str):
-            from modules.files_cache import list_files
-            files += list(list_files(batch_str, ext_filter=['.png', '.jpg', '.jpeg', '.webp', '.jxl'], recursive=recursive))
+        from modules.caption import pipeline
+        files = pipeline.collect_files(batch_files, batch_folder, batch_str, recursive=recursive)
         if len(files) == 0:
             log.warning('LLM batch: type=vlm no images')
             return ''
@@ -1673,14 +1667,14 @@ class VQA:
             pbar = rp.Progress(rp.TextColumn('[cyan]VLM:'), rp.BarColumn(), rp.MofNCompleteColumn(), rp.TaskProgressColumn(), rp.TimeRemainingColumn(), rp.TimeElapsedColumn(), rp.TextColumn('[cyan]{task.description}'), console=console)
             with pbar:
                 task = pbar.add_task(total=len(files), description='starting...')
-                for file in files:
+                # VLM generation stays per image; upcoming files are decoded by the prefetch workers meanwhile
+                items = (item for batch in pipeline.prefetch(files, lambda file: pipeline.load_image(file, mode=None)) for item in batch)
+                for file, img, error in items:
                     pbar.update(task, advance=1, description=f'file={file}')
                     try:
                         if shared.state.interrupted:
                             break
-                        try:
-                            img = Image.open(file)
-                        except Exception:
+                        if error is not None:
                             continue
                         if vlm_mode == 'caption':
                             result = self.caption(question, system_prompt, prompt, img, model_name, prefill, thinking_mode, quiet=True)
@@ -222,18 +222,7 @@ class WaifuDiffusionTagger:
             Formatted tag string
         """
         t0 = time.time()
-
-        # Use settings defaults if not specified
-        general_threshold = general_threshold or shared.opts.tagger_threshold
-        character_threshold = character_threshold or shared.opts.waifudiffusion_character_threshold
-        include_rating = include_rating if include_rating is not None else shared.opts.tagger_include_rating
-        exclude_tags = exclude_tags or shared.opts.tagger_exclude_tags
-        max_tags = max_tags or shared.opts.tagger_max_tags
-        sort_alpha = sort_alpha if sort_alpha is not None else shared.opts.tagger_sort_alpha
-        use_spaces = use_spaces if use_spaces is not None else shared.opts.tagger_use_spaces
-        escape_brackets = escape_brackets if escape_brackets is not None else shared.opts.tagger_escape_brackets
-
-        debug_log(f'WaifuDiffusion predict: general_threshold={general_threshold} character_threshold={character_threshold} max_tags={max_tags} include_rating={include_rating} sort_alpha={sort_alpha}')
+        settings = self.resolve_settings(general_threshold, character_threshold, include_rating, exclude_tags, max_tags, sort_alpha, use_spaces, escape_brackets)
 
         # Handle input variations
         if isinstance(image, list):
@@ -249,17 +238,71 @@ class WaifuDiffusionTagger:
             if not self.load():
                 return ''
 
-        # Preprocess image
+        # Preprocess image and run inference
         img_input = self.preprocess_image(image)
+        probs = self.infer([img_input])[0]
+        output = self.format_tags(probs, **settings)
+        total_time = time.time() - t0
+        debug_log(f'WaifuDiffusion predict: complete time={total_time:.2f} result="{output[:100]}..."' if len(output) > 100 else f'WaifuDiffusion predict: complete time={total_time:.2f} result="{output}"')
+        return output
 
-        # Run inference
+    def resolve_settings(
+        self,
+        general_threshold: float | None = None,
+        character_threshold: float | None = None,
+        include_rating: bool | None = None,
+        exclude_tags: str | None = None,
+        max_tags: int | None = None,
+        sort_alpha: bool | None = None,
+        use_spaces: bool | None = None,
+        escape_brackets: bool | None = None,
+    ) -> dict:
+        """Fill unspecified predict() arguments from settings defaults."""
+        settings = {
+            'general_threshold': general_threshold or shared.opts.tagger_threshold,
+            'character_threshold': character_threshold or shared.opts.waifudiffusion_character_threshold,
+            'include_rating': include_rating if include_rating is not None else shared.opts.tagger_include_rating,
+            'exclude_tags': exclude_tags or shared.opts.tagger_exclude_tags,
+            'max_tags': max_tags or shared.opts.tagger_max_tags,
+            'sort_alpha': sort_alpha if sort_alpha is not None else shared.opts.tagger_sort_alpha,
+            'use_spaces': use_spaces if use_spaces is not None else shared.opts.tagger_use_spaces,
+            'escape_brackets': escape_brackets if escape_brackets is not None else shared.opts.tagger_escape_brackets,
+        }
+        debug_log(f'WaifuDiffusion predict: general_threshold={settings["general_threshold"]} character_threshold={settings["character_threshold"]} max_tags={settings["max_tags"]} include_rating={settings["include_rating"]} sort_alpha={settings["sort_alpha"]}')
+        return settings
+
+    def infer(self, inputs: list[np.ndarray]) -> list[np.ndarray]:
+        """Run the ONNX session on preprocessed inputs and return per-image probabilities.
+
+        Inputs are stacked into a single batch; models exported with a fixed batch dimension
+        fall back to one run per image.
+        """
         t_infer = time.time()
         input_name = self.session.get_inputs()[0].name
         output_name = self.session.get_outputs()[0].name
-        probs = self.session.run([output_name], {input_name: img_input})[0][0]
-        infer_time = time.time() - t_infer
-        debug_log(f'WaifuDiffusion predict: inference time={infer_time:.3f}s output_shape={probs.shape}')
-
+        try:
+            probs = self.session.run([output_name], {input_name: np.concatenate(inputs, axis=0)})[0]
+        except Exception as e:
+            if len(inputs) == 1:
+                raise
+            debug_log(f'WaifuDiffusion predict: batched inference failed, using per-image fallback error={e}')
+            probs = np.concatenate([self.session.run([output_name], {input_name: img_input})[0] for img_input in inputs], axis=0)
+        debug_log(f'WaifuDiffusion predict: inference batch={len(inputs)} time={time.time() - t_infer:.3f}s output_shape={probs.shape}')
+        return list(probs)
+
+    def format_tags(
+        self,
+        probs: np.ndarray,
+        general_threshold: float,
+        character_threshold: float,
+        include_rating: bool,
+        exclude_tags: str,
+        max_tags: int,
+        sort_alpha: bool,
+        use_spaces: bool,
+        escape_brackets: bool,
+    ) -> str:
+        """Apply thresholds, filters and formatting to one image's probabilities."""
         # Build tag list with probabilities
         tag_probs = {}
         exclude_set = {x.strip().replace(' ', '_').lower() for x in exclude_tags.split(',') if x.strip()}
@@ -323,11 +366,7 @@ class WaifuDiffusionTagger:
                 formatted_tag = f"({formatted_tag}:{tag_probs[tag_name]:.2f})"
             result.append(formatted_tag)
 
-        output = ", ".join(result)
-        total_time = time.time() - t0
-        debug_log(f'WaifuDiffusion predict: complete tags={len(result)} time={total_time:.2f} result="{output[:100]}..."' if len(output) > 100 else f'WaifuDiffusion predict: complete tags={len(result)} time={total_time:.2f} result="{output}"')
-
-        return output
+        return ", ".join(result)
 
     def tag(self, image: Image.Image, **kwargs) -> str:
         """Alias for predict() to match deepbooru interface."""
@@ -428,27 +467,24 @@ def batch(
         tagger.load()
 
     # Collect image files
-    image_files = []
-    if batch_files is not None:
-        image_files += [f.name for f in batch_files]
-    if batch_folder is not None:
-        image_files += [f.name for f in batch_folder]
-    if batch_str is not None and len(batch_str) > 0 and os.path.exists(batch_str) and os.path.isdir(batch_str):
-        image_extensions = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif'}
-        folder_path = Path(batch_str.strip())
-        for ext in image_extensions:
-            image_files.extend(str(p) for p in (folder_path.rglob(f'*{ext}') if recursive else folder_path.glob(f'*{ext}')))
+    from modules.caption import pipeline
+    image_files = pipeline.collect_files(batch_files, batch_folder, batch_str, recursive=recursive)
 
     if not image_files:
         log.warning('WaifuDiffusion batch: no images found')
         return ''
+    if tagger.session is None:
+        log.error('WaifuDiffusion batch: model not loaded')
+        return ''
 
     t0 = time.time()
     jobid = shared.state.begin('WaifuDiffusion Batch')
-    log.info(f'WaifuDiffusion batch: model="{tagger.model_name}" images={len(image_files)} write={save_output} append={save_append} recursive={recursive}')
+    batch_size = pipeline.get_batch_size()
+    log.info(f'WaifuDiffusion batch: model="{tagger.model_name}" images={len(image_files)} batch={batch_size} write={save_output} append={save_append} recursive={recursive}')
     debug_log(f'WaifuDiffusion batch: files={[str(f) for f in image_files[:5]]}{"..." if len(image_files) > 5 else ""}')
 
     results = []
+    settings = tagger.resolve_settings(**kwargs)
 
     # Progress bar
     import rich.progress as rp
@@ -456,26 +492,35 @@ def batch(
 
     with pbar:
         task = pbar.add_task(total=len(image_files), description='starting...')
-        for file in image_files:
-            file_name = os.path.basename(file)
-            pbar.update(task, advance=1, description=file_name)
+        for batch in pipeline.prefetch(image_files, lambda file: tagger.preprocess_image(pipeline.load_image(file)), batch_size=batch_size):
+            if shared.state.interrupted:
+                log.info('WaifuDiffusion batch: interrupted')
+                break
+            pbar.update(task, advance=len(batch), description=os.path.basename(batch[-1].file))
+            for item in batch:
+                if item.error is not None:
+                    log.error(f'WaifuDiffusion batch: file="{item.file}" error={item.error}')
+                    results.append(f'{os.path.basename(item.file)}: ERROR - {item.error}')
+            batch = [item for item in batch if item.error is None]
+            if len(batch) == 0:
+                continue
             try:
-                if shared.state.interrupted:
-                    log.info('WaifuDiffusion batch: interrupted')
-                    break
-
-                image = Image.open(file)
-                tags_str = tagger.predict(image, **kwargs)
-
-                if save_output:
-                    from modules.caption import tagger as tagger_module
-                    tagger_module.save_tags_to_file(Path(file), tags_str, save_append)
-
-                results.append(f'{file_name}: {tags_str[:100]}...' if len(tags_str) > 100 else f'{file_name}: {tags_str}')
-
+                probs = tagger.infer([item.data for item in batch])
             except Exception as e:
-                log.error(f'WaifuDiffusion batch: file="{file}" error={e}')
-                results.append(f'{file_name}: ERROR - {e}')
+                log.error(f'WaifuDiffusion batch: files={len(batch)} error={e}')
+                results += [f'{os.path.basename(item.file)}: ERROR - {e}' for item in batch]
+                continue
+            for item, item_probs in zip(batch, probs, strict=False):
+                file_name = os.path.basename(item.file)
+                try:
+                    tags_str = tagger.format_tags(item_probs, **settings)
+                    if save_output:
+                        from modules.caption import tagger as tagger_module
+                        tagger_module.save_tags_to_file(Path(item.file), tags_str, save_append)
+                    results.append(f'{file_name}: {tags_str[:100]}...' if len(tags_str) > 100 else f'{file_name}: {tags_str}')
+                except Exception as e:
+                    log.error(f'WaifuDiffusion batch: file="{item.file}" error={e}')
+                    results.append(f'{file_name}: ERROR - {e}')
 
     elapsed = time.time() - t0
     log.info(f'WaifuDiffusion batch: complete images={len(results)} time={elapsed:.1f}s')
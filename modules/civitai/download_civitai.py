@@ -12,6 +12,10 @@ from modules import shared, paths
 from modules.logger import console
 
 
+BLOCK_SIZE = 65536 # 64KB blocks
+RANGED_MIN_SIZE = 64 * 1024 * 1024 # only use ranged downloads for files larger than this
+RANGED_MIN_SEGMENT = 16 * 1024 * 1024 # do not split into segments smaller than this
+
 @dataclass
 class DownloadItem:
     id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
@@ -170,6 +174,23 @@ class DownloadManager:
         item.status = "downloading"
         item.bytes_downloaded = starting_pos
 
+        # Hash is updated as bytes arrive so the file never needs to be re-read after download
+        hasher = hashlib.sha256()
+        if starting_pos > 0:
+            with open(temp_file, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+
+        def cancelled():
+            return item.id in self._cancel_ids
+
+        def update(written):
+            item.bytes_downloaded = written
+            if item.bytes_total > 0:
+                item.progress = written / item.bytes_total
+            pbar.update(task, completed=written)
+
+        ranged = False
         try:
             r = shared.req(item.url, headers=headers if headers else None, stream=True)
             if r.status_code not in (200, 206):
@@ -188,33 +209,39 @@ class DownloadManager:
                     item.filename = cn.split('filename=')[-1].strip('"')
                     final_file = os.path.join(item.folder, item.filename)
 
-            block_size = 65536  # 64KB blocks
+            connections = int(getattr(shared.opts, 'civitai_download_connections', 1) or 1)
+            ranged = connections > 1 and starting_pos == 0 and total_size >= RANGED_MIN_SIZE and r.headers.get('accept-ranges', '').lower() == 'bytes'
             written = starting_pos
-            log.info(f'CivitAI download: id={item.id} file="{item.filename}" size={round((starting_pos + total_size) / 1024 / 1024, 1)}MB')
+            log.info(f'CivitAI download: id={item.id} file="{item.filename}" size={round((starting_pos + total_size) / 1024 / 1024, 1)}MB connections={connections if ranged else 1}')
             pbar = p.Progress(p.TextColumn('[cyan]{task.description}'), p.DownloadColumn(), p.BarColumn(), p.TaskProgressColumn(), p.TimeRemainingColumn(), p.TimeElapsedColumn(), p.TransferSpeedColumn(), p.TextColumn('[cyan]{task.fields[name]}'), console=console)
             with pbar:
                 task = pbar.add_task(description="Download", total=starting_pos + total_size, name=item.filename)
-                with open(temp_file, 'ab') as f:
-                    for chunk in r.iter_content(block_size):
-                        # Check cancellation
-                        if item.id in self._cancel_ids:
-                            with self._lock:
-                                self._cancel_ids.discard(item.id)
-                            item.status = "cancelled"
-                            item.completed_at = datetime.now()
-                            log.info(f'CivitAI download cancelled: id={item.id}')
-                            try:
-                                os.remove(temp_file)
-                            except OSError:
-                                pass
-                            return
-
-                        f.write(chunk)
-                        written += len(chunk)
-                        item.bytes_downloaded = written
-                        if item.bytes_total > 0:
-                            item.progress = written / item.bytes_total
-                        pbar.update(task, completed=written)
+                if ranged:
+                    r.close() # ranged workers open their own connections against the resolved url
+                    range_headers = {k: v for k, v in headers.items() if k != 'Authorization' or 'civit' in r.url.lower()}
+                    written = download_ranged(r.url, temp_file, total_size, connections, headers=range_headers, hasher=hasher, on_progress=update, cancelled=cancelled)
+                else:
+                    with open(temp_file, 'ab') as f:
+                        for chunk in r.iter_content(BLOCK_SIZE):
+                            if cancelled():
+                                break
+                            f.write(chunk)
+                            hasher.update(chunk)
+                            written += len(chunk)
+                            update(written)
+
+            # Check cancellation
+            if cancelled():
+                with self._lock:
+                    self._cancel_ids.discard(item.id)
+                item.status = "cancelled"
+                item.completed_at = datetime.now()
+                log.info(f'CivitAI download cancelled: id={item.id}')
+                try:
+                    os.remove(temp_file)
+                except OSError:
+                    pass
+                return
 
             # Validate minimum size
             if written < 1024:
@@ -229,12 +256,22 @@ class DownloadManager:
 
             # Check for incomplete download
             if starting_pos + total_size != written:
+                if ranged: # preallocated file has full size so it cannot be resumed
+                    try:
+                        os.remove(temp_file)
+                    except OSError:
+                        pass
                 item.status = "failed"
                 item.error = f'incomplete: expected={starting_pos + total_size} got={written}'
                 item.completed_at = datetime.now()
                 return
 
         except Exception as e:
+            if ranged:
+                try:
+                    os.remove(temp_file)
+                except OSError:
+                    pass
             item.status = "failed"
             item.error = str(e)
             item.completed_at = datetime.now()
@@ -242,26 +279,22 @@ class DownloadManager:
             return
 
         # Hash verification
+        computed = hasher.hexdigest()
         if item.expected_hash:
             item.status = "verifying"
-            try:
-                from modules import hashes
-                computed = hashes.calculate_sha256(temp_file, quiet=True)
-                if computed.upper() != item.expected_hash.upper():
-                    discard = getattr(shared.opts, 'civitai_discard_hash_mismatch', True)
-                    if discard:
-                        try:
-                            os.remove(temp_file)
-                        except OSError:
-                            pass
-                        item.status = "failed"
-                        item.error = f'hash mismatch: expected={item.expected_hash[:16]}... got={computed[:16]}...'
-                        item.completed_at = datetime.now()
-                        log.error(f'CivitAI download hash mismatch: id={item.id} expected={item.expected_hash[:16]} got={computed[:16]}')
-                        return
-                    log.warning(f'CivitAI download hash mismatch (kept): id={item.id} expected={item.expected_hash[:16]} got={computed[:16]}')
-            except Exception as e:
-                log.warning(f'CivitAI download hash check failed: id={item.id} {e}')
+            if computed.upper() != item.expected_hash.upper():
+                discard = getattr(shared.opts, 'civitai_discard_hash_mismatch', True)
+                if discard:
+                    try:
+                        os.remove(temp_file)
+                    except OSError:
+                        pass
+                    item.status = "failed"
+                    item.error = f'hash mismatch: expected={item.expected_hash[:16]}... got={computed[:16]}...'
+                    item.completed_at = datetime.now()
+                    log.error(f'CivitAI download hash mismatch: id={item.id} expected={item.expected_hash[:16]} got={computed[:16]}')
+                    return
+                log.warning(f'CivitAI download hash mismatch (kept): id={item.id} expected={item.expected_hash[:16]} got={computed[:16]}')
 
         # Move temp to final
         try:
@@ -275,20 +308,19 @@ class DownloadManager:
         item.status = "completed"
         item.progress = 1.0
         item.completed_at = datetime.now()
-        log.info(f'CivitAI download complete: id={item.id} file="{final_file}" size={item.bytes_downloaded}')
+        log.info(f'CivitAI download complete: id={item.id} file="{final_file}" size={item.bytes_downloaded} sha256={computed[:10]}')
 
-        # Write verified hash to cache so check-local finds it immediately
-        if item.expected_hash:
-            try:
-                from modules import hashes
-                model_type_map = {'Checkpoint': 'checkpoint', 'LORA': 'lora', 'TextualInversion': 'embedding', 'VAE': 'vae'}
-                prefix = model_type_map.get(item.model_type, item.model_type.lower())
-                name = os.path.splitext(item.filename)[0]
-                title = f"{prefix}/{name}"
-                hashes.cache().add_hash(title, os.path.getmtime(final_file), item.expected_hash.lower())
-                hashes.save_cache()
-            except Exception:
-                pass
+        # Write computed hash to cache so check-local and first use find it immediately
+        try:
+            from modules import hashes
+            model_type_map = {'Checkpoint': 'checkpoint', 'LORA': 'lora', 'TextualInversion': 'embedding', 'VAE': 'vae'}
+            prefix = model_type_map.get(item.model_type, item.model_type.lower())
+            name = os.path.splitext(item.filename)[0]
+            title = f"{prefix}/{name}"
+            hashes.cache().add_hash(title, os.path.getmtime(final_file), computed.lower())
+            hashes.save_cache()
+        except Exception:
+            pass
 
         # Download metadata and preview
         self._fetch_sidecar(item, final_file)
@@ -340,6 +372,83 @@ class DownloadManager:
         return os.environ.get('CIVITAI_TOKEN', None)
 
 
+def download_ranged(url: str, temp_file: str, total_size: int, connections: int, headers: dict | None = None, hasher=None, on_progress=None, cancelled=None) -> int:
+    """Download file using parallel http range requests into preallocated file.
+    Preallocated file is full size from the start, so callers must remove it when download does not complete.
+
+    Each connection writes its own segment in place. The calling thread hashes the contiguous
+    prefix of completed bytes as segments advance, so the hash is ready when the last byte lands
+    and the data is read back while it is still in the page cache. Returns number of bytes written.
+    """
+    import requests
+    connections = max(1, min(connections, total_size // RANGED_MIN_SEGMENT or 1))
+    segment = total_size // connections
+    segments = [(i * segment, (total_size if i == connections - 1 else (i + 1) * segment) - 1) for i in range(connections)]
+    done = [0] * connections
+    errors = []
+    cond = threading.Condition()
+    with open(temp_file, 'wb') as f:
+        f.truncate(total_size) # preallocate so segments can be written in place
+
+    def fetch(i: int):
+        start, end = segments[i]
+        try:
+            r = requests.get(url, headers={**(headers or {}), 'Range': f'bytes={start}-{end}'}, stream=True, timeout=30, verify=False, allow_redirects=True)
+            if r.status_code != 206:
+                raise RuntimeError(f'range request not honored: segment={i} status={r.status_code}')
+            with open(temp_file, 'r+b', buffering=0) as f: # unbuffered so hashing thread can read bytes as soon as they are counted
+                f.seek(start)
+                for chunk in r.iter_content(BLOCK_SIZE):
+                    if cancelled is not None and cancelled():
+                        break
+                    chunk = chunk[:end - start + 1 - done[i]]
+                    f.write(chunk)
+                    with cond:
+                        done[i] += len(chunk)
+                        cond.notify_all()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            with cond:
+                cond.notify_all()
+
+    def watermark() -> int:
+        for i, (start, end) in enumerate(segments):
+            if done[i] < end - start + 1:
+                return start + done[i]
+        return total_size
+
+    threads = [threading.Thread(target=fetch, args=(i,), daemon=True, name=f'sdnext-download-{i}') for i in range(connections)]
+    for thread in threads:
+        thread.start()
+    hashed = 0
+    with open(temp_file, 'rb', buffering=0) as reader:
+        while True:
+            with cond:
+                cond.wait_for(lambda pos=hashed: watermark() > pos or not any(t.is_alive() for t in threads), timeout=1)
+                limit = watermark()
+                alive = any(t.is_alive() for t in threads)
+            if hasher is not None and limit > hashed:
+                reader.seek(hashed)
+                while hashed < limit:
+                    chunk = reader.read(min(1024 * 1024, limit - hashed))
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    hashed += len(chunk)
+            else:
+                hashed = limit
+            if on_progress is not None:
+                on_progress(sum(done))
+            if not alive or errors or (cancelled is not None and cancelled()):
+                break
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return watermark()
+
+
 download_manager = DownloadManager()
 
 
@@ -0,0 +1,134 @@
+"""Cache of control processor outputs keyed by input image content, processor id, processor params and target size.
+
+Memory tier keeps last `control_cache_size` results, optional disk tier stores results as png in `data/control-cache`
+and removes least recently used files once total size exceeds `control_cache_disk` megabytes.
+Repeated jobs on same control image with different prompt or seed skip processor load and detection entirely.
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from PIL import Image
+from modules import shared, paths, metrics
+from modules.logger import log
+
+
+debug = log.trace if os.environ.get('SD_CONTROL_DEBUG', None) is not None else lambda *args, **kwargs: None
+cache = OrderedDict() # key -> processed image
+lock = threading.Lock()
+disk_index: OrderedDict | None = None # key -> file size, least recently used first
+disk_total = 0
+
+
+def folder() -> str:
+    return os.path.join(paths.data_path, 'data', 'control-cache')
+
+
+def filename(key: str) -> str:
+    return os.path.join(folder(), f'{key}.png')
+
+
+def enabled() -> bool:
+    return shared.opts.control_cache_size > 0 or shared.opts.control_cache_disk > 0
+
+
+def image_hash(image: Image.Image) -> str:
+    h = hashlib.sha256(image.tobytes())
+    h.update(f'{image.mode}:{image.width}x{image.height}'.encode('utf-8'))
+    return h.hexdigest()
+
+
+def make_key(image: Image.Image, processor_id: str, params: dict, resize: bool) -> str:
+    values = [image_hash(image), processor_id, sorted(params.items()), resize]
+    return hashlib.sha256(json.dumps(values, default=str).encode('utf-8')).hexdigest()
+
+
+def load_disk_index() -> OrderedDict:
+    global disk_index, disk_total # pylint: disable=global-statement
+    if disk_index is not None:
+        return disk_index
+    entries = []
+    if os.path.isdir(folder()):
+        for entry in os.scandir(folder()):
+            if entry.is_file() and entry.name.endswith('.png'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-len('.png')], stat.st_size))
+    disk_index = OrderedDict((key, size) for _mtime, key, size in sorted(entries))
+    disk_total = sum(disk_index.values())
+    return disk_index
+
+
+def disk_evict(limit: int):
+    global disk_total # pylint: disable=global-statement
+    while disk_total > limit and len(disk_index) > 0:
+        key, size = disk_index.popitem(last=False)
+        disk_total -= size
+        try:
+            os.remove(filename(key))
+        except OSError:
+            pass
+
+
+def get(key: str) -> Image.Image | None:
+    with lock:
+        image = cache.get(key, None)
+        if image is not None:
+            cache.move_to_end(key)
+        elif shared.opts.control_cache_disk > 0 and key in load_disk_index():
+            disk_index.move_to_end(key)
+            try:
+                with Image.open(filename(key)) as f:
+                    image = f.copy()
+                os.utime(filename(key)) # mtime is lru clock across restarts
+                remember(key, image)
+            except Exception as e:
+                log.warning(f'Control cache: file="{filename(key)}" {e}')
+    metrics.cache('control', image is not None)
+    if image is not None:
+        debug(f'Control cache: get={key}')
+        return image.copy() # callers may modify returned image
+    return None
+
+
+def remember(key: str, image: Image.Image):
+    cache[key] = image
+    cache.move_to_end(key)
+    while len(cache) > max(int(shared.opts.control_cache_size), 0):
+        cache.popitem(last=False)
+
+
+def put(key: str, image: Image.Image):
+    global disk_total # pylint: disable=global-statement
+    if not isinstance(image, Image.Image):
+        return
+    image = image.copy()
+    with lock:
+        remember(key, image)
+        if shared.opts.control_cache_disk <= 0:
+            return
+        load_disk_index()
+        try:
+            os.makedirs(folder(), exist_ok=True)
+            image.save(filename(key) + '.tmp', format='PNG', compress_level=1)
+            os.replace(filename(key) + '.tmp', filename(key))
+            size = os.path.getsize(filename(key))
+        except Exception as e:
+            log.warning(f'Control cache: file="{filename(key)}" {e}')
+            return
+        disk_total += size - disk_index.get(key, 0)
+        disk_index[key] = size
+        disk_index.move_to_end(key)
+        disk_evict(int(shared.opts.control_cache_disk * 1024 * 1024))
+    debug(f'Control cache: put={key}')
+
+
+def clear(disk: bool = False):
+    global disk_index, disk_total # pylint: disable=global-statement
+    with lock:
+        cache.clear()
+        if disk:
+            load_disk_index()
+            disk_evict(0)
+            disk_index = None
+            disk_total = 0
@@ -5,6 +5,7 @@ from PIL import Image
 from modules.logger import log
 from modules.errors import display
 from modules import devices, images
+from modules.control import cache
 
 
 models = {}
@@ -348,6 +349,14 @@ class Processor:
             image_input = image_input[0]
         if self.processor_id not in config:
             return image_process
+        kwargs = dict(config.get(self.processor_id, {}).get('params', {}))
+        if local_config:
+            kwargs.update(local_config)
+        cache_key = cache.make_key(image_input, self.processor_id, kwargs, self.resize) if cache.enabled() else None
+        cached = cache.get(cache_key) if cache_key is not None else None
+        if cached is not None: # same input and params, skip processor load and detection
+            debug(f'Control Processor: id="{self.processor_id}" cached={cached}')
+            return cached.convert(mode) if mode != 'RGB' else cached
         if config[self.processor_id].get('dirty', False):
             processor_id = self.processor_id
             config[processor_id].pop('dirty')
@@ -358,9 +367,6 @@ class Processor:
             return image_process
         try:
             t0 = time.time()
-            kwargs = dict(config.get(self.processor_id, {}).get('params', {}))
-            if local_config:
-                kwargs.update(local_config)
             if self.resize:
                 image_resized = image_input.resize((512, 512), Image.Resampling.LANCZOS)
             else:
@@ -376,6 +382,8 @@ class Processor:
                 image_process = Image.fromarray(image_process, 'L')
             if self.resize and image_process.size != image_input.size:
                 image_process = image_process.resize(image_input.size, Image.Resampling.LANCZOS)
+            if cache_key is not None:
+                cache.put(cache_key, image_process)
             t1 = time.time()
             log.debug(f'Control Processor: id="{self.processor_id}" mode={mode} args={kwargs} time={t1-t0:.2f}')
         except Exception as e:
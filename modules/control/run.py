@@ -368,7 +368,7 @@ def control_run(state: str = '', # pylint: disable=keyword-arg-before-vararg
                 override_script_name: str | None = None, override_script_args = None, extra: dict | None = None,
                 *input_script_args,
                 # API-only params (keyword-only, not wired to Gradio)
-                detailer_segmentation: bool | None = None, detailer_include_detections: bool | None = None, detailer_merge: bool | None = None, detailer_sort: bool | None = None, detailer_classes: str | None = None,
+                detailer_segmentation: bool | None = None, detailer_include_detections: bool | None = None, detailer_merge: bool | None = None, detailer_sort: bool | None = None, detailer_batch: bool | None = None, detailer_classes: str | None = None,
                 detailer_conf: float | None = None, detailer_iou: float | None = None, detailer_max: int | None = None,
                 detailer_min_size: float | None = None, detailer_max_size: float | None = None,
                 detailer_blur: int | None = None, detailer_padding: int | None = None,
@@ -528,6 +528,7 @@ def control_run(state: str = '', # pylint: disable=keyword-arg-before-vararg
         detailer_include_detections = detailer_include_detections,
         detailer_merge = detailer_merge,
         detailer_sort = detailer_sort,
+        detailer_batch = detailer_batch,
         detailer_classes = detailer_classes,
         detailer_conf=detailer_conf, detailer_iou=detailer_iou, detailer_max=detailer_max,
         detailer_min_size=detailer_min_size, detailer_max_size=detailer_max_size,
@@ -10,10 +10,24 @@ class Detailer: # abstract class used for postprocessing
     def restore(self, np_image):
         return np_image
 
+    def prefetch(self, images, p=None): # optional batch pre-pass before per-image restore
+        pass
 
-def detail(np_image, p=None): # postprocesses the image
+
+def get_detailer():
     detailers = [x for x in shared.detailers if x.name() == shared.opts.detailer_model or shared.opts.detailer_model is None]
-    if len(detailers) == 0:
+    return detailers[0] if len(detailers) > 0 else None
+
+
+def detail(np_image, p=None): # postprocesses the image
+    detailer: Detailer = get_detailer()
+    if detailer is None:
         return np_image
-    detailer: Detailer = detailers[0]
     return detailer.restore(np_image, p)
+
+
+def prefetch(images, p=None): # runs detection for the whole output batch ahead of per-image detail
+    detailer: Detailer = get_detailer()
+    if detailer is None:
+        return
+    detailer.prefetch(images, p)
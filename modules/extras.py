@@ -7,7 +7,7 @@ from PIL import Image
 import torch
 import gradio as gr
 import safetensors.torch
-from modules.merging import merge, merge_utils, modules_sdxl
+from modules.merging import merge, merge_stream, merge_utils, modules_sdxl
 from modules import shared, images, sd_models, sd_vae, sd_samplers, devices
 from modules.logger import log
 
@@ -111,33 +111,14 @@ def run_modelmerger(id_task, **kwargs):  # pylint: disable=unused-argument
         kwargs["device"] = torch.device("cpu")
     if kwargs.pop("unload", False):
         sd_models.unload_model_weights()
-
-    try:
-        theta_0 = merge.merge_models(**kwargs)
-    except Exception as e:
-        return fail(f"{e}")
-
-    try:
-        theta_0 = theta_0.to_dict() #TensorDict -> Dict if necessary
-    except Exception:
-        pass
-
-    bake_in_vae_filename = sd_vae.vae_dict.get(kwargs.get("bake_in_vae", None), None)
-    if bake_in_vae_filename is not None:
-        log.info(f"Merge VAE='{bake_in_vae_filename}'")
-        shared.state.textinfo = 'Merge VAE'
-        vae_dict = sd_vae.load_vae_dict(bake_in_vae_filename)
-        for key in vae_dict.keys():
-            theta_0_key = 'first_stage_model.' + key
-            if theta_0_key in theta_0:
-                theta_0[theta_0_key] = to_half(vae_dict[key], kwargs.get("precision", "fp16") == "fp16")
-        del vae_dict
+    streaming = kwargs.pop("streaming", False) and kwargs.get("checkpoint_format", None) == "safetensors" and merge_stream.supported(**kwargs)
 
     ckpt_dir = shared.opts.ckpt_dir or sd_models.model_path
     filename = kwargs.get("custom_name", "Unnamed_Merge")
     filename += "." + kwargs.get("checkpoint_format", None)
     output_modelname = os.path.join(ckpt_dir, filename)
-    shared.state.textinfo = "merge saving"
+    if os.path.exists(output_modelname) and not kwargs.get("overwrite", False):
+        return [*[gr.Dropdown.update(choices=sd_models.checkpoint_titles()) for _ in range(4)], f"Model already exists: {output_modelname}"]
     metadata = None
     if kwargs.get("save_metadata", False):
         metadata = {"format": "pt", "sd_merge_models": {}}
@@ -170,14 +151,42 @@ def run_modelmerger(id_task, **kwargs):  # pylint: disable=unused-argument
             add_model_metadata(tertiary_model_info)
         metadata["sd_merge_models"] = json.dumps(metadata["sd_merge_models"])
 
-    _, extension = os.path.splitext(output_modelname)
+    vae_dict = {}
+    bake_in_vae_filename = sd_vae.vae_dict.get(kwargs.get("bake_in_vae", None), None)
+    if bake_in_vae_filename is not None:
+        log.info(f"Merge VAE='{bake_in_vae_filename}'")
+        shared.state.textinfo = 'Merge VAE'
+        vae_dict = {'first_stage_model.' + key: to_half(value, kwargs.get("precision", "fp16") == "fp16") for key, value in sd_vae.load_vae_dict(bake_in_vae_filename).items()}
 
-    if os.path.exists(output_modelname) and not kwargs.get("overwrite", False):
-        return [*[gr.Dropdown.update(choices=sd_models.checkpoint_titles()) for _ in range(4)], f"Model already exists: {output_modelname}"]
-    if extension.lower() == ".safetensors":
-        safetensors.torch.save_file(theta_0, output_modelname, metadata=metadata)
+    if streaming:
+        shared.state.textinfo = "merge streaming"
+        try:
+            merge_stream.merge_to_file(output_modelname, metadata=metadata, replace=vae_dict, **kwargs)
+        except Exception as e:
+            return fail(f"{e}")
     else:
-        torch.save(theta_0, output_modelname)
+        try:
+            theta_0 = merge.merge_models(**kwargs)
+        except Exception as e:
+            return fail(f"{e}")
+
+        try:
+            theta_0 = theta_0.to_dict() #TensorDict -> Dict if necessary
+        except Exception:
+            pass
+
+        for key, value in vae_dict.items():
+            if key in theta_0:
+                theta_0[key] = value
+
+        shared.state.textinfo = "merge saving"
+        _, extension = os.path.splitext(output_modelname)
+        if extension.lower() == ".safetensors":
+            safetensors.torch.save_file(theta_0, output_modelname, metadata=metadata)
+        else:
+            torch.save(theta_0, output_modelname)
+        del theta_0
+    del vae_dict
 
     t1 = time.time()
     log.info(f"Merge complete: saved='{output_modelname}' time={t1-t0:.2f}")
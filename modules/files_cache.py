@@ -1,13 +1,19 @@
 from typing import Union
 import itertools
 import os
+import time
 from collections import UserDict
 from collections.abc import Callable, Iterator
 from dataclasses import dataclass, field
 from modules.logger import log
+from modules import metrics
 
 
 do_cache_folders = os.environ.get('SD_NO_CACHE', None) is None
+watcher = None # files_watch.Watcher when change notifications are enabled, cached reads of watched directories then skip mtime checks
+snapshot_pending: set[str] = set() # directories loaded from snapshot and trusted as-is until background revalidation reaches them
+snapshot_version = 1
+snapshot_registered = False
 class Directory: # forward declaration
     ...
 
@@ -20,6 +26,7 @@ DirectoryIterator = Iterator[Directory]
 DirectoryCollection = dict[str, Directory]
 ExtensionFilter = Callable
 ExtensionList = list[str]
+FileStats = dict[str, tuple[int, float]]
 RecursiveType = Union[bool,Callable]
 
 
@@ -37,6 +44,7 @@ class Directory(Directory): # pylint: disable=E0102
     mtime: float = field(default_factory=float, init=False)
     files: FilePathList = field(default_factory=list)
     directories: DirectoryPathList = field(default_factory=list)
+    stats: FileStats = field(default_factory=dict) # file path -> (size, mtime) captured during scan
 
     def __post_init__(self):
         object.__setattr__(self, 'mtime', self.live_mtime)
@@ -48,6 +56,7 @@ class Directory(Directory): # pylint: disable=E0102
         object.__setattr__(directory, 'mtime', dict_object.get('mtime'))
         object.__setattr__(directory, 'files', dict_object.get('files'))
         object.__setattr__(directory, 'directories', dict_object.get('directories'))
+        object.__setattr__(directory, 'stats', dict_object.get('stats', None) or {})
         return directory
 
     def clear(self) -> None:
@@ -55,7 +64,8 @@ class Directory(Directory): # pylint: disable=E0102
             'path': None,
             'mtime': 0.0,
             'files': [],
-            'directories': []
+            'directories': [],
+            'stats': {},
         }))
 
     def update(self, source_directory: Directory) -> Directory:
@@ -70,6 +80,8 @@ class Directory(Directory): # pylint: disable=E0102
                 delete_cached_directory(dead_path)
         self.directories[:] = source.directories
         self.files[:] = source.files
+        self.stats.clear()
+        self.stats.update(source.stats)
         object.__setattr__(self, 'mtime', source.mtime)
 
     @property
@@ -98,7 +110,24 @@ class DirectoryCache(UserDict, DirectoryCollection):
         del self.data[directory_path]
 
 
+def is_trusted(directory_path: str) -> bool:
+    """Cached entry is known to be current without touching the filesystem."""
+    return directory_path in snapshot_pending or (watcher is not None and watcher.is_clean(directory_path))
+
+
 def clean_directory(directory: Directory, /, recursive: RecursiveType=False) -> bool:
+    if directory.path in snapshot_pending:
+        return True
+    if watcher is not None:
+        if not recursive and watcher.is_clean(directory.path):
+            return True
+        dirty = watcher.take(directory.path)
+        watcher.watch(directory.path)
+        if dirty and directory.is_directory: # file writes do not change directory mtime, rescan so file stats are current
+            fresh = fetch_directory(directory.path)
+            if fresh is not None:
+                directory.update(fresh)
+                return False
     if not directory.is_directory:
         is_clean = False
         delete_cached_directory(directory.path)
@@ -128,18 +157,25 @@ def clean_directory(directory: Directory, /, recursive: RecursiveType=False) ->
 
 def get_directory(directory_or_path: str, /, fetch: bool=True) -> Directory | None:
     if isinstance(directory_or_path, Directory):
+        if is_trusted(directory_or_path.path):
+            return directory_or_path
         if directory_or_path.is_directory:
             return directory_or_path
         else:
             directory_or_path = directory_or_path.path
     directory_or_path = real_path(directory_or_path)
     if not cache_folders.get(directory_or_path, None):
+        metrics.cache('files', False)
         if fetch:
+            watched = watcher is not None and do_cache_folders and watcher.watch(directory_or_path) # watch before scan so changes during the scan are not lost
             directory = fetch_directory(directory_path=directory_or_path)
             if directory and do_cache_folders:
                 cache_folders[directory_or_path] = directory
+            elif watched:
+                watcher.unwatch(directory_or_path)
             return directory
     else:
+        metrics.cache('files', True)
         clean_directory(cache_folders[directory_or_path])
     return cache_folders[directory_or_path] if directory_or_path in cache_folders else None
 
@@ -155,6 +191,7 @@ def _walk(top, recurse:RecursiveType=True) -> Directory:
     # reimplemented `path.walk()`
     nondirs = []
     walk_dirs = []
+    stats = {}
     try:
         scandir_it = os.scandir(top)
     except OSError:
@@ -167,12 +204,18 @@ def _walk(top, recurse:RecursiveType=True) -> Directory:
                 break
             if not entry.is_dir():
                 nondirs.append(entry.path)
+                if not entry.is_symlink():
+                    try:
+                        stat = entry.stat()
+                        stats[entry.path] = (stat.st_size, stat.st_mtime)
+                    except OSError:
+                        pass
             else:
                 if entry.is_symlink() and not os.path.exists(entry.path):
                     log.error(f'Files broken symlink: {entry.path}')
                 else:
                     walk_dirs.append(entry.path)
-    yield Directory(top, nondirs, walk_dirs)
+    yield Directory(top, nondirs, walk_dirs, stats)
     if recurse:
         for new_path in walk_dirs:
             if callable(recurse) and not recurse(new_path):
@@ -202,6 +245,20 @@ def delete_cached_directory(directory_path:str) -> bool:
     global cache_folders # pylint: disable=W0602
     if directory_path in cache_folders:
         del cache_folders[directory_path]
+    if watcher is not None:
+        watcher.unwatch(directory_path)
+
+
+def file_stat(file_path:str) -> tuple[int, float] | None:
+    """Cached (size, mtime) of a file if its directory is known to be current, otherwise None and caller should stat the file."""
+    file_path = real_path(file_path)
+    if not file_path:
+        return None
+    directory_path = os.path.dirname(file_path)
+    directory = cache_folders.get(directory_path, None)
+    if directory is None or not is_trusted(directory_path):
+        return None
+    return directory.stats.get(file_path, None)
 
 
 def is_directory(dir_path:str) -> bool:
@@ -301,4 +358,112 @@ def list_files(*directory_paths:DirectoryPathList, ext_filter: ExtensionList | N
     ), ext_filter, ext_blacklist)
 
 
+def watch_start(mode: str='local') -> None:
+    """Enable change notifications for cached directories: none, local (skip network filesystems) or all."""
+    global watcher # pylint: disable=global-statement
+    if watcher is not None and watcher.mode == mode:
+        return
+    watch_stop()
+    if not do_cache_folders:
+        return
+    from modules import files_watch
+    instance = files_watch.create(mode)
+    if instance is None:
+        return
+    for directory_path in list(cache_folders.keys()): # existing entries may have changed while unwatched, revalidate once
+        if directory_path not in snapshot_pending: # snapshot entries are watched when revalidated
+            instance.watch(directory_path, dirty=True)
+    watcher = instance
+    log.debug(f'Files watch: {watcher.stats()}')
+
+
+def watch_stop() -> None:
+    global watcher # pylint: disable=global-statement
+    if watcher is None:
+        return
+    instance, watcher = watcher, None
+    instance.close()
+
+
+def snapshot_filename() -> str:
+    from modules.paths import data_path
+    return os.path.join(data_path, 'data', 'files.json')
+
+
+def snapshot_save() -> None:
+    if not do_cache_folders or len(cache_folders) == 0:
+        return
+    from modules.json_helpers import writefile
+    t0 = time.time()
+    directories = {}
+    for directory_path, directory in list(cache_folders.items()):
+        if not directory.path:
+            continue
+        files = list(directory.files)
+        directories[directory_path] = {
+            'mtime': directory.mtime,
+            'files': files,
+            'directories': list(directory.directories),
+            'stats': [directory.stats.get(f, None) for f in files],
+        }
+    writefile({'version': snapshot_version, 'directories': directories}, snapshot_filename(), silent=True, atomic=True)
+    log.debug(f'Files snapshot: save directories={len(directories)} files={sum(len(d["files"]) for d in directories.values())} time={time.time()-t0:.2f}')
+
+
+def snapshot_load() -> int:
+    """Seed cache from snapshot saved on previous shutdown; loaded entries are served as-is until `snapshot_revalidate` rescans them."""
+    global snapshot_registered # pylint: disable=global-statement
+    if not do_cache_folders:
+        return 0
+    if not snapshot_registered:
+        import atexit
+        atexit.register(snapshot_save)
+        snapshot_registered = True
+    filename = snapshot_filename()
+    if not os.path.isfile(filename):
+        return 0
+    from modules.json_helpers import readfile
+    t0 = time.time()
+    data = readfile(filename, silent=True, as_type='dict')
+    if data.get('version', None) != snapshot_version:
+        return 0
+    loaded = 0
+    for directory_path, entry in data.get('directories', {}).items():
+        if directory_path in cache_folders: # live entry from before a server restart is newer
+            continue
+        files = entry.get('files', [])
+        stats = {f: tuple(stat) for f, stat in zip(files, entry.get('stats', []), strict=False) if stat is not None}
+        cache_folders[directory_path] = Directory.from_dict({'path': directory_path, 'mtime': entry.get('mtime', 0), 'files': files, 'directories': entry.get('directories', []), 'stats': stats})
+        snapshot_pending.add(directory_path)
+        loaded += 1
+    log.debug(f'Files snapshot: load directories={loaded} time={time.time()-t0:.2f}')
+    return loaded
+
+
+def snapshot_revalidate() -> DirectoryPathList:
+    """Rescan directories loaded from snapshot and return paths whose listing or file stats changed."""
+    t0 = time.time()
+    total = len(snapshot_pending)
+    changed = []
+    for directory_path in sorted(snapshot_pending):
+        directory = cache_folders.get(directory_path, None)
+        if directory is None: # removed by an earlier parent rescan
+            snapshot_pending.discard(directory_path)
+            continue
+        if watcher is not None:
+            watcher.watch(directory_path) # watch before scan so changes during the scan are not lost
+        fresh = fetch_directory(directory_path)
+        if fresh is None:
+            snapshot_pending.discard(directory_path)
+            delete_cached_directory(directory_path)
+            changed.append(directory_path)
+            continue
+        if set(fresh.files) != set(directory.files) or set(fresh.directories) != set(directory.directories) or fresh.stats != directory.stats:
+            changed.append(directory_path)
+        directory.update(fresh)
+        snapshot_pending.discard(directory_path)
+    log.debug(f'Files snapshot: revalidate directories={total} changed={len(changed)} time={time.time()-t0:.2f}')
+    return changed
+
+
 cache_folders = DirectoryCache({})
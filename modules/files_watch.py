@@ -0,0 +1,200 @@
+"""Directory change notifications for files_cache.
+
+Uses Linux inotify through libc so cached directory listings can be trusted without re-stating them on every read.
+Each cached directory gets its own non-recursive watch; any event on it marks that path dirty and the next read revalidates it.
+Paths that cannot be watched (other platforms, network filesystems, exhausted watch limit) simply stay on mtime polling.
+"""
+import os
+import sys
+import errno
+import struct
+import select
+import threading
+from modules.logger import log
+
+
+debug = log.trace if os.environ.get('SD_FILES_DEBUG', None) is not None else lambda *args, **kwargs: None
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_CLOEXEC = 0o2000000
+watch_mask = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+event_header = struct.Struct('iIII') # wd, mask, cookie, len
+# changes made by other hosts are not reported by inotify on these
+remote_filesystems = ['nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'ncpfs', 'afs', '9p', 'drvfs', 'ceph', 'glusterfs', 'lustre', 'gpfs', 'davfs', 'fuse.sshfs', 'fuse.rclone', 'fuse.s3fs', 'fuse.glusterfs', 'fuse.juicefs']
+
+
+def read_mounts() -> list[tuple[str, str]]:
+    """Return (mountpoint, fstype) sorted longest mountpoint first."""
+    mounts = []
+    try:
+        with open('/proc/self/mounts', encoding='utf8') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3:
+                    mountpoint = fields[1].replace('\\040', ' ').replace('\\011', '\t').replace('\\134', '\\')
+                    mounts.append((mountpoint, fields[2]))
+    except Exception:
+        pass
+    mounts.sort(key=lambda m: len(m[0]), reverse=True)
+    return mounts
+
+
+class Watcher:
+    def __init__(self, mode: str = 'local'):
+        import ctypes
+        import ctypes.util
+        self.mode = mode
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), f'inotify init: {os.strerror(ctypes.get_errno())}')
+        self.lock = threading.Lock()
+        self.paths: dict[int, set[str]] = {} # wd -> cached paths, several paths can resolve to the same inode
+        self.watched: dict[str, int] = {} # cached path -> wd
+        self.dirty: set[str] = set()
+        self.skip: set[str] = set() # paths that cannot be watched, remembered so polling does not retry on every read
+        self.mounts = read_mounts() if mode == 'local' else []
+        self.exhausted = False
+        self.events = 0
+        self.stop_r, self.stop_w = os.pipe()
+        self.thread = threading.Thread(target=self.loop, name='sd-files-watch', daemon=True)
+        self.thread.start()
+
+    def remote(self, path: str) -> bool:
+        real = os.path.realpath(path)
+        for mountpoint, fstype in self.mounts:
+            if real == mountpoint or real.startswith(os.path.join(mountpoint, '')):
+                return fstype in remote_filesystems
+        return False
+
+    def is_clean(self, path: str) -> bool:
+        """True if path is watched and nothing changed since its last revalidation; never touches the filesystem."""
+        return path in self.watched and path not in self.dirty
+
+    def take(self, path: str) -> bool:
+        """Clear dirty flag before revalidating so events arriving during the rescan are kept, returns previous state."""
+        try:
+            self.dirty.remove(path)
+            return True
+        except KeyError:
+            return False
+
+    def watch(self, path: str, dirty: bool = False) -> bool:
+        if path in self.watched:
+            return True
+        if self.exhausted or self.fd < 0 or not path or path in self.skip:
+            return False
+        if self.mounts and self.remote(path):
+            debug(f'Files watch: path="{path}" remote')
+            self.skip.add(path)
+            return False
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), watch_mask)
+        if wd < 0:
+            import ctypes
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                self.exhausted = True
+                log.warning(f'Files watch: limit reached watched={len(self.watched)} fallback=polling')
+            elif err not in (errno.ENOENT, errno.ENOTDIR):
+                debug(f'Files watch: path="{path}" error="{os.strerror(err)}"')
+                self.skip.add(path)
+            return False
+        with self.lock:
+            self.paths.setdefault(wd, set()).add(path)
+            self.watched[path] = wd
+            if dirty:
+                self.dirty.add(path)
+        return True
+
+    def unwatch(self, path: str) -> None:
+        with self.lock:
+            wd = self.watched.pop(path, None)
+            self.dirty.discard(path)
+            if wd is None:
+                return
+            paths = self.paths.get(wd, set())
+            paths.discard(path)
+            if len(paths) > 0:
+                return
+            self.paths.pop(wd, None)
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def dispatch(self, buffer: bytes) -> None:
+        offset = 0
+        with self.lock:
+            while offset + event_header.size <= len(buffer):
+                wd, mask, _cookie, length = event_header.unpack_from(buffer, offset)
+                offset += event_header.size + length
+                self.events += 1
+                if mask & IN_Q_OVERFLOW:
+                    debug(f'Files watch: overflow watched={len(self.watched)}')
+                    self.dirty.update(self.watched)
+                    continue
+                paths = self.paths.get(wd, None)
+                if paths is None:
+                    continue
+                self.dirty.update(paths)
+                if mask & (IN_IGNORED | IN_UNMOUNT): # watch is gone, paths fall back to polling
+                    for path in self.paths.pop(wd, set()):
+                        self.watched.pop(path, None)
+
+    def loop(self) -> None:
+        while True:
+            try:
+                ready, _w, _x = select.select([self.fd, self.stop_r], [], [])
+                if self.stop_r in ready:
+                    break
+                self.dispatch(os.read(self.fd, 65536))
+            except InterruptedError:
+                continue
+            except Exception as e:
+                log.error(f'Files watch: {e}')
+                with self.lock:
+                    self.dirty.update(self.watched)
+                    self.watched.clear()
+                    self.paths.clear()
+                break
+
+    def close(self) -> None:
+        with self.lock:
+            self.dirty.update(self.watched)
+            self.watched.clear()
+            self.paths.clear()
+        try:
+            os.write(self.stop_w, b'\0')
+            self.thread.join(timeout=5)
+        except Exception:
+            pass
+        for fd in (self.fd, self.stop_r, self.stop_w):
+            try:
+                os.close(fd)
+            except Exception:
+                pass
+        self.fd = -1
+
+    def stats(self) -> dict:
+        return {'mode': self.mode, 'watched': len(self.watched), 'dirty': len(self.dirty), 'skip': len(self.skip), 'events': self.events}
+
+
+def create(mode: str) -> Watcher | None:
+    if mode == 'none':
+        return None
+    if not sys.platform.startswith('linux'):
+        debug(f'Files watch: platform={sys.platform} unavailable')
+        return None
+    try:
+        return Watcher(mode)
+    except Exception as e:
+        log.warning(f'Files watch: mode={mode} unavailable fallback=polling {e}')
+        return None
@@ -1,12 +1,18 @@
 """
-TODO: apply metadata, preview, load/save
+Latent history with memory budget: newest latents stay in ram, older ones are spilled to safetensors files in `data/history`
+and loaded back only when selected, spilled items are restored on next start
+TODO: apply metadata, preview
 """
 
-import sys
+import os
+import json
+import time
+import atexit
 import datetime
+import threading
 from collections import deque
 import torch
-from modules import shared, devices
+from modules import shared, devices, paths
 from modules.logger import log
 
 
@@ -17,15 +23,17 @@ class Item:
     info: str | None = None
     ops: list = []
     images: list | None = None
+    filename: str | None = None
 
     def __init__(self, latent, preview=None, info=None, ops=None, images=None):
         if ops is None:
             ops = []
+        self.created = time.time_ns() # unique and sortable, used as spill filename
         self.ts = datetime.datetime.now().replace(microsecond=0)
         self.name = self.ts.strftime('%Y-%m-%d %H:%M:%S')
         if torch.is_tensor(latent):
             self.latent = latent.detach().clone().to(devices.cpu)
-            self.size = sys.getsizeof(self.latent.storage())
+            self.size = self.latent.numel() * self.latent.element_size()
         self.preview = preview
         self.info = info
         self.ops = ops.copy()
@@ -37,19 +45,78 @@ class Item:
     def __str__(self):
         if self.latent is not None:
             return f'Item(ts="{self.name}" ops={self.ops} latent={self.latent.shape} size={self.size})'
+        elif self.filename is not None:
+            return f'Item(ts="{self.name}" ops={self.ops} file="{self.filename}" size={self.size})'
         elif self.images is not None:
             return f'Item(ts="{self.name}" ops={self.ops} images={len(self.images) if isinstance(self.images, list) else self.images})'
         else:
             return f'Item(ts="{self.name}" ops={self.ops} unknown content)'
 
+    @property
+    def has_latent(self):
+        return self.latent is not None or self.filename is not None
+
+    def spill(self, folder):
+        """Move latent from ram to file, returns file size."""
+        from safetensors.torch import save_file
+        os.makedirs(folder, exist_ok=True)
+        filename = os.path.join(folder, f'{self.created:020d}.safetensors')
+        metadata = {'history': json.dumps({'ts': self.ts.isoformat(), 'info': self.info, 'ops': self.ops}, default=str)}
+        save_file({'latent': self.latent.contiguous()}, filename, metadata=metadata)
+        self.filename = filename
+        self.latent = None
+        return os.path.getsize(filename)
+
+    def load_latent(self):
+        """Latent from ram or memory-mapped read from spilled file, file stays as backing store."""
+        if self.latent is not None:
+            return self.latent
+        if self.filename is None:
+            return None
+        from safetensors import safe_open
+        with safe_open(self.filename, framework='pt', device='cpu') as f:
+            return f.get_tensor('latent')
+
+    def remove(self):
+        if self.filename is not None:
+            try:
+                os.remove(self.filename)
+            except OSError:
+                pass
+        self.filename = None
+
+    @classmethod
+    def from_file(cls, filename):
+        from safetensors import safe_open
+        with safe_open(filename, framework='pt', device='cpu') as f:
+            metadata = json.loads((f.metadata() or {}).get('history', '{}'))
+            shape, dtype = f.get_slice('latent').get_shape(), f.get_slice('latent').get_dtype()
+        item = cls(None, info=metadata.get('info', None), ops=metadata.get('ops', []))
+        item.ts = datetime.datetime.fromisoformat(metadata['ts']) if 'ts' in metadata else datetime.datetime.fromtimestamp(os.path.getmtime(filename)).replace(microsecond=0)
+        item.name = item.ts.strftime('%Y-%m-%d %H:%M:%S')
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        item.created = int(stem) if stem.isdigit() else 0
+        item.filename = filename
+        item.size = os.path.getsize(filename)
+        log.trace(f'History restore: file="{filename}" shape={shape} dtype={dtype}')
+        return item
+
 
 class History:
     def __init__(self):
         self.index = -1
         self.latents = deque(maxlen=1024)
+        self.ram = 0 # bytes of latents held in memory
+        self.disk = 0 # bytes of spilled latents
+        self.loaded = False
+        self.lock = threading.RLock()
 
     def __str__(self):
-        return f'History(count={self.count} size={self.size})'
+        return f'History(count={self.count} size={self.size} disk={self.disk})'
+
+    @property
+    def folder(self):
+        return os.path.join(paths.data_path, 'data', 'history')
 
     @property
     def count(self):
@@ -57,18 +124,17 @@ class History:
 
     @property
     def size(self):
-        s = 0
-        for item in self.latents:
-            s += item.size
-        return s
+        return self.ram
 
     @property
     def list(self):
-        log.info(f'History: items={self.count}/{shared.opts.latent_history} size={self.size}')
-        return [item.name for item in self.latents if item.latent is not None]
+        self.load()
+        log.info(f'History: items={self.count}/{shared.opts.latent_history} size={self.size} disk={self.disk}')
+        return [item.name for item in self.latents if item.has_latent]
 
     @property
     def selected(self):
+        self.load()
         if self.index >= 0 and self.index < self.count:
             current_index = self.index
             self.index = -1
@@ -76,13 +142,14 @@ class History:
             current_index = 0
         while abs(current_index) <= self.count:
             item = self.latents[current_index]
-            if item.latent is not None:
+            if item.has_latent:
                 break
             current_index -= 1
-        if item.latent is None:
+        if not item.has_latent:
             return None, -1
-        log.debug(f'History get: index={current_index} time={item.ts} shape={list(item.latent.shape)} dtype={item.latent.dtype} count={self.count}')
-        return item.latent.to(devices.device), current_index
+        latent = item.load_latent()
+        log.debug(f'History get: index={current_index} time={item.ts} shape={list(latent.shape)} dtype={latent.dtype} count={self.count} file={item.filename}')
+        return latent.to(devices.device), current_index
 
     @property
     def last_item(self):
@@ -102,11 +169,12 @@ class History:
         if self.count == 0:
             return None
         for item in self.latents:
-            if item.latent is not None:
-                return item.latent
+            if item.has_latent:
+                return item.load_latent()
         return None
 
     def find(self, name):
+        self.load()
         for i, item in enumerate(self.latents):
             if item.name == name:
                 return i
@@ -118,17 +186,98 @@ class History:
         shared.state.latent_history += 1
         if shared.opts.latent_history == 0:
             return
+        self.load()
         item = Item(latent, preview, info, ops, images)
-        self.latents.appendleft(item)
-        if self.count >= shared.opts.latent_history:
-            self.latents.pop()
-        log.debug(f'History: len={self.count} add={item}')
+        with self.lock:
+            if len(self.latents) == self.latents.maxlen:
+                self.drop(self.latents[-1])
+            self.latents.appendleft(item)
+            if item.latent is not None:
+                self.ram += item.size
+            while self.count > shared.opts.latent_history:
+                self.drop(self.latents[-1])
+            self.enforce()
+        log.debug(f'History: len={self.count} add={item} ram={self.ram} disk={self.disk}')
+
+    def drop(self, item):
+        """Remove item and release its memory or file."""
+        if item.latent is not None:
+            self.ram -= item.size
+            item.latent = None
+        if item.filename is not None:
+            self.disk -= item.size
+            item.remove()
+        if item in self.latents:
+            self.latents.remove(item)
+
+    def enforce(self, ram_limit: int | None = None):
+        """Spill oldest in-memory latents until ram budget is met, then drop oldest spilled latents until disk budget is met."""
+        ram_limit = int(shared.opts.latent_history_ram * 1024 * 1024) if ram_limit is None else ram_limit
+        disk_limit = int(shared.opts.latent_history_disk * 1024 * 1024)
+        for item in reversed(self.latents):
+            if self.ram <= ram_limit:
+                break
+            if item.latent is None:
+                continue
+            self.ram -= item.size
+            if disk_limit > 0:
+                try:
+                    item.size = item.spill(self.folder)
+                    self.disk += item.size
+                    log.debug(f'History spill: {item}')
+                    continue
+                except Exception as e:
+                    log.error(f'History spill: {item} {e}')
+            item.latent = None
+        for item in reversed(list(self.latents)):
+            if self.disk <= disk_limit:
+                break
+            if item.filename is None:
+                continue
+            self.disk -= item.size
+            item.remove()
+            if item.images is None:
+                self.latents.remove(item)
 
     def clear(self):
-        self.latents.clear()
+        with self.lock:
+            for item in list(self.latents):
+                self.drop(item)
+            self.latents.clear()
+            self.ram = 0
+            self.disk = 0
 
     def load(self):
-        pass
+        """Restore spilled items from previous session once, newest first."""
+        if self.loaded:
+            return
+        with self.lock:
+            if self.loaded:
+                return
+            self.loaded = True
+            atexit.register(self.save)
+            if shared.opts.latent_history == 0 or shared.opts.latent_history_disk <= 0 or not os.path.isdir(self.folder):
+                return
+            t0 = time.time()
+            items = []
+            for filename in sorted(os.listdir(self.folder), reverse=True):
+                if not filename.endswith('.safetensors'):
+                    continue
+                try:
+                    items.append(Item.from_file(os.path.join(self.folder, filename)))
+                except Exception as e:
+                    log.warning(f'History restore: file="{filename}" {e}')
+            for item in items:
+                self.latents.append(item)
+                self.disk += item.size
+            while self.count > shared.opts.latent_history:
+                self.drop(self.latents[-1])
+            self.enforce()
+            log.debug(f'History restore: items={self.count} disk={self.disk} time={time.time()-t0:.2f}')
 
     def save(self):
-        pass
+        """Spill all in-memory latents so history survives restart, no-op without disk budget."""
+        if shared.opts.latent_history_disk <= 0:
+            return
+        with self.lock:
+            self.enforce(ram_limit=0)
@@ -1,8 +1,11 @@
+import io
 import os
 import sys
+import time
 import queue
 import datetime
 import threading
+import contextvars
 import piexif.helper
 from PIL import Image, PngImagePlugin
 from modules import shared, script_callbacks, errors, paths
@@ -32,114 +35,280 @@ def sanitize_filename_part(text, replace_spaces=True):
     return text
 
 
-def atomically_save_image():
-    Image.MAX_IMAGE_PIXELS = None # disable check in Pillow and rely on check below to allow large custom image sizes
-    while True:
-        image, filename, extension, params, exifinfo, filename_txt, is_grid = save_queue.get()
-        jobid = shared.state.begin('Save image')
-        shared.state.image_history += 1
-        if len(exifinfo) > 2:
-            with open(paths.params_path, "w", encoding="utf8") as file:
-                file.write(exifinfo)
-        fn = filename + extension
-        filename = filename.strip()
+# encoder overrides per image format applied on top of format defaults, selected by save_encoder_preset
+presets = {
+    'default': {},
+    'fast-png': { 'PNG': { 'compress_level': 1 }, 'JPEG': { 'optimize': False } },
+    'archival-png': { 'PNG': { 'compress_level': 9, 'optimize': True } },
+    'webp-fast': { 'WEBP': { 'method': 0 }, 'JPEG': { 'optimize': False } },
+}
+
+
+def encoder_args(image, image_format, params, exifinfo):
+    """Returns possibly converted image and format specific save args."""
+    exifinfo_dump = piexif.helper.UserComment.dump(exifinfo, encoding="unicode")
+    if image_format == 'PNG':
+        pnginfo_data = PngImagePlugin.PngInfo()
+        for k, v in params.pnginfo.items():
+            pnginfo_data.add_text(k, str(v))
+        debug_save(f'Save pnginfo: {params.pnginfo.items()}')
+        save_args = {
+            'compress_level': 6,
+            'pnginfo': pnginfo_data if shared.opts.image_metadata else None,
+        }
+    elif image_format == 'JPEG':
+        if image.mode == 'RGBA':
+            log.warning('Save: removing alpha channel')
+            image = image.convert("RGB")
+        elif image.mode == 'I;16':
+            image = image.point(lambda p: p * 0.0038910505836576).convert("L")
+        save_args = {
+            'optimize': True,
+            'quality': shared.opts.jpeg_quality,
+        }
+        if shared.opts.image_metadata:
+            debug_save(f'Save exif: {exifinfo}')
+            save_args['exif'] = piexif.dump({ "Exif": { piexif.ExifIFD.UserComment: exifinfo_dump } })
+    elif image_format == 'WEBP':
+        if image.mode == 'I;16':
+            image = image.point(lambda p: p * 0.0038910505836576).convert("RGB")
+        save_args = {
+            'optimize': True,
+            'quality': shared.opts.jpeg_quality,
+            'lossless': shared.opts.webp_lossless,
+        }
+        if shared.opts.image_metadata:
+            debug_save(f'Save exif: {exifinfo}')
+            save_args['exif'] = piexif.dump({ "Exif": { piexif.ExifIFD.UserComment: exifinfo_dump } })
+    elif image_format == 'JXL':
+        if image.mode == 'I;16':
+            image = image.point(lambda p: p * 0.0038910505836576).convert("RGB")
+        elif image.mode not in {"RGB", "RGBA"}:
+            image = image.convert("RGBA")
+        save_args = {
+            'optimize': True,
+            'quality': shared.opts.jpeg_quality,
+            'lossless': shared.opts.webp_lossless,
+        }
+        if shared.opts.image_metadata:
+            debug_save(f'Save exif: {exifinfo}')
+            save_args['exif'] = piexif.dump({ "Exif": { piexif.ExifIFD.UserComment: exifinfo_dump } })
+    else:
+        save_args = { 'quality': shared.opts.jpeg_quality }
+    save_args.update(presets.get(shared.opts.save_encoder_preset, {}).get(image_format, {}))
+    return image, save_args
+
+
+class SaveJob:
+    __slots__ = ('context', 'done', 'exifinfo', 'extension', 'filename', 'filename_txt', 'image', 'is_grid', 'params', 'prev')
+
+    def __init__(self, image, filename, extension, params, exifinfo, filename_txt, is_grid):
+        self.image = image
+        self.filename = filename
+        self.extension = extension
+        self.params = params
+        self.exifinfo = exifinfo
+        self.filename_txt = filename_txt
+        self.is_grid = is_grid
+        self.prev: SaveJob | None = None # previous job writing to same folder, files are committed in submit order
+        self.done = threading.Event()
+        self.context = contextvars.copy_context() # workers see settings overlay of submitting job
+
+
+class SavePool:
+    """Encoder workers fed from a bounded queue.
+    Images are encoded in parallel into memory, then committed to disk in submit order per folder.
+    Save-log entries are collected and written once per flush when the pool runs idle."""
+
+    def __init__(self, workers: int = 1, depth: int = 4):
+        self.depth = depth
+        self.queue: queue.Queue[SaveJob | None] = queue.Queue(maxsize=max(workers * depth, 1))
+        self.lock = threading.Lock()
+        self.order = threading.Lock() # held from chaining a job to its folder until it is queued, so predecessors are always queued first
+        self.idle = threading.Condition(self.lock)
+        self.threads: list[threading.Thread] = []
+        self.workers = 0
+        self.tails: dict[str, SaveJob] = {}
+        self.pending = 0 # submitted and not yet on disk
+        self.unfinished = 0 # same as pending but also includes save-log flush
+        self.entries: list[dict] = []
+        self.saved = 0
+        self.failed = 0
+        self.time_encode = 0.0
+        self.time_write = 0.0
+        self.time_blocked = 0.0
+        self.resize(workers)
+
+    def resize(self, workers: int):
+        workers = max(int(workers), 1)
+        self.queue.maxsize = workers * self.depth
+        with self.lock:
+            self.threads = [thread for thread in self.threads if thread.is_alive()]
+            while len(self.threads) < workers:
+                thread = threading.Thread(target=self.worker, name=f'sd-save-{len(self.threads)}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+            stop = len(self.threads) - workers
+            self.workers = workers
+        for _i in range(stop):
+            self.queue.put(None) # worker that takes it exits after jobs queued before it
+
+    def submit(self, job: SaveJob):
+        folder = os.path.dirname(job.filename)
+        with self.order:
+            with self.lock:
+                job.prev = self.tails.get(folder, None)
+                self.tails[folder] = job
+                self.pending += 1
+                self.unfinished += 1
+            t0 = time.time()
+            self.queue.put(job) # blocks while queue is full so producers cannot run ahead of encoders, workers never take order lock
+            blocked = time.time() - t0
+        with self.lock:
+            self.time_blocked += blocked
+        return job
+
+    def worker(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                self.queue.task_done()
+                with self.lock:
+                    self.threads = [thread for thread in self.threads if thread is not threading.current_thread()]
+                return
+            try:
+                job.context.run(self.process, job)
+            except Exception as e:
+                with self.lock:
+                    self.failed += 1
+                log.error(f'Save failed: file="{job.filename}{job.extension}" {e}')
+                errors.display(e, 'Image save')
+            finally:
+                job.done.set()
+                job.image = None
+                with self.lock:
+                    folder = os.path.dirname(job.filename)
+                    if self.tails.get(folder, None) is job:
+                        del self.tails[folder]
+                    self.pending -= 1
+                    flush = self.pending == 0 or len(self.entries) >= 64
+                if flush:
+                    self.flush()
+                with self.lock:
+                    self.unfinished -= 1
+                    if self.unfinished == 0:
+                        self.idle.notify_all()
+                self.queue.task_done()
+
+    def process(self, job: SaveJob):
+        filename, extension, exifinfo = job.filename.strip(), job.extension, job.exifinfo
         if extension[0] != '.': # add dot if missing
             extension = '.' + extension
+        fn = job.filename + job.extension
         try:
             image_format = Image.registered_extensions()[extension]
         except Exception:
             log.warning(f'Save: unknown image format: {extension}')
             image_format = 'JPEG'
+        params_info = exifinfo
         exifinfo = (exifinfo or "") if shared.opts.image_metadata else ""
-        # additional metadata saved in files
-        if shared.opts.save_txt and len(exifinfo) > 0:
-            try:
-                with open(filename_txt, "w", encoding="utf8") as file:
-                    file.write(f"{exifinfo}\n")
-                log.info(f'Save: text="{filename_txt}" len={len(exifinfo)}')
-            except Exception as e:
-                log.warning(f'Save failed: description={filename_txt} {e}')
-
-        # actual save
-        exifinfo_dump = piexif.helper.UserComment.dump(exifinfo, encoding="unicode")
-        if image_format == 'PNG':
-            pnginfo_data = PngImagePlugin.PngInfo()
-            for k, v in params.pnginfo.items():
-                pnginfo_data.add_text(k, str(v))
-            debug_save(f'Save pnginfo: {params.pnginfo.items()}')
-            save_args = {
-                'compress_level': 6,
-                'pnginfo': pnginfo_data if shared.opts.image_metadata else None,
-            }
-        elif image_format == 'JPEG':
-            if image.mode == 'RGBA':
-                log.warning('Save: removing alpha channel')
-                image = image.convert("RGB")
-            elif image.mode == 'I;16':
-                image = image.point(lambda p: p * 0.0038910505836576).convert("L")
-            save_args = {
-                'optimize': True,
-                'quality': shared.opts.jpeg_quality,
-            }
-            if shared.opts.image_metadata:
-                debug_save(f'Save exif: {exifinfo}')
-                save_args['exif'] = piexif.dump({ "Exif": { piexif.ExifIFD.UserComment: exifinfo_dump } })
-        elif image_format == 'WEBP':
-            if image.mode == 'I;16':
-                image = image.point(lambda p: p * 0.0038910505836576).convert("RGB")
-            save_args = {
-                'optimize': True,
-                'quality': shared.opts.jpeg_quality,
-                'lossless': shared.opts.webp_lossless,
-            }
-            if shared.opts.image_metadata:
-                debug_save(f'Save exif: {exifinfo}')
-                save_args['exif'] = piexif.dump({ "Exif": { piexif.ExifIFD.UserComment: exifinfo_dump } })
-        elif image_format == 'JXL':
-            if image.mode == 'I;16':
-                image = image.point(lambda p: p * 0.0038910505836576).convert("RGB")
-            elif image.mode not in {"RGB", "RGBA"}:
-                image = image.convert("RGBA")
-            save_args = {
-                'optimize': True,
-                'quality': shared.opts.jpeg_quality,
-                'lossless': shared.opts.webp_lossless,
-            }
-            if shared.opts.image_metadata:
-                debug_save(f'Save exif: {exifinfo}')
-                save_args['exif'] = piexif.dump({ "Exif": { piexif.ExifIFD.UserComment: exifinfo_dump } })
-        else:
-            save_args = { 'quality': shared.opts.jpeg_quality }
+
+        # encode into memory, runs in parallel across workers
+        t0 = time.time()
+        image, save_args = encoder_args(job.image, image_format, job.params, exifinfo)
+        buffer = io.BytesIO()
         try:
             debug_save(f'Save args: {save_args}')
-            image.save(fn, format=image_format, **save_args)
+            image.save(buffer, format=image_format, **save_args)
         except Exception as e:
             log.error(f'Save failed: file="{fn}" format={image_format} args={save_args} {e}')
             errors.display(e, 'Image save')
-        size = os.path.getsize(fn) if os.path.exists(fn) else 0
-        what = 'grid' if is_grid else 'image'
-        log.info(f'Save: {what}="{fn}" type={image_format} width={image.width} height={image.height} size={size}')
+            buffer = None
+        t1 = time.time()
+        with self.lock:
+            self.time_encode += t1 - t0
 
+        # commit in submit order per folder
+        if job.prev is not None:
+            job.prev.done.wait()
+        t2 = time.time()
+        if len(params_info) > 2:
+            with open(paths.params_path, "w", encoding="utf8") as file:
+                file.write(params_info)
+        if shared.opts.save_txt and len(exifinfo) > 0: # additional metadata saved in files
+            try:
+                with open(job.filename_txt, "w", encoding="utf8") as file:
+                    file.write(f"{exifinfo}\n")
+                log.info(f'Save: text="{job.filename_txt}" len={len(exifinfo)}')
+            except Exception as e:
+                log.warning(f'Save failed: description={job.filename_txt} {e}')
+        if buffer is not None:
+            with open(fn, 'wb') as file:
+                file.write(buffer.getbuffer())
+        with self.lock:
+            if buffer is not None:
+                self.saved += 1
+            else:
+                self.failed += 1
+            self.time_write += time.time() - t2
+        size = buffer.getbuffer().nbytes if buffer is not None else 0
+        what = 'grid' if job.is_grid else 'image'
+        log.info(f'Save: {what}="{fn}" type={image_format} width={image.width} height={image.height} size={size} encode={t1-t0:.2f}')
         if shared.opts.save_log_fn != '' and len(exifinfo) > 0:
-            fn = os.path.join(paths.data_path, shared.opts.save_log_fn)
-            if not fn.endswith('.json'):
-                fn += '.json'
-            entries = shared.readfile(fn, silent=True)
-            if not isinstance(entries, list):
-                entries = []
-            idx = len(entries)
-            entry = { 'id': idx, 'filename': filename, 'time': datetime.datetime.now().isoformat(), 'info': exifinfo }
-            entries.append(entry)
-            writefile(entries, fn, mode='w', silent=True)
-            log.info(f'Save: json="{fn}" records={len(entries)}')
+            with self.lock:
+                self.entries.append({ 'filename': filename, 'time': datetime.datetime.now().isoformat(), 'info': exifinfo })
+        shared.state.image_history += 1
         shared.state.outputs(filename)
-        shared.state.end(jobid)
-        save_queue.task_done()
+        script_callbacks.image_saved_callback(job.params)
+
+    def flush(self):
+        """Append collected save-log entries with a single read and write of the log file."""
+        with self.lock:
+            collected, self.entries = self.entries, []
+        if len(collected) == 0 or shared.opts.save_log_fn == '':
+            return
+        fn = os.path.join(paths.data_path, shared.opts.save_log_fn)
+        if not fn.endswith('.json'):
+            fn += '.json'
+        entries = shared.readfile(fn, silent=True)
+        if not isinstance(entries, list):
+            entries = []
+        for entry in collected:
+            entries.append({ 'id': len(entries), **entry })
+        writefile(entries, fn, mode='w', silent=True)
+        log.info(f'Save: json="{fn}" records={len(entries)} added={len(collected)}')
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until every submitted image is on disk."""
+        with self.lock:
+            return self.idle.wait_for(lambda: self.unfinished == 0, timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'queue': self.queue.qsize(),
+            'pending': self.pending,
+            'saved': self.saved,
+            'failed': self.failed,
+            'encode': round(self.time_encode, 3),
+            'write': round(self.time_write, 3),
+            'blocked': round(self.time_blocked, 3),
+        }
+
+
+Image.MAX_IMAGE_PIXELS = None # disable check in Pillow and rely on check below to allow large custom image sizes
+save_pool = SavePool(workers=shared.opts.save_workers)
 
 
-save_queue: queue.Queue[tuple[Image.Image, str, str, script_callbacks.ImageSaveParams, str, str | None, bool]] = queue.Queue()
-save_thread = threading.Thread(target=atomically_save_image, daemon=True)
-save_thread.start()
+def wait_saved(jobs: list[SaveJob] | None = None, timeout: float | None = None) -> bool:
+    """Block until given jobs are on disk, or until pool is idle if no jobs are given."""
+    if jobs is None:
+        return save_pool.wait(timeout)
+    deadline = time.time() + timeout if timeout is not None else None
+    for job in jobs:
+        if not job.done.wait(None if deadline is None else max(deadline - time.time(), 0)):
+            return False
+    return True
 
 
 def save_image(image,
@@ -156,6 +325,7 @@ def save_image(image,
                forced_filename=None,
                suffix='',
                save_to_dirs=None,
+               wait=True,
             ):
     fn = f'{sys._getframe(2).f_code.co_name}:{sys._getframe(1).f_code.co_name}' # pylint: disable=protected-access
     debug_save(f'Save: fn={fn}') # pylint: disable=protected-access
@@ -218,10 +388,12 @@ def save_image(image,
     exifinfo += params.pnginfo.get(pnginfo_section_name, '')
     filename, extension = os.path.splitext(params.filename)
     filename_txt = f"{filename}.txt" if shared.opts.save_txt and len(exifinfo) > 0 else None
-    save_queue.put((params.image, filename, extension, params, exifinfo, filename_txt, grid)) # actual save is executed in a thread that polls data from queue
-    save_queue.join()
     if not hasattr(params.image, 'already_saved_as'):
         debug(f'Image marked: "{params.filename}"')
         params.image.already_saved_as = params.filename
-    script_callbacks.image_saved_callback(params)
+    job = save_pool.submit(SaveJob(params.image, filename, extension, params, exifinfo, filename_txt, grid)) # actual save is executed by pool workers
+    if wait:
+        job.done.wait()
+    elif isinstance(getattr(p, 'save_jobs', None), list):
+        p.save_jobs.append(job) # processing waits only for its own saves
     return params.filename, filename_txt, exifinfo
@@ -1,5 +1,5 @@
 from modules.image.metadata import image_data, read_info_from_image
-from modules.image.save import save_image, sanitize_filename_part
+from modules.image.save import save_image, sanitize_filename_part, wait_saved
 from modules.image.resize import resize_image
 from modules.image.namegen import FilenameGenerator, get_next_sequence_number
 from modules.image.grid import Grid, image_grid, check_grid_size, get_grid_size, draw_grid_annotations, draw_prompt_matrix, combine_grid, get_font
@@ -19,6 +19,7 @@ __all__ = [
     'resize_image',
     'sanitize_filename_part',
     'save_image',
+    'wait_saved',
     'get_font',
     'get_next_sequence_number',
     'draw_text',
@@ -1,7 +1,7 @@
 import os
 import time
 import concurrent.futures
-from modules import shared, errors, sd_models, sd_models_compile, files_cache
+from modules import shared, errors, sd_models, sd_models_compile, files_cache, metrics
 from modules.logger import log
 from modules.lora import network, lora_overrides, lora_convert, lora_diffusers
 from modules.lora import lora_common as l
@@ -57,6 +57,7 @@ def load_safetensors(name, network_on_disk: network.NetworkOnDisk) -> network.Ne
 
     sd_model = getattr(shared.sd_model, "pipe", shared.sd_model)
     cached = lora_cache.get(name, None)
+    metrics.cache('lora', cached is not None)
     if l.debug:
         log.debug(f'Network load: type=LoRA name="{name}" file="{network_on_disk.filename}" type=lora {"cached" if cached else ""}')
     if cached is not None:
@@ -361,3 +362,5 @@ def network_load(names, te_multipliers=None, unet_multipliers=None, dyn_dims=Non
             shared.compiled_model_state.lora_model = backup_lora_model
 
     l.timer.load = time.time() - t0
+    if len(names) > 0:
+        metrics.lora_load.observe(l.timer.load)
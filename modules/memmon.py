@@ -12,6 +12,7 @@ class MemUsageMonitor:
         self.name = name
         self.device = device
         self.data = defaultdict(int)
+        self.carried = {'active_peak': 0, 'reserved_peak': 0} # peaks from before hold() reset counters
         if not torch.cuda.is_available():
             self.disabled = True
         else:
@@ -30,6 +31,7 @@ class MemUsageMonitor:
         if not self.disabled:
             try:
                 torch.cuda.reset_peak_memory_stats(self.device)
+                self.carried = {'active_peak': 0, 'reserved_peak': 0}
                 self.data['retries'] = 0
                 self.data['oom'] = 0
                 # torch.cuda.reset_accumulated_memory_stats(self.device)
@@ -38,6 +40,17 @@ class MemUsageMonitor:
             except Exception:
                 pass
 
+    def hold(self):
+        """Reset peak counters to measure a single step while summary keeps reporting peak seen so far."""
+        if not self.disabled:
+            try:
+                torch_stats = torch.cuda.memory_stats(self.device)
+                self.carried['active_peak'] = max(self.carried['active_peak'], torch_stats.get("active_bytes.all.peak", 0))
+                self.carried['reserved_peak'] = max(self.carried['reserved_peak'], torch_stats.get("reserved_bytes.all.peak", 0))
+                torch.cuda.reset_peak_memory_stats(self.device)
+            except Exception:
+                pass
+
     def read(self):
         if not self.disabled:
             try:
@@ -45,9 +58,9 @@ class MemUsageMonitor:
                 self.data["used"] = self.data["total"] - self.data["free"]
                 torch_stats = torch.cuda.memory_stats(self.device)
                 self.data["active"] = torch_stats.get("active.all.current", torch_stats.get("active_bytes.all.current", -1))
-                self.data["active_peak"] = torch_stats.get("active_bytes.all.peak", -1)
+                self.data["active_peak"] = max(torch_stats.get("active_bytes.all.peak", -1), self.carried['active_peak'])
                 self.data["reserved"] = torch_stats.get("reserved_bytes.all.current", -1)
-                self.data["reserved_peak"] = torch_stats.get("reserved_bytes.all.peak", -1)
+                self.data["reserved_peak"] = max(torch_stats.get("reserved_bytes.all.peak", -1), self.carried['reserved_peak'])
                 self.data['retries'] = torch_stats.get("num_alloc_retries", -1)
                 self.data['oom'] = torch_stats.get("num_ooms", -1)
             except Exception:
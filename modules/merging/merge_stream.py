@@ -0,0 +1,202 @@
+"""
+Streaming merge: inputs are memory-mapped with safetensors `safe_open` and merged key by key by worker threads
+with a bounded prefetch window, each result is written to output safetensors file right away
+using a header computed upfront from input headers, so peak memory is a few tensors instead of all models
+"""
+import os
+import json
+import math
+import struct
+import threading
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import torch
+from safetensors import safe_open
+from modules.logger import console, log
+from modules.merging.merge import KEY_POSITION_IDS, MAX_TOKENS, merge_key
+from modules.merging.merge_utils import WeightClass
+
+
+dtypes = {
+    'F64': torch.float64,
+    'F32': torch.float32,
+    'F16': torch.float16,
+    'BF16': torch.bfloat16,
+    'I64': torch.int64,
+    'I32': torch.int32,
+    'I16': torch.int16,
+    'I8': torch.int8,
+    'U8': torch.uint8,
+    'BOOL': torch.bool,
+}
+if hasattr(torch, 'float8_e4m3fn'):
+    dtypes['F8_E4M3'] = torch.float8_e4m3fn
+    dtypes['F8_E5M2'] = torch.float8_e5m2
+dtype_names = {v: k for k, v in dtypes.items()}
+prune_prefixes = ('model.diffusion_model.', 'cond_stage_model.')
+
+
+class Source:
+    """Memory-mapped input checkpoint, tensor shapes and dtypes are read from header and each worker thread uses its own handle."""
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.local = threading.local()
+        with safe_open(filename, framework='pt', device='cpu') as f:
+            self.info = {key: (dtypes[f.get_slice(key).get_dtype()], list(f.get_slice(key).get_shape())) for key in f.keys()}
+
+    def keys(self):
+        return self.info.keys()
+
+    def __contains__(self, key):
+        return key in self.info
+
+    def get(self, key: str) -> torch.Tensor:
+        handle = getattr(self.local, 'handle', None)
+        if handle is None:
+            handle = safe_open(self.filename, framework='pt', device='cpu')
+            self.local.handle = handle
+        return handle.get_tensor(key)
+
+
+class Writer:
+    """Safetensors file written tensor by tensor, tensors must be written in order of planned header."""
+    def __init__(self, filename: str, plan: dict, metadata: dict | None = None):
+        header = {}
+        if metadata is not None:
+            header['__metadata__'] = {k: str(v) for k, v in metadata.items()}
+        offset = 0
+        for key, (_mode, _source, dtype, shape) in plan.items():
+            size = math.prod(shape) * torch.empty(0, dtype=dtype).element_size()
+            header[key] = {'dtype': dtype_names[dtype], 'shape': shape, 'data_offsets': [offset, offset + size]}
+            offset += size
+        data = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        data += b' ' * (-len(data) % 8) # header is padded to 8 byte alignment
+        self.filename = filename
+        self.file = open(filename, 'wb') # pylint: disable=consider-using-with
+        self.file.write(struct.pack('<Q', len(data)))
+        self.file.write(data)
+
+    def write(self, tensor: torch.Tensor):
+        self.file.write(tensor.reshape(-1).view(torch.uint8).numpy())
+
+    def close(self):
+        self.file.close()
+
+
+def supported(models: dict, re_basin: bool = False, **kwargs) -> bool: # pylint: disable=unused-argument
+    if re_basin:
+        return False # rebasin permutes whole models
+    return all(str(filename).lower().endswith('.safetensors') for filename in models.values())
+
+
+def plan_keys(sources: dict[str, Source], prune: bool, precision: str, replace: dict) -> dict:
+    """Output keys in write order with (mode, source, dtype, shape), same key selection as in-memory merge with unprune."""
+    def target(dtype):
+        return torch.float16 if precision == 'fp16' and dtype.is_floating_point else dtype
+
+    plan = {}
+    for key, (dtype, shape) in sources['model_a'].info.items():
+        if KEY_POSITION_IDS in key:
+            plan[key] = ('position', None, torch.int64, [1, MAX_TOKENS])
+        elif key in replace:
+            plan[key] = ('replace', None, replace[key].dtype, list(replace[key].shape))
+        elif all(key in source for source in sources.values()) and (not prune or key.startswith(prune_prefixes)):
+            infos = [source.info[key] for source in sources.values()]
+            merged = torch.float16 if precision == 'fp16' else functools.reduce(torch.promote_types, [info[0] for info in infos])
+            size_a, size_b = infos[0][1], infos[1][1]
+            if size_a != size_b and not (len(size_a) > 1 and len(size_b) > 1 and size_a[1] > size_b[1]): # pix2pix and inpainting models
+                shape = size_b
+            plan[key] = ('merge', None, merged, shape)
+        elif not prune or 'model' in key:
+            plan[key] = ('copy', 'model_a', target(dtype), shape)
+    for key, (dtype, shape) in sources['model_b'].info.items():
+        if key in plan or 'model' not in key or KEY_POSITION_IDS in key:
+            continue
+        if key in replace:
+            plan[key] = ('replace', None, replace[key].dtype, list(replace[key].shape))
+        else:
+            plan[key] = ('copy', 'model_b', target(dtype), shape)
+    return plan
+
+
+def merge_to_file(
+    filename: str,
+    models: dict[str, os.PathLike],
+    merge_mode: str,
+    precision: str = "fp16",
+    weights_clip: bool = False,
+    device: torch.device = None,
+    work_device: torch.device = None,
+    prune: bool = False,
+    threads: int = 4,
+    metadata: dict | None = None,
+    replace: dict | None = None,
+    window: int | None = None,
+    **kwargs,
+) -> dict:
+    """
+    Merge models directly into safetensors file, at most `window` keys are loaded or merged at any time.
+    Keys in `replace` are written as given instead of merged, returns plan of written keys.
+    """
+    sources = {name: Source(fn) for name, fn in models.items()}
+    replace = replace or {}
+    device = device or torch.device('cpu')
+    plan = plan_keys(sources, prune, precision, replace)
+    weight_matcher = WeightClass(sources['model_a'], **kwargs)
+    window = window or 2 * threads
+    log.info(f'Merge stream: models={list(models.values())} keys={len(plan)} size={plan_size(plan)} threads={threads} window={window}')
+
+    def load(tensor):
+        tensor = tensor.to(device)
+        return tensor.half() if precision == 'fp16' else tensor
+
+    def process(key, entry):
+        mode, source, dtype, shape = entry
+        if mode == 'position':
+            tensor = torch.tensor([list(range(MAX_TOKENS))], dtype=torch.int64)
+        elif mode == 'replace':
+            tensor = replace[key]
+        elif mode == 'copy':
+            tensor = sources[source].get(key)
+        else:
+            thetas = {name: {key: load(source.get(key))} for name, source in sources.items()}
+            tensor = merge_key(key, thetas, weight_matcher, merge_mode, precision, weights_clip, device, work_device)
+        tensor = tensor.detach().to(device='cpu', dtype=dtype).contiguous()
+        if list(tensor.shape) != shape:
+            raise ValueError(f'Merge stream: key={key} shape={list(tensor.shape)} expected={shape}')
+        return tensor
+
+    tmp = f'{filename}.tmp'
+    writer = Writer(tmp, plan, metadata)
+    import rich.progress as p
+    try:
+        with p.Progress(p.TextColumn('[cyan]{task.description}'), p.BarColumn(), p.TaskProgressColumn(), p.TimeRemainingColumn(), p.TimeElapsedColumn(), p.TextColumn('[cyan]keys={task.fields[keys]}'), console=console) as progress:
+            task = progress.add_task(description="Merging", total=len(plan), keys=len(plan))
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                items = iter(plan.items())
+                pending = deque()
+                for key, entry in items:
+                    pending.append(executor.submit(process, key, entry))
+                    if len(pending) >= window:
+                        break
+                while len(pending) > 0:
+                    tensor = pending.popleft().result() # results are written in plan order
+                    writer.write(tensor)
+                    del tensor
+                    item = next(items, None)
+                    if item is not None:
+                        pending.append(executor.submit(process, *item))
+                    progress.update(task, advance=1)
+        writer.close()
+        os.replace(tmp, filename)
+    except Exception:
+        writer.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return plan
+
+
+def plan_size(plan: dict) -> int:
+    return sum(math.prod(shape) * torch.empty(0, dtype=dtype).element_size() for _mode, _source, dtype, shape in plan.values())
@@ -0,0 +1,230 @@
+"""Process-wide metrics exported in OpenMetrics text format on `/metrics`.
+
+Metrics are plain python objects updated in place with a lock per metric, so recording is cheap enough for every request.
+Generation phases are fed from `timer.process` records once per job, model and lora loads from their own timers.
+Cache and save pool values are collected at scrape time from callbacks so they always reflect current state.
+"""
+import time
+import bisect
+import threading
+
+
+prefix = 'sdnext'
+content_type = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+phase_buckets = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+rate_buckets = (0.1, 0.25, 0.5, 1, 2, 4, 6, 8, 10, 15, 20, 30, 50, 100)
+phases = { # exported phase -> timer.process record names
+    'encode': ['te', 'prompt', 'encode'],
+    'denoise': ['pipeline', 'hires', 'refine'],
+    'decode': ['decode'],
+    'save': ['save'],
+    'post': ['post'],
+}
+nested = { # exported phase -> records added while its intervals were running, subtracted so time is counted once
+    'denoise': ['te', 'prompt'], # text encoder runs inside pipeline call, prompt is recorded without resetting pipeline interval
+}
+registry: list = []
+
+
+def escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names: tuple, values: tuple) -> str:
+    items = [f'{name}="{escape(value)}"' for name, value in zip(names, values, strict=False)]
+    return '{' + ','.join(items) + '}' if len(items) > 0 else ''
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    kind = 'unknown'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = f'{prefix}_{name}'
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {} # label values -> metric state
+        registry.append(self)
+
+    def key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def samples(self) -> list[str]:
+        return []
+
+    def render(self) -> str:
+        lines = [f'# TYPE {self.name} {self.kind}', f'# HELP {self.name} {escape(self.documentation)}']
+        lines += self.samples()
+        return '\n'.join(lines)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self.key(labels), 0)
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        return [f'{self.name}_total{format_labels(self.labels, key)} {format_value(value)}' for key, value in items]
+
+
+class Gauge(Metric):
+    """Gauge whose values are read from a callback at scrape time, callback returns {label values tuple: value}."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), callback=None):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+    def samples(self):
+        values = dict(self.values)
+        if self.callback is not None:
+            try:
+                values.update(self.callback())
+            except Exception:
+                pass
+        return [f'{self.name}{format_labels(self.labels, key)} {format_value(value)}' for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = latency_buckets):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key, None)
+            if state is None:
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0] # per-bucket counts incl. +Inf, sum
+            state[0][position] += 1
+            state[1] += value
+
+    def count(self, **labels) -> int:
+        state = self.values.get(self.key(labels), None)
+        return sum(state[0]) if state is not None else 0
+
+    def samples(self):
+        lines = []
+        with self.lock:
+            items = sorted((key, (list(state[0]), state[1])) for key, state in self.values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts, strict=True):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'{self.name}_bucket{format_labels(self.labels + ("le",), key + (le,))} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.labels, key)} {format_value(total)}')
+            lines.append(f'{self.name}_count{format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+class TimedLock:
+    """Lock wrapper that records how long callers waited to acquire the wrapped lock."""
+    def __init__(self, lock, queue: str):
+        self.lock = lock
+        self.queue = queue
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        t0 = time.perf_counter()
+        acquired = self.lock.acquire(blocking, timeout)
+        if acquired:
+            queue_wait.observe(time.perf_counter() - t0, queue=self.queue)
+        return acquired
+
+    def release(self):
+        self.lock.release()
+
+    def locked(self) -> bool:
+        return self.lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+http_requests = Histogram('http_request_duration_seconds', 'HTTP request latency by route', labels=('method', 'route', 'code'))
+queue_wait = Histogram('queue_wait_seconds', 'Time spent waiting for the processing queue lock', labels=('queue',))
+generation_phase = Histogram('generation_phase_seconds', 'Generation time per phase of a job', labels=('phase',), buckets=phase_buckets)
+generation_rate = Histogram('generation_steps_per_second', 'Sampling steps per second of a job', buckets=rate_buckets)
+generation_steps = Counter('generation_steps', 'Sampling steps across all generated images')
+generation_images = Counter('generation_images', 'Generated images')
+model_load = Histogram('model_load_seconds', 'Model load duration', labels=('op',), buckets=phase_buckets)
+lora_load = Histogram('lora_load_seconds', 'LoRA load duration per activation', buckets=phase_buckets)
+cache_requests = Counter('cache_requests', 'Cache lookups by cache and result', labels=('cache', 'result'))
+
+
+def cache_ratio() -> dict:
+    totals = {}
+    for (cache, result), value in list(cache_requests.values.items()):
+        hits, total = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (value if result == 'hit' else 0), total + value)
+    return {(cache,): hits / total for cache, (hits, total) in totals.items() if total > 0}
+
+
+def save_stats() -> dict:
+    import sys
+    save = sys.modules.get('modules.image.save', None) # only report once the save pool exists
+    if save is None:
+        return {}
+    stats = save.save_pool.stats()
+    return {(name,): stats[name] for name in ['workers', 'queue', 'pending']}
+
+
+cache_hit_ratio = Gauge('cache_hit_ratio', 'Cache hit ratio since startup', labels=('cache',), callback=cache_ratio)
+save_queue = Gauge('save_queue', 'Image save pool state', labels=('state',), callback=save_stats)
+
+
+def cache(name: str, hit: bool):
+    cache_requests.inc(cache=name, result='hit' if hit else 'miss')
+
+
+def observe_request(method: str, route: str, code: int, duration: float):
+    http_requests.observe(duration, method=method, route=route, code=code)
+
+
+def observe_process(records: dict, steps: int, images: int, duration: float):
+    """Feed per-phase times of a finished job from its timer records plus overall sampling rate."""
+    for phase, names in phases.items():
+        value = sum(records.get(name, 0) for name in names) - sum(records.get(name, 0) for name in nested.get(phase, []))
+        if value > 0:
+            generation_phase.observe(value, phase=phase)
+    if images > 0:
+        generation_images.inc(images)
+        generation_steps.inc(steps * images)
+        if duration > 0 and steps > 0:
+            generation_rate.observe(steps * images / duration)
+
+
+def render() -> str:
+    return '\n'.join(metric.render() for metric in registry) + '\n# EOF\n'
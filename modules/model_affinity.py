@@ -0,0 +1,169 @@
+"""Model overrides that stay loaded between jobs and queue ordering that groups jobs by required model.
+
+Jobs that override checkpoint, refiner or vae normally restore the original model right after they finish,
+so a stream of requests for a non-default model pays for two loads per request.
+With deferred restore settings are restored right away, but the overridden model stays loaded
+and original model weights are reloaded only once a job needs them.
+API jobs also wait in a scheduler that prefers jobs for currently loaded models; the oldest waiting job
+is never passed over more than `sd_affinity_skip` times.
+"""
+import os
+import threading
+import itertools
+from contextlib import contextmanager
+from modules import shared
+from modules.logger import log
+
+
+debug = log.trace if os.environ.get('SD_QUEUE_DEBUG', None) is not None else lambda *args, **kwargs: None
+keys = ['sd_model_checkpoint', 'sd_model_refiner', 'sd_vae']
+pending: dict[str, tuple] = {} # option -> (original value restored in settings, override value whose model is still loaded)
+
+
+def enabled() -> bool:
+    return shared.opts.sd_restore_deferred
+
+
+def reload(key: str):
+    from modules import sd_models, sd_vae
+    if key == 'sd_vae':
+        sd_vae.reload_vae_weights()
+    else:
+        sd_models.reload_model_weights()
+
+
+def valid(key: str, value) -> bool:
+    if value is None:
+        return False
+    if key in ['sd_model_checkpoint', 'sd_model_refiner']:
+        from modules import sd_checkpoint
+        return sd_checkpoint.checkpoint_aliases.get(value) is not None
+    return True
+
+
+def title(key: str, value) -> str:
+    if key in ['sd_model_checkpoint', 'sd_model_refiner'] and value is not None:
+        from modules import sd_checkpoint
+        info = sd_checkpoint.checkpoint_aliases.get(value)
+        value = info.title if info is not None else value
+    return str(value)
+
+
+def resolve(override_settings: dict) -> dict:
+    """Reload original models job does not override, returns original values of deferred options job does override."""
+    originals = {}
+    for key, (original, _active) in list(pending.items()):
+        if shared.opts.data.get(key, None) != original: # changed outside of jobs, onchange already loaded new value
+            pending.pop(key, None)
+            continue
+        override = override_settings.get(key, None)
+        if valid(key, override) and title(key, override) != title(key, original):
+            originals[key] = original
+            continue
+        pending.pop(key, None)
+        debug(f'Override restore: {key}={original} reload')
+        reload(key)
+    return originals
+
+
+def restore(stored_opts: dict, override_settings: dict, restore_afterwards: bool):
+    """Restore options after job, reload of model options is only marked as pending when deferred restore is enabled."""
+    if not restore_afterwards:
+        for key in override_settings:
+            pending.pop(key, None) # override is permanent
+        return
+    for key, value in stored_opts.items():
+        if key in keys and enabled():
+            active = shared.opts.data.get(key, None)
+            setattr(shared.opts, key, value) # settings never show per-job override
+            if value == active:
+                pending.pop(key, None)
+                continue
+            pending[key] = (value, active)
+            debug(f'Override restore: {key}={value} deferred')
+            continue
+        setattr(shared.opts, key, value)
+        if key in keys:
+            reload(key)
+
+
+def job_key(override_settings: dict | None) -> tuple:
+    """Models a job will run with, using override when valid and original or current option otherwise."""
+    override_settings = override_settings or {}
+    values = []
+    for key in keys:
+        value = override_settings.get(key, None)
+        if not valid(key, value):
+            value = shared.opts.data.get(key, None)
+        values.append(title(key, value))
+    return tuple(values)
+
+
+class Waiter:
+    def __init__(self, seq: int, key: tuple):
+        self.seq = seq
+        self.key = key
+        self.skipped = 0
+
+
+class Scheduler:
+    """Grants one job at a time, preferring waiting jobs whose model matches last granted job."""
+    def __init__(self, max_skips: int | None = None):
+        self.cond = threading.Condition()
+        self.waiting: list[Waiter] = []
+        self.busy = False
+        self.current: tuple | None = None
+        self.max_skips = max_skips
+        self.counter = itertools.count()
+
+    def limit(self) -> int:
+        return self.max_skips if self.max_skips is not None else int(shared.opts.sd_affinity_skip)
+
+    def pick(self) -> Waiter | None:
+        if len(self.waiting) == 0:
+            return None
+        oldest = self.waiting[0]
+        if self.current is None or oldest.skipped >= self.limit():
+            return oldest
+        for waiter in self.waiting:
+            if waiter.key == self.current:
+                return waiter
+        return oldest
+
+    def acquire(self, key: tuple) -> Waiter:
+        with self.cond:
+            waiter = Waiter(next(self.counter), key)
+            self.waiting.append(waiter)
+            granted = False
+            try:
+                while self.busy or self.pick() is not waiter:
+                    self.cond.wait()
+                granted = True
+            finally:
+                self.waiting.remove(waiter)
+                if not granted:
+                    self.cond.notify_all() # other waiters may have been held back by this one
+            for other in self.waiting:
+                if other.seq < waiter.seq:
+                    other.skipped += 1
+            if key != self.current:
+                debug(f'Queue: model={key} previous={self.current} waiting={len(self.waiting)}')
+            self.busy = True
+            self.current = key
+            return waiter
+
+    def release(self):
+        with self.cond:
+            self.busy = False
+            self.cond.notify_all()
+
+    @contextmanager
+    def slot(self, key: tuple):
+        self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+scheduler = Scheduler()
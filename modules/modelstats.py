@@ -1,7 +1,7 @@
 import os
 from datetime import datetime
 import torch
-from modules import shared, sd_models
+from modules import shared, sd_models, files_cache
 from modules.logger import log
 
 
@@ -14,7 +14,12 @@ def walk(folder: str):
 
 
 def stat(fn: str):
-    if fn is None or len(fn) == 0 or not os.path.exists(fn):
+    if fn is None or len(fn) == 0:
+        return 0, datetime.fromtimestamp(0)
+    cached = files_cache.file_stat(fn)
+    if cached is not None:
+        return round(cached[0]), datetime.fromtimestamp(cached[1]).replace(microsecond=0)
+    if not os.path.exists(fn):
         return 0, datetime.fromtimestamp(0)
     fs_stat = os.stat(fn, follow_symlinks=False)
     mtime = datetime.fromtimestamp(fs_stat.st_mtime).replace(microsecond=0)
@@ -3,6 +3,8 @@ import os
 import sys
 import json
 import threading
+import contextvars
+from contextlib import contextmanager
 from typing import TYPE_CHECKING
 from modules import cmd_args, errors
 from modules.json_helpers import readfile, writefile
@@ -18,6 +20,67 @@ if TYPE_CHECKING:
 cmd_opts = cmd_args.parse_args()
 compatibility_opts = ['clip_skip', 'uni_pc_lower_order_final', 'uni_pc_order']
 secrets_pattern = ['_version', '_token', '_key', '_secret', '_password']
+overlay_data: contextvars.ContextVar[dict | None] = contextvars.ContextVar('options_overlay', default=None)
+
+
+class OptionsData(dict):
+    """Settings values with copy-on-write overlay of current context, writes inside an overlay never reach global values."""
+    def __getitem__(self, key):
+        overlay = overlay_data.get()
+        if overlay is not None and key in overlay:
+            return overlay[key]
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        overlay = overlay_data.get()
+        if overlay is not None:
+            overlay[key] = value
+        else:
+            super().__setitem__(key, value)
+
+    def __contains__(self, key):
+        overlay = overlay_data.get()
+        return (overlay is not None and key in overlay) or super().__contains__(key)
+
+    def get(self, key, default=None):
+        overlay = overlay_data.get()
+        if overlay is not None and key in overlay:
+            return overlay[key]
+        return super().get(key, default)
+
+    def pop(self, key, *args):
+        overlay = overlay_data.get()
+        if overlay is not None: # global values are never removed from inside an overlay
+            if key in overlay:
+                return overlay.pop(key)
+            return super().__getitem__(key) if super().__contains__(key) or len(args) == 0 else args[0]
+        return super().pop(key, *args)
+
+    def base(self) -> dict:
+        """Global values without overlay of current context, used for anything that is persisted."""
+        return dict(dict.items(self))
+
+    def merged(self) -> dict:
+        overlay = overlay_data.get()
+        return self.base() | overlay if overlay is not None else self.base()
+
+    def keys(self):
+        return self.merged().keys() if overlay_data.get() is not None else super().keys()
+
+    def values(self):
+        return self.merged().values() if overlay_data.get() is not None else super().values()
+
+    def items(self):
+        return self.merged().items() if overlay_data.get() is not None else super().items()
+
+    def __iter__(self):
+        return iter(self.merged()) if overlay_data.get() is not None else super().__iter__()
+
+    def __len__(self):
+        return len(self.merged()) if overlay_data.get() is not None else super().__len__()
+
+    def copy(self):
+        return self.merged()
 
 
 class Options:
@@ -34,7 +97,7 @@ class Options:
         if restricted is None:
             restricted = set()
         super().__setattr__('data_labels', options_templates)
-        super().__setattr__('data', {k: v.default for k, v in options_templates.items()})
+        super().__setattr__('data', OptionsData({k: v.default for k, v in options_templates.items()}))
         super().__setattr__('secrets', {})
         self.filename: str = filename or cmd_opts.config
         self.secretsfn: str = secrets or cmd_opts.secrets
@@ -71,6 +134,8 @@ class Options:
         return super().__getattribute__(item)  # pylint: disable=super-with-arguments
 
     def __setattr__(self, key, value):  # pylint: disable=inconsistent-return-statements
+        if key == 'data' and not isinstance(value, OptionsData):
+            value = OptionsData(value)
         if (key in self.data_labels) or (key in self.data) or (key in self.secrets):
             if cmd_opts.freeze:
                 log.warning(f"Settings are frozen: {key}")
@@ -120,6 +185,25 @@ class Options:
                 return False
         return True
 
+    def push_overlay(self, values: dict | None = None) -> contextvars.Token:
+        """Start overlay for current thread, settings changed until `pop_overlay` are visible only to this thread."""
+        parent = overlay_data.get()
+        return overlay_data.set((parent or {}) | (values or {}))
+
+    def pop_overlay(self, token: contextvars.Token) -> dict:
+        """End overlay and return values that were set in it."""
+        values = overlay_data.get() or {}
+        overlay_data.reset(token)
+        return values
+
+    @contextmanager
+    def overlay(self, values: dict | None = None):
+        token = self.push_overlay(values)
+        try:
+            yield self
+        finally:
+            self.pop_overlay(token)
+
     def get_default(self, key):
         """returns the default value for the key"""
         data_label = self.data_labels.get(key)
@@ -143,7 +227,7 @@ class Options:
             if self.debug:
                 log.debug(f'Settings: total={len(self.data.keys())} secrets={len(self.secrets.keys())} known={len(self.data_labels.keys())}')
 
-            all_options = self.data | self.secrets
+            all_options = self.data.base() | self.secrets # per-job overlay values are never persisted
             diff = {}
             for k, v in all_options.items():
                 if k in self.data_labels:
@@ -222,10 +306,11 @@ class Options:
             func()
 
     def dumpjson(self):
-        d = {k: self.data.get(k, self.data_labels.get(k).default) for k in self.data_labels.keys()}
+        data = self.data.base()
+        d = {k: data.get(k, self.data_labels.get(k).default) for k in self.data_labels.keys()}
         metadata = {
             k: {
-                "is_stored": k in self.data and self.data[k] != self.data_labels[k].default, # pylint: disable=unnecessary-dict-index-lookup
+                "is_stored": k in data and data[k] != self.data_labels[k].default, # pylint: disable=unnecessary-dict-index-lookup
                 "tab_name": v.section[0]
             } for k, v in self.data_labels.items()
         }
@@ -103,6 +103,24 @@ class YoloRestorer(Detailer):
             offload: bool | None = None,
             p = None,
         ) -> list[YoloResult]:
+        results = self.predict_batch(model, [image], imgsz=imgsz, half=half, device=device, agnostic=agnostic, retina=retina, mask=mask, augment=augment, offload=offload, p=p)
+        return results[0] if len(results) > 0 else []
+
+    def predict_batch(
+            self,
+            model,
+            images: list[Image.Image],
+            imgsz: int = 640,
+            half: bool = True,
+            device = devices.device,
+            agnostic: bool = False,
+            retina: bool = False,
+            mask: bool = True,
+            augment: bool | None = None,
+            offload: bool | None = None,
+            p = None,
+        ) -> list[list[YoloResult]]:
+        """Run detection on all images in a single predict call and return detected items per image."""
         if augment is None:
             augment = detailer_opt(p, 'detailer_augment')
         if offload is None:
@@ -110,7 +128,9 @@ class YoloRestorer(Detailer):
 
         if model is None or (isinstance(model, str) and len(model) == 0):
             model = 'yolo11m'
-        result = []
+        result = [[] for _ in images]
+        if len(images) == 0:
+            return result
         if isinstance(model, str):
             cached = self.models.get(model, None)
             if cached is None:
@@ -129,7 +149,7 @@ class YoloRestorer(Detailer):
                 from ultralytics import YOLO # pylint: disable=import-outside-toplevel, unused-import
             model: YOLO = model.to(device)
             predictions = model.predict(
-                source=[image],
+                source=images,
                 stream=False,
                 verbose=False,
                 imgsz=imgsz,
@@ -151,7 +171,7 @@ class YoloRestorer(Detailer):
         desired = [d.lower().strip() for d in desired]
         desired = [d for d in desired if len(d) > 0]
 
-        for prediction in predictions:
+        for prediction, image, items in zip(predictions, images, result):
             boxes = prediction.boxes.xyxy.detach().int().cpu().numpy() if prediction.boxes is not None else []
             scores = prediction.boxes.conf.detach().float().cpu().numpy() if prediction.boxes is not None else []
             classes = prediction.boxes.cls.detach().float().cpu().numpy() if prediction.boxes is not None else []
@@ -196,8 +216,8 @@ class YoloRestorer(Detailer):
                             height=h,
                             args=args,
                         )
-                        result.append(res)
-                if len(result) >= (detailer_opt(p, 'detailer_max') or 2):
+                        items.append(res)
+                if len(items) >= (detailer_opt(p, 'detailer_max') or 2):
                     break
         return result
 
@@ -299,16 +319,14 @@ class YoloRestorer(Detailer):
             log.error(f'Detailer: model="{shared.sd_model.__class__.__name__}" not compatible')
             return np_image
 
-        models = []
-        if len(shared.opts.detailer_args) > 0:
-            models = [m.strip() for m in re.split(r'[\n,;]+', shared.opts.detailer_args)]
-            models = [m for m in models if len(m) > 0]
-        if len(models) == 0:
-            models = detailer_opt(p, 'detailer_models') or []
+        models = self.get_models(p)
         if len(models) == 0:
             log.warning('Detailer: model=None')
             return np_image
         log.debug(f'Detailer: models={models}')
+        batched = detailer_opt(p, 'detailer_batch')
+        detections = getattr(p, 'detailer_detections', None) or {}
+        batch_index = getattr(p, 'batch_index', 0)
 
         # create backups
         orig_apply_overlay = shared.opts.mask_apply_overlay
@@ -320,13 +338,7 @@ class YoloRestorer(Detailer):
         image = None
 
         for i, model_val in enumerate(models):
-            if ':' in model_val:
-                model_name, model_args = model_val.split(':', 1)
-            else:
-                model_name, model_args = model_val, ''
-            model_args = [m.strip() for m in model_args.split(':')]
-            model_args = {k.strip(): v.strip() for k, v in (arg.split('=') for arg in model_args if '=' in arg)}
-
+            model_name, model_args = self.parse_model(model_val)
             name, model = self.load(model_name)
             if model is None:
                 log.warning(f'Detailer: model="{name}" not loaded')
@@ -334,7 +346,11 @@ class YoloRestorer(Detailer):
 
             if image is None:
                 image = Image.fromarray(np_image)
-            items = self.predict(model, image, p=p)
+            cached = detections.get(name, None)
+            if cached is not None and batch_index < len(cached):
+                items = cached[batch_index] # detections prefetched for the whole batch
+            else:
+                items = self.predict(model, image, p=p)
 
             if len(items) == 0:
                 log.info(f'Detailer: model="{name}" no items detected')
@@ -418,6 +434,11 @@ class YoloRestorer(Detailer):
             if detailer_opt(p, 'detailer_include_detections', 'detailer_save'):
                 annotated = self.draw_masks(annotated, items, p=p)
 
+            if batched and len(items) > 1:
+                pc.keep_prompts = True
+                image, masks = self.restore_batch(pc, p, image, items, prompt_lines[i*len(items):(i+1)*len(items)], negative_lines[i*len(items):(i+1)*len(items)], f'{i+1}:{name}')
+                mask_all.extend(masks)
+                items = [] # all items processed in single batch
             for j, item in enumerate(items):
                 if item.mask is None:
                     continue
@@ -483,6 +504,109 @@ class YoloRestorer(Detailer):
             np_images.append(annotated) # save debug image with boxes
         return np_images
 
+    def restore_batch(self, pc, p, image: Image.Image, items: list[YoloResult], prompts: list[str], negatives: list[str], name: str):
+        """Crop all detected regions to detailer resolution, inpaint them in a single batch and paste results back."""
+        from modules import masking
+        crops, masks, regions, blends, kept = [], [], [], [], []
+        for j, item in enumerate(items):
+            if item.mask is None:
+                continue
+            mask = masking.run_mask(input_image=image, input_mask=item.mask, invert=False, mask_blur=pc.mask_blur, mask_padding=pc.inpaint_full_res_padding)
+            if mask is None:
+                continue
+            mask = mask.convert('L')
+            region = masking.get_crop_region(np.array(mask), pc.inpaint_full_res_padding)
+            region = masking.expand_crop_region(region, pc.width, pc.height, mask.width, mask.height)
+            crops.append(images.resize_image(3, image.crop(region), pc.width, pc.height))
+            masks.append(images.resize_image(2, mask.crop(region), pc.width, pc.height))
+            blends.append(mask.crop(region))
+            regions.append(region)
+            kept.append(j)
+        if len(crops) == 0:
+            return image, []
+        prompts, negatives = [prompts[j] for j in kept], [negatives[j] for j in kept]
+        seed = pc.all_seeds[0] if pc.all_seeds else pc.seed
+        subseed = pc.all_subseeds[0] if pc.all_subseeds else pc.subseed
+        pc.batch_size = len(crops)
+        pc.n_iter = 1
+        pc.prompt, pc.negative_prompt = prompts[0], negatives[0]
+        pc.all_prompts, pc.all_negative_prompts = prompts, negatives
+        pc.prompts, pc.negative_prompts = prompts, negatives
+        pc.all_seeds, pc.all_subseeds = len(crops) * [seed], len(crops) * [subseed]
+        pc.prompts, pc.network_data = extra_networks.parse_prompts(pc.prompts, pc.network_data)
+        pc.disable_extra_networks = True
+        network_same = len(p.network_data.values()) == len(pc.network_data.values()) and all(x == y for x, y in zip(p.network_data.values(), pc.network_data.values()))
+        if not network_same:
+            extra_networks.activate(pc, pc.network_data)
+        log.debug(f'Detail: model="{name}" items={len(crops)} boxes={[item.box for item in items]} batch={pc.width}x{pc.height}x{len(crops)} network={network_same} prompts={prompts}')
+        shared.sd_model.fail_on_switch_error = True
+        pc.init_images = crops
+        pc.image_mask = masks # first mask drives task selection, per-item masks are passed to pipeline
+        pc.task_args = dict(getattr(pc, 'task_args', None) or {})
+        pc.task_args['image_mask'] = masks
+        pc.inpaint_full_res = False # regions are already cropped and resized
+        pc.mask_blur = 0
+        pc.inpaint_full_res_padding = 0
+        pc.mask_apply_overlay = False # results are blended back using item masks
+        pc.color_corrections = None
+        pc.overlay_images = []
+        pc.enable_hr = False
+        pc.do_not_save_samples = True
+        pc.do_not_save_grid = True
+        pc.recursion = True
+
+        jobid = shared.state.begin('Detailer')
+        pp = processing.process_images_inner(pc)
+        if not network_same:
+            extra_networks.deactivate(pc, force=True)
+        shared.sd_model.fail_on_switch_error = False
+        shared.state.end(jobid)
+        del pc.recursion
+        pc.task_args.pop('image_mask', None)
+
+        if pp is None or pp.images is None or len(pp.images) < len(crops):
+            log.warning(f'Detailer: model="{name}" items={len(crops)} images={len(pp.images) if pp is not None and pp.images is not None else 0} batch failed')
+            return image, []
+        image = image.copy()
+        for result, region, blend in zip(pp.images[:len(crops)], regions, blends):
+            x1, y1, x2, y2 = region
+            result = images.resize_image(2, result, x2 - x1, y2 - y1)
+            image.paste(result.convert(image.mode), (x1, y1), mask=blend)
+        return image, list(pp.images[len(crops):])
+
+    def get_models(self, p=None) -> list[str]:
+        models = []
+        if len(shared.opts.detailer_args) > 0:
+            models = [m.strip() for m in re.split(r'[\n,;]+', shared.opts.detailer_args)]
+            models = [m for m in models if len(m) > 0]
+        if len(models) == 0:
+            models = detailer_opt(p, 'detailer_models') or []
+        return models
+
+    def parse_model(self, model_val: str) -> tuple[str, dict]:
+        if ':' in model_val:
+            model_name, model_args = model_val.split(':', 1)
+        else:
+            model_name, model_args = model_val, ''
+        model_args = [m.strip() for m in model_args.split(':')]
+        model_args = {k.strip(): v.strip() for k, v in (arg.split('=') for arg in model_args if '=' in arg)}
+        return model_name, model_args
+
+    def prefetch(self, batch: list[Image.Image], p: processing.StableDiffusionProcessing = None):
+        """Run detection for all images in output batch ahead of per-image restore when batched detailer is enabled."""
+        if p is None or not detailer_opt(p, 'detailer_batch') or len(batch) == 0:
+            return
+        if hasattr(p, 'recursion') or shared.state.interrupted or shared.state.skipped:
+            return
+        p.detailer_detections = {}
+        for model_val in self.get_models(p):
+            model_name, _model_args = self.parse_model(model_val)
+            name, model = self.load(model_name)
+            if model is None:
+                continue
+            p.detailer_detections[name] = self.predict_batch(model, batch, p=p)
+        log.debug(f'Detailer prefetch: images={len(batch)} detections={ {k: [len(items) for items in v] for k, v in p.detailer_detections.items()} }')
+
     def make_processing(self, image, prompt='', negative='', steps=10, strength=0.3, resolution=1024, seed=-1, overrides=None):
         """Build a synthetic Img2Img processing object to run restore() standalone, with no base generation pass.
 
@@ -538,7 +662,7 @@ class YoloRestorer(Detailer):
             return gr.update(visible=False), gr.update(visible=True, value=value), gr.update(visible=False)
 
     def ui(self, tab: str):
-        def ui_settings_change(merge, detailers, text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg):
+        def ui_settings_change(merge, detailers, text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch):
             shared.opts.detailer_merge = merge
             shared.opts.detailer_models = detailers
             shared.opts.detailer_args = text if not self.ui_mode else ''
@@ -555,9 +679,10 @@ class YoloRestorer(Detailer):
             shared.opts.detailer_save = save
             shared.opts.detailer_sort = sort
             shared.opts.detailer_segmentation = seg
+            shared.opts.detailer_batch = batch
             # shared.opts.detailer_resolution = resolution
             shared.opts.save(silent=True)
-            log.debug(f'Detailer settings: models={detailers} classes={classes} strength={strength} conf={min_confidence} max={max_detected} iou={iou} size={min_size}-{max_size} padding={padding} steps={steps} resolution={resolution} save={save} sort={sort} seg={seg}')
+            log.debug(f'Detailer settings: models={detailers} classes={classes} strength={strength} conf={min_confidence} max={max_detected} iou={iou} size={min_size}-{max_size} padding={padding} steps={steps} resolution={resolution} save={save} sort={sort} seg={seg} batch={batch}')
             if not self.ui_mode:
                 log.debug(f'Detailer expert: {text}')
 
@@ -570,6 +695,7 @@ class YoloRestorer(Detailer):
             with gr.Row():
                 merge = gr.Checkbox(label="Merge detailers", elem_id=f"{tab}_detailer_merge", value=shared.opts.detailer_merge, visible=True)
                 sort = gr.Checkbox(label="Sort detections", elem_id=f"{tab}_detailer_sort", value=shared.opts.detailer_sort, visible=True)
+                batch = gr.Checkbox(label="Batch detections", elem_id=f"{tab}_detailer_batch", value=shared.opts.detailer_batch, visible=True)
             with gr.Row():
                 detailers = gr.Dropdown(label="Detailer models", elem_id=f"{tab}_detailers", choices=list(self.list), value=shared.opts.detailer_models, multiselect=True, visible=True)
                 detailers_text = gr.Textbox(label="Detailer list", elem_id=f"{tab}_detailers_text", placeholder="Comma separated list of detailer models", lines=2, visible=False, interactive=True)
@@ -626,21 +752,22 @@ class YoloRestorer(Detailer):
                         d_seed = gr.Number(label='Seed', value=-1, precision=0, elem_id=f"{tab}_detailer_seed")
                 sampler_block = {'sampler': d_sampler, 'prediction': d_prediction, 'shift': d_shift, 'cfg_scale': d_cfg, 'options': d_options, 'seed': d_seed}
 
-            merge.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            detailers.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            detailers_text.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            classes.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            padding.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            blur.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            min_confidence.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            max_detected.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            min_size.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            max_size.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            iou.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            resolution.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            save.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            sort.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
-            seg.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg], outputs=[])
+            merge.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            detailers.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            detailers_text.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            classes.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            padding.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            blur.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            min_confidence.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            max_detected.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            min_size.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            max_size.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            iou.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            resolution.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            save.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            sort.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            seg.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
+            batch.change(fn=ui_settings_change, inputs=[merge, detailers, detailers_text, classes, strength, padding, blur, min_confidence, max_detected, min_size, max_size, iou, steps, renoise_value, renoise_end, resolution, save, sort, seg, batch], outputs=[])
             if tab == 'extras':
                 return enabled, prompt, negative, steps, strength, resolution, sampler_block
             return enabled, prompt, negative, steps, strength, resolution
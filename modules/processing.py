@@ -2,8 +2,9 @@ import os
 import json
 import time
 import numpy as np
+import torch
 from PIL import Image, ImageOps
-from modules import shared, devices, errors, images, scripts_manager, memstats, script_callbacks, extra_networks, detailer, sd_models, sd_checkpoint, sd_vae, processing_helpers, processing_grading, timer, masking
+from modules import shared, devices, errors, images, scripts_manager, memstats, script_callbacks, extra_networks, detailer, sd_models, sd_checkpoint, sd_vae, processing_helpers, processing_grading, timer, masking, metrics, model_affinity
 from modules.logger import log
 from modules.sd_hijack_hypertile import context_hypertile_vae, context_hypertile_unet
 from modules.processing_class import ( # pylint: disable=unused-import
@@ -150,15 +151,20 @@ def process_images(p: StableDiffusionProcessing) -> Processed | None:
     if p.scripts is not None and isinstance(p.scripts, scripts_manager.ScriptRunner):
         p.scripts.before_process(p)
     stored_opts = {}
+    originals = model_affinity.resolve(p.override_settings) # models kept loaded by previous job
     for k, v in p.override_settings.copy().items():
         if shared.opts.data.get(k, None) is None and shared.opts.data_labels.get(k, None) is None:
             continue
         orig = shared.opts.data.get(k, None) or shared.opts.data_labels[k].default
         if orig == v or (type(orig) == str and os.path.splitext(orig)[0] == v):
             p.override_settings.pop(k, None)
+    isolated = shared.opts.sd_override_overlay # non-model overrides go to job-local overlay and need no restore
     for k in p.override_settings.keys():
-        stored_opts[k] = shared.opts.data.get(k, None) or shared.opts.data_labels[k].default
+        if isolated and k not in model_affinity.keys:
+            continue
+        stored_opts[k] = originals.get(k, None) or shared.opts.data.get(k, None) or shared.opts.data_labels[k].default
     results = None
+    overlay = None
     try:
         # if no checkpoint override or the override checkpoint can't be found, remove override entry and load opts checkpoint
         if p.override_settings.get('sd_model_checkpoint', None) is not None and sd_checkpoint.checkpoint_aliases.get(p.override_settings.get('sd_model_checkpoint')) is None:
@@ -181,11 +187,15 @@ def process_images(p: StableDiffusionProcessing) -> Processed | None:
         if len(p.override_settings.keys()) > 0:
             log.debug(f'Override: {p.override_settings}')
         for k, v in p.override_settings.items():
+            if isolated and k not in model_affinity.keys:
+                continue
             setattr(shared.opts, k, v)
             if k == 'sd_model_checkpoint':
                 sd_models.reload_model_weights()
             if k == 'sd_vae':
                 sd_vae.reload_vae_weights()
+        if isolated:
+            overlay = shared.opts.push_overlay({k: v for k, v in p.override_settings.items() if k not in model_affinity.keys})
 
         shared.prompt_styles.apply_styles_to_extra(p)
         shared.prompt_styles.extract_comments(p)
@@ -233,15 +243,13 @@ def process_images(p: StableDiffusionProcessing) -> Processed | None:
     finally:
         script_callbacks.after_process_callback(p)
 
-        if p.override_settings_restore_afterwards: # restore opts to original state
-            for k, v in stored_opts.items():
-                setattr(shared.opts, k, v)
-                if k == 'sd_model_checkpoint':
-                    sd_models.reload_model_weights()
-                if k == 'sd_model_refiner':
-                    sd_models.reload_model_weights()
-                if k == 'sd_vae':
-                    sd_vae.reload_vae_weights()
+        if overlay is not None:
+            shared.opts.pop_overlay(overlay)
+            if not p.override_settings_restore_afterwards: # permanent overrides are applied to global settings
+                for k, v in p.override_settings.items():
+                    if k not in model_affinity.keys:
+                        setattr(shared.opts, k, v)
+        model_affinity.restore(stored_opts, p.override_settings, p.override_settings_restore_afterwards) # restore opts to original state, model restore can be deferred
         timer.process.record('post')
     return results
 
@@ -289,25 +297,80 @@ def get_opt(p, key):
     return val if val is not None else getattr(shared.opts, key)
 
 
+def get_grading_params(p: StableDiffusionProcessing):
+    return processing_grading.GradingParams(
+        brightness=getattr(p, 'grading_brightness', 0.0),
+        contrast=getattr(p, 'grading_contrast', 0.0),
+        saturation=getattr(p, 'grading_saturation', 0.0),
+        hue=getattr(p, 'grading_hue', 0.0),
+        gamma=getattr(p, 'grading_gamma', 1.0),
+        sharpness=getattr(p, 'grading_sharpness', 0.0),
+        color_temp=getattr(p, 'grading_color_temp', 6500),
+        shadows=getattr(p, 'grading_shadows', 0.0),
+        midtones=getattr(p, 'grading_midtones', 0.0),
+        highlights=getattr(p, 'grading_highlights', 0.0),
+        clahe_clip=getattr(p, 'grading_clahe_clip', 0.0),
+        clahe_grid=getattr(p, 'grading_clahe_grid', 8),
+        shadows_tint=getattr(p, 'grading_shadows_tint', '#000000'),
+        highlights_tint=getattr(p, 'grading_highlights_tint', '#ffffff'),
+        split_tone_balance=getattr(p, 'grading_split_tone_balance', 0.5),
+        vignette=getattr(p, 'grading_vignette', 0.0),
+        grain=getattr(p, 'grading_grain', 0.0),
+        lut_cube_file=getattr(p, 'grading_lut_file', ''),
+        lut_strength=getattr(p, 'grading_lut_strength', 1.0),
+    )
+
+
+def process_tensors(p: StableDiffusionProcessing, samples: list, grading_params):
+    """Batched color correction and grading of uint8 samples on decode device followed by a single host transfer.
+    Stages run here only when nothing that must see the image earlier in per-image order is active, otherwise they stay per-image."""
+    applied = []
+    batch = torch.stack(samples)
+    inorder = not p.detailer_enabled and not shared.state.interrupted and not shared.state.skipped
+    if inorder and p.color_corrections is not None and len(p.color_corrections) >= len(samples):
+        method = p.color_correction_method if p.color_correction_method is not None else getattr(shared.opts, 'color_correction_method', 'histogram')
+        before = not p.do_not_save_samples and get_opt(p, 'save_images_before_color_correction')
+        if method in processing_helpers.tensor_corrections and not before:
+            batch = processing_helpers.apply_color_correction_batch(p.color_corrections[:len(samples)], batch, method)
+            applied.append('color')
+    hooks = p.scripts.dispatch('postprocess_image') if p.scripts is not None and isinstance(p.scripts, scripts_manager.ScriptRunner) else []
+    if inorder and len(hooks) == 0 and (p.color_corrections is None or 'color' in applied) and processing_grading.is_active(grading_params):
+        batch = processing_grading.grade_batch(batch, grading_params)
+        applied.append('grading')
+    samples = list(batch.contiguous().cpu().numpy())
+    debug(f'Processing tensors: batch={len(samples)} applied={applied}')
+    return samples, applied
+
+
 def process_samples(p: StableDiffusionProcessing, samples):
     out_images = []
     out_infotexts = []
     if not isinstance(samples, list):
         return samples, []
-    for i, sample in enumerate(samples):
-        debug(f'Processing result: index={i+1}/{len(samples)}')
-        p.batch_index = i
+    grading_params = get_grading_params(p)
+    applied = []
+    if len(samples) > 0 and all(torch.is_tensor(sample) and sample.dtype == torch.uint8 and sample.shape == samples[0].shape for sample in samples):
+        samples, applied = process_tensors(p, samples, grading_params)
+        p.ops.extend(applied)
+    converted = []
+    for sample in samples:
         if isinstance(sample, Image.Image) or (isinstance(sample, list) and isinstance(sample[0], Image.Image)):
             image = sample
             sample = np.array(sample)
         else:
             sample = validate_sample(sample)
             image = Image.fromarray(sample)
-
         if isinstance(image, list):
             if len(image) > 1:
                 log.warning(f'Processing: images={image} contains multiple images using first one only')
             image = image[0]
+        converted.append((sample, image))
+    if p.detailer_enabled and not shared.state.interrupted and not shared.state.skipped:
+        detailer.prefetch([image for _sample, image in converted], p)
+
+    for i, (sample, image) in enumerate(converted):
+        debug(f'Processing result: index={i+1}/{len(samples)}')
+        p.batch_index = i
 
         if not shared.state.interrupted and not shared.state.skipped:
 
@@ -315,7 +378,7 @@ def process_samples(p: StableDiffusionProcessing, samples):
                 p.ops.append('detailer')
                 if not p.do_not_save_samples and get_opt(p, 'save_images_before_detailer'):
                     info = create_infotext(p, p.prompts, p.seeds, p.subseeds, index=i)
-                    images.save_image(image, path=p.outpath_samples, basename="", seed=p.seeds[i], prompt=p.prompts[i], extension=get_opt(p, 'samples_format'), info=info, p=p, suffix="-before-detailer")
+                    images.save_image(image, path=p.outpath_samples, basename="", seed=p.seeds[i], prompt=p.prompts[i], extension=get_opt(p, 'samples_format'), info=info, p=p, suffix="-before-detailer", wait=False)
                 sample = detailer.detail(sample, p)
                 if isinstance(sample, list):
                     if len(sample) > 0:
@@ -327,12 +390,12 @@ def process_samples(p: StableDiffusionProcessing, samples):
                 elif sample is not None:
                     image = Image.fromarray(sample)
 
-            if p.color_corrections is not None and i < len(p.color_corrections):
+            if p.color_corrections is not None and i < len(p.color_corrections) and 'color' not in applied:
                 p.ops.append('color')
                 if not p.do_not_save_samples and get_opt(p, 'save_images_before_color_correction'):
                     image_without_cc = apply_overlay(image, p.paste_to, i, p.overlay_images)
                     info = create_infotext(p, p.prompts, p.seeds, p.subseeds, index=i)
-                    images.save_image(image_without_cc, path=p.outpath_samples, basename="", seed=p.seeds[i], prompt=p.prompts[i], extension=get_opt(p, 'samples_format'), info=info, p=p, suffix="-before-color-correct")
+                    images.save_image(image_without_cc, path=p.outpath_samples, basename="", seed=p.seeds[i], prompt=p.prompts[i], extension=get_opt(p, 'samples_format'), info=info, p=p, suffix="-before-color-correct", wait=False)
                 method = p.color_correction_method if p.color_correction_method is not None else getattr(shared.opts, 'color_correction_method', 'histogram')
                 image = apply_color_correction(p.color_corrections[i], image, method=method)
 
@@ -342,28 +405,9 @@ def process_samples(p: StableDiffusionProcessing, samples):
                 if pp.image is not None:
                     image = pp.image
 
-            grading_params = processing_grading.GradingParams(
-                brightness=getattr(p, 'grading_brightness', 0.0),
-                contrast=getattr(p, 'grading_contrast', 0.0),
-                saturation=getattr(p, 'grading_saturation', 0.0),
-                hue=getattr(p, 'grading_hue', 0.0),
-                gamma=getattr(p, 'grading_gamma', 1.0),
-                sharpness=getattr(p, 'grading_sharpness', 0.0),
-                color_temp=getattr(p, 'grading_color_temp', 6500),
-                shadows=getattr(p, 'grading_shadows', 0.0),
-                midtones=getattr(p, 'grading_midtones', 0.0),
-                highlights=getattr(p, 'grading_highlights', 0.0),
-                clahe_clip=getattr(p, 'grading_clahe_clip', 0.0),
-                clahe_grid=getattr(p, 'grading_clahe_grid', 8),
-                shadows_tint=getattr(p, 'grading_shadows_tint', '#000000'),
-                highlights_tint=getattr(p, 'grading_highlights_tint', '#ffffff'),
-                split_tone_balance=getattr(p, 'grading_split_tone_balance', 0.5),
-                vignette=getattr(p, 'grading_vignette', 0.0),
-                grain=getattr(p, 'grading_grain', 0.0),
-                lut_cube_file=getattr(p, 'grading_lut_file', ''),
-                lut_strength=getattr(p, 'grading_lut_strength', 1.0),
-            )
-            if processing_grading.is_active(grading_params):
+            if 'grading' in applied:
+                image = processing_grading.grade_lut(image, grading_params)
+            elif processing_grading.is_active(grading_params):
                 p.ops.append('grading')
                 image = processing_grading.grade_image(image, grading_params)
 
@@ -405,7 +449,7 @@ def process_samples(p: StableDiffusionProcessing, samples):
 
         info = create_infotext(p, p.prompts, p.seeds, p.subseeds, index=i)
         if get_opt(p, 'samples_save') and not p.do_not_save_samples and p.outpath_samples is not None:
-            images.save_image(image, p.outpath_samples, "", p.seeds[i], p.prompts[i], get_opt(p, 'samples_format'), info=info, p=p) # main save image
+            images.save_image(image, p.outpath_samples, "", p.seeds[i], p.prompts[i], get_opt(p, 'samples_format'), info=info, p=p, wait=False) # main save image
 
         image.info["parameters"] = info
         out_infotexts.append(info)
@@ -551,8 +595,12 @@ def process_images_inner(p: StableDiffusionProcessing) -> Processed:
                     output_images.insert(0, grid)
                     index_of_first_image = 1
                 if _grid_save:
-                    images.save_image(grid, p.outpath_grids, "", p.all_seeds[0], p.all_prompts[0], get_opt(p, 'grid_format'), info=grid_info, p=p, grid=True) # main save grid
+                    images.save_image(grid, p.outpath_grids, "", p.all_seeds[0], p.all_prompts[0], get_opt(p, 'grid_format'), info=grid_info, p=p, grid=True, wait=False) # main save grid
 
+    t_save = time.time()
+    images.wait_saved(p.save_jobs) # saves run in background while batches generate, outputs are on disk once job returns
+    p.save_jobs.clear()
+    timer.process.add('save', time.time() - t_save)
     results = get_processed(
         p,
         images_list=output_images,
@@ -568,6 +616,7 @@ def process_images_inner(p: StableDiffusionProcessing) -> Processed:
     if p.scripts is not None and isinstance(p.scripts, scripts_manager.ScriptRunner) and not (shared.state.interrupted or shared.state.skipped):
         p.scripts.postprocess(p, results)
     timer.process.record('post')
+    metrics.observe_process(timer.process.records, p.steps, len(output_images), t1 - t0)
     p.ops = list(set(p.ops))
     if not p.disable_extra_networks:
         log.info(f'Processed: images={len(output_images)} its={(p.steps * len(output_images)) / (t1 - t0):.2f} ops={p.ops}')
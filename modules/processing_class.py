@@ -76,6 +76,7 @@ class StableDiffusionProcessing:
                  detailer_include_detections: bool | None = None,
                  detailer_merge: bool | None = None,
                  detailer_sort: bool | None = None,
+                 detailer_batch: bool | None = None,
                  detailer_classes: str | None = None,
                  detailer_conf: float | None = None,
                  detailer_iou: float | None = None,
@@ -358,6 +359,7 @@ class StableDiffusionProcessing:
         self.detailer_include_detections = detailer_include_detections
         self.detailer_merge = detailer_merge
         self.detailer_sort = detailer_sort
+        self.detailer_batch = detailer_batch
         self.detailer_classes = detailer_classes
         self.detailer_conf = detailer_conf
         self.detailer_iou = detailer_iou
@@ -588,6 +590,7 @@ class StableDiffusionProcessing:
         self.hr_negative_prompt = ''
         self.all_hr_negative_prompts = []
         self.comments = {}
+        self.save_jobs = [] # background image saves submitted by this job
         self.sampler = None
         self.nmask = None
         self.initial_noise_multiplier = initial_noise_multiplier if initial_noise_multiplier is not None else shared.opts.initial_noise_multiplier
@@ -4,7 +4,7 @@ import time
 import numpy as np
 import torch
 from PIL import Image
-from modules import shared, devices, processing, sd_models, errors, sd_hijack_hypertile, processing_vae, sd_models_compile, timer, modelstats, extra_networks, attention
+from modules import shared, devices, processing, scripts_manager, sd_models, errors, sd_hijack_hypertile, processing_vae, sd_models_compile, timer, modelstats, extra_networks, attention
 from modules.logger import log
 from modules.processing_helpers import resize_hires, calculate_base_steps, calculate_hires_steps, calculate_refiner_steps, save_intermediate, update_sampler, is_txt2img, is_refiner_enabled, get_job_name
 from modules.processing_args import set_pipeline_args
@@ -467,6 +467,14 @@ def attach_audio(results, audio):
     return wrapped
 
 
+def decode_output_type(p: processing.StableDiffusionProcessing) -> str:
+    """Batched uint8 output on decode device unless scripts expect float images from postprocess batch hooks."""
+    if p.scripts is not None and isinstance(p.scripts, scripts_manager.ScriptRunner):
+        if len(p.scripts.dispatch('postprocess_batch')) > 0 or len(p.scripts.dispatch('postprocess_batch_list')) > 0:
+            return 'np'
+    return 'uint8'
+
+
 def process_decode(p: processing.StableDiffusionProcessing, output):
     shared.sd_model = sd_models.apply_balanced_offload(shared.sd_model, exclude=['vae'])
     if output is not None:
@@ -491,6 +499,7 @@ def process_decode(p: processing.StableDiffusionProcessing, output):
                 width = getattr(p, 'width', 0)
                 height = getattr(p, 'height', 0)
             frames = p.task_args.get('num_frames', None) or getattr(p, 'frames', None)
+            output_type = decode_output_type(p)
             if isinstance(output.images, list):
                 results = []
                 for i in range(len(output.images)):
@@ -498,6 +507,7 @@ def process_decode(p: processing.StableDiffusionProcessing, output):
                         latents = output.images[i],
                         model = model,
                         vae_type = p.vae_type,
+                        output_type = output_type,
                         width = width,
                         height = height,
                         frames = frames,
@@ -509,6 +519,7 @@ def process_decode(p: processing.StableDiffusionProcessing, output):
                     latents = output.images,
                     model = model,
                     vae_type = p.vae_type,
+                    output_type = output_type,
                     width = width,
                     height = height,
                     frames = frames,
@@ -1,6 +1,6 @@
 """
 GPU-accelerated color grading engine using kornia + pillow-lut-tools.
-Applied per-image after generation, before mask overlay.
+Applied after generation, before mask overlay, per-image or on the whole decoded batch.
 """
 
 import os
@@ -202,14 +202,9 @@ def _apply_lut(image: Image.Image, lut_cube_file: str, strength: float) -> Image
         return image
 
 
-def grade_image(image: Image.Image, params: GradingParams) -> Image.Image:
-    """Full grading pipeline: PIL -> GPU tensor -> kornia ops -> PIL."""
-    log.debug(f"Grading: params={params}")
+def grade_tensor(tensor: torch.Tensor, params: GradingParams) -> torch.Tensor:
+    """Grading ops on NCHW tensor in 0..1 range, every op works per-image so batches grade the same as single images."""
     kornia = _ensure_kornia()
-    arr = np.array(image).astype(np.float32) / 255.0
-    tensor = torch.from_numpy(arr).permute(2, 0, 1).unsqueeze(0)
-    tensor = tensor.to(device=devices.device, dtype=devices.dtype)
-
     # basic adjustments
     if params.brightness != 0:
         tensor = kornia.enhance.adjust_brightness(tensor, params.brightness)
@@ -246,14 +241,33 @@ def grade_image(image: Image.Image, params: GradingParams) -> Image.Image:
     if params.grain > 0:
         tensor = _apply_grain(tensor, params.grain)
 
-    # convert back to PIL
-    tensor = tensor.clamp(0, 1)
+    return tensor.clamp(0, 1)
+
+
+def grade_lut(image: Image.Image, params: GradingParams) -> Image.Image:
+    """LUT is applied last on CPU via pillow-lut-tools."""
+    if params.lut_cube_file:
+        image = _apply_lut(image, params.lut_cube_file, params.lut_strength)
+    return image
+
+
+def grade_image(image: Image.Image, params: GradingParams) -> Image.Image:
+    """Full grading pipeline: PIL -> GPU tensor -> kornia ops -> PIL."""
+    log.debug(f"Grading: params={params}")
+    arr = np.array(image).astype(np.float32) / 255.0
+    tensor = torch.from_numpy(arr).permute(2, 0, 1).unsqueeze(0)
+    tensor = tensor.to(device=devices.device, dtype=devices.dtype)
+    tensor = grade_tensor(tensor, params)
     arr = (tensor.squeeze(0).permute(1, 2, 0).float().cpu().numpy() * 255).astype(np.uint8)
     result = Image.fromarray(arr)
     result.info = image.info.copy()  # Image.fromarray drops info; preserve so Process-tab metadata survives grading
+    return grade_lut(result, params)
 
-    # LUT applied last (CPU, via pillow-lut-tools)
-    if params.lut_cube_file:
-        result = _apply_lut(result, params.lut_cube_file, params.lut_strength)
 
-    return result
+def grade_batch(batch: torch.Tensor, params: GradingParams) -> torch.Tensor:
+    """Grading of NHWC uint8 batch without leaving its device, LUT is not included and is applied per image with grade_lut."""
+    log.debug(f"Grading: batch={list(batch.shape)} params={params}")
+    tensor = batch.permute(0, 3, 1, 2).float() / 255.0
+    tensor = tensor.to(device=devices.device, dtype=devices.dtype)
+    tensor = grade_tensor(tensor, params)
+    return (tensor.float() * 255).to(torch.uint8).permute(0, 2, 3, 1)
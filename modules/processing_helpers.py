@@ -59,15 +59,9 @@ def _apply_histogram(correction, original_image):
     return image
 
 
-def _apply_wavelet(correction, original_image):
-    ref_pil = correction.image if isinstance(correction, ColorCorrectionRef) else original_image
-    ref = torch.from_numpy(np.asarray(ref_pil).astype(np.float32) / 255.0).permute(2, 0, 1).unsqueeze(0)
-    gen = torch.from_numpy(np.asarray(original_image).astype(np.float32) / 255.0).permute(2, 0, 1).unsqueeze(0)
-    if ref.shape[2:] != gen.shape[2:]:
-        ref = torch.nn.functional.interpolate(ref, size=gen.shape[2:], mode='bilinear', align_corners=False)
+def _wavelet_tensor(ref, gen):
     kernel = torch.tensor([[1, 2, 1], [2, 4, 2], [1, 2, 1]], dtype=torch.float32).unsqueeze(0).unsqueeze(0) / 16.0
-    kernel = kernel.expand(3, -1, -1, -1)
-    log.debug(f"Applying color correction: method=wavelet levels=5 image={original_image}")
+    kernel = kernel.expand(3, -1, -1, -1).to(gen.device)
     gen_highs = []
     current = gen
     for _ in range(5):
@@ -80,32 +74,64 @@ def _apply_wavelet(correction, original_image):
     result = ref_low
     for high in reversed(gen_highs):
         result = result + high
-    result = result.clamp(0, 1).squeeze(0).permute(1, 2, 0).numpy()
-    return Image.fromarray((result * 255).astype(np.uint8))
+    return result.clamp(0, 1)
 
 
-def _apply_adain(correction, original_image):
-    ref_pil = correction.image if isinstance(correction, ColorCorrectionRef) else original_image
-    ref = torch.from_numpy(np.asarray(ref_pil).astype(np.float32) / 255.0).permute(2, 0, 1).unsqueeze(0)
-    gen = torch.from_numpy(np.asarray(original_image).astype(np.float32) / 255.0).permute(2, 0, 1).unsqueeze(0)
-    if ref.shape[2:] != gen.shape[2:]:
-        ref = torch.nn.functional.interpolate(ref, size=gen.shape[2:], mode='bilinear', align_corners=False)
-    log.debug(f"Applying color correction: method=adain image={original_image}")
+def _adain_tensor(ref, gen):
     ref_mean = ref.mean(dim=(2, 3), keepdim=True)
     ref_std = ref.std(dim=(2, 3), keepdim=True) + 1e-6
     gen_mean = gen.mean(dim=(2, 3), keepdim=True)
     gen_std = gen.std(dim=(2, 3), keepdim=True) + 1e-6
     result = (gen - gen_mean) / gen_std * ref_std + ref_mean
-    result = result.clamp(0, 1).squeeze(0).permute(1, 2, 0).numpy()
+    return result.clamp(0, 1)
+
+
+tensor_corrections = {'wavelet': _wavelet_tensor, 'adain': _adain_tensor}
+
+
+def _color_reference(image, size, device=None):
+    ref = torch.from_numpy(np.asarray(image)).to(device).permute(2, 0, 1).unsqueeze(0).float() / 255.0
+    if ref.shape[2:] != size:
+        ref = torch.nn.functional.interpolate(ref, size=size, mode='bilinear', align_corners=False)
+    return ref
+
+
+def _apply_tensor_correction(correction, original_image, method):
+    gen = torch.from_numpy(np.asarray(original_image).astype(np.float32) / 255.0).permute(2, 0, 1).unsqueeze(0)
+    ref = _color_reference(correction.image if isinstance(correction, ColorCorrectionRef) else original_image, gen.shape[2:])
+    log.debug(f"Applying color correction: method={method} image={original_image}")
+    result = tensor_corrections[method](ref, gen).squeeze(0).permute(1, 2, 0).numpy()
     return Image.fromarray((result * 255).astype(np.uint8))
 
 
+def _apply_wavelet(correction, original_image):
+    return _apply_tensor_correction(correction, original_image, 'wavelet')
+
+
+def _apply_adain(correction, original_image):
+    return _apply_tensor_correction(correction, original_image, 'adain')
+
+
 def apply_color_correction(correction, original_image, method='histogram'):
     methods = {'histogram': _apply_histogram, 'wavelet': _apply_wavelet, 'adain': _apply_adain}
     fn = methods.get(method, _apply_histogram)
     return fn(correction, original_image)
 
 
+def apply_color_correction_batch(corrections, batch, method):
+    """Tensor color correction of NHWC uint8 batch on its own device, same math as per-image wavelet and adain."""
+    gen = batch.permute(0, 3, 1, 2).float() / 255.0
+    refs = []
+    for i, correction in enumerate(corrections):
+        if isinstance(correction, ColorCorrectionRef):
+            refs.append(_color_reference(correction.image, gen.shape[2:], device=batch.device))
+        else:
+            refs.append(gen[i:i + 1]) # no reference image, same as per-image path using the image itself
+    log.debug(f"Applying color correction: method={method} batch={list(batch.shape)}")
+    result = tensor_corrections[method](torch.cat(refs), gen)
+    return (result * 255).to(torch.uint8).permute(0, 2, 3, 1)
+
+
 def apply_overlay(image: Image.Image, paste_loc, index, overlays):
     if overlays is None or index >= len(overlays):
         return image
@@ -338,6 +364,8 @@ def validate_sample(tensor):
     else:
         log.warning(f'Decode: type={type(tensor)} unknown sample')
         return tensor
+    if sample.dtype == np.uint8: # already quantized by validate_samples
+        return sample
     sample = 255.0 * sample
     with warnings.catch_warnings(record=True) as w:
         cast = sample.astype(np.uint8)
@@ -345,17 +373,36 @@ def validate_sample(tensor):
         nans = np.isnan(sample).sum()
         cast = np.nan_to_num(sample)
         cast = cast.astype(np.uint8)
-        vae = shared.sd_model.vae.dtype if hasattr(shared.sd_model, 'vae') else None
-        upcast = getattr(shared.sd_model.vae.config, 'force_upcast', None) if hasattr(shared.sd_model, 'vae') and hasattr(shared.sd_model.vae, 'config') else None
-        log.error(f'Decode: sample={sample.shape} invalid={nans} dtype={dtype} vae={vae} upcast={upcast} failed to validate')
-        if upcast is not None and not upcast:
-            setattr(shared.sd_model.vae.config, 'force_upcast', True) # noqa: B010
-            log.info('Decode: set upcast=True and attempt to retry operation')
+        invalid_sample(sample.shape, nans, dtype)
+    t1 = time.time()
+    timer.process.add('validate', t1 - t0)
+    return cast
+
+
+def validate_samples(tensor):
+    """Batched validate_sample on the decode device: NCHW tensor in 0..1 range to NHWC uint8 tensor, quantized the same way."""
+    t0 = time.time()
+    sample = 255.0 * tensor.float()
+    nans = torch.isnan(sample)
+    invalid = int(nans.sum().item())
+    if invalid > 0:
+        sample = sample.masked_fill(nans, 0)
+        invalid_sample(tuple(sample.shape), invalid, tensor.dtype)
+    cast = sample.to(torch.uint8).permute(0, 2, 3, 1)
     t1 = time.time()
     timer.process.add('validate', t1 - t0)
     return cast
 
 
+def invalid_sample(shape, nans, dtype):
+    vae = shared.sd_model.vae.dtype if hasattr(shared.sd_model, 'vae') else None
+    upcast = getattr(shared.sd_model.vae.config, 'force_upcast', None) if hasattr(shared.sd_model, 'vae') and hasattr(shared.sd_model.vae, 'config') else None
+    log.error(f'Decode: sample={shape} invalid={nans} dtype={dtype} vae={vae} upcast={upcast} failed to validate')
+    if upcast is not None and not upcast:
+        setattr(shared.sd_model.vae.config, 'force_upcast', True) # noqa: B010
+        log.info('Decode: set upcast=True and attempt to retry operation')
+
+
 def decode_images(image):
     if isinstance(image, list):
         decoded = []
@@ -4,7 +4,7 @@ import numpy as np
 import torch
 from modules import shared, devices, errors, sd_models, sd_models_utils, sd_vae
 from modules.logger import log
-from modules.vae import sd_vae_taesd
+from modules.vae import sd_vae_taesd, sd_vae_tiling
 
 
 debug = os.environ.get('SD_VAE_DEBUG', None) is not None
@@ -149,14 +149,18 @@ def full_vae_decode(latents, model):
         latents = latents.to(model.vae.dtype)
 
     log_debug(f'VAE config: {model.vae.config}')
+    decode_plan = sd_vae_tiling.plan_decode(model.vae, latents)
     try:
         with devices.inference_context():
             decoded = model.vae.decode(latents, return_dict=False)[0]
+        sd_vae_tiling.measure(decode_plan)
     except Exception as e:
         log.error(f'VAE decode: {e}')
         if 'out of memory' not in str(e) and 'no data' not in str(e):
             errors.display(e, 'VAE decode')
         decoded = []
+    finally:
+        sd_vae_tiling.restore(model.vae, decode_plan)
 
     if hasattr(model.vae, "orig_dtype"):
         model.vae = model.vae.to(dtype=model.vae.orig_dtype)
@@ -177,7 +181,7 @@ def full_vae_decode(latents, model):
         log_debug(f'VAE memory: {shared.mem_mon.read()}')
     vae_name = os.path.splitext(os.path.basename(sd_vae.loaded_vae_file))[0] if sd_vae.loaded_vae_file is not None else "default"
     vae_scale_factor = sd_vae.get_vae_scale_factor(model)
-    log.debug(f'Decode: vae="{vae_name}" scale={vae_scale_factor} upcast={upcast} slicing={getattr(model.vae, "use_slicing", None)} tiling={getattr(model.vae, "use_tiling", None)} latents={list(latents.shape)}:{latents.device} dtype={latents.dtype} time={t1-t0:.3f}')
+    log.debug(f'Decode: vae="{vae_name}" scale={vae_scale_factor} upcast={upcast} slicing={getattr(model.vae, "use_slicing", None)} tiling={getattr(model.vae, "use_tiling", None)} tiles={decode_plan.tiles if decode_plan is not None else None} latents={list(latents.shape)}:{latents.device} dtype={latents.dtype} time={t1-t0:.3f}')
     return decoded
 
 
@@ -219,9 +223,7 @@ def taesd_vae_decode(latents):
     if len(latents) == 0:
         return []
     if len(latents) > 1:
-        decoded = torch.zeros((len(latents), 3, latents.shape[2] * 8, latents.shape[3] * 8), dtype=devices.dtype_vae, device=devices.device)
-        for i in range(latents.shape[0]):
-            decoded[i] = sd_vae_taesd.decode(latents[i])
+        decoded = sd_vae_taesd.decode(latents, batch=True)
     else:
         decoded = sd_vae_taesd.decode(latents)
     t1 = time.time()
@@ -237,6 +239,8 @@ def taesd_vae_encode(image):
 
 def vae_postprocess(tensor, model, output_type='np'):
     images = []
+    quantize = output_type == 'uint8' # batched uint8 tensor left on decode device, other paths fall back to numpy
+    output_type = 'np' if quantize else output_type
     try:
         if isinstance(tensor, list) and len(tensor) > 0 and torch.is_tensor(tensor[0]):
             tensor = torch.stack(tensor)
@@ -257,6 +261,9 @@ def vae_postprocess(tensor, model, output_type='np'):
                 if tensor.ndim == 5 and tensor.shape[1] == 3: # Qwen Image
                     tensor = tensor[:, :, 0]
                 try:
+                    if quantize and tensor.ndim == 4:
+                        from modules.processing_helpers import validate_samples
+                        return validate_samples(model.image_processor.postprocess(tensor, output_type='pt'))
                     images = model.image_processor.postprocess(tensor, output_type=output_type)
                 except Exception as e:
                     log.warning(f'VAE postprocess: type=image {e}')
@@ -344,7 +351,7 @@ def vae_decode(latents, model, output_type='np', vae_type='Full', width=None, he
     if shared.cmd_opts.profile or debug:
         t1 = time.time()
         log.debug(f'Profile: VAE decode: {t1-t0:.2f}')
-    devices.torch_gc()
+    sd_vae_tiling.collect()
     shared.state.end(jobid)
     return images
 
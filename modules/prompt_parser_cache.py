@@ -0,0 +1,184 @@
+"""Disk tier for encoded prompts, used after in-memory prompt cache misses.
+
+Each encoded positive/negative pair is stored as a safetensors file named by a key over text encoder identity, prompt text,
+clip skip, parser settings, active text encoder networks and textual inversions used by the prompt.
+Text encoder identity combines checkpoint hash or file stat, text encoder override and parameter layout, so it survives restarts.
+Reads are memory-mapped, file mtime is the LRU clock and oldest files are removed once total size exceeds the configured limit.
+When every prompt of a job is found on disk the text encoder is never called, so with offload enabled it is not moved to gpu either.
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from modules import shared, devices, paths, metrics
+from modules.logger import log
+
+
+debug = log.trace if os.environ.get('SD_PROMPT_DEBUG', None) else lambda *args, **kwargs: None
+cache_version = 1
+fields = ['prompt_embed', 'positive_pooled', 'prompt_attention_mask', 'negative_embed', 'negative_pooled', 'negative_prompt_attention_mask']
+text_encoders = ['text_encoder', 'text_encoder_2', 'text_encoder_3', 'text_encoder_4']
+lock = threading.Lock()
+index: OrderedDict | None = None # key -> file size, least recently used first
+total = 0
+
+
+def enabled() -> bool:
+    return shared.opts.sd_textencoder_disk_cache > 0
+
+
+def folder() -> str:
+    return os.path.join(paths.data_path, 'data', 'te-cache')
+
+
+def filename(key: str) -> str:
+    return os.path.join(folder(), f'{key}.safetensors')
+
+
+def te_signature(pipe) -> str:
+    """Identity of text encoder weights, cached on pipe until one of its text encoders is replaced."""
+    modules = [getattr(pipe, name, None) for name in text_encoders]
+    ids = tuple(id(module) for module in modules)
+    cached = getattr(pipe, 'te_signature', None)
+    if cached is not None and cached[0] == ids:
+        return cached[1]
+    h = hashlib.sha256()
+    info = getattr(pipe, 'sd_checkpoint_info', None) or getattr(shared.sd_model, 'sd_checkpoint_info', None)
+    identity = (getattr(info, 'sha256', None) or getattr(info, 'hash', None)) if info is not None else None
+    if identity is None and info is not None and os.path.exists(getattr(info, 'filename', '')):
+        stat = os.stat(info.filename)
+        identity = f'{info.filename}:{stat.st_size}:{stat.st_mtime}'
+    h.update(f'{identity}:{shared.opts.sd_text_encoder}'.encode('utf-8'))
+    for name, module in zip(text_encoders, modules, strict=True):
+        if module is None:
+            continue
+        h.update(f'{name}:{module.__class__.__name__}'.encode('utf-8'))
+        for param_name, param in module.named_parameters():
+            h.update(f'{param_name}:{tuple(param.shape)}:{param.dtype}'.encode('utf-8'))
+    signature = h.hexdigest()[:16]
+    try:
+        pipe.te_signature = (ids, signature)
+    except Exception:
+        pass
+    return signature
+
+
+def embeddings_key(prompts: list[str]) -> list:
+    """Textual inversions referenced by prompts, their vectors are part of the encoded result."""
+    db = getattr(shared.sd_model, 'embedding_db', None)
+    if db is None:
+        return []
+    text = ' '.join(prompts)
+    return sorted((name, getattr(embedding, 'filename', None)) for name, embedding in db.word_embeddings.items() if name in text)
+
+
+def make_key(pipe, positive: str, negative: str, embedder) -> str:
+    values = [
+        cache_version,
+        te_signature(pipe),
+        pipe.__class__.__name__,
+        positive,
+        negative,
+        embedder.clip_skip,
+        embedder.prompt_attention_value,
+        embedder.prompt_mean_norm,
+        embedder.diffusers_zeros_prompt_pad,
+        embedder.te_pooled_embeds,
+        shared.opts.sd_textencder_linebreak,
+        embedder.network_key,
+        embeddings_key([positive, negative]),
+    ]
+    return hashlib.sha256(json.dumps(values, default=str).encode('utf-8')).hexdigest()
+
+
+def load_index() -> OrderedDict:
+    global index, total # pylint: disable=global-statement
+    if index is not None:
+        return index
+    entries = []
+    if os.path.isdir(folder()):
+        for entry in os.scandir(folder()):
+            if entry.is_file() and entry.name.endswith('.safetensors'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-len('.safetensors')], stat.st_size))
+    index = OrderedDict((key, size) for _mtime, key, size in sorted(entries))
+    total = sum(index.values())
+    debug(f'Prompt disk cache: folder="{folder()}" entries={len(index)} size={total}')
+    return index
+
+
+def evict(limit: int) -> None:
+    global total # pylint: disable=global-statement
+    while total > limit and len(index) > 0:
+        key, size = index.popitem(last=False)
+        total -= size
+        try:
+            os.remove(filename(key))
+        except OSError:
+            pass
+        debug(f'Prompt disk cache: evict={key}')
+
+
+def get(key: str) -> dict | None:
+    """Encoded values for key moved to compute device, None on miss."""
+    global total # pylint: disable=global-statement
+    from safetensors import safe_open
+    with lock:
+        hit = key in load_index()
+        if hit:
+            index.move_to_end(key)
+    metrics.cache('prompt-disk', hit)
+    if not hit:
+        return None
+    fn = filename(key)
+    try:
+        values = dict.fromkeys(fields)
+        with safe_open(fn, framework='pt', device='cpu') as f: # memory-mapped, only stored tensors are read
+            for name in f.keys():
+                values[name] = f.get_tensor(name).to(devices.device)
+        os.utime(fn) # mtime is lru clock across restarts
+        debug(f'Prompt disk cache: get={key}')
+        return values
+    except Exception as e:
+        log.warning(f'Prompt disk cache: file="{fn}" {e}')
+        with lock:
+            total -= index.pop(key, 0)
+        return None
+
+
+def put(key: str, values: list) -> None:
+    """Store encoded values, only plain tensor outputs can be cached."""
+    import torch
+    from safetensors.torch import save_file
+    if not all(value is None or torch.is_tensor(value) for value in values):
+        return
+    tensors = {name: value.detach().to('cpu').contiguous() for name, value in zip(fields, values, strict=True) if value is not None}
+    if len(tensors) == 0:
+        return
+    fn = filename(key)
+    try:
+        os.makedirs(folder(), exist_ok=True)
+        save_file(tensors, fn + '.tmp', metadata={'version': str(cache_version)})
+        os.replace(fn + '.tmp', fn)
+        size = os.path.getsize(fn)
+    except Exception as e:
+        log.warning(f'Prompt disk cache: file="{fn}" {e}')
+        return
+    global total # pylint: disable=global-statement
+    with lock:
+        load_index()
+        total += size - index.get(key, 0)
+        index[key] = size
+        index.move_to_end(key)
+        evict(int(shared.opts.sd_textencoder_disk_cache * 1024 * 1024))
+    debug(f'Prompt disk cache: put={key} size={size}')
+
+
+def clear() -> None:
+    global index, total # pylint: disable=global-statement
+    with lock:
+        load_index()
+        evict(0)
+        index = None
+        total = 0
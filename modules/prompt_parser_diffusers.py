@@ -5,7 +5,7 @@ from collections import OrderedDict
 import torch
 from compel.embeddings_provider import BaseTextualInversionManager, EmbeddingsProvider
 from transformers import PreTrainedTokenizer
-from modules import shared, prompt_parser, devices, sd_models
+from modules import shared, prompt_parser, prompt_parser_cache, devices, sd_models, metrics
 from modules.logger import log
 from modules.prompt_parser_xhinker import get_weighted_text_embeddings_sd15, get_weighted_text_embeddings_sdxl_2p, get_weighted_text_embeddings_sd3, get_weighted_text_embeddings_flux1, get_weighted_text_embeddings_chroma
 
@@ -83,6 +83,7 @@ class PromptEmbedder:
         self.scheduled_prompt = False
         if hasattr(p, 'dummy'):
             return
+        self.network_key = [idx.items for item in getattr(p, 'network_data', {}).values() for idx in item] # te lora changes encoded result
         earlyout = self.checkcache(p)
         if earlyout:
             return
@@ -90,6 +91,9 @@ class PromptEmbedder:
         if self.pipe is None:
             log.error("Prompt encode: cannot find text encoder in model")
             return
+        embedding_db = getattr(shared.sd_model, 'embedding_db', None)
+        if embedding_db is not None:
+            embedding_db.activate(self.prompts + self.negative_prompts)
         seen_prompts = {}
         # per prompt in batch
         for batchidx, (prompt, negative_prompt) in enumerate(zip(self.prompts, self.negative_prompts, strict=False)):
@@ -140,6 +144,7 @@ class PromptEmbedder:
                                                 self.negative_pooleds,
                                                 self.prompt_attention_masks,
                                                 self.negative_prompt_attention_masks]):
+                metrics.cache('prompt', False)
                 return False
             else:
                 cache[key] = {'prompt_embeds': self.prompt_embeds,
@@ -164,6 +169,7 @@ class PromptEmbedder:
                 self.prompt_attention_masks = [self.prompt_attention_masks[0]] * self.batchsize
                 self.negative_prompt_attention_masks = [self.negative_prompt_attention_masks[0]] * self.batchsize
             debug(f"Prompt cache: get={key}")
+            metrics.cache('prompt', True)
             return True
 
     def compare_prompts(self):
@@ -214,7 +220,18 @@ class PromptEmbedder:
         global last_attention # pylint: disable=global-statement
         self.attention = self.prompt_attention_value
         last_attention = self.attention
-        if self.attention == "xhinker":
+        disk_key = prompt_parser_cache.make_key(pipe, positive_prompt, negative_prompt, self) if prompt_parser_cache.enabled() else None
+        cached = prompt_parser_cache.get(disk_key) if disk_key is not None else None
+        if cached is not None: # text encoder is not used so it stays offloaded
+            (
+                prompt_embed,
+                positive_pooled,
+                prompt_attention_mask,
+                negative_embed,
+                negative_pooled,
+                negative_prompt_attention_mask
+            ) = [cached[name] for name in prompt_parser_cache.fields]
+        elif self.attention == "xhinker":
             (
                 prompt_embed,
                 positive_pooled,
@@ -233,6 +250,8 @@ class PromptEmbedder:
                 negative_prompt_attention_mask
             ) = get_weighted_text_embeddings(pipe, positive_prompt, negative_prompt, self.clip_skip,
                                              prompt_mean_norm=self.prompt_mean_norm, diffusers_zeros_prompt_pad=self.diffusers_zeros_prompt_pad, te_pooled_embeds=self.te_pooled_embeds)
+        if disk_key is not None and cached is None:
+            prompt_parser_cache.put(disk_key, [prompt_embed, positive_pooled, prompt_attention_mask, negative_embed, negative_pooled, negative_prompt_attention_mask])
         def _store(target, value):
             if value is None:
                 return
@@ -22,6 +22,7 @@ if TYPE_CHECKING:
 AlwaysVisible = object()
 time_component = {}
 time_setup = {}
+time_hooks = {}
 debug = log.trace if os.environ.get('SD_SCRIPT_DEBUG', None) is not None else lambda *args, **kwargs: None
 
 
@@ -53,6 +54,7 @@ class Script:
     is_txt2img = False
     is_img2img = False
     api_info: ItemScript | None = None
+    api_defaults: list | None = None # default values of script controls, used to build api script args without calling ui again
     group = None
     infotext_fields: list | None = None
     paste_field_names: list[str] | None = None
@@ -238,6 +240,132 @@ class ScriptClassData(NamedTuple):
 
 scripts_data = []
 postprocessing_scripts_data = []
+manifest_filename = os.path.join(paths.data_path, "data", "scripts.json")
+manifest: dict[str, dict] = {}
+lazy_modules: dict[str, ModuleType] = {}
+script_hooks = ['setup', 'before_process', 'process', 'process_images', 'before_process_batch', 'process_batch', 'postprocess_batch', 'postprocess_batch_list', 'postprocess_image', 'postprocess', 'before_component', 'after_component', 'after']
+lazy_hooks = ['after'] # hooks a deferred script may define, only called after run() has already imported it
+
+
+def overrides(script_class: type, name: str) -> bool:
+    return getattr(script_class, name, None) is not getattr(Script, name, None)
+
+
+class LazyScript(Script):
+    """Selectable script registered from the scripts manifest; its module is imported on first ui() or run() call,
+    at which point the instance is converted in-place to the real script class so runner references stay valid.
+    """
+    lazy_file: ScriptFile = None
+    lazy_class: str = ''
+    lazy_title: str = ''
+    lazy_show: list[bool] = [False, False]
+
+    def title(self):
+        return self.lazy_title
+
+    def show(self, is_img2img):
+        return self.lazy_show[1 if is_img2img else 0]
+
+    def materialize(self):
+        path = self.lazy_file.path
+        module = lazy_modules.get(path, None)
+        if module is None:
+            t0 = time.time()
+            module = import_script(self.lazy_file)
+            lazy_modules[path] = module
+            log.debug(f'Script load: file="{path}" deferred time={time.time()-t0:.2f}')
+        script_class = module.__dict__.get(self.lazy_class, None)
+        if type(script_class) != type or not issubclass(script_class, Script):
+            raise RuntimeError(f'Script load: file="{path}" class={self.lazy_class} not found')
+        state = dict(vars(self)) # attributes assigned by the runner
+        self.__class__ = script_class
+        script_class.__init__(self)
+        self.__dict__.update(state)
+
+    def ui(self, is_img2img):
+        self.materialize()
+        return self.ui(is_img2img)
+
+    def run(self, p: StableDiffusionProcessing, *args):
+        self.materialize()
+        return self.run(p, *args)
+
+
+def lazy_script_class(scriptfile: ScriptFile, item: dict) -> type[LazyScript]:
+    return type(item['name'], (LazyScript,), {'lazy_file': scriptfile, 'lazy_class': item['name'], 'lazy_title': item['title'], 'lazy_show': item['show']})
+
+
+def load_manifest():
+    from modules.json_helpers import readfile
+    manifest.clear()
+    if os.path.isfile(manifest_filename):
+        manifest.update(readfile(manifest_filename, silent=True, as_type="dict"))
+
+
+def save_manifest():
+    from modules.json_helpers import writefile
+    try:
+        writefile(manifest, manifest_filename, silent=True)
+    except Exception as e:
+        log.error(f'Scripts manifest: file="{manifest_filename}" {e}')
+
+
+def manifest_valid(entry: dict | None, path: str) -> bool:
+    if entry is None:
+        return False
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return entry.get('mtime', None) == stat.st_mtime and entry.get('size', None) == stat.st_size
+
+
+def manifest_lazy(entry: dict) -> bool:
+    classes = entry.get('classes', [])
+    if entry.get('callbacks', 0) > 0 or len(classes) == 0:
+        return False
+    for item in classes:
+        if item.get('type') != 'script' or item.get('title') is None or item.get('show') is None:
+            return False
+        if any(hook not in lazy_hooks for hook in item.get('hooks', [])):
+            return False
+    return True
+
+
+def manifest_entry(module: ModuleType, path: str, callbacks: int, elapsed: float) -> dict:
+    """Describe script classes of an imported module: titles, visibility and overridden hooks."""
+    classes = []
+    for name, script_class in module.__dict__.items():
+        if type(script_class) != type:
+            continue
+        if issubclass(script_class, Script):
+            item = { 'name': name, 'type': 'script', 'title': None, 'show': None, 'hooks': [hook for hook in script_hooks if overrides(script_class, hook)] }
+            try:
+                script = script_class()
+                title = script.title()
+                show = [script.show(False), script.show(True)]
+                if isinstance(title, str) and all(isinstance(v, bool) for v in show): # AlwaysVisible scripts are never deferred
+                    item['title'], item['show'] = title, show
+            except Exception:
+                pass
+            classes.append(item)
+        elif issubclass(script_class, scripts_postprocessing.ScriptPostprocessing):
+            classes.append({ 'name': name, 'type': 'postprocessing' })
+    stat = os.stat(path)
+    return { 'mtime': stat.st_mtime, 'size': stat.st_size, 'callbacks': callbacks, 'time': round(elapsed, 3), 'classes': classes }
+
+
+def import_script(scriptfile: ScriptFile) -> ModuleType:
+    global current_basedir # pylint: disable=global-statement
+    syspath = sys.path
+    try:
+        if scriptfile.basedir != paths.script_path:
+            sys.path = [scriptfile.basedir] + sys.path
+        current_basedir = scriptfile.basedir
+        return script_loading.load_module(scriptfile.path)
+    finally:
+        current_basedir = paths.script_path
+        sys.path = syspath
 
 
 def list_scripts(scriptdirname: str, extension: str):
@@ -286,15 +414,19 @@ def list_files_with_name(filename: str):
 
 
 def load_scripts():
+    from modules import shared
     t = timer.Timer()
     t0 = time.time()
-    global current_basedir # pylint: disable=global-statement
     scripts_data.clear()
     postprocessing_scripts_data.clear()
     script_callbacks.clear_callbacks()
+    lazy_modules.clear()
     scripts_list = list_scripts('scripts', '.py') + list_scripts(os.path.join('modules', 'face'), '.py')
     scripts_list = sorted(scripts_list, key=lambda item: item.priority + item.path.lower(), reverse=False)
-    syspath = sys.path
+    load_manifest()
+    lazy = shared.opts.extensions_lazy_load
+    changed = len(manifest) != len(scripts_list)
+    deferred = 0
 
     def register_scripts_from_module(module: ModuleType, scriptfile):
         for script_class in module.__dict__.values():
@@ -307,18 +439,32 @@ def load_scripts():
                 postprocessing_scripts_data.append(ScriptClassData(script_class, scriptfile.path, scriptfile.basedir, module))
 
     for scriptfile in scripts_list:
+        entry = manifest.get(scriptfile.path, None)
+        valid = manifest_valid(entry, scriptfile.path)
+        if lazy and valid and manifest_lazy(entry):
+            for item in entry['classes']:
+                scripts_data.append(ScriptClassData(lazy_script_class(scriptfile, item), scriptfile.path, scriptfile.basedir, None))
+            deferred += 1
+            continue
         try:
-            if scriptfile.basedir != paths.script_path:
-                sys.path = [scriptfile.basedir] + sys.path
-            current_basedir = scriptfile.basedir
-            script_module = script_loading.load_module(scriptfile.path)
+            callbacks = sum(len(v) for v in script_callbacks.callback_map.values())
+            t1 = time.time()
+            script_module = import_script(scriptfile)
             register_scripts_from_module(script_module, scriptfile)
+            if not valid:
+                manifest[scriptfile.path] = manifest_entry(script_module, scriptfile.path, sum(len(v) for v in script_callbacks.callback_map.values()) - callbacks, time.time() - t1)
+                changed = True
         except Exception as e:
             errors.display(e, f'Load script: {scriptfile.filename}')
         finally:
-            current_basedir = paths.script_path
-            t.record(os.path.basename(scriptfile.basedir) if scriptfile.basedir != paths.script_path else scriptfile.filename)
-            sys.path = syspath
+            t.record(f'{os.path.basename(scriptfile.basedir)}/{scriptfile.filename}' if scriptfile.basedir != paths.script_path else scriptfile.filename)
+
+    if changed:
+        current = {scriptfile.path for scriptfile in scripts_list}
+        for path in [path for path in manifest if path not in current]:
+            del manifest[path]
+        save_manifest()
+    log.debug(f'Scripts: total={len(scripts_list)} loaded={len(scripts_list) - deferred} deferred={deferred} manifest="{manifest_filename}"')
 
     global scripts_txt2img, scripts_img2img, scripts_control, scripts_postproc # pylint: disable=global-statement
     scripts_txt2img = ScriptRunner('txt2img')
@@ -350,6 +496,7 @@ class ScriptSummary:
         self.update = now
 
     def report(self):
+        time_hooks[self.op] = time_hooks.get(self.op, 0) + (time.time() - self.start)
         total = sum(self.time.values())
         if total == 0:
             return
@@ -372,6 +519,8 @@ class ScriptRunner:
         self.is_img2img = False
         self.inputs: list = [None]
         self.time = 0
+        self.hook_tables: dict[str, list[tuple[Script, str]]] = {}
+        self.args_cache: tuple | None = None
 
     def add_script(self, script_class, path, is_img2img, is_control):
         try:
@@ -418,6 +567,8 @@ class ScriptRunner:
         self.paste_field_names.clear()
         self.script_load_ctr = 0
         self.is_img2img = is_img2img
+        self.hook_tables.clear()
+        self.args_cache = None
         self.scripts.clear()
         self.alwayson_scripts.clear()
         self.selectable_scripts.clear()
@@ -485,6 +636,7 @@ class ScriptRunner:
                 self.infotext_fields += script.infotext_fields
             if script.paste_field_names is not None:
                 self.paste_field_names += script.paste_field_names
+            script.api_defaults = [getattr(control, 'value', None) for control in controls]
             inputs += controls
             inputs_alwayson += [script.alwayson for _ in controls]
             script.args_to = len(inputs)
@@ -596,8 +748,31 @@ class ScriptRunner:
 
         self.infotext_fields.append((dropdown, lambda x: gr.update(value=x.get('Script', 'None'))))
         self.infotext_fields.extend([(script.group, onload_script_visibility) for script in self.selectable_scripts if script.group is not None])
+        self.hook_tables.clear() # args ranges are assigned during ui setup
+        self.args_cache = None
         return inputs
 
+    def setup_api(self):
+        """Assign script args ranges for api requests without building the ui.
+        Deferred scripts are not imported here, they get an empty range at the end which is assigned once a request selects them.
+        """
+        inputs = [None]
+        deferred = []
+        with gr.Blocks(): # script ui functions require a blocks context
+            for script in self.alwayson_scripts + self.selectable_scripts:
+                if isinstance(script, LazyScript):
+                    deferred.append(script)
+                    continue
+                script.args_from = len(inputs)
+                controls = wrap_call(script.ui, script.filename, "ui", script.is_img2img) or []
+                script.api_defaults = [getattr(control, 'value', None) for control in controls]
+                inputs += controls
+                script.args_to = len(inputs)
+        for script in deferred:
+            script.args_from = script.args_to = len(inputs)
+        self.hook_tables.clear()
+        self.args_cache = None
+
     def run(self, p: StableDiffusionProcessing, *args) -> Processed | None:
         s = ScriptSummary('run')
         script_index = args[0] if len(args) > 0 else 0
@@ -641,116 +816,145 @@ class ScriptRunner:
         s.report()
         return processed
 
+    def dispatch(self, hook: str) -> list[tuple[Script, str]]:
+        """Return (script, title) for always-on scripts that override the hook and have ui args, cached per hook."""
+        table = self.hook_tables.get(hook, None)
+        if table is None:
+            table = [(script, script.title()) for script in self.alwayson_scripts if overrides(type(script), hook) and (script.args_to > 0) and (script.args_to >= script.args_from)]
+            self.hook_tables[hook] = table
+            debug(f'Script dispatch: runner={self.name} hook={hook} scripts={[title for _script, title in table]}')
+        return table
+
+    def get_args(self, p: StableDiffusionProcessing, script: Script, title: str):
+        """Script args slice for current job, cached until p.script_args or p.per_script_args are replaced."""
+        if self.args_cache is None or self.args_cache[0] is not p.script_args or self.args_cache[1] is not p.per_script_args:
+            self.args_cache = (p.script_args, p.per_script_args, {})
+        slices = self.args_cache[2]
+        args = slices.get(id(script), None)
+        if args is None:
+            args = p.per_script_args.get(title, p.script_args[script.args_from:script.args_to])
+            slices[id(script)] = args
+        return args
+
     def before_process(self, p: StableDiffusionProcessing, **kwargs):
+        table = self.dispatch('before_process')
+        if len(table) == 0:
+            return
         s = ScriptSummary('before-process')
-        for script in self.alwayson_scripts:
+        for script, title in table:
             try:
-                if hasattr(script, 'args_to') and hasattr(script, 'args_from') and (script.args_to > 0) and (script.args_to >= script.args_from):
-                    args = p.per_script_args.get(script.title(), p.script_args[script.args_from:script.args_to])
-                    script.before_process(p, *args, **kwargs)
+                script.before_process(p, *self.get_args(p, script, title), **kwargs)
             except Exception as e:
                 errors.display(e, f"Error running before process: {script.filename}")
-            s.record(script.title())
+            s.record(title)
         s.report()
 
     def process(self, p: StableDiffusionProcessing, **kwargs):
+        table = self.dispatch('process')
+        if len(table) == 0:
+            return
         s = ScriptSummary('process')
-        for script in self.alwayson_scripts:
+        for script, title in table:
             try:
-                if hasattr(script, 'args_to') and hasattr(script, 'args_from') and (script.args_to > 0) and (script.args_to >= script.args_from):
-                    args = p.per_script_args.get(script.title(), p.script_args[script.args_from:script.args_to])
-                    script.process(p, *args, **kwargs)
+                script.process(p, *self.get_args(p, script, title), **kwargs)
             except Exception as e:
                 errors.display(e, f'Running script process: {script.filename}')
-            s.record(script.title())
+            s.record(title)
         s.report()
 
     def process_images(self, p: StableDiffusionProcessing, **kwargs):
+        table = self.dispatch('process_images')
+        if len(table) == 0:
+            return None
         s = ScriptSummary('process_images')
         processed = None
-        for script in self.alwayson_scripts:
+        for script, title in table:
             try:
-                if hasattr(script, 'args_to') and hasattr(script, 'args_from') and (script.args_to > 0) and (script.args_to >= script.args_from):
-                    args = p.per_script_args.get(script.title(), p.script_args[script.args_from:script.args_to])
-                    _processed = script.process_images(p, *args, **kwargs)
-                    if _processed is not None:
-                        processed = _processed
+                _processed = script.process_images(p, *self.get_args(p, script, title), **kwargs)
+                if _processed is not None:
+                    processed = _processed
             except Exception as e:
                 errors.display(e, f'Running script process images: {script.filename}')
-            s.record(script.title())
+            s.record(title)
         s.report()
         return processed
 
     def before_process_batch(self, p: StableDiffusionProcessing, **kwargs):
+        table = self.dispatch('before_process_batch')
+        if len(table) == 0:
+            return
         s = ScriptSummary('before-process-batch')
-        for script in self.alwayson_scripts:
+        for script, title in table:
             try:
-                if hasattr(script, 'args_to') and hasattr(script, 'args_from') and (script.args_to > 0) and (script.args_to >= script.args_from):
-                    args = p.per_script_args.get(script.title(), p.script_args[script.args_from:script.args_to])
-                    script.before_process_batch(p, *args, **kwargs)
+                script.before_process_batch(p, *self.get_args(p, script, title), **kwargs)
             except Exception as e:
                 errors.display(e, f'Running script before process batch: {script.filename}')
-            s.record(script.title())
+            s.record(title)
         s.report()
 
     def process_batch(self, p: StableDiffusionProcessing, **kwargs):
+        table = self.dispatch('process_batch')
+        if len(table) == 0:
+            return
         s = ScriptSummary('process-batch')
-        for script in self.alwayson_scripts:
+        for script, title in table:
             try:
-                if hasattr(script, 'args_to') and hasattr(script, 'args_from') and (script.args_to > 0) and (script.args_to >= script.args_from):
-                    args = p.per_script_args.get(script.title(), p.script_args[script.args_from:script.args_to])
-                    script.process_batch(p, *args, **kwargs)
+                script.process_batch(p, *self.get_args(p, script, title), **kwargs)
             except Exception as e:
                 errors.display(e, f'Running script process batch: {script.filename}')
-            s.record(script.title())
+            s.record(title)
         s.report()
 
     def postprocess(self, p: StableDiffusionProcessing, processed):
+        table = self.dispatch('postprocess')
+        if len(table) == 0:
+            return
         s = ScriptSummary('postprocess')
-        for script in self.alwayson_scripts:
+        for script, title in table:
             try:
-                if hasattr(script, 'args_to') and hasattr(script, 'args_from') and (script.args_to > 0) and (script.args_to >= script.args_from):
-                    args = p.per_script_args.get(script.title(), p.script_args[script.args_from:script.args_to])
-                    script.postprocess(p, processed, *args)
+                script.postprocess(p, processed, *self.get_args(p, script, title))
             except Exception as e:
                 errors.display(e, f'Running script postprocess: {script.filename}')
-            s.record(script.title())
+            s.record(title)
         s.report()
 
     def postprocess_batch(self, p: StableDiffusionProcessing, images, **kwargs):
+        table = self.dispatch('postprocess_batch')
+        if len(table) == 0:
+            return
         s = ScriptSummary('postprocess-batch')
-        for script in self.alwayson_scripts:
+        for script, title in table:
             try:
-                if hasattr(script, 'args_to') and hasattr(script, 'args_from') and (script.args_to > 0) and (script.args_to >= script.args_from):
-                    args = p.per_script_args.get(script.title(), p.script_args[script.args_from:script.args_to])
-                    script.postprocess_batch(p, *args, images=images, **kwargs)
+                script.postprocess_batch(p, *self.get_args(p, script, title), images=images, **kwargs)
             except Exception as e:
                 errors.display(e, f'Running script before postprocess batch: {script.filename}')
-            s.record(script.title())
+            s.record(title)
         s.report()
 
     def postprocess_batch_list(self, p: StableDiffusionProcessing, pp: PostprocessBatchListArgs, **kwargs):
+        table = self.dispatch('postprocess_batch_list')
+        if len(table) == 0:
+            return
         s = ScriptSummary('postprocess-batch-list')
-        for script in self.alwayson_scripts:
+        for script, title in table:
             try:
-                if hasattr(script, 'args_to') and hasattr(script, 'args_from') and (script.args_to > 0) and (script.args_to >= script.args_from):
-                    args = p.per_script_args.get(script.title(), p.script_args[script.args_from:script.args_to])
-                    script.postprocess_batch_list(p, pp, *args, **kwargs)
+                script.postprocess_batch_list(p, pp, *self.get_args(p, script, title), **kwargs)
             except Exception as e:
                 errors.display(e, f'Running script before postprocess batch list: {script.filename}')
-            s.record(script.title())
+            s.record(title)
         s.report()
 
     def postprocess_image(self, p: StableDiffusionProcessing, pp: PostprocessImageArgs):
+        table = self.dispatch('postprocess_image')
+        if len(table) == 0:
+            return
         s = ScriptSummary('postprocess-image')
-        for script in self.alwayson_scripts:
+        for script, title in table:
             try:
-                if hasattr(script, 'args_to') and hasattr(script, 'args_from') and (script.args_to > 0) and (script.args_to >= script.args_from):
-                    args = p.per_script_args.get(script.title(), p.script_args[script.args_from:script.args_to])
-                    script.postprocess_image(p, pp, *args)
+                script.postprocess_image(p, pp, *self.get_args(p, script, title))
             except Exception as e:
                 errors.display(e, f'Running script postprocess image: {script.filename}')
-            s.record(script.title())
+            s.record(title)
         s.report()
 
     def before_component(self, component: IOComponent, **kwargs):
@@ -811,6 +1015,8 @@ class ScriptRunner:
                         self.scripts[si].args_from = args_from
                         self.scripts[si].args_to = args_to
                 s.record(script.title())
+        self.hook_tables.clear()
+        self.args_cache = None
         s.report()
 
 
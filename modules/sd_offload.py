@@ -9,7 +9,7 @@ import torch
 import accelerate.hooks
 import accelerate.utils.modeling
 from modules.logger import log
-from modules import shared, devices, errors, model_quant, sd_models, sd_offload_aux
+from modules import shared, devices, errors, model_quant, sd_models, sd_offload_aux, sd_offload_prefetch
 from modules.timer import process as process_timer
 
 
@@ -236,10 +236,36 @@ class OffloadHook(accelerate.hooks.ModelHook):
             return False
         return True
 
+    def get_modules(self) -> dict[str, torch.nn.Module]:
+        modules = {}
+        for pipe in get_pipe_variants():
+            for module_name in get_module_names(pipe):
+                module_instance = getattr(pipe, module_name, None)
+                if module_instance is not None:
+                    modules.setdefault(module_name, module_instance)
+        return modules
+
+    def prefetch_plan(self, name: str) -> sd_offload_prefetch.Plan | None:
+        """Advance recorded module schedule and plan evictions and prefetches, None until schedule is recorded."""
+        if shared.opts.diffusers_offload_prefetch <= 0 or not shared.opts.diffusers_offload_pre or devices.backend != 'cuda':
+            return None
+        schedule = sd_offload_prefetch.get_schedule(self.checkpoint_name)
+        if not schedule.observe(name):
+            return None
+        modules = self.get_modules()
+        sizes = {module_name: self.offload_map.get(module_name, 0) for module_name in modules}
+        resident = {module_name: sizes[module_name] for module_name, module_instance in modules.items() if not devices.same_device(module_instance.device, devices.cpu)}
+        budget = shared.gpu_memory * shared.opts.diffusers_offload_max_gpu_memory
+        plan = schedule.plan(resident, sizes, budget, int(shared.opts.diffusers_offload_prefetch))
+        debug_move(f'Offload: type=prefetch op=plan module={name} keep={plan.keep} evict={plan.evict} prefetch={plan.prefetch}')
+        return plan
+
     def pre_forward(self, module, *args, **kwargs):
         _id = id(module)
+        name = getattr(module, "module_name", module.__class__.__name__)
 
         do_offload = (self.last_pre != _id) or (module.__class__.__name__ != self.last_cls)
+        plan = self.prefetch_plan(name) if do_offload else None
 
         if do_offload and self.offload_allowed(module): # offload every other module first time when new module starts pre-forward
             if shared.opts.diffusers_offload_pre:
@@ -250,13 +276,17 @@ class OffloadHook(accelerate.hooks.ModelHook):
                     for module_name in get_module_names(pipe):
                         module_instance = getattr(pipe, module_name, None)
                         module_cls = module_instance.__class__.__name__
+                        if (plan is not None) and (module_name not in plan.evict): # recorded schedule decides what stays resident
+                            continue
                         if (module_instance is not None) and (_id != id(module_instance)) and (module_cls not in self.offload_never) and (not devices.same_device(module_instance.device, devices.cpu)):
                             apply_balanced_offload_to_module(module_instance, op='pre')
                 self.last_cls = module.__class__.__name__
                 process_timer.add('offload', time.time() - t0)
 
+        sd_offload_prefetch.wait(name, module)
         if not devices.same_device(module.device, devices.device): # move-to-device
             t0 = time.time()
+            sd_offload_prefetch.settle(name)
             device_index = torch.device(devices.device).index
             if device_index is None:
                 device_index = 0
@@ -303,6 +333,14 @@ class OffloadHook(accelerate.hooks.ModelHook):
                     module_instance = getattr(pipe, module_name, None)
                     log.trace(f'Offload: type=balanced op=pre:status forward={module.__class__.__name__} module={module_name} class={module_instance.__class__.__name__} pipe={_i} device={module_instance.device} dtype={module_instance.dtype}')
 
+        if plan is not None and len(plan.prefetch) > 0: # copies run on prefetch stream while this module computes
+            t0 = time.time()
+            modules = self.get_modules()
+            for module_name in plan.prefetch:
+                if module_name in modules and modules[module_name].__class__.__name__ not in self.offload_never:
+                    sd_offload_prefetch.start(module_name, modules[module_name])
+            process_timer.add('prefetch', time.time() - t0)
+
         self.last_pre = _id
         return args, kwargs
 
@@ -422,6 +460,8 @@ def get_module_sizes(pipe=None, exclude=None):
 
 def move_module_to_cpu(module, op='unk', force:bool=False):
     def do_move(module):
+        if sd_offload_prefetch.stream is not None and sd_offload_prefetch.offload(getattr(module, "module_name", module.__class__.__name__), module):
+            return module # prefetched module is copied back into its pinned host buffers
         if shared.opts.diffusers_offload_streams:
             global move_stream # pylint: disable=global-statement
             if move_stream is None:
@@ -534,6 +574,7 @@ def apply_balanced_offload(sd_model=None, exclude: list[str] | None = None, forc
         return sd_model
 
     t0 = time.time()
+    sd_offload_prefetch.settle() # host tensors may still be receiving evicted weights
     cached = True
     checkpoint_name = sd_model.sd_checkpoint_info.name if getattr(sd_model, "sd_checkpoint_info", None) is not None else sd_model.__class__.__name__
     if force or (offload_hook_instance is None) or (offload_hook_instance.min_watermark != shared.opts.diffusers_offload_min_gpu_memory) or (offload_hook_instance.max_watermark != shared.opts.diffusers_offload_max_gpu_memory) or (checkpoint_name != offload_hook_instance.checkpoint_name):
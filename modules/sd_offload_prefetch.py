@@ -0,0 +1,209 @@
+"""Look-ahead prefetch for balanced offload.
+
+Module execution order is recorded the first time a model runs; the schedule is complete once execution wraps around to its first module.
+With a complete schedule each pre-forward plans which modules stay resident: current module, next modules in schedule while they fit
+into gpu budget, then other resident modules ordered by how soon they run again. Everything else is evicted.
+Modules planned ahead start copying on a separate stream from pinned host buffers while current module computes,
+eviction copies weights back into the same pinned buffers so later prefetches do not need to pin again.
+"""
+import os
+import itertools
+from dataclasses import dataclass, field
+from modules.logger import log
+
+
+debug = os.environ.get('SD_MOVE_DEBUG', None) is not None
+debug_move = log.trace if debug else lambda *args, **kwargs: None
+stream = None
+pending: dict[str, object] = {} # module name -> cuda event of in-flight prefetch
+evicting: dict[str, object] = {} # module name -> cuda event of in-flight eviction
+
+
+@dataclass
+class Plan:
+    current: str
+    keep: list[str] = field(default_factory=list)
+    evict: list[str] = field(default_factory=list)
+    prefetch: list[str] = field(default_factory=list)
+
+
+class Schedule:
+    """Recorded module execution order with position tracking; consecutive calls of same module count as one entry."""
+    def __init__(self, key: str = ''):
+        self.key = key
+        self.order: list[str] = []
+        self.complete = False
+        self.position = -1
+        self.misses = 0
+
+    def observe(self, name: str) -> bool:
+        """Advance schedule with module starting forward, returns True if schedule can be used for planning."""
+        if self.position >= 0 and self.order[self.position] == name:
+            return self.complete
+        if not self.complete:
+            if len(self.order) > 1 and name == self.order[0]: # execution wrapped around, first run is recorded
+                self.complete = True
+                self.position = 0
+                debug_move(f'Offload: type=prefetch op=schedule key={self.key} order={self.order}')
+                return True
+            self.order.append(name)
+            self.position = len(self.order) - 1
+            return False
+        following = self.order[self.position + 1:] + self.order[:self.position + 1]
+        if name in following: # expected module or skip ahead, e.g. refiner pass not used this time
+            self.position = (self.position + 1 + following.index(name)) % len(self.order)
+            return True
+        self.misses += 1 # module never seen before, learn again from here
+        debug_move(f'Offload: type=prefetch op=relearn key={self.key} module={name} order={self.order}')
+        self.order = [name]
+        self.position = 0
+        self.complete = False
+        return False
+
+    def upcoming(self, count: int) -> list[str]:
+        """Next distinct modules after current position, in execution order."""
+        if not self.complete or count <= 0:
+            return []
+        current = self.order[self.position]
+        result = []
+        for i in range(1, len(self.order)):
+            name = self.order[(self.position + i) % len(self.order)]
+            if name != current and name not in result:
+                result.append(name)
+                if len(result) >= count:
+                    break
+        return result
+
+    def distance(self, name: str) -> int:
+        """Number of schedule entries until module runs again, unknown modules are infinitely far."""
+        for i in range(1, len(self.order) + 1):
+            if self.order[(self.position + i) % len(self.order)] == name:
+                return i
+        return len(self.order) + 1
+
+    def plan(self, resident: dict[str, float], sizes: dict[str, float], budget: float, lookahead: int) -> Plan:
+        """Choose modules to keep, evict and prefetch so that resident size stays within budget."""
+        current = self.order[self.position]
+        result = Plan(current=current, keep=[current])
+        used = sizes.get(current, resident.get(current, 0))
+        for name in self.upcoming(lookahead): # look-ahead window in order, stop at first module that does not fit
+            size = sizes.get(name, resident.get(name, 0))
+            if used + size > budget:
+                break
+            result.keep.append(name)
+            used += size
+            if name not in resident:
+                result.prefetch.append(name)
+        for name in sorted(resident, key=self.distance): # remaining space goes to modules that run again soonest
+            if name in result.keep:
+                continue
+            if used + resident[name] <= budget:
+                result.keep.append(name)
+                used += resident[name]
+            else:
+                result.evict.append(name)
+        return result
+
+
+schedules: dict[str, Schedule] = {}
+
+
+def get_schedule(key: str) -> Schedule:
+    if key not in schedules:
+        schedules.clear() # one loaded model at a time, schedule of previous model is stale
+        schedules[key] = Schedule(key)
+    return schedules[key]
+
+
+def tensors(module):
+    return itertools.chain(module.parameters(), module.buffers())
+
+
+def supported(module) -> bool:
+    """Prefetch moves tensors directly, so only plain modules whose weights are all registered tensors are eligible."""
+    from modules import devices
+    if devices.backend != 'cuda' or getattr(module, 'quantization_method', None) is not None or hasattr(module, 'offload_never'):
+        return False
+    return not any(tensor.device.type == 'meta' for tensor in tensors(module)) # split by accelerate device map
+
+
+def start(name: str, module) -> bool:
+    """Begin async host-to-device copy of module on prefetch stream, host tensors are pinned on first use."""
+    import torch
+    from modules import devices
+    global stream # pylint: disable=global-statement
+    if name in pending or not supported(module):
+        return False
+    evicting.pop(name, None) # same stream, copy back in is ordered after copy out
+    if stream is None:
+        stream = torch.cuda.Stream(device=devices.device)
+    with torch.cuda.stream(stream): # does not wait for compute stream, copies overlap with current module
+        for tensor in tensors(module):
+            if tensor.device.type != 'cpu':
+                continue
+            host = tensor.data if tensor.data.is_pinned() else tensor.data.pin_memory()
+            tensor.prefetch_host = host
+            tensor.data = host.to(devices.device, non_blocking=True)
+        event = torch.cuda.Event()
+        event.record(stream)
+    pending[name] = event
+    debug_move(f'Offload: type=prefetch op=start module={name}')
+    return True
+
+
+def wait(name: str, module) -> None:
+    """Make compute stream wait for in-flight prefetch of module before it runs."""
+    event = pending.pop(name, None)
+    if event is None:
+        return
+    import torch
+    current = torch.cuda.current_stream()
+    current.wait_event(event)
+    for tensor in tensors(module):
+        if tensor.device.type != 'cpu':
+            tensor.data.record_stream(current) # allocated on prefetch stream, used on compute stream
+    debug_move(f'Offload: type=prefetch op=wait module={name}')
+
+
+def offload(name: str, module) -> bool:
+    """Copy module back into pinned host buffers on prefetch stream, returns False if module needs regular move."""
+    import torch
+    items = list(tensors(module))
+    if stream is None or not any(hasattr(tensor, 'prefetch_host') for tensor in items) or any(tensor.device.type == 'meta' for tensor in items):
+        return False
+    wait(name, module)
+    stream.wait_stream(torch.cuda.current_stream()) # compute using these weights must finish before they are copied out
+    with torch.cuda.stream(stream):
+        for tensor in items:
+            if tensor.device.type == 'cpu':
+                continue
+            host = getattr(tensor, 'prefetch_host', None)
+            if host is None or host.shape != tensor.shape or host.dtype != tensor.dtype:
+                host = torch.empty(tensor.shape, dtype=tensor.dtype, pin_memory=True)
+                tensor.prefetch_host = host
+            device_data = tensor.data
+            host.copy_(device_data, non_blocking=True)
+            device_data.record_stream(stream)
+            tensor.data = host
+        event = torch.cuda.Event()
+        event.record(stream)
+    evicting[name] = event
+    debug_move(f'Offload: type=prefetch op=evict module={name}')
+    return True
+
+
+def settle(name: str | None = None) -> None:
+    """Block until eviction of module or all modules finished, required before host tensors are used outside prefetch stream."""
+    names = list(evicting) if name is None else [name]
+    for item in names:
+        event = evicting.pop(item, None)
+        if event is not None:
+            event.synchronize()
+
+
+def reset() -> None:
+    if stream is not None:
+        stream.synchronize()
+    pending.clear()
+    evicting.clear()
+    schedules.clear()
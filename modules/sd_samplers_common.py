@@ -1,5 +1,6 @@
 import time
 import threading
+import contextvars
 from collections import namedtuple
 import torch
 from PIL import Image
@@ -75,38 +76,100 @@ def single_sample_to_image(sample, approximation=None):
             warn_once(f"VAE: method={approximation} unknown")
             return Image.new(mode="RGB", size=(512, 512))
 
-        try:
-            if isinstance(x_sample, Image.Image):
-                image = x_sample
-            else:
-                if x_sample.shape[0] > 4 or x_sample.shape[0] == 4:
-                    return Image.new(mode="RGB", size=(512, 512))
-                x_sample = torch.nan_to_num(x_sample, nan=0.0, posinf=1, neginf=0)
-                x_sample = (255.0 * x_sample).to(torch.uint8)
-                if len(x_sample.shape) == 4:
-                    x_sample = x_sample[0]
-                image = convert.to_pil(x_sample)
-        except Exception as e:
-            warn_once(f'Preview: {e}')
-            image = Image.new(mode="RGB", size=(512, 512))
+        image = decoded_to_image(x_sample)
         t1 = time.time()
         timer.process.add('preview', t1 - t0)
         return image
 
 
+def decoded_to_image(x_sample):
+    try:
+        if isinstance(x_sample, Image.Image):
+            return x_sample
+        if x_sample.shape[0] > 4 or x_sample.shape[0] == 4:
+            return Image.new(mode="RGB", size=(512, 512))
+        x_sample = torch.nan_to_num(x_sample, nan=0.0, posinf=1, neginf=0)
+        x_sample = (255.0 * x_sample).to(torch.uint8)
+        if len(x_sample.shape) == 4:
+            x_sample = x_sample[0]
+        return convert.to_pil(x_sample)
+    except Exception as e:
+        warn_once(f'Preview: {e}')
+        return Image.new(mode="RGB", size=(512, 512))
+
+
 def sample_to_image(samples, index=0, approximation=None):
     return single_sample_to_image(samples[index], approximation)
 
 
 def samples_to_image_grid(samples, approximation=None):
+    approximation = approximation or shared.opts.show_progress_type
+    if approximation == "TAESD" and len(samples.shape) == 4 and samples.shape[0] > 1:
+        with queue_lock:
+            t0 = time.time()
+            if shared.opts.live_preview_downscale and (samples.shape[-1]*samples.shape[-2] > 128*128):
+                try:
+                    scale = (128 * 128) / (samples.shape[-1] * samples.shape[-2])
+                    samples = torch.nn.functional.interpolate(samples, scale_factor=[scale, scale], mode='bilinear', align_corners=False)
+                except Exception:
+                    pass
+            decoded = sd_vae_taesd.decode(samples, batch=True) # one forward pass for the whole batch
+            if torch.is_tensor(decoded) and decoded.ndim == 4 and decoded.shape[1] == 3:
+                grid = images.image_grid([decoded_to_image(x_sample) for x_sample in decoded])
+                timer.process.add('preview', time.time() - t0)
+                return grid
     return images.image_grid([single_sample_to_image(sample, approximation) for sample in samples])
 
 
+class PreviewWorker:
+    """Renders live previews on a single background thread so decoding never runs on the sampling or request thread.
+
+    Holds at most one pending request; submitting a newer one drops the pending one since only the latest step is shown.
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending = None
+        self.thread = None
+        self.rendered = 0
+        self.dropped = 0
+
+    def submit(self, key, render, callback):
+        """Queue `render()` and call `callback(key, image)` with the result, replacing any request not yet started."""
+        with self.cond:
+            if self.pending is not None:
+                self.dropped += 1
+            self.pending = (key, render, callback, contextvars.copy_context()) # render with settings overlay of submitting job
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.loop, name='sd-preview', daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def loop(self):
+        while True:
+            with self.cond:
+                if self.pending is None:
+                    self.cond.wait(timeout=30)
+                if self.pending is None: # idle, thread is restarted on next submit
+                    self.thread = None
+                    return
+                key, render, callback, context = self.pending
+                self.pending = None
+            try:
+                image = context.run(render)
+                self.rendered += 1
+                callback(key, image)
+            except Exception as e:
+                warn_once(f'Preview: {e}')
+
+
+preview_worker = PreviewWorker()
+
+
 def store_latent(decoded):
     shared.state.current_latent = decoded
     if not shared.parallel_processing_allowed:
-        image = sample_to_image(decoded)
-        shared.state.assign_current_image(image)
+        sample = decoded.detach().clone()
+        preview_worker.submit((shared.state.id, shared.state.job_no, shared.state.sampling_step), lambda: sample_to_image(sample), shared.state.on_preview)
 
 
 def is_sampler_using_eta_noise_seed_delta(p):
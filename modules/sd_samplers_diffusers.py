@@ -1,9 +1,12 @@
 import os
 import re
 import copy
+import json
 import inspect
+import weakref
+from collections import OrderedDict
 import diffusers
-from modules import shared, errors
+from modules import shared, errors, metrics
 from modules.logger import log
 from modules.sd_hijack_schedulers import init_hijack, hijack_unipc, attach_scale_noise_if_missing # pylint: disable=unused-import
 from modules.sd_samplers_common import SamplerData, flow_models
@@ -12,6 +15,8 @@ from modules.sd_samplers_common import SamplerData, flow_models
 debug = os.environ.get('SD_SAMPLER_DEBUG', None) is not None
 debug_log = log.trace if debug else lambda *args, **kwargs: None
 scheduler_overrides = {}  # set by sd_samplers.create_sampler() before constructor call
+schedulers_cache = OrderedDict() # (model, name, class, config) -> (model weakref, pristine scheduler)
+schedules_cache = OrderedDict() # (class, config, set_timesteps args) -> scheduler state after set_timesteps
 flow_exclude = ['PeRFlow']
 hijack_unipc()
 # init_hijack()
@@ -412,6 +417,101 @@ def get_override(key):
     return getattr(shared.opts, key, None)
 
 
+def cache_size() -> int:
+    return int(getattr(shared.opts, 'sd_sampler_cache', 0) or 0)
+
+
+def cache_limit(cache: OrderedDict, size: int):
+    while len(cache) > size:
+        cache.popitem(last=False)
+
+
+def config_key(config) -> str:
+    return json.dumps({k: v for k, v in dict(config).items() if not k.startswith('_')}, sort_keys=True, default=str)
+
+
+def model_ref(model):
+    if model is None:
+        return None
+    try:
+        return weakref.ref(model)
+    except TypeError:
+        return None
+
+
+def cached_scheduler(key, model):
+    item = schedulers_cache.get(key, None)
+    if item is None:
+        return None
+    ref, scheduler = item
+    if (ref is None and model is not None) or (ref is not None and ref() is not model): # model object was replaced
+        schedulers_cache.pop(key, None)
+        return None
+    schedulers_cache.move_to_end(key)
+    return copy.deepcopy(scheduler)
+
+
+def schedule_value(value):
+    if hasattr(value, 'tolist'): # tensor or array
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [schedule_value(v) for v in value]
+    if isinstance(value, (int, float, bool, str)) or value is None:
+        return value
+    return str(value)
+
+
+schedule_state = ['timesteps', 'sigmas', 'num_inference_steps', '_step_index', '_begin_index', 'model_outputs', 'lower_order_nums', 'last_sample', 'noise_sampler', 'sample', 'prev_derivative', 'dt'] # reset by set_timesteps even when value is unchanged
+
+
+class ScheduleMemo:
+    """
+    Replaces scheduler set_timesteps so state it computes for same config and arguments is computed once and restored afterwards.
+    Restored state is a copy so steps of one job never leak into schedule used by next job.
+    Only attributes set_timesteps changes or resets are recorded, so per-job attributes such as noise_sampler_seed are kept.
+    Holds scheduler instead of a closure so deep copies of scheduler get a memo bound to the copy.
+    """
+    def __init__(self, scheduler, function):
+        self.scheduler = scheduler
+        self.function = function # unbound set_timesteps of scheduler class
+
+    @property
+    def __signature__(self):
+        return inspect.signature(self.function.__get__(self.scheduler)) # callers inspect accepted arguments
+
+    def __call__(self, *args, **kwargs):
+        size = cache_size()
+        if size == 0:
+            return self.function(self.scheduler, *args, **kwargs)
+        try:
+            bound = self.__signature__.bind(*args, **kwargs)
+            key = (self.scheduler.__class__.__name__, config_key(self.scheduler.config), json.dumps({k: schedule_value(v) for k, v in bound.arguments.items()}, sort_keys=True))
+        except Exception as e:
+            debug_log(f'Sampler schedule: cls={self.scheduler.__class__.__name__} {e}')
+            return self.function(self.scheduler, *args, **kwargs)
+        state = schedules_cache.get(key, None)
+        metrics.cache('schedule', state is not None)
+        if state is not None:
+            schedules_cache.move_to_end(key)
+            self.scheduler.__dict__.update(copy.deepcopy(state))
+            return None
+        before = dict(vars(self.scheduler))
+        result = self.function(self.scheduler, *args, **kwargs)
+        if result is None: # only schedules that live entirely in scheduler state can be restored
+            changed = {k: v for k, v in vars(self.scheduler).items() if k in schedule_state or k not in before or before[k] is not v}
+            changed.pop('set_timesteps', None)
+            schedules_cache[key] = copy.deepcopy(changed)
+            cache_limit(schedules_cache, 4 * size)
+        return result
+
+
+def memoize_set_timesteps(scheduler):
+    function = getattr(scheduler.__class__, 'set_timesteps', None)
+    if function is not None and not isinstance(scheduler.__dict__.get('set_timesteps', None), ScheduleMemo):
+        scheduler.set_timesteps = ScheduleMemo(scheduler, function)
+    return scheduler
+
+
 class DiffusionSampler:
     def __init__(self, name, constructor, model, **kwargs):
         if name == 'Default':
@@ -546,6 +646,17 @@ class DiffusionSampler:
         debug_log(f'Sampler: config={self.config}')
         debug_log(f'Sampler: signature={possible}')
 
+        # reuse scheduler created earlier for same model and resolved config
+        key = (id(model), name, constructor.__name__, json.dumps(self.config, sort_keys=True, default=str))
+        if cache_size() > 0:
+            sampler = cached_scheduler(key, model)
+            metrics.cache('scheduler', sampler is not None)
+            if sampler is not None:
+                debug_log(f'Sampler: name="{name}" cached')
+                self.sampler = memoize_set_timesteps(sampler)
+                self.sampler.name = name
+                return
+
         # finally create the new sampler
         try:
             sampler = constructor(**self.config)
@@ -607,3 +718,7 @@ class DiffusionSampler:
 
         self.sampler = sampler
         self.sampler.name = name
+        if cache_size() > 0:
+            schedulers_cache[key] = (model_ref(model), copy.deepcopy(sampler))
+            cache_limit(schedulers_cache, cache_size())
+            memoize_set_timesteps(sampler)
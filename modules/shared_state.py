@@ -45,6 +45,7 @@ class State:
     api = False
     disable_preview = False
     preview_job = -1
+    preview_key = None
     time_start = None
     duration = None
     need_restart = False
@@ -208,6 +209,7 @@ class State:
         self.current_sigma = None
         self.current_sigma_next = None
         self.id_live_preview = 0
+        self.preview_key = None
         self.id = self.get_id(task_id)
         self.job = title
         self.job_count = 1 # cannot be less than 1 on new job
@@ -282,22 +284,25 @@ class State:
 
         if self.current_latent is not None:
             try:
-                self.preview_job = self.job_no
-                sample = self.current_latent
-                self.current_image_sampling_step = self.sampling_step
-                try:
-                    if self.current_noise_pred is not None and self.current_sigma is not None and self.current_sigma_next is not None:
-                        original_sample = sample - (self.current_noise_pred * (self.current_sigma_next-self.current_sigma))
-                        if self.prediction_type in {"epsilon", "flow_prediction"}:
-                            sample = original_sample - (self.current_noise_pred * self.current_sigma)
-                        elif self.prediction_type == "v_prediction":
-                            sample = self.current_noise_pred * (-self.current_sigma / (self.current_sigma**2 + 1) ** 0.5) + (original_sample / (self.current_sigma**2 + 1)) # pylint: disable=invalid-unary-operand-type
-                except Exception:
-                    pass # ignore sigma errors
-                image = sd_samplers_common.samples_to_image_grid(sample)
-                self.assign_current_image(image)
-                self.preview_job = -1
-                return True
+                key = (self.id, self.job_no, self.sampling_step)
+                if key != self.preview_key: # new latent since last request, render it in background and serve latest finished preview meanwhile
+                    self.preview_job = self.job_no
+                    sample = self.current_latent
+                    try:
+                        if self.current_noise_pred is not None and self.current_sigma is not None and self.current_sigma_next is not None:
+                            original_sample = sample - (self.current_noise_pred * (self.current_sigma_next-self.current_sigma))
+                            if self.prediction_type in {"epsilon", "flow_prediction"}:
+                                sample = original_sample - (self.current_noise_pred * self.current_sigma)
+                            elif self.prediction_type == "v_prediction":
+                                sample = self.current_noise_pred * (-self.current_sigma / (self.current_sigma**2 + 1) ** 0.5) + (original_sample / (self.current_sigma**2 + 1)) # pylint: disable=invalid-unary-operand-type
+                    except Exception:
+                        pass # ignore sigma errors
+                    if sample is self.current_latent:
+                        sample = sample.detach().clone() # sampler may update latent in place while preview is pending
+                    self.preview_key = key
+                    sd_samplers_common.preview_worker.submit(key, lambda: sd_samplers_common.samples_to_image_grid(sample), self.on_preview)
+                    self.preview_job = -1
+                return self.current_image is not None
             except Exception as e:
                 self.preview_job = -1
                 log.error(f'State image: last={self.id_live_preview} step={self.sampling_step} {e}')
@@ -312,6 +317,12 @@ class State:
             pass
         return False
 
+    def on_preview(self, key, image):
+        if key[0] != self.id: # finished after its job ended
+            return
+        self.current_image_sampling_step = key[2]
+        self.assign_current_image(image)
+
     def assign_current_image(self, image):
         self.current_image = image
         self.id_live_preview += 1
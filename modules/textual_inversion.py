@@ -1,5 +1,6 @@
 import os
 import time
+from collections import OrderedDict
 import torch
 import safetensors.torch
 from modules.errorlimiter import limit_errors
@@ -58,6 +59,25 @@ def open_embeddings(filename):
     return embeddings, skipped
 
 
+def read_header(filename):
+    """
+    Index embedding file without loading vectors, safetensors shapes are read from file header only.
+    Vector sizes of legacy pt files are unknown until embedding is activated.
+    """
+    name = os.path.splitext(os.path.basename(filename))[0]
+    embedding = Embedding(vec=[], name=name, filename=filename)
+    embedding.vector_sizes = None
+    if filename.upper().endswith('.SAFETENSORS'):
+        with safetensors.torch.safe_open(filename, framework="pt") as f:  # type: ignore
+            shapes = [list(f.get_slice(k).get_shape()) for k in f.keys()]
+        if len(shapes) == 0:
+            return None
+        embedding.vector_sizes = [shape[-1] for shape in shapes]
+        embedding.shape = embedding.vector_sizes[0]
+        embedding.vectors = shapes[0][0] if len(shapes[0]) > 1 else 1
+    return embedding
+
+
 def convert_bundled(data):
     """
     Bundled embeddings are passed as a dict from lora loading, convert to Embedding objects and pass back as list.
@@ -115,16 +135,60 @@ def deref_tokenizers(tokens, tokenizers):
                 newsuffix += 1
 
 
-def insert_tokens(embeddings: list, tokenizers: list):
+def insert_tokens(embeddings: list, tokenizers: list, free: dict | None = None):
     """
     Add all tokens to each tokenizer in the list, with one call to each.
+    Token ids released by `remove_tokens` are reused first so text encoder embedding layers do not grow.
     """
     tokens = []
     for embedding in embeddings:
         if embedding is not None:
             tokens += embedding.tokens
     for tokenizer in tokenizers:
-        tokenizer.add_tokens(tokens)
+        pending = tokens
+        slots = (free or {}).get(id(tokenizer), [])
+        if len(slots) > 0 and not getattr(tokenizer, 'is_fast', False):
+            encoder = tokenizer._added_tokens_encoder # pylint: disable=protected-access
+            pending = []
+            for token in tokens:
+                if token in encoder or len(slots) == 0:
+                    pending.append(token)
+                    continue
+                idx = slots.pop()
+                added = tokenizer._added_tokens_decoder[idx] # pylint: disable=protected-access
+                encoder.pop(added.content, None)
+                added.content = token
+                encoder[token] = idx
+                debug(f"Textual inversion: reuse idx={idx} token={token}")
+            tokenizer._update_trie() # pylint: disable=protected-access
+        tokenizer.add_tokens(pending)
+
+
+def remove_tokens(tokens: list, tokenizers: list, free: dict):
+    """
+    Release tokens of an unloaded embedding so they no longer match prompts and record their ids for reuse.
+    Released tokens keep a placeholder entry so tokenizer length and text encoder embedding size stay in sync.
+    Only python tokenizers are supported, tokens of fast tokenizers stay in place.
+    """
+    for tokenizer in tokenizers:
+        if getattr(tokenizer, 'is_fast', False):
+            continue
+        encoder = tokenizer._added_tokens_encoder # pylint: disable=protected-access
+        for token in tokens:
+            idx = encoder.pop(token, None)
+            if idx is None:
+                continue
+            placeholder = f'<|free-{idx}|>'
+            tokenizer._added_tokens_decoder[idx].content = placeholder # pylint: disable=protected-access
+            encoder[placeholder] = idx
+            free.setdefault(id(tokenizer), []).append(idx)
+        tokenizer._update_trie() # pylint: disable=protected-access
+
+
+def compatible(vector_sizes: list, hiddensizes: list) -> bool:
+    return not (not all(vs in hiddensizes for vs in vector_sizes) or  # Skip SD2.1 in SD1.5/SDXL/SD3 vis versa
+                len(vector_sizes) > len(hiddensizes) or  # Skip SDXL/SD3 in SD1.5
+                (len(vector_sizes) < len(hiddensizes) and len(vector_sizes) != 2))  # SD3 no T5
 
 
 def insert_vectors(embedding, tokenizers, text_encoders, hiddensizes):
@@ -229,6 +293,10 @@ def convert_embedding(tensor, text_encoder, text_encoder_2):
 
 
 class EmbeddingDatabase:
+    """
+    Embeddings found in embedding folders, either all inserted into text encoders on load or with `diffusers_embed_lazy`
+    indexed from file headers and inserted only once referenced by a prompt, keeping at most `diffusers_embed_active` active.
+    """
     def __init__(self):
         self.ids_lookup = {}
         self.word_embeddings = {}
@@ -236,6 +304,11 @@ class EmbeddingDatabase:
         self.embedding_dirs = {}
         self.previously_displayed_embeddings = ()
         self.embeddings_used = []
+        self.files = {} # filename -> mtime of loaded or indexed files
+        self.index = {} # name -> embedding without vectors
+        self.active = OrderedDict() # name -> embedding with tokens and vectors inserted, least recently used first
+        self.free = {} # id(tokenizer) -> token ids released by unloaded embeddings
+        self.lazy = False
 
     def add_embedding_dir(self, path):
         self.embedding_dirs[path] = DirWithTextualInversionEmbeddings(path)
@@ -279,9 +352,7 @@ class EmbeddingDatabase:
                     if shared.opts.diffusers_convert_embed and 768 in hiddensizes and 1280 in hiddensizes and 1280 not in embedding.vector_sizes and 768 in embedding.vector_sizes:
                         embedding.vec.append(convert_embedding(embedding.vec[embedding.vector_sizes.index(768)], text_encoders[hiddensizes.index(768)], text_encoders[hiddensizes.index(1280)]))
                         embedding.vector_sizes.append(1280)
-                    if (not all(vs in hiddensizes for vs in embedding.vector_sizes) or  # Skip SD2.1 in SD1.5/SDXL/SD3 vis versa
-                            len(embedding.vector_sizes) > len(hiddensizes) or  # Skip SDXL/SD3 in SD1.5
-                            (len(embedding.vector_sizes) < len(hiddensizes) and len(embedding.vector_sizes) != 2)):  # SD3 no T5
+                    if not compatible(embedding.vector_sizes, hiddensizes):
                         embedding.tokens = []
                         self.skipped_embeddings[embedding.name] = embedding
                 except Exception as e:
@@ -293,12 +364,17 @@ class EmbeddingDatabase:
                 for embedding in embeddings:
                     if embedding.name not in self.skipped_embeddings:
                         deref_tokenizers(embedding.tokens, tokenizers)
-            insert_tokens(embeddings, tokenizers)
+            insert_tokens(embeddings, tokenizers, self.free)
             for embedding in embeddings:
                 if embedding.name not in self.skipped_embeddings:
                     try:
                         insert_vectors(embedding, tokenizers, text_encoders, hiddensizes)
                         self.register_embedding(embedding, shared.sd_model)
+                        if embedding.filename is not None:
+                            self.active[embedding.name] = embedding
+                            self.active.move_to_end(embedding.name)
+                        else:
+                            self.active.pop(embedding.name, None) # replaced by bundled embedding
                     except Exception as e:
                         log.error(f'Load embedding: name="{embedding.name}" file="{embedding.filename}" {e}')
                         errors.display(e, f'Load embedding: name="{embedding.name}" file="{embedding.filename}"')
@@ -314,6 +390,121 @@ class EmbeddingDatabase:
         file_paths = list_embeddings(embdir.path)
         self.load_diffusers_embedding(file_paths)
 
+    def index_files(self, filenames: list[str]):
+        """
+        Register embeddings from file headers only, embeddings with vector sizes not matching text encoders are skipped.
+        """
+        _text_encoders, _tokenizers, hiddensizes = get_text_encoders()
+        for filename in filenames:
+            name = os.path.splitext(os.path.basename(filename))[0]
+            try:
+                embedding = read_header(filename)
+            except Exception as e:
+                debug(f'Embedding index: file="{filename}" {e}')
+                embedding = None
+            if embedding is None:
+                self.skipped_embeddings[name] = Embedding(vec=[], name=name, filename=filename)
+                continue
+            vector_sizes = embedding.vector_sizes
+            if vector_sizes is not None and shared.opts.diffusers_convert_embed and 768 in hiddensizes and 1280 in hiddensizes and 1280 not in vector_sizes and 768 in vector_sizes:
+                vector_sizes = vector_sizes + [1280]
+            if vector_sizes is not None and not compatible(vector_sizes, hiddensizes):
+                self.skipped_embeddings[name] = embedding
+                continue
+            self.index[name] = embedding
+            if name not in self.active:
+                self.word_embeddings[name] = embedding
+
+    def unload(self, name: str):
+        """
+        Release tokens of active embedding, its text encoder rows are reused by next embedding that is inserted.
+        """
+        embedding = self.active.pop(name, None)
+        if embedding is None:
+            return
+        if embedding.tokens:
+            _text_encoders, tokenizers, _hiddensizes = get_text_encoders()
+            remove_tokens(embedding.tokens, tokenizers, self.free)
+        for first_id, entries in list(self.ids_lookup.items()):
+            entries = [entry for entry in entries if entry[1] is not embedding]
+            if len(entries) > 0:
+                self.ids_lookup[first_id] = entries
+            else:
+                self.ids_lookup.pop(first_id, None)
+        if name in self.index:
+            self.word_embeddings[name] = self.index[name]
+        else:
+            self.word_embeddings.pop(name, None)
+        debug(f'Embedding unload: name="{name}" tokens={embedding.tokens}')
+
+    def remove_file(self, filename: str):
+        name = os.path.splitext(os.path.basename(filename))[0]
+        self.files.pop(filename, None)
+        if getattr(self.active.get(name, None), 'filename', None) == filename:
+            self.unload(name)
+        if getattr(self.index.get(name, None), 'filename', None) == filename:
+            self.index.pop(name, None)
+        if getattr(self.word_embeddings.get(name, None), 'filename', None) == filename:
+            self.word_embeddings.pop(name, None)
+        self.skipped_embeddings.pop(name, None)
+
+    def refresh(self):
+        """
+        Compare embedding files with ones already loaded or indexed and process only files that were added, changed or removed.
+        """
+        files = {}
+        for embdir in self.embedding_dirs.values():
+            if os.path.isdir(embdir.path):
+                for filename in list_embeddings(embdir.path):
+                    files[filename] = os.path.getmtime(filename)
+        removed = [filename for filename, mtime in self.files.items() if files.get(filename, None) != mtime]
+        added = [filename for filename, mtime in files.items() if self.files.get(filename, None) != mtime]
+        for filename in removed:
+            self.remove_file(filename)
+        if len(added) > 0:
+            if self.lazy:
+                self.index_files(added)
+            else:
+                self.load_diffusers_embedding(added)
+        self.files = files
+        return added, removed
+
+    def reset(self):
+        for name in list(self.active):
+            self.unload(name)
+        self.files.clear()
+        self.index.clear()
+        self.ids_lookup.clear()
+        self.word_embeddings.clear()
+        self.skipped_embeddings.clear()
+
+    def activate(self, prompts: list[str]):
+        """
+        Insert indexed embeddings referenced by prompts, least recently used embeddings over the active limit are unloaded.
+        """
+        if not self.lazy or len(self.index) == 0:
+            return
+        text = ' '.join(prompt for prompt in prompts if isinstance(prompt, str))
+        names = [name for name in self.index if name in text]
+        for name in names:
+            if name in self.active:
+                self.active.move_to_end(name)
+        missing = [name for name in names if name not in self.active]
+        if len(missing) == 0:
+            return
+        for name in list(self.active): # unload before insert so released token slots are reused
+            if len(self.active) + len(missing) <= shared.opts.diffusers_embed_active:
+                break
+            if name not in names:
+                self.unload(name)
+        t0 = time.time()
+        self.load_diffusers_embedding([self.index[name].filename for name in missing])
+        for name in missing:
+            if name in self.skipped_embeddings: # failed to load, do not retry on every prompt
+                self.index.pop(name, None)
+                self.word_embeddings.pop(name, None)
+        log.debug(f'Network activate: type=embeddings names={missing} active={len(self.active)} time={time.time()-t0:.2f}')
+
     def load_textual_inversion_embeddings(self, force_reload=False):
         if not shared.sd_loaded:
             return
@@ -328,12 +519,12 @@ class EmbeddingDatabase:
                     break
             if not need_reload:
                 return
-        self.ids_lookup.clear()
-        self.word_embeddings.clear()
-        self.skipped_embeddings.clear()
+        if not shared.opts.diffusers_enable_embed or self.lazy != shared.opts.diffusers_embed_lazy:
+            self.reset()
+            self.lazy = shared.opts.diffusers_embed_lazy
         self.embeddings_used.clear()
+        added, removed = self.refresh() if shared.opts.diffusers_enable_embed else ([], [])
         for embdir in self.embedding_dirs.values():
-            self.load_from_dir(embdir)
             embdir.update()
 
         # re-sort word_embeddings because load_from_dir may not load in alphabetic order.
@@ -346,4 +537,4 @@ class EmbeddingDatabase:
         if self.previously_displayed_embeddings != displayed_embeddings and shared.opts.diffusers_enable_embed:
             self.previously_displayed_embeddings = displayed_embeddings
             t1 = time.time()
-            log.info(f"Network load: type=embeddings loaded={len(self.word_embeddings)} skipped={len(self.skipped_embeddings)} time={t1-t0:.2f}")
+            log.info(f"Network load: type=embeddings loaded={len(self.word_embeddings)} skipped={len(self.skipped_embeddings)} active={len(self.active)} lazy={self.lazy} added={len(added)} removed={len(removed)} time={t1-t0:.2f}")
@@ -278,6 +278,14 @@ def create_ui_elements(units, result_txt, output_gallery):
                     def set_control_unload_processor(value):
                         shared.opts.control_unload_processor = value
                     control_unload_processor.change(fn=set_control_unload_processor, inputs=[control_unload_processor], outputs=[])
+                    control_cache_size = gr.Slider(label="Processor cache", minimum=0, maximum=64, step=1, value=shared.opts.control_cache_size, elem_id='control_cache_size')
+                    def set_control_cache_size(value):
+                        shared.opts.control_cache_size = value
+                    control_cache_size.change(fn=set_control_cache_size, inputs=[control_cache_size], outputs=[])
+                    control_cache_disk = gr.Slider(label="Processor disk cache (MB)", minimum=0, maximum=4096, step=64, value=shared.opts.control_cache_disk, elem_id='control_cache_disk')
+                    def set_control_cache_disk(value):
+                        shared.opts.control_cache_disk = value
+                    control_cache_disk.change(fn=set_control_cache_disk, inputs=[control_cache_disk], outputs=[])
 
                 with gr.Accordion('HED', open=True, elem_classes=['processor-settings']):
                     settings.append(gr.Checkbox(label="Scribble", value=False))
@@ -76,11 +76,17 @@ def create_settings(cmd_opts):
         "sd_model_refiner": OptionInfo('None', "Refiner model", gr.Dropdown, lambda: {"choices": ['None'] + list_checkpoint_titles()}, refresh=refresh_checkpoints),
         "sd_unet": OptionInfo("Default", "UNET model", gr.Dropdown, lambda: {"choices": shared_items.sd_unet_items()}, refresh=shared_items.refresh_unet_list),
         "latent_history": OptionInfo(20, "Latent history size", gr.Slider, {"minimum": 0, "maximum": 100, "step": 1}),
+        "latent_history_ram": OptionInfo(1024, "Latent history memory limit (MB)", gr.Slider, {"minimum": 0, "maximum": 16384, "step": 64}),
+        "latent_history_disk": OptionInfo(0, "Latent history disk limit (MB)", gr.Slider, {"minimum": 0, "maximum": 65536, "step": 256}),
 
         "advanced_sep": OptionInfo("<h2>Advanced Options</h2>", "", gr.HTML),
         "sd_checkpoint_autoload": OptionInfo(True, "Model auto-load on start"),
         "sd_parallel_load": OptionInfo(True, "Model load using multiple threads"),
         "sd_checkpoint_autodownload": OptionInfo(True, "Model auto-download on demand"),
+        "sd_restore_deferred": OptionInfo(True, "Model override restore on demand"),
+        "sd_override_overlay": OptionInfo(True, "Override settings per job without changing global settings"),
+        "sd_affinity_skip": OptionInfo(4, "Model affinity queue max skips", gr.Slider, {"minimum": 0, "maximum": 16, "step": 1}),
+        "sd_sampler_cache": OptionInfo(16, "Sampler cache size", gr.Slider, {"minimum": 0, "maximum": 64, "step": 1}),
         "stream_load": OptionInfo(False, "Model load using streams", gr.Checkbox),
         "diffusers_to_gpu": OptionInfo(False, "Model load model direct to GPU"),
         "runai_streamer_diffusers": OptionInfo(False, "Diffusers load using Run:ai streamer", gr.Checkbox),
@@ -131,6 +137,7 @@ def create_settings(cmd_opts):
         "offload_balanced_sep": OptionInfo("<h2>Balanced Offload</h2>", "", gr.HTML),
         "diffusers_offload_pre": OptionInfo(True, "Offload during pre-forward"),
         "diffusers_offload_streams": OptionInfo(False, "Offload using streams"),
+        "diffusers_offload_prefetch": OptionInfo(0, "Offload prefetch modules", gr.Slider, {"minimum": 0, "maximum": 4, "step": 1 }),
         "diffusers_offload_min_gpu_memory": OptionInfo(startup_offload_min_gpu, "Offload low watermark", gr.Slider, {"minimum": 0, "maximum": 1, "step": 0.01 }),
         "diffusers_offload_max_gpu_memory": OptionInfo(startup_offload_max_gpu, "Offload GPU high watermark", gr.Slider, {"minimum": 0.1, "maximum": 1, "step": 0.01 }),
         "diffusers_offload_max_cpu_memory": OptionInfo(0.90, "Offload CPU high watermark", gr.Slider, {"minimum": 0, "maximum": 1, "step": 0.01, "visible": False }),
@@ -197,6 +204,7 @@ def create_settings(cmd_opts):
         "diffusers_vae_tiling": OptionInfo(cmd_opts.lowvram, "VAE tiling", gr.Checkbox),
         "diffusers_vae_tile_size": OptionInfo(0, "VAE tile size", gr.Slider, {"minimum": 0, "maximum": 4096, "step": 8 }),
         "diffusers_vae_tile_overlap": OptionInfo(0.25, "VAE tile overlap", gr.Slider, {"minimum": 0, "maximum": 0.95, "step": 0.05 }),
+        "diffusers_vae_tile_auto": OptionInfo(False, "VAE adaptive tiling", gr.Checkbox),
         "remote_vae_type": OptionInfo('raw', "Remote VAE image type", gr.Dropdown, {"choices": ['raw', 'jpg', 'png']}),
         "remote_vae_encode": OptionInfo(False, "Remote VAE for encode"),
     }))
@@ -206,6 +214,7 @@ def create_settings(cmd_opts):
         "prompt_attention": OptionInfo("native", "Prompt attention parser", gr.Radio, {"choices": ["native", "compel", "xhinker", "a1111", "fixed"] }),
         "prompt_mean_norm": OptionInfo(False, "Prompt attention normalization", gr.Checkbox),
         "sd_textencoder_cache_size": OptionInfo(4, "Text encoder cache size", gr.Slider, {"minimum": 0, "maximum": 16, "step": 1}),
+        "sd_textencoder_disk_cache": OptionInfo(0, "Text encoder disk cache size (MB)", gr.Slider, {"minimum": 0, "maximum": 4096, "step": 64}),
         "sd_textencder_linebreak": OptionInfo(True, "Use line break as prompt segment marker", gr.Checkbox),
         "diffusers_zeros_prompt_pad": OptionInfo(False, "Use zeros for prompt padding", gr.Checkbox),
         "te_optional_sep": OptionInfo("<h2>Optional</h2>", "", gr.HTML),
@@ -417,6 +426,8 @@ def create_settings(cmd_opts):
         "clip_models_path": OptionInfo(os.path.join(paths.models_path, 'CLIP'), "Folder with CLIP models", folder=True),
         "other_paths_sep_options": OptionInfo("<h2>Cache folders</h2>", "", gr.HTML),
         "clean_temp_dir_at_start": OptionInfo(True, "Cleanup temporary folder on startup"),
+        "files_cache_watch": OptionInfo('local', "Folder change notifications", gr.Radio, {"choices": ['none', 'local', 'all']}),
+        "files_cache_snapshot": OptionInfo(True, "Persist folder listings between restarts"),
         "temp_dir": OptionInfo("", "Directory for temporary images; leave empty for default", folder=True),
         "accelerate_offload_path": OptionInfo('cache/accelerate', "Folder for disk offload", folder=True),
         "openvino_cache_path": OptionInfo('cache', "Folder for OpenVINO cache", folder=True),
@@ -432,6 +443,8 @@ def create_settings(cmd_opts):
         "jpeg_quality": OptionInfo(90, "Image quality", gr.Slider, {"minimum": 1, "maximum": 100, "step": 1}),
         "img_max_size_mp": OptionInfo(1000, "Maximum image size (MP)", gr.Slider, {"minimum": 10, "maximum": 2000, "step": 1}),
         "webp_lossless": OptionInfo(False, "WebP lossless compression"),
+        "save_encoder_preset": OptionInfo("default", "Image encoder preset", gr.Dropdown, {"choices": ["default", "fast-png", "archival-png", "webp-fast"]}),
+        "save_workers": OptionInfo(4, "Image save workers", gr.Slider, {"minimum": 1, "maximum": 16, "step": 1}),
         "save_selected_only": OptionInfo(True, "UI save only saves selected image"),
         "include_mask": OptionInfo(False, "Include mask in outputs"),
         "samples_save_zip": OptionInfo(False, "Create ZIP archive for multiple images"),
@@ -624,6 +637,7 @@ def create_settings(cmd_opts):
         "civitai_save_subfolder_enabled": OptionInfo(False, 'CivitAI save to subfolders', gr.Checkbox, {"visible": False}),
         "civitai_save_subfolder": OptionInfo('{{BASEMODEL}}', 'CivitAI subfolder template', gr.Textbox, {"visible": False}),
         "civitai_discard_hash_mismatch": OptionInfo(True, 'CivitAI discard downloads with hash mismatch', gr.Checkbox, {"visible": False}),
+        "civitai_download_connections": OptionInfo(1, 'CivitAI parallel download connections', gr.Slider, {"minimum": 1, "maximum": 16, "step": 1, "visible": False}),
     }))
 
     # --- Extra Networks ---
@@ -665,6 +679,8 @@ def create_settings(cmd_opts):
         "extra_networks_embed_sep": OptionInfo("<h2>Embeddings</h2>", "", gr.HTML),
         "diffusers_enable_embed": OptionInfo(True, "Enable embeddings support", gr.Checkbox),
         "diffusers_convert_embed": OptionInfo(False, "Auto-convert SD15 embeddings to SDXL", gr.Checkbox),
+        "diffusers_embed_lazy": OptionInfo(False, "Load embeddings on demand", gr.Checkbox),
+        "diffusers_embed_active": OptionInfo(64, "Active embeddings limit", gr.Slider, {"minimum": 1, "maximum": 1024, "step": 1}),
 
         "extra_networks_wildcard_sep": OptionInfo("<h2>Wildcards</h2>", "", gr.HTML),
         "wildcards_enabled": OptionInfo(True, "Enable file wildcards support"),
@@ -673,6 +689,7 @@ def create_settings(cmd_opts):
     # --- Extensions ---
     options_templates.update(options_section(('extensions', "Extensions"), {
         "disable_all_extensions": OptionInfo("none", "Disable all extensions", gr.Radio, {"choices": ["none", "user", "all"]}),
+        "extensions_lazy_load": OptionInfo(True, "Defer loading of selectable scripts until first use"),
     }))
 
     # --- Hidden Options ---
@@ -697,6 +714,8 @@ def create_settings(cmd_opts):
                 # Caption settings (controlled via Caption Tab UI)
                 "caption_default_type": OptionInfo("VLM", "Default caption type", gr.Radio, {"choices": ["VLM", "OpenCLiP", "Tagger"], "visible": False}),
                 "tagger_show_scores": OptionInfo(False, "Tagger: show confidence scores in results", gr.Checkbox, {"visible": False}),
+                "caption_batch_size": OptionInfo(4, "Caption: batch size", gr.Slider, {"minimum": 1, "maximum": 64, "step": 1, "visible": False}),
+                "caption_batch_workers": OptionInfo(2, "Caption: prefetch workers", gr.Slider, {"minimum": 0, "maximum": 16, "step": 1, "visible": False}),
                 "caption_openclip_model": OptionInfo("ViT-L-14/openai", "OpenCLiP: default model", gr.Dropdown, lambda: {"choices": modules.caption.openclip.get_clip_models(), "visible": False}, refresh=modules.caption.openclip.refresh_clip_models),
                 "caption_openclip_mode": OptionInfo(modules.caption.openclip.caption_types[0], "OpenCLiP: default mode", gr.Dropdown, {"choices": modules.caption.openclip.caption_types, "visible": False}),
                 "caption_openclip_blip_model": OptionInfo(list(modules.caption.openclip.caption_models)[0], "OpenCLiP: default captioner", gr.Dropdown, {"choices": list(modules.caption.openclip.caption_models), "visible": False}),
@@ -735,6 +754,8 @@ def create_settings(cmd_opts):
                 "control_tiles": OptionInfo("1x1, 1x2, 1x3, 1x4, 2x1, 2x1, 2x2, 2x3, 2x4, 3x1, 3x2, 3x3, 3x4, 4x1, 4x2, 4x3, 4x4", "Tiling options", gr.Textbox, {"visible": False}),
                 "control_move_processor": OptionInfo(False, "Processor move to CPU when complete", gr.Checkbox, {"visible": False}),
                 "control_unload_processor": OptionInfo(False, "Processor unload after use", gr.Checkbox, {"visible": False}),
+                "control_cache_size": OptionInfo(8, "Processor cache size", gr.Slider, {"minimum": 0, "maximum": 64, "step": 1, "visible": False}),
+                "control_cache_disk": OptionInfo(0, "Processor disk cache size (MB)", gr.Slider, {"minimum": 0, "maximum": 4096, "step": 64, "visible": False}),
                 # sampler settings are handled separately
                 "show_samplers": OptionInfo([], "Show samplers in user interface", gr.CheckboxGroup, lambda: {"choices": [x.name for x in list_samplers()], "visible": False}),
                 "eta_noise_seed_delta": OptionInfo(0, "Noise seed delta (eta)", gr.Number, {"precision": 0, "visible": False}),
@@ -777,6 +798,7 @@ def create_settings(cmd_opts):
                 "detailer_args": OptionInfo("", "Detailer args", gr.Textbox, {"visible": False}),
                 "detailer_merge": OptionInfo(False, "Merge multiple results from each detailer model", gr.Checkbox, {"visible": False}),
                 "detailer_sort": OptionInfo(False, "Sort detailer output by location", gr.Checkbox, {"visible": False}),
+                "detailer_batch": OptionInfo(False, "Process all detected regions in a single batch", gr.Checkbox, {"visible": False}),
                 "detailer_save": OptionInfo(False, "Include detection results", gr.Checkbox, {"visible": False}),
                 "detailer_segmentation": OptionInfo(False, "Use segmentation", gr.Checkbox, {"visible": False}),
             },
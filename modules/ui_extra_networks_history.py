@@ -19,6 +19,7 @@ class ExtraNetworksPageHistory(ui_extra_networks.ExtraNetworksPage):
 
     def list_items(self):
         # log.trace('History list')
+        shared.history.load()
         for item in shared.history.latents:
             title = ', '.join(list(set(item.ops))) + '<br>' + item.name
             yield {
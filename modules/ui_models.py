@@ -287,6 +287,8 @@ def create_ui():
                         with gr.Row():
                             device = gr.Radio(choices=["cpu", "shuffle", "gpu"], value="cpu", label="Merge Device")
                             unload = gr.Checkbox(label="Unload Current Model from VRAM", value=False, visible=False)
+                        with gr.Row():
+                            streaming = gr.Checkbox(label="Streaming merge", value=True)
                         with gr.Row():
                             bake_in_vae = gr.Dropdown(choices=["None"] + list(sd_vae.vae_dict), value="None", interactive=True, label="Replace VAE")
                             create_refresh_button(bake_in_vae, sd_vae.refresh_vae_list,
@@ -325,7 +327,8 @@ def create_ui():
                                 re_basin_iterations, # pylint: disable=unused-argument
                                 device, # pylint: disable=unused-argument
                                 unload, # pylint: disable=unused-argument
-                                bake_in_vae): # pylint: disable=unused-argument
+                                bake_in_vae, # pylint: disable=unused-argument
+                                streaming): # pylint: disable=unused-argument
                     kwargs = {}
                     for x in inspect.getfullargspec(modelmerger)[0]:
                         kwargs[x] = locals()[x]
@@ -450,6 +453,7 @@ def create_ui():
                         device,
                         unload,
                         bake_in_vae,
+                        streaming,
                     ],
                     outputs=[
                         primary_model_name,
@@ -190,7 +190,27 @@ def restore_preview_size(image, vae):
     return image
 
 
-def decode(latents):
+def is_image_decoder(variant: str) -> bool:
+    return variant.startswith('TAESD') or variant in {'TAE FLUX.1', 'TAE FLUX.2', 'TAE SD3'}
+
+
+def run_decoder(vae, variant: str, tensor: torch.Tensor, batch: bool = False):
+    # Fallback: reshape packed 128-channel latents to 32 channels if not already unpacked
+    if (variant == 'TAE FLUX.2') and (len(tensor.shape) == 4) and (tensor.shape[1] == 128):
+        b, _c, h, w = tensor.shape
+        tensor = tensor.reshape(b, 32, h * 2, w * 2)
+    if is_image_decoder(variant):
+        image = vae.decoder(tensor).clamp(0, 1).detach() # decoder is fully convolutional so whole batch runs in one pass
+        if not batch:
+            image = image[0]
+    else:
+        image = vae.decode(tensor, return_dict=False)[0]
+        image = (image / 2.0 + 0.5).clamp(0, 1).detach()
+    return restore_preview_size(image, vae)
+
+
+def decode(latents, batch: bool = False):
+    """Decode single latent or, with batch=True, a whole latent batch returning images as BCHW."""
     global first_run # pylint: disable=global-statement
     with lock:
         try:
@@ -208,18 +228,11 @@ def decode(latents):
                 tensor = latents.unsqueeze(0) if len(latents.shape) == 3 else latents
                 tensor = tensor.detach().clone().to(devices.device, dtype=dtype)
                 if debug:
-                    log.debug(f'Decode: type="taesd" variant="{variant}" input={latents.shape} tensor={tensor.shape}')
-                # Fallback: reshape packed 128-channel latents to 32 channels if not already unpacked
-                if (variant == 'TAE FLUX.2') and (len(tensor.shape) == 4) and (tensor.shape[1] == 128):
-                    b, _c, h, w = tensor.shape
-                    tensor = tensor.reshape(b, 32, h * 2, w * 2)
-                if variant.startswith('TAESD') or variant in {'TAE FLUX.1', 'TAE FLUX.2', 'TAE SD3'}:
-                    image = vae.decoder(tensor).clamp(0, 1).detach()
-                    image = image[0]
+                    log.debug(f'Decode: type="taesd" variant="{variant}" input={latents.shape} tensor={tensor.shape} batch={batch}')
+                if batch and not is_image_decoder(variant): # video decoders treat leading dims as frames, keep them per sample
+                    image = torch.stack([run_decoder(vae, variant, sample.unsqueeze(0)) for sample in tensor])
                 else:
-                    image = vae.decode(tensor, return_dict=False)[0]
-                    image = (image / 2.0 + 0.5).clamp(0, 1).detach()
-                image = restore_preview_size(image, vae)
+                    image = run_decoder(vae, variant, tensor, batch=batch)
                 t1 = time.time()
                 if (t1 - t0) > 3.0 and not first_run:
                     log.warning(f'Decode: type="taesd" variant="{variant}" long decode time={t1 - t0:.2f}')
@@ -0,0 +1,183 @@
+"""Memory-aware tiling planner for VAE decode.
+
+Estimates peak activation memory of a decode from latent shape, decoder channel widths and dtype,
+then picks a full decode if it fits into free device memory or the tile size with fewest tiles that does.
+Allocator peak is reset before each planned decode, measured after it and actual/estimated ratio is folded into a per-VAE correction,
+so estimates converge to what the device really needs. User tiling settings are restored after decode.
+Garbage collection after decode only runs when the allocator high-water mark crosses the gc threshold.
+"""
+import os
+import math
+from dataclasses import dataclass
+from modules.logger import log
+
+
+debug = log.trace if os.environ.get('SD_VAE_DEBUG', None) is not None else lambda *args, **kwargs: None
+
+tile_sizes = [1024, 768, 512, 384, 256] # candidate tile sizes in pixels, largest first
+headroom = 0.9 # fraction of free memory a decode may use
+smoothing = 0.3 # weight of newest measurement in correction
+corrections: dict[str, float] = {} # vae class:mode -> actual/estimated ratio
+
+
+@dataclass
+class Plan:
+    key: str
+    tiled: bool = False
+    tile: int = 0 # tile size in pixels, 0 for full decode
+    tiles: int = 1
+    estimate: int = 0 # estimated peak bytes incl. correction
+    budget: int | None = None # usable bytes, None if memory cannot be measured
+    baseline: int = 0
+    saved: tuple | None = None # vae tiling state before plan was applied
+
+
+def estimate(shape, channels: list[int], dtype_bytes: int, batch: int | None = None) -> int:
+    """Raw peak activation bytes of decoding latents of given shape with a decoder using given block channels."""
+    batch = shape[0] if batch is None else batch
+    h, w = shape[-2], shape[-1]
+    widths = list(reversed(channels)) # decoder runs from widest block at latent resolution towards full resolution
+    elements = 0
+    for i, width in enumerate(widths):
+        pixels = h * w * 4 ** i
+        elements = max(elements, 3 * width * pixels) # resnet: residual, norm and conv output alive together
+        if i < len(widths) - 1:
+            elements = max(elements, width * pixels + 2 * width * 4 * pixels) # upsample: input, interpolated and conv output
+    output = 2 * 3 * h * w * 4 ** (len(widths) - 1) # conv_out and returned image
+    return batch * (elements + output) * dtype_bytes
+
+
+def tile_count(shape, tile_latent: int, overlap: float) -> int:
+    stride = max(int(tile_latent * (1 - overlap)), 1)
+    return math.ceil(shape[-2] / stride) * math.ceil(shape[-1] / stride)
+
+
+def supported(vae, shape) -> bool:
+    channels = getattr(getattr(vae, 'config', None), 'block_out_channels', None)
+    return len(shape) == 4 and isinstance(channels, (list, tuple)) and len(channels) > 0 and hasattr(vae, 'enable_tiling') and hasattr(vae, 'tile_latent_min_size')
+
+
+def plan(vae, shape, dtype_bytes: int, budget: int | None, slicing: bool = False, overlap: float = 0.25) -> Plan | None:
+    """Choose full decode or the tile size with fewest tiles that fits budget; budget None keeps static options."""
+    if not supported(vae, shape):
+        return None
+    channels = list(vae.config.block_out_channels)
+    scale = 2 ** (len(channels) - 1)
+    batch = 1 if slicing and shape[0] > 1 else shape[0]
+    name = vae.__class__.__name__
+    result = Plan(key=f'{name}:full', budget=budget)
+    result.estimate = int(estimate(shape, channels, dtype_bytes, batch) * corrections.get(result.key, 1.0))
+    if budget is None or result.estimate <= budget:
+        return result
+    output = 3 * shape[0] * shape[-2] * shape[-1] * scale * scale * dtype_bytes # tiled decode keeps decoded tiles and blended image
+    candidates = []
+    for tile in tile_sizes:
+        tile_latent = tile // scale
+        if tile_latent < 8 or tile_latent >= max(shape[-2], shape[-1]):
+            continue
+        tile_shape = (batch, shape[1], min(tile_latent, shape[-2]), min(tile_latent, shape[-1]))
+        needed = int((estimate(tile_shape, channels, dtype_bytes, batch) + 2 * output) * corrections.get(f'{name}:tiled', 1.0))
+        candidates.append(Plan(key=f'{name}:tiled', tiled=True, tile=tile, tiles=tile_count(shape, tile_latent, overlap), estimate=needed, budget=budget))
+    if len(candidates) == 0:
+        return result # latent smaller than any tile, tiling would not split it anyway
+    fitting = [candidate for candidate in candidates if candidate.estimate <= budget]
+    if len(fitting) == 0:
+        return candidates[-1] # nothing fits, smallest tile is the best effort
+    return min(fitting, key=lambda candidate: (candidate.tiles, -candidate.tile))
+
+
+def apply(vae, decode_plan: Plan) -> None:
+    decode_plan.saved = (getattr(vae, 'use_tiling', False), vae.tile_sample_min_size, vae.tile_latent_min_size)
+    if decode_plan.tiled:
+        channels = list(vae.config.block_out_channels)
+        vae.tile_sample_min_size = decode_plan.tile
+        vae.tile_latent_min_size = decode_plan.tile // (2 ** (len(channels) - 1))
+        vae.enable_tiling()
+    else:
+        vae.disable_tiling()
+
+
+def restore(vae, decode_plan: Plan | None) -> None:
+    """Put back tiling state set by set_vae_options from user settings."""
+    if decode_plan is None or decode_plan.saved is None:
+        return
+    tiling, vae.tile_sample_min_size, vae.tile_latent_min_size = decode_plan.saved
+    if tiling:
+        vae.enable_tiling()
+    else:
+        vae.disable_tiling()
+    decode_plan.saved = None
+
+
+def record(decode_plan: Plan, peak: int) -> float:
+    """Fold measured peak bytes of a decode into correction for its vae and mode, returns new correction."""
+    correction = corrections.get(decode_plan.key, 1.0)
+    if peak <= 0 or decode_plan.estimate <= 0:
+        return correction
+    raw = decode_plan.estimate / correction
+    ratio = min(max(peak / raw, 0.25), 4.0)
+    corrections[decode_plan.key] = (1 - smoothing) * correction + smoothing * ratio
+    return corrections[decode_plan.key]
+
+
+def memory_budget() -> int | None:
+    """Bytes a decode can allocate: free device memory plus allocator cache, None if device memory is not measurable."""
+    import torch
+    from modules import devices
+    if not devices.cuda_ok:
+        return None
+    try:
+        free, _total = torch.cuda.mem_get_info()
+        cached = torch.cuda.memory_reserved() - torch.cuda.memory_allocated()
+        return int(headroom * (free + cached))
+    except Exception:
+        return None
+
+
+def plan_decode(vae, latents) -> Plan | None:
+    from modules import shared
+    if not shared.opts.diffusers_vae_tile_auto:
+        return None
+    budget = memory_budget()
+    if budget is None:
+        return None
+    decode_plan = plan(vae, latents.shape, latents.element_size(), budget, slicing=getattr(vae, 'use_slicing', False), overlap=getattr(vae, 'tile_overlap_factor', 0.25))
+    if decode_plan is None:
+        return None
+    import torch
+    apply(vae, decode_plan)
+    shared.mem_mon.hold() # job peak stays in memory summary
+    decode_plan.baseline = torch.cuda.memory_allocated()
+    debug(f'VAE plan: {decode_plan}')
+    return decode_plan
+
+
+def measure(decode_plan: Plan | None) -> None:
+    if decode_plan is None:
+        return
+    import torch
+    try:
+        peak = torch.cuda.max_memory_allocated() # peak was reset right before decode
+    except Exception:
+        return
+    correction = record(decode_plan, peak - decode_plan.baseline)
+    debug(f'VAE plan: key={decode_plan.key} estimate={decode_plan.estimate} actual={peak - decode_plan.baseline} correction={correction:.2f}')
+
+
+def collect() -> None:
+    """Run gc after decode only when allocator high-water mark crossed gc threshold."""
+    import torch
+    from modules import shared, devices
+    if not devices.cuda_ok or shared.cmd_opts.lowvram:
+        devices.torch_gc()
+        return
+    try:
+        _free, total = torch.cuda.mem_get_info()
+        used = round(100 * torch.cuda.max_memory_allocated() / total) if total > 0 else 100 # same allocated bytes measure records
+    except Exception:
+        devices.torch_gc()
+        return
+    if used >= shared.opts.torch_gc_threshold:
+        devices.torch_gc(force=True, reason='vae')
+    else:
+        debug(f'VAE plan: gc skip used={used} threshold={shared.opts.torch_gc_threshold}')
@@ -1,5 +1,6 @@
 import os
 import threading
+import contextvars
 import numpy as np
 from PIL import Image
 from modules import shared, errors
@@ -89,7 +90,7 @@ def save_video(p, images, filename = None, video_type: str = 'none', duration: f
     filename = namegen.sanitize(filename)
     shared.state.outputs(filename)
     if not sync:
-        threading.Thread(target=save_video_atomic, args=(images, filename, video_type, duration, loop, interpolate, scale, pad, change)).start()
+        threading.Thread(target=contextvars.copy_context().run, args=(save_video_atomic, images, filename, video_type, duration, loop, interpolate, scale, pad, change)).start()
     else:
         save_video_atomic(images, filename, video_type, duration, loop, interpolate, scale, pad, change)
     return filename
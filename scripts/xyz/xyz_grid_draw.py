@@ -7,7 +7,7 @@ from modules.logger import log
 from modules.image.util import draw_text
 
 
-def draw_xyz_grid(p, xs, ys, zs, x_labels, y_labels, z_labels, cell, draw_legend, include_lone_images, include_sub_grids, first_axes_processed, second_axes_processed, margin_size, no_grid=False, include_time=False, include_text=False): # pylint: disable=unused-argument
+def draw_xyz_grid(p, xs, ys, zs, x_labels, y_labels, z_labels, cell, draw_legend, include_lone_images, include_sub_grids, first_axes_processed, second_axes_processed, margin_size, no_grid=False, include_time=False, include_text=False, order=None): # pylint: disable=unused-argument
     x_texts = [[GridAnnotation(x)] for x in x_labels]
     y_texts = [[GridAnnotation(y)] for y in y_labels]
     z_texts = [[GridAnnotation(z)] for z in z_labels]
@@ -67,7 +67,10 @@ def draw_xyz_grid(p, xs, ys, zs, x_labels, y_labels, z_labels, cell, draw_legend
             processed_result.images[idx] = Image.new(cell_mode, cell_size)
         shared.state.nextjob()
 
-    if first_axes_processed == 'x':
+    if order is not None:
+        for ix, iy, iz in order:
+            process_cell(xs[ix], ys[iy], zs[iz], ix, iy, iz)
+    elif first_axes_processed == 'x':
         for ix, x in enumerate(xs):
             if second_axes_processed == 'y':
                 for iy, y in enumerate(ys):
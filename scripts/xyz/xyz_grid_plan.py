@@ -0,0 +1,79 @@
+from collections import namedtuple
+from itertools import pairwise
+from modules import extra_networks
+from modules.logger import log
+
+
+batchable_axes = ['[Param] Seed', '[Param] Variation seed', '[Prompt] Search & replace'] # axes that only change per-image prompt/seed and can share one generate call, see network_groups
+batchable_fields = ['prompt', 'negative_prompt', 'seed', 'subseed']
+Plan = namedtuple('Plan', ['order', 'batches', 'groups', 'switches'])
+
+
+def axis_order(axes: dict):
+    """Sort axes so expensive state changes slowest and batchable axes change fastest.
+
+    Ties keep the previous default of z outermost, then y, then x.
+    """
+    priority = {'z': 0, 'y': 1, 'x': 2}
+    state = sorted([name for name, opt in axes.items() if opt.cost > 0], key=lambda name: (-axes[name].cost, priority[name]))
+    batchable = sorted([name for name, opt in axes.items() if opt.cost <= 0 and opt.label in batchable_axes], key=lambda name: priority[name])
+    cheap = sorted([name for name in axes if name not in state and name not in batchable], key=lambda name: priority[name])
+    return state, cheap, batchable
+
+
+def plan_cells(xs, ys, zs, x_opt, y_opt, z_opt, max_batch: int = 1) -> Plan:
+    """Build execution order for all grid cells and split it into generate calls.
+
+    Cells are grouped by expensive state so each checkpoint, LoRA or quantization combination is applied once,
+    and cells in a group that differ only on batchable axes are merged into batches of up to `max_batch` images.
+    """
+    axes = {'x': x_opt, 'y': y_opt, 'z': z_opt}
+    sizes = {'x': len(xs), 'y': len(ys), 'z': len(zs)}
+    state, cheap, batchable = axis_order(axes)
+    names = state + cheap + batchable
+    cells = [{'x': ix, 'y': iy, 'z': iz} for iz in range(sizes['z']) for iy in range(sizes['y']) for ix in range(sizes['x'])]
+    cells.sort(key=lambda c: tuple(c[name] for name in names))
+    order = [(c['x'], c['y'], c['z']) for c in cells]
+
+    batches = []
+    previous = None
+    for c, key in zip(cells, order, strict=False):
+        fixed = tuple(c[name] for name in state + cheap)
+        if previous == fixed and len(batches[-1]) < max(1, max_batch):
+            batches[-1].append(key)
+        else:
+            batches.append([key])
+        previous = fixed
+
+    switches = {}
+    for name in state:
+        values = [c[name] for c in cells]
+        switches[axes[name].label] = 1 + sum(1 for a, b in pairwise(values) if a != b)
+    groups = len({tuple(c[name] for name in state) for c in cells})
+    return Plan(order=order, batches=batches, groups=groups, switches=switches)
+
+
+def network_groups(prompts: list[str]) -> list[list[int]]:
+    """Split batch into runs of consecutive prompts with identical extra networks.
+
+    Extra networks are parsed once per generate call, so cells whose prompts carry different networks cannot share it.
+    """
+    groups = []
+    previous = None
+    for i, prompt in enumerate(prompts):
+        _prompt, networks = extra_networks.parse_prompt(prompt)
+        networks = dict(networks)
+        if len(groups) > 0 and networks == previous:
+            groups[-1].append(i)
+        else:
+            groups.append([i])
+        previous = networks
+    return groups
+
+
+def report(plan: Plan):
+    batched = sum(len(batch) for batch in plan.batches if len(batch) > 1)
+    switches = ' '.join(f'"{label}"={count}' for label, count in plan.switches.items())
+    log.info(f'XYZ grid plan: cells={len(plan.order)} calls={len(plan.batches)} batched={batched} max={max(len(batch) for batch in plan.batches)} groups={plan.groups} switches={{{switches}}}')
+    for i, batch in enumerate(plan.batches):
+        log.debug(f'XYZ grid plan: call={i+1}/{len(plan.batches)} cells={[(ix+1, iy+1, iz+1) for ix, iy, iz in batch]}')
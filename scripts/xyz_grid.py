@@ -11,6 +11,7 @@ import gradio as gr
 from scripts.xyz.xyz_grid_shared import str_permutations, list_to_csv_string, restore_comma, re_range, re_plain_comma # pylint: disable=no-name-in-module
 from scripts.xyz.xyz_grid_classes import axis_options, AxisOption, SharedSettingsStackHelper # pylint: disable=no-name-in-module
 from scripts.xyz.xyz_grid_draw import draw_xyz_grid # pylint: disable=no-name-in-module
+from scripts.xyz.xyz_grid_plan import plan_cells, report, network_groups, batchable_fields # pylint: disable=no-name-in-module
 from scripts.xyz.xyz_grid_shared import apply_field, apply_task_args, apply_setting, apply_prompt, apply_order, apply_sampler, apply_hr_sampler_name, confirm_samplers, apply_checkpoint, apply_refiner, apply_unet, apply_clip_skip, apply_vae, list_lora, apply_lora, apply_lora_strength, apply_te, apply_styles, apply_upscaler, apply_context, apply_detailer, apply_override, apply_processing, apply_options, apply_seed, format_value_add_label, format_value, format_value_join_list, do_nothing, format_nothing # pylint: disable=no-name-in-module, unused-import
 from modules import shared, errors, scripts_manager, images, video, processing
 from modules.ui_components import ToolButton
@@ -77,6 +78,7 @@ class XYZGridScript(scripts_manager.Script):
 
         with gr.Row():
             margin_size = gr.Slider(label="Grid margins", minimum=0, maximum=500, value=0, step=2, elem_id=self.elem_id("margin_size"))
+            batch_cells = gr.Slider(label="Batch cells", minimum=1, maximum=16, value=1, step=1, elem_id=self.elem_id("batch_cells"))
 
         with gr.Row():
             swap_xy_axes_button = gr.Button(value="Swap X/Y", elem_id="xy_grid_swap_axes_button", variant="secondary")
@@ -162,6 +164,7 @@ class XYZGridScript(scripts_manager.Script):
             include_grid, include_subgrids, include_images,
             include_time, include_text, margin_size,
             create_video, video_type, video_duration, video_loop, video_pad, video_interpolate,
+            batch_cells,
         ]
 
     def run(self, p,
@@ -172,6 +175,7 @@ class XYZGridScript(scripts_manager.Script):
             include_grid, include_subgrids, include_images,
             include_time, include_text, margin_size,
             create_video, video_type, video_duration, video_loop, video_pad, video_interpolate,
+            batch_cells=1,
            ): # pylint: disable=W0221
         jobid = shared.state.begin('XYZ Grid')
         if not shared.opts.return_grid:
@@ -298,46 +302,71 @@ class XYZGridScript(scripts_manager.Script):
         shared.state.xyz_plot_x = AxisInfo(x_opt, xs)
         shared.state.xyz_plot_y = AxisInfo(y_opt, ys)
         shared.state.xyz_plot_z = AxisInfo(z_opt, zs)
-        first_axes_processed = 'z'
-        second_axes_processed = 'y'
-        if x_opt.cost > y_opt.cost and x_opt.cost > z_opt.cost:
-            first_axes_processed = 'x'
-            if y_opt.cost > z_opt.cost:
-                second_axes_processed = 'y'
-            else:
-                second_axes_processed = 'z'
-        elif y_opt.cost > x_opt.cost and y_opt.cost > z_opt.cost:
-            first_axes_processed = 'y'
-            if x_opt.cost > z_opt.cost:
-                second_axes_processed = 'x'
-            else:
-                second_axes_processed = 'z'
-        elif z_opt.cost > x_opt.cost and z_opt.cost > y_opt.cost:
-            first_axes_processed = 'z'
-            if x_opt.cost > y_opt.cost:
-                second_axes_processed = 'x'
-            else:
-                second_axes_processed = 'y'
+        max_batch = int(batch_cells) if p.batch_size == 1 and p.n_iter == 1 else 1 # cells are batched only when each cell is a single image
+        plan = plan_cells(xs, ys, zs, x_opt, y_opt, z_opt, max_batch=max_batch)
+        report(plan)
+        batch_of = {key: batch for batch in plan.batches for key in batch}
+        results = {}
         grid_infotext = [None] * (1 + len(zs))
 
-        def cell(x, y, z, ix, iy, iz):
-            if shared.state.interrupted:
-                return processing.Processed(p, [], p.seed, ""), 0
+        def prepare(ix, iy, iz):
             p.xyz = True
             pc = copy(p)
             pc.override_settings_restore_afterwards = False
             pc.styles = pc.styles[:]
-            x_opt.apply(pc, x, xs)
-            y_opt.apply(pc, y, ys)
-            z_opt.apply(pc, z, zs)
-
-            t0 = time.time()
-            try:
-                processed = processing.process_images(pc)
-            except Exception as e:
-                log.error(f"XYZ grid: Failed to process image: {e}")
-                errors.display(e, 'XYZ grid')
-                processed = None
+            x_opt.apply(pc, xs[ix], xs)
+            y_opt.apply(pc, ys[iy], ys)
+            z_opt.apply(pc, zs[iz], zs)
+            return pc
+
+        def process_batch(pcs):
+            if len(pcs) == 1:
+                return [processing.process_images(pcs[0])]
+            groups = network_groups([f'{pc.prompt} {pc.negative_prompt}' for pc in pcs]) # search & replace can change extra networks per cell
+            if len(groups) > 1:
+                return [output for group in groups for output in process_batch([pcs[i] for i in group])]
+            pb = copy(pcs[0]) # cells in a batch differ only in batchable fields
+            for field in batchable_fields:
+                setattr(pb, field, [getattr(pc, field) for pc in pcs])
+            pb.seed = [processing.get_fixed_seed(seed) for seed in pb.seed]
+            pb.subseed = [processing.get_fixed_seed(seed) for seed in pb.subseed]
+            pb.all_prompts, pb.all_negative_prompts, pb.all_seeds, pb.all_subseeds = None, None, None, None
+            pb.batch_size = len(pcs)
+            pb.do_not_save_grid = True
+            processed = processing.process_images(pb)
+            outputs = []
+            for i, pc in enumerate(pcs):
+                idx = processed.index_of_first_image + i
+                if idx >= len(processed.images):
+                    outputs.append(None)
+                    continue
+                res = copy(processed)
+                res.images = [processed.images[idx]]
+                res.infotexts = [processed.infotexts[idx]] if idx < len(processed.infotexts) else [processed.info]
+                res.prompt, res.negative_prompt = pb.all_prompts[i], pb.all_negative_prompts[i]
+                res.seed, res.subseed = pb.all_seeds[i], pb.all_subseeds[i]
+                res.index_of_first_image = 0
+                pc.all_prompts, pc.all_negative_prompts, pc.all_seeds, pc.all_subseeds = [res.prompt], [res.negative_prompt], [res.seed], [res.subseed]
+                outputs.append(res)
+            return outputs
+
+        def cell(x, y, z, ix, iy, iz): # pylint: disable=unused-argument
+            if shared.state.interrupted:
+                return processing.Processed(p, [], p.seed, ""), 0
+            if (ix, iy, iz) not in results:
+                batch = batch_of[(ix, iy, iz)]
+                pcs = [prepare(*key) for key in batch]
+                t0 = time.time()
+                try:
+                    outputs = process_batch(pcs)
+                except Exception as e:
+                    log.error(f"XYZ grid: Failed to process image: {e}")
+                    errors.display(e, 'XYZ grid')
+                    outputs = [None] * len(pcs)
+                elapsed = (time.time() - t0) / len(pcs)
+                for key, pc, output in zip(batch, pcs, outputs, strict=False):
+                    results[key] = (pc, output, elapsed)
+            pc, processed, elapsed = results.pop((ix, iy, iz))
             subgrid_index = 1 + iz # Sets subgrid infotexts
             if grid_infotext[subgrid_index] is None and ix == 0 and iy == 0:
                 pc.extra_generation_params = copy(pc.extra_generation_params)
@@ -362,8 +391,7 @@ class XYZGridScript(scripts_manager.Script):
                         pc.extra_generation_params["Fixed Z Values"] = ", ".join([str(z) for z in zs])
                 grid_text = f'{len(zs)}x{len(xs)}x{len(ys)}' if len(zs) > 0 else f'{len(xs)}x{len(ys)}'
                 grid_infotext[0] = processing.create_infotext(pc, pc.all_prompts, pc.all_seeds, pc.all_subseeds, grid=grid_text)
-            t1 = time.time()
-            return processed, t1-t0
+            return processed, elapsed
 
         with SharedSettingsStackHelper():
             processed: processing.Processed = draw_xyz_grid(
@@ -378,12 +406,13 @@ class XYZGridScript(scripts_manager.Script):
                 draw_legend=draw_legend,
                 include_lone_images=include_images,
                 include_sub_grids=include_subgrids,
-                first_axes_processed=first_axes_processed,
-                second_axes_processed=second_axes_processed,
+                first_axes_processed=None,
+                second_axes_processed=None,
                 margin_size=margin_size,
                 no_grid=not include_grid,
                 include_time=include_time,
                 include_text=include_text,
+                order=plan.order,
             )
 
         if hasattr(shared.sd_model, 'restore_pipeline') and (shared.sd_model.restore_pipeline is not None):
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Image save throughput: single worker with default encoder vs worker pool and encoder presets, CPU only.
+
+Usage:
+    python test/benchmark_save.py [images] [format]
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+os.environ['SD_INSTALL_QUIET'] = '1'
+
+import modules.cmd_args # pylint: disable=wrong-import-position
+import installer # pylint: disable=wrong-import-position
+installer.add_args(modules.cmd_args.parser)
+modules.cmd_args.parsed, _ = modules.cmd_args.parser.parse_known_args([])
+
+from PIL import Image # pylint: disable=wrong-import-position
+from modules import shared, paths, script_callbacks # pylint: disable=wrong-import-position
+from modules.image import save # pylint: disable=wrong-import-position
+
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+extension = sys.argv[2] if len(sys.argv) > 2 else 'png'
+runs = [
+    # workers, preset
+    (1, 'default'),
+    (4, 'default'),
+    (4, 'fast-png'),
+    (4, 'archival-png'),
+    (4, 'webp-fast'),
+]
+
+
+def make_images(n, size=512):
+    rng = np.random.default_rng(42)
+    gradient = np.linspace(0, 255, size, dtype=np.float32)
+    base = np.stack([np.add.outer(gradient, gradient) / 2, np.tile(gradient, (size, 1)), np.tile(gradient[:, None], (1, size))], axis=-1)
+    return [Image.fromarray(np.clip(base + rng.normal(0, 8, base.shape), 0, 255).astype(np.uint8)) for _i in range(n)]
+
+
+def run(workers, preset, images, folder):
+    shared.opts.save_encoder_preset = preset
+    shared.opts.save_log_fn = 'benchmark-save-log'
+    pool = save.SavePool(workers=workers)
+    ext = '.webp' if preset == 'webp-fast' else f'.{extension}'
+    t0 = time.time()
+    for i, image in enumerate(images):
+        filename = os.path.join(folder, f'{workers}-{preset}-{i:05}')
+        params = script_callbacks.ImageSaveParams(image, None, filename + ext, {'parameters': f'benchmark image {i}'})
+        pool.submit(save.SaveJob(image, filename, ext, params, f'benchmark image {i}', None, False))
+    pool.wait()
+    t1 = time.time()
+    pool.resize(1)
+    size = sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder) if f.startswith(f'{workers}-{preset}-'))
+    stats = pool.stats()
+    print(f'workers={workers} preset={preset} format={ext[1:]} images={len(images)} time={t1-t0:.2f} rate={len(images)/(t1-t0):.1f}/s size={size/1024/1024:.1f}MB encode={stats["encode"]:.2f} write={stats["write"]:.2f} blocked={stats["blocked"]:.2f}')
+
+
+if __name__ == '__main__':
+    shared.opts.save_txt = False
+    samples = make_images(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n, name in runs:
+            run(n, name, samples, tmp)
+    log_fn = os.path.join(paths.data_path, 'benchmark-save-log.json')
+    if os.path.isfile(log_fn):
+        os.remove(log_fn)
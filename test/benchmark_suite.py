@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+"""
+In-process CPU benchmark suite for hot paths with JSON results and regression baselines.
+
+Cases run against synthetic data and tiny randomly initialized diffusers models, no server, gpu or downloaded model required.
+Each case is timed after warmup and reported as median, min and mean seconds per iteration.
+
+Usage:
+    python test/benchmark_suite.py                      # run all cases and print results
+    python test/benchmark_suite.py --only hash,lora     # run cases whose name contains any of the filters
+    python test/benchmark_suite.py --save               # run and store results as baseline
+    python test/benchmark_suite.py --compare            # run and compare with baseline, exit code 1 on regression
+    python test/benchmark_suite.py --compare --input results.json # compare existing results without running
+"""
+import os
+import sys
+import json
+import time
+import copy
+import types
+import random
+import platform
+import argparse
+import tempfile
+import statistics
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+os.environ['SD_INSTALL_QUIET'] = '1'
+
+import modules.cmd_args # pylint: disable=wrong-import-position
+import installer # pylint: disable=wrong-import-position
+installer.add_args(modules.cmd_args.parser)
+modules.cmd_args.parsed, _ = modules.cmd_args.parser.parse_known_args([])
+
+import torch # pylint: disable=wrong-import-position
+import numpy as np # pylint: disable=wrong-import-position
+from PIL import Image # pylint: disable=wrong-import-position
+from modules import shared # pylint: disable=wrong-import-position
+
+
+result_version = 1
+default_baseline = os.path.join(script_dir, 'test', 'benchmark-baseline.json')
+cases = {} # name -> setup function returning callable to time
+fixtures = {}
+
+
+def case(name, repeats=10):
+    def register(fn):
+        cases[name] = (fn, repeats)
+        return fn
+    return register
+
+
+def measure(fn, repeats: int, warmup: int = 1, min_time: float = 0.0) -> dict:
+    for _i in range(warmup):
+        fn()
+    times = []
+    t_start = time.perf_counter()
+    while len(times) < repeats or (time.perf_counter() - t_start) < min_time:
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {
+        'status': 'ok',
+        'median': statistics.median(times),
+        'min': min(times),
+        'mean': statistics.fmean(times),
+        'repeats': len(times),
+    }
+
+
+def system_info() -> dict:
+    return {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'threads': torch.get_num_threads(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def tmp_dir() -> str:
+    if 'tmp' not in fixtures:
+        fixtures['tmp'] = tempfile.TemporaryDirectory(prefix='sdnext-benchmark-')
+    return fixtures['tmp'].name
+
+
+def tiny_tokenizer(folder: str):
+    from transformers import CLIPTokenizer
+    from transformers.models.clip.tokenization_clip import bytes_to_unicode
+    chars = list(bytes_to_unicode().values())
+    vocab = {'<|startoftext|>': 0, '<|endoftext|>': 1}
+    for token in chars + [f'{c}</w>' for c in chars]:
+        vocab.setdefault(token, len(vocab))
+    vocab_file = os.path.join(folder, 'vocab.json')
+    merges_file = os.path.join(folder, 'merges.txt')
+    with open(vocab_file, 'w', encoding='utf8') as f:
+        json.dump(vocab, f)
+    with open(merges_file, 'w', encoding='utf8') as f:
+        f.write('#version: 0.2\n')
+    return CLIPTokenizer(vocab_file, merges_file, model_max_length=77)
+
+
+def tiny_pipeline():
+    """Randomly initialized sd-style pipeline small enough to run a full generation on cpu in well under a second."""
+    if 'pipe' in fixtures:
+        return fixtures['pipe']
+    from diffusers import StableDiffusionPipeline, UNet2DConditionModel, AutoencoderKL, DDIMScheduler
+    from transformers import CLIPTextConfig, CLIPTextModel
+    from modules.modeldata import model_data
+    torch.manual_seed(0)
+    unet = UNet2DConditionModel(block_out_channels=(32, 64), layers_per_block=1, sample_size=8, in_channels=4, out_channels=4, down_block_types=('DownBlock2D', 'CrossAttnDownBlock2D'), up_block_types=('CrossAttnUpBlock2D', 'UpBlock2D'), cross_attention_dim=32, attention_head_dim=(2, 4), norm_num_groups=32)
+    vae = AutoencoderKL(block_out_channels=[8, 16, 32, 32], down_block_types=['DownEncoderBlock2D'] * 4, up_block_types=['UpDecoderBlock2D'] * 4, latent_channels=4, norm_num_groups=8, layers_per_block=1, sample_size=64)
+    text_encoder = CLIPTextModel(CLIPTextConfig(bos_token_id=0, eos_token_id=1, pad_token_id=1, hidden_size=32, intermediate_size=37, num_attention_heads=4, num_hidden_layers=2, vocab_size=600))
+    scheduler = DDIMScheduler(beta_start=0.00085, beta_end=0.012, beta_schedule='scaled_linear', clip_sample=False, set_alpha_to_one=False)
+    pipe = StableDiffusionPipeline(vae=vae.eval(), text_encoder=text_encoder.eval(), tokenizer=tiny_tokenizer(tmp_dir()), unet=unet.eval(), scheduler=scheduler, safety_checker=None, feature_extractor=None, requires_safety_checker=False)
+    pipe.sd_checkpoint_info = types.SimpleNamespace(name='benchmark', title='benchmark', model_name='benchmark', filename='', hash=None, shorthash=None, sha256=None, type='diffusers')
+    pipe.sd_model_hash = None
+    pipe.sd_model_checkpoint = ''
+    model_data.sd_model = pipe # bypass model load, same as native adapter tests
+    fixtures['pipe'] = pipe
+    return pipe
+
+
+prompts = [
+    'a photo of a (red:1.2) fox sitting in a [snowy:forest:0.4] clearing, highly detailed, (sharp focus:0.8)',
+    'portrait of an astronaut, ((cinematic lighting)), [oil painting|watercolor], by greg rutkowski and alphonse mucha',
+    'BREAK '.join(['landscape with mountains and a lake at sunset'] * 3),
+    '(masterpiece:1.3), best quality, 1girl, solo, long hair, looking at viewer, smile, outdoors, [[blurry]], (detailed background:1.1)',
+]
+
+
+@case('prompt-parse', repeats=50)
+def case_prompt_parse():
+    from modules import prompt_parser
+    def fn():
+        prompt_parser.get_learned_conditioning_prompt_schedules(prompts, 30)
+        for prompt in prompts:
+            prompt_parser.parse_prompt_attention(prompt)
+    return fn
+
+
+@case('prompt-embed', repeats=20)
+def case_prompt_embed():
+    from modules import prompt_parser_diffusers
+    tiny_pipeline()
+    shared.opts.sd_textencoder_cache_size = 0 # measure encode, not cache lookup
+    p = types.SimpleNamespace(network_data={})
+    def fn():
+        prompt_parser_diffusers.PromptEmbedder(prompts, [''] * len(prompts), 20, 1, p)
+    return fn
+
+
+def file_tree(folders: int = 50, files: int = 40) -> str:
+    root = os.path.join(tmp_dir(), 'tree')
+    if not os.path.isdir(root):
+        for i in range(folders):
+            folder = os.path.join(root, f'folder-{i:03}', 'sub')
+            os.makedirs(folder)
+            for j in range(files):
+                ext = '.safetensors' if j % 2 == 0 else '.png'
+                with open(os.path.join(folder, f'item-{j:04}{ext}'), 'wb') as f:
+                    f.write(b'\0' * 16)
+    return root
+
+
+@case('files-scan-cold', repeats=10)
+def case_files_scan_cold():
+    from modules import files_cache
+    root = file_tree()
+    def fn():
+        files_cache.cache_folders.clear()
+        list(files_cache.list_files(root, ext_filter=['.safetensors']))
+    return fn
+
+
+@case('files-scan-warm', repeats=50)
+def case_files_scan_warm():
+    from modules import files_cache
+    root = file_tree()
+    list(files_cache.list_files(root, ext_filter=['.safetensors']))
+    def fn():
+        list(files_cache.list_files(root, ext_filter=['.safetensors']))
+    return fn
+
+
+@case('hash-sha256', repeats=5)
+def case_hash():
+    from modules import hashes
+    filename = os.path.join(tmp_dir(), 'hash.bin')
+    with open(filename, 'wb') as f:
+        f.write(os.urandom(64 * 1024 * 1024))
+    def fn():
+        hashes.calculate_sha256(filename, quiet=True)
+    return fn
+
+
+def tiny_lora(rank: int = 4) -> str:
+    import safetensors.torch
+    filename = os.path.join(tmp_dir(), 'benchmark-lora.safetensors')
+    if os.path.isfile(filename):
+        return filename
+    pipe = tiny_pipeline()
+    state_dict = {}
+    for name, module in pipe.unet.named_modules():
+        if isinstance(module, torch.nn.Linear) and ('attn' in name or 'ff' in name):
+            key = 'lora_unet_' + name.replace('.', '_')
+            state_dict[f'{key}.lora_down.weight'] = torch.randn(rank, module.in_features) * 0.01
+            state_dict[f'{key}.lora_up.weight'] = torch.randn(module.out_features, rank) * 0.01
+            state_dict[f'{key}.alpha'] = torch.tensor(float(rank))
+    safetensors.torch.save_file(state_dict, filename)
+    return filename
+
+
+@case('lora-load', repeats=10)
+def case_lora_load():
+    from modules.lora import lora_load, lora_convert
+    pipe = tiny_pipeline()
+    filename = tiny_lora()
+    lora_convert.assign_network_names_to_compvis_modules(pipe)
+    def fn():
+        lora_load.lora_cache.clear()
+        lora_load.network_load([filename], te_multipliers=[1.0], unet_multipliers=[1.0])
+    return fn
+
+
+@case('lora-apply', repeats=10)
+def case_lora_apply():
+    from modules.lora import lora_load, lora_convert, networks
+    pipe = tiny_pipeline()
+    filename = tiny_lora()
+    lora_convert.assign_network_names_to_compvis_modules(pipe)
+    lora_load.network_load([filename], te_multipliers=[1.0], unet_multipliers=[1.0])
+    def fn():
+        networks.network_activate()
+        networks.network_deactivate()
+    return fn
+
+
+@case('sdnq-quantize', repeats=10)
+def case_sdnq_quantize():
+    from modules.sdnq import SDNQConfig, sdnq_quantize_layer
+    torch.manual_seed(0)
+    layer = torch.nn.Linear(2048, 2048)
+    def fn():
+        sdnq_quantize_layer(copy.deepcopy(layer), SDNQConfig(weights_dtype='int8'))
+    return fn
+
+
+@case('sdnq-dequantize', repeats=20)
+def case_sdnq_dequantize():
+    from modules.sdnq import SDNQConfig, sdnq_quantize_layer
+    torch.manual_seed(0)
+    layer, _config = sdnq_quantize_layer(torch.nn.Linear(2048, 2048), SDNQConfig(weights_dtype='int8'))
+    def fn():
+        layer.sdnq_dequantizer(layer.weight, layer.scale, zero_point=layer.zero_point, svd_up=layer.svd_up, svd_down=layer.svd_down, skip_quantized_matmul=layer.sdnq_dequantizer.use_quantized_matmul)
+    return fn
+
+
+def decoded_batch(batch: int = 4, size: int = 512):
+    torch.manual_seed(0)
+    return torch.rand(batch, 3, size, size) * 2 - 1
+
+
+@case('vae-postprocess-np', repeats=10)
+def case_vae_postprocess_np():
+    from diffusers.image_processor import VaeImageProcessor
+    from modules import processing_vae
+    model = types.SimpleNamespace(image_processor=VaeImageProcessor())
+    tensor = decoded_batch()
+    def fn():
+        processing_vae.vae_postprocess(tensor, model, output_type='np')
+    return fn
+
+
+@case('vae-postprocess-uint8', repeats=10)
+def case_vae_postprocess_uint8():
+    from diffusers.image_processor import VaeImageProcessor
+    from modules import processing_vae
+    model = types.SimpleNamespace(image_processor=VaeImageProcessor())
+    tensor = decoded_batch()
+    def fn():
+        processing_vae.vae_postprocess(tensor, model, output_type='uint8')
+    return fn
+
+
+@case('image-save', repeats=3)
+def case_image_save():
+    from modules import script_callbacks
+    from modules.image import save
+    folder = os.path.join(tmp_dir(), 'save')
+    os.makedirs(folder, exist_ok=True)
+    shared.opts.save_txt = False
+    shared.opts.save_log_fn = ''
+    rng = np.random.default_rng(42)
+    samples = [Image.fromarray(rng.integers(0, 255, (512, 512, 3), dtype=np.uint8)) for _i in range(16)]
+    pool = save.SavePool(workers=shared.opts.save_workers)
+    counter = iter(range(1000000))
+    def fn():
+        run = next(counter)
+        for i, image in enumerate(samples):
+            filename = os.path.join(folder, f'{run:04}-{i:04}')
+            params = script_callbacks.ImageSaveParams(image, None, filename + '.png', {'parameters': f'benchmark image {i}'})
+            pool.submit(save.SaveJob(image, filename, '.png', params, f'benchmark image {i}', None, False))
+        pool.wait()
+    return fn
+
+
+@case('process-images', repeats=5)
+def case_process_images():
+    from modules import processing
+    pipe = tiny_pipeline()
+    shared.opts.sd_textencoder_cache_size = 0
+    def fn():
+        p = processing.StableDiffusionProcessingTxt2Img(sd_model=pipe, prompt=prompts[0], negative_prompt='blurry', steps=4, width=64, height=64, batch_size=2, n_iter=1, seed=42, do_not_save_samples=True, do_not_save_grid=True)
+        processed = processing.process_images(p)
+        if processed is None or len(processed.images) != 2:
+            raise RuntimeError(f'unexpected output: {processed}')
+    return fn
+
+
+def run(selected: list[str]) -> dict:
+    results = {}
+    for name, (setup, repeats) in cases.items():
+        if selected and not any(item in name for item in selected):
+            continue
+        random.seed(42)
+        try:
+            fn = setup()
+            with torch.no_grad():
+                results[name] = measure(fn, repeats)
+            print(f'{name}: median={results[name]["median"]:.4f} min={results[name]["min"]:.4f} repeats={results[name]["repeats"]}')
+        except ImportError as e:
+            results[name] = {'status': 'skip', 'error': str(e)}
+            print(f'{name}: skip {e}')
+        except Exception as e:
+            results[name] = {'status': 'error', 'error': f'{type(e).__name__}: {e}'}
+            print(f'{name}: error {type(e).__name__}: {e}')
+    return {'version': result_version, 'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'), 'system': system_info(), 'results': results}
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print per-case ratio against baseline and return names of cases slower than baseline by more than threshold."""
+    regressions = []
+    if baseline.get('system', {}).get('platform') != current.get('system', {}).get('platform'):
+        print(f'warning: baseline platform="{baseline.get("system", {}).get("platform")}" current="{current.get("system", {}).get("platform")}"')
+    for name, item in current.get('results', {}).items():
+        reference = baseline.get('results', {}).get(name, None)
+        if item.get('status') != 'ok' or reference is None or reference.get('status') != 'ok':
+            print(f'{name}: not compared current={item.get("status")} baseline={reference.get("status") if reference else None}')
+            continue
+        ratio = item['median'] / reference['median'] if reference['median'] > 0 else 1.0
+        regressed = ratio > 1 + threshold
+        if regressed:
+            regressions.append(name)
+        print(f'{name}: baseline={reference["median"]:.4f} current={item["median"]:.4f} ratio={ratio:.2f} {"REGRESSION" if regressed else "ok"}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='sdnext cpu benchmark suite')
+    parser.add_argument('--only', type=str, default='', help='comma separated list of case name filters')
+    parser.add_argument('--output', type=str, default=None, help='write results json to file')
+    parser.add_argument('--input', type=str, default=None, help='load results json instead of running cases')
+    parser.add_argument('--baseline', type=str, default=default_baseline, help='baseline json file')
+    parser.add_argument('--save', action='store_true', help='store results as baseline')
+    parser.add_argument('--compare', action='store_true', help='compare results with baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown before a case is flagged as regression')
+    parser.add_argument('--threads', type=int, default=0, help='torch cpu threads, 0 keeps default')
+    parser.add_argument('--list', action='store_true', help='list available cases')
+    args = parser.parse_args()
+    if args.list:
+        print('\n'.join(cases.keys()))
+        sys.exit(0)
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    if args.input:
+        with open(args.input, encoding='utf8') as f:
+            data = json.load(f)
+    else:
+        data = run([item.strip() for item in args.only.split(',') if item.strip()])
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            json.dump(data, f, indent=2)
+    if args.save:
+        with open(args.baseline, 'w', encoding='utf8') as f:
+            json.dump(data, f, indent=2)
+        print(f'baseline: saved="{args.baseline}"')
+    exit_code = 1 if any(item.get('status') == 'error' for item in data['results'].values()) else 0
+    if args.compare:
+        if not os.path.isfile(args.baseline):
+            print(f'baseline: missing="{args.baseline}" run with --save first')
+            sys.exit(2)
+        with open(args.baseline, encoding='utf8') as f:
+            reference_data = json.load(f)
+        failed = compare(data, reference_data, args.threshold)
+        if len(failed) > 0:
+            print(f'regressions: {failed}')
+            exit_code = 1
+    for item in fixtures.values():
+        if hasattr(item, 'cleanup'):
+            item.cleanup()
+    sys.exit(exit_code)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+Offline tests for CivitAI downloader: incremental hashing and parallel ranged downloads.
+
+Uses a local HTTP server with Range support as a stand-in for CivitAI CDN.
+No running SD.Next server or network access required.
+
+Usage:
+    python test/test-civitai-download.py
+"""
+
+import os
+import sys
+import time
+import hashlib
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+
+os.environ['SD_INSTALL_QUIET'] = '1'
+
+# Initialize cmd_args before any module imports (required by shared.py)
+import modules.cmd_args
+import installer
+installer.add_args(modules.cmd_args.parser)
+modules.cmd_args.parsed, _ = modules.cmd_args.parser.parse_known_args([])
+
+from modules.logger import log
+
+payload = os.urandom(3 * 1024 * 1024 + 12345)
+payload_sha256 = hashlib.sha256(payload).hexdigest()
+requests_seen = []
+server_state = {'fail_ranges': False}
+results = {'passed': 0, 'failed': 0}
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        pass
+
+    def do_GET(self):
+        requests_seen.append(self.headers.get('Range'))
+        start, end = 0, len(payload) - 1
+        rng = self.headers.get('Range')
+        if rng and server_state['fail_ranges']:
+            self.send_response(500)
+            self.end_headers()
+            return
+        if rng and rng.startswith('bytes='):
+            first, last = rng[6:].split('-')
+            start = int(first)
+            end = int(last) if last else len(payload) - 1
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(payload)}')
+        else:
+            self.send_response(200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Content-Disposition', 'attachment; filename="model.safetensors"')
+        self.end_headers()
+        self.wfile.write(payload[start:end + 1])
+
+
+def record(passed, name, detail=''):
+    results['passed' if passed else 'failed'] += 1
+    msg = f'  {"PASS" if passed else "FAIL"}: {name}'
+    if detail:
+        msg += f' ({detail})'
+    if passed:
+        log.info(msg)
+    else:
+        log.error(msg)
+
+
+def test_ranged_download(url, folder):
+    """Parallel ranged download reassembles file and hashes it while downloading."""
+    from modules.civitai import download_civitai
+    download_civitai.RANGED_MIN_SEGMENT = 256 * 1024
+    temp_file = os.path.join(folder, 'ranged.tmp')
+    hasher = hashlib.sha256()
+    progress = []
+    requests_seen.clear()
+    written = download_civitai.download_ranged(url, temp_file, len(payload), 4, hasher=hasher, on_progress=progress.append)
+    with open(temp_file, 'rb') as f:
+        content = f.read()
+    assert written == len(payload), f'written={written} expected={len(payload)}'
+    assert content == payload, 'content mismatch'
+    assert hasher.hexdigest() == payload_sha256, 'hash mismatch'
+    assert len([r for r in requests_seen if r]) == 4, f'ranges={requests_seen}'
+    assert progress[-1] == len(payload), f'progress={progress[-1]}'
+
+
+def test_ranged_cancel(url, folder):
+    """Ranged download stops when cancelled and reports partial size."""
+    from modules.civitai import download_civitai
+    temp_file = os.path.join(folder, 'cancel.tmp')
+    written = download_civitai.download_ranged(url, temp_file, len(payload), 4, hasher=hashlib.sha256(), cancelled=lambda: True)
+    assert written < len(payload), f'written={written}'
+
+
+def test_manager_download(url, folder):
+    """DownloadManager verifies expected hash without re-reading file and seeds hash cache."""
+    from modules import shared, hashes
+    from modules.civitai import download_civitai
+    shared.opts.data['civitai_download_connections'] = 4
+    download_civitai.RANGED_MIN_SIZE = 1024 * 1024
+    item = download_civitai.DownloadItem(url=url, folder=folder, filename='model.safetensors', model_type='LORA', expected_hash=payload_sha256.upper())
+    calls = []
+    original_calculate, original_save = hashes.calculate_sha256, hashes.save_cache
+    hashes.calculate_sha256 = lambda *args, **kwargs: calls.append(args) or original_calculate(*args, **kwargs)
+    hashes.save_cache = lambda: None # do not persist test entries
+    try:
+        download_civitai.DownloadManager()._download(item)
+    finally:
+        hashes.calculate_sha256, hashes.save_cache = original_calculate, original_save
+    assert item.status == 'completed', f'status={item.status} error={item.error}'
+    assert len(calls) == 0, 'file was re-read for hashing'
+    cached = hashes.cache().get('lora/model', {})
+    assert cached.get('sha256') == payload_sha256, f'cache={cached}'
+
+
+def test_manager_ranged_failure(url, folder):
+    """Failed ranged download removes preallocated temp file so next attempt starts over."""
+    from modules import hashes
+    from modules.civitai import download_civitai
+    folder = os.path.join(folder, 'failure')
+    url = f'{url}?failure'
+    temp_file = os.path.join(folder, f'{hashlib.sha256(url.encode("utf-8")).hexdigest()[:8]}.tmp')
+    item = download_civitai.DownloadItem(url=url, folder=folder, filename='failure.safetensors', model_type='LORA', expected_hash=payload_sha256.upper())
+    server_state['fail_ranges'] = True
+    try:
+        download_civitai.DownloadManager()._download(item)
+    finally:
+        server_state['fail_ranges'] = False
+    assert item.status == 'failed', f'status={item.status}'
+    assert not os.path.exists(temp_file), 'preallocated temp file left behind'
+    item = download_civitai.DownloadItem(url=url, folder=folder, filename='failure.safetensors', model_type='LORA', expected_hash=payload_sha256.upper())
+    original_save = hashes.save_cache
+    hashes.save_cache = lambda: None # do not persist test entries
+    try:
+        download_civitai.DownloadManager()._download(item)
+    finally:
+        hashes.save_cache = original_save
+    assert item.status == 'completed', f'retry status={item.status} error={item.error}'
+
+
+def run_tests():
+    t0 = time.time()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/model.safetensors'
+    log.warning('=== CivitAI download ===')
+    with tempfile.TemporaryDirectory() as folder:
+        for fn in [test_ranged_download, test_ranged_cancel, test_manager_download, test_manager_ranged_failure]:
+            try:
+                fn(url, folder)
+                record(True, fn.__name__)
+            except Exception as e:
+                record(False, fn.__name__, str(e))
+    server.shutdown()
+    log.warning(f'Total: {results["passed"]} passed, {results["failed"]} failed in {time.time() - t0:.2f}s')
+    if results['failed'] > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Control processor cache test with canny processor: repeated input skips detection, params and input changes miss, disk tier survives memory clear, cpu only
+"""
+import os
+import sys
+import tempfile
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+os.environ['SD_INSTALL_QUIET'] = '1'
+
+import modules.cmd_args # pylint: disable=wrong-import-position
+import installer # pylint: disable=wrong-import-position
+installer.add_args(modules.cmd_args.parser)
+modules.cmd_args.parsed, _ = modules.cmd_args.parser.parse_known_args([])
+
+import numpy as np # pylint: disable=wrong-import-position
+from PIL import Image # pylint: disable=wrong-import-position
+from modules import shared # pylint: disable=wrong-import-position
+from modules.control import processors, cache # pylint: disable=wrong-import-position
+
+
+failures = 0
+
+
+def check(name, ok, details=''):
+    global failures # pylint: disable=global-statement
+    if not ok:
+        failures += 1
+    print(f'{"PASS" if ok else "FAIL"}: {name} {details}')
+
+
+class Counting:
+    def __init__(self, model):
+        self.model = model
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.model(*args, **kwargs)
+
+
+def make_image(seed, size=256):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 255, (size, size, 3), dtype=np.uint8))
+
+
+if __name__ == '__main__':
+    processors.delay_load_config()
+    with tempfile.TemporaryDirectory() as tmp:
+        cache.folder = lambda: tmp
+        cache.clear()
+        shared.opts.control_cache_size = 4
+        shared.opts.control_cache_disk = 16
+        processor = processors.Processor('Canny')
+        counter = Counting(processor.model)
+        processor.model = counter
+        image = make_image(1)
+
+        first = processor(image)
+        second = processor(image)
+        check('first call runs processor', counter.calls == 1, f'calls={counter.calls}')
+        check('repeated input served from cache', counter.calls == 1 and np.array_equal(np.array(first), np.array(second)))
+        check('cached result is a copy', first is not second)
+        grayscale = processor(image, mode='L')
+        check('mode conversion applied to cached result', counter.calls == 1 and grayscale.mode == 'L', f'mode={grayscale.mode}')
+
+        processor(image, local_config={'low_threshold': 50})
+        check('changed params miss', counter.calls == 2, f'calls={counter.calls}')
+        processor(make_image(2))
+        check('changed input miss', counter.calls == 3, f'calls={counter.calls}')
+
+        cache.clear() # memory only, disk tier remains
+        cache.disk_index = None # simulate restart
+        third = processor(image)
+        check('disk tier hit after memory clear', counter.calls == 3 and np.array_equal(np.array(first), np.array(third)), f'calls={counter.calls}')
+
+        shared.opts.control_cache_size = 0
+        shared.opts.control_cache_disk = 0
+        processor(image)
+        check('disabled cache runs processor', counter.calls == 4, f'calls={counter.calls}')
+        cache.clear(disk=True)
+        check('clear removes disk entries', len([f for f in os.listdir(tmp) if f.endswith('.png')]) == 0)
+    sys.exit(1 if failures > 0 else 0)
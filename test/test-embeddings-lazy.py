@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+On-demand textual inversion test: header-only index, activation by prompt, lru unload with token reuse, incremental refresh, cpu only
+"""
+import os
+import sys
+import time
+import tempfile
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+os.environ['SD_INSTALL_QUIET'] = '1'
+
+import modules.cmd_args # pylint: disable=wrong-import-position
+import installer # pylint: disable=wrong-import-position
+installer.add_args(modules.cmd_args.parser)
+modules.cmd_args.parsed, _ = modules.cmd_args.parser.parse_known_args([])
+
+import torch # pylint: disable=wrong-import-position
+from safetensors.torch import save_file # pylint: disable=wrong-import-position
+from modules import shared, devices, modeldata, textual_inversion # pylint: disable=wrong-import-position
+
+
+failures = 0
+dim = 8
+
+
+def check(name, ok, details=''):
+    global failures # pylint: disable=global-statement
+    if not ok:
+        failures += 1
+    print(f'{"PASS" if ok else "FAIL"}: {name} {details}')
+
+
+class AddedToken:
+    def __init__(self, content):
+        self.content = content
+
+
+class Tokenizer:
+    """Minimal python tokenizer with added tokens handled like transformers slow tokenizers."""
+    is_fast = False
+    unk_token = '<unk>'
+
+    def __init__(self):
+        self.vocab = {'<unk>': 0, 'a': 1, 'photo': 2}
+        self._added_tokens_encoder = {}
+        self._added_tokens_decoder = {}
+
+    def __len__(self):
+        return len(self.vocab) + len(self._added_tokens_encoder)
+
+    def _update_trie(self):
+        pass
+
+    def add_tokens(self, tokens):
+        for token in tokens:
+            if token not in self._added_tokens_encoder:
+                idx = len(self)
+                self._added_tokens_encoder[token] = idx
+                self._added_tokens_decoder[idx] = AddedToken(token)
+
+    def convert_tokens_to_ids(self, token):
+        return self._added_tokens_encoder.get(token, self.vocab.get(token, 0))
+
+    def get_vocab(self):
+        return {**self.vocab, **self._added_tokens_encoder}
+
+
+class TextEncoder(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.embeddings = torch.nn.Embedding(3, dim)
+
+    def get_input_embeddings(self):
+        return self.embeddings
+
+    def resize_token_embeddings(self, size):
+        resized = torch.nn.Embedding(size, dim)
+        rows = min(size, self.embeddings.weight.shape[0])
+        resized.weight.data[:rows] = self.embeddings.weight.data[:rows]
+        self.embeddings = resized
+
+
+class StableDiffusionPipeline:
+    def __init__(self):
+        self.tokenizer = Tokenizer()
+        self.text_encoder = TextEncoder()
+
+
+def write(folder, name, value, vectors=2, size=dim):
+    filename = os.path.join(folder, f'{name}.safetensors')
+    save_file({'emb_params': torch.full((vectors, size), float(value))}, filename)
+    return filename
+
+
+def rows(pipe, token):
+    return pipe.text_encoder.get_input_embeddings().weight.data[pipe.tokenizer.convert_tokens_to_ids(token)]
+
+
+if __name__ == '__main__':
+    devices.device = torch.device('cpu')
+    pipe = StableDiffusionPipeline()
+    modeldata.model_data.sd_model = pipe
+    shared.opts.diffusers_enable_embed = True
+    shared.opts.diffusers_embed_lazy = True
+    shared.opts.diffusers_embed_active = 2
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, name in enumerate(['one', 'two', 'three']):
+            write(tmp, name, i + 1)
+        write(tmp, 'other', 9, size=dim * 2)
+        db = textual_inversion.EmbeddingDatabase()
+        db.add_embedding_dir(tmp)
+        db.load_textual_inversion_embeddings(force_reload=True)
+        check('index from headers', sorted(db.index) == ['one', 'three', 'two'] and db.index['one'].vectors == 2 and db.index['one'].vec == [], sorted(db.index))
+        check('incompatible vector size skipped', 'other' in db.skipped_embeddings)
+        check('nothing inserted on load', len(pipe.tokenizer) == 3 and len(db.active) == 0, f'tokens={len(pipe.tokenizer)}')
+        check('indexed embeddings listed', sorted(db.word_embeddings) == ['one', 'three', 'two'])
+
+        db.activate(['a photo of one', 'two'])
+        check('prompt embeddings activated', sorted(db.active) == ['one', 'two'] and len(pipe.tokenizer) == 7, f'active={list(db.active)} tokens={len(pipe.tokenizer)}')
+        check('vectors inserted', torch.equal(rows(pipe, 'one'), torch.full((dim, ), 1.0)) and torch.equal(rows(pipe, 'two_1'), torch.full((dim, ), 2.0)))
+        size = pipe.text_encoder.get_input_embeddings().weight.shape[0]
+
+        db.activate(['one', 'three'])
+        check('least recently used unloaded', list(db.active) == ['one', 'three'] and pipe.tokenizer.convert_tokens_to_ids('two') == 0, list(db.active))
+        check('token slots reused', len(pipe.tokenizer) == 7 and pipe.text_encoder.get_input_embeddings().weight.shape[0] == size, f'tokens={len(pipe.tokenizer)} rows={pipe.text_encoder.get_input_embeddings().weight.shape[0]}')
+        check('reused slot has new vectors', torch.equal(rows(pipe, 'three_1'), torch.full((dim, ), 3.0)))
+        check('unloaded embedding stays indexed', db.word_embeddings['two'] is db.index['two'])
+
+        write(tmp, 'four', 4)
+        time.sleep(0.01)
+        write(tmp, 'one', 5)
+        os.remove(os.path.join(tmp, 'three.safetensors'))
+        added, removed = db.refresh()
+        check('refresh only changed files', sorted(os.path.basename(f) for f in added) == ['four.safetensors', 'one.safetensors'] and len(removed) == 2, f'added={added} removed={removed}')
+        check('removed file unloaded', 'three' not in db.active and 'three' not in db.word_embeddings and pipe.tokenizer.convert_tokens_to_ids('three') == 0)
+        check('changed file unloaded until used', 'one' not in db.active and 'four' in db.index)
+        db.activate(['one'])
+        check('changed file reloaded', torch.equal(rows(pipe, 'one'), torch.full((dim, ), 5.0)) and len(pipe.tokenizer) == 7, f'tokens={len(pipe.tokenizer)}')
+
+        shared.opts.diffusers_embed_lazy = False
+        db.load_textual_inversion_embeddings(force_reload=True)
+        check('eager mode inserts all', sorted(db.active) == ['four', 'one', 'two'] and len(db.index) == 0, sorted(db.active))
+    sys.exit(1 if failures > 0 else 0)
@@ -310,6 +310,65 @@ def test_grade_image_edge_cases():
     return True
 
 
+def test_grade_batch_matches_image():
+    """grade_batch on stacked uint8 samples is bit-equal to per-image grade_image on CPU."""
+    try:
+        import modules.devices as devices_mod
+        from modules.processing_grading import GradingParams, grade_image, grade_batch
+    except ImportError:
+        return None
+    from PIL import Image
+    device, dtype = devices_mod.device, devices_mod.dtype
+    devices_mod.device, devices_mod.dtype = torch.device('cpu'), torch.float32
+    try:
+        images = [_make_test_pil_image(), Image.fromarray(np.random.RandomState(7).randint(0, 255, (64, 64, 3), dtype=np.uint8), 'RGB')]
+        batch = torch.stack([torch.from_numpy(np.array(image)) for image in images])
+        for params in [GradingParams(brightness=0.1, contrast=0.2, saturation=-0.1), GradingParams(shadows=0.3, midtones=-0.2, highlights=0.1, vignette=0.5), GradingParams(hue=0.1, gamma=0.8, color_temp=3000)]:
+            graded = grade_batch(batch, params).numpy()
+            for i, image in enumerate(images):
+                expected = np.array(grade_image(image, params))
+                assert np.array_equal(graded[i], expected), f"batch image {i} differs max={np.abs(graded[i].astype(int) - expected.astype(int)).max()} params={params}"
+    finally:
+        devices_mod.device, devices_mod.dtype = device, dtype
+    return True
+
+
+def test_color_correction_batch_matches_image():
+    """Batched wavelet and adain color correction matches per-image correction with and without reference image."""
+    try:
+        from modules.processing_helpers import apply_color_correction, apply_color_correction_batch, setup_color_correction
+    except ImportError:
+        return None
+    from PIL import Image
+    images = [_make_test_pil_image(), Image.fromarray(np.random.RandomState(7).randint(0, 255, (64, 64, 3), dtype=np.uint8), 'RGB')]
+    reference = Image.fromarray(np.random.RandomState(3).randint(0, 128, (32, 32, 3), dtype=np.uint8), 'RGB') # smaller reference is resized
+    corrections = [setup_color_correction(reference), None]
+    batch = torch.stack([torch.from_numpy(np.array(image)) for image in images])
+    for method in ['wavelet', 'adain']:
+        corrected = apply_color_correction_batch(corrections, batch, method)
+        assert corrected.dtype == torch.uint8 and list(corrected.shape) == list(batch.shape), f"method={method} shape={list(corrected.shape)} dtype={corrected.dtype}"
+        for i, image in enumerate(images):
+            expected = np.array(apply_color_correction(corrections[i], image, method))
+            diff = np.abs(corrected[i].numpy().astype(int) - expected.astype(int)).max()
+            assert diff <= 1, f"method={method} image {i} differs max={diff}" # batched convolution may round differently by one level
+    return True
+
+
+def test_validate_samples_matches_sample():
+    """Device-side validate_samples quantizes bit-equal to host validate_sample on CPU."""
+    try:
+        from modules.processing_helpers import validate_sample, validate_samples
+    except ImportError:
+        return None
+    torch.manual_seed(42)
+    decoded = torch.rand(2, 3, 32, 32, dtype=torch.float16)
+    expected = [validate_sample(sample) for sample in decoded.permute(0, 2, 3, 1).float().numpy()] # what image_processor np output gives per image
+    quantized = validate_samples(decoded).numpy()
+    for i, sample in enumerate(expected):
+        assert np.array_equal(quantized[i], sample), f"sample {i} differs"
+    return True
+
+
 # ============================================================
 # Latent Corrections: primitive tensor operations
 # ============================================================
@@ -593,7 +652,8 @@ def run_tests():
     log.warning('=== Color Grading: Tensor Operations ===')
     for fn in [test_apply_vignette, test_apply_grain, test_apply_color_temp,
                test_apply_shadows_midtones_highlights, test_grade_image_pipeline,
-               test_grade_image_edge_cases]:
+               test_grade_image_edge_cases, test_grade_batch_matches_image,
+               test_color_correction_batch_matches_image, test_validate_samples_matches_sample]:
         run_test(fn)
 
     # Correction primitives (pure torch)
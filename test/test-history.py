@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Latent history test: incremental size tracking, spill to disk over memory budget, lazy reload on selection, restore after restart, cpu only
+"""
+import os
+import sys
+import tempfile
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+os.environ['SD_INSTALL_QUIET'] = '1'
+
+import modules.cmd_args # pylint: disable=wrong-import-position
+import installer # pylint: disable=wrong-import-position
+installer.add_args(modules.cmd_args.parser)
+modules.cmd_args.parsed, _ = modules.cmd_args.parser.parse_known_args([])
+
+import torch # pylint: disable=wrong-import-position
+from modules import shared, devices, history # pylint: disable=wrong-import-position
+
+
+failures = 0
+mb = 1024 * 1024
+
+
+def check(name, ok, details=''):
+    global failures # pylint: disable=global-statement
+    if not ok:
+        failures += 1
+    print(f'{"PASS" if ok else "FAIL"}: {name} {details}')
+
+
+def latent(value):
+    return torch.full((1, 4, 256, 256), float(value)) # 1mb each
+
+
+def make_history(folder):
+    instance = history.History()
+    instance.loaded = True # skip restore and exit hook
+    history.History.folder = property(lambda self: folder)
+    return instance
+
+
+if __name__ == '__main__':
+    devices.device = torch.device('cpu')
+    shared.opts.latent_history = 10
+    with tempfile.TemporaryDirectory() as tmp:
+        shared.opts.latent_history_ram = 3
+        shared.opts.latent_history_disk = 0
+        h = make_history(tmp)
+        for i in range(3):
+            h.add(latent(i), info=f'item {i}')
+        check('size tracked incrementally', h.size == 3 * mb, f'size={h.size}')
+        h.add(latent(3))
+        check('over budget without disk discards oldest latent', h.size == 3 * mb and not h.latents[-1].has_latent, f'size={h.size}')
+        check('no files without disk budget', len(os.listdir(tmp)) == 0)
+
+        shared.opts.latent_history_disk = 16
+        h = make_history(tmp)
+        for i in range(5):
+            h.add(latent(i), info=f'item {i}', ops=['txt2img'])
+        spilled = [item for item in h.latents if item.filename is not None]
+        check('oldest latents spilled to disk', len(spilled) == 2 and h.size == 3 * mb and h.disk > 0, f'spilled={len(spilled)} size={h.size} disk={h.disk}')
+        h.index = h.count - 1 # select oldest
+        selected, index = h.selected
+        check('spilled latent loaded on selection', index == h.count - 1 and torch.equal(selected, latent(0)), f'index={index}')
+        check('selection does not grow memory', h.size == 3 * mb, f'size={h.size}')
+        check('list includes spilled items', len(h.list) == 5)
+
+        shared.opts.latent_history = 4
+        h.add(latent(5))
+        check('count limit removes oldest files', h.count == 4 and len([f for f in os.listdir(tmp) if f.endswith('.safetensors')]) == 1, f'count={h.count} files={os.listdir(tmp)}')
+
+        h.save()
+        check('save spills all latents', h.size == 0 and len(os.listdir(tmp)) == 4, f'size={h.size} files={len(os.listdir(tmp))}')
+        names = [item.name for item in h.latents]
+
+        restored = make_history(tmp)
+        restored.loaded = False
+        restored.load()
+        check('restore after restart', restored.count == 4 and [item.name for item in restored.latents] == names, f'count={restored.count}')
+        check('restored metadata', restored.latents[-1].ops == ['txt2img'] and restored.latents[-1].info == 'item 2', f'ops={restored.latents[-1].ops} info={restored.latents[-1].info}')
+        check('restored latest latent', torch.equal(restored.last_latent, latent(5)))
+
+        shared.opts.latent_history_disk = 3.5
+        restored.enforce()
+        check('disk budget drops oldest spilled', restored.disk <= 3.5 * mb and restored.count == 3, f'disk={restored.disk} count={restored.count}')
+        restored.clear()
+        check('clear removes files', restored.count == 0 and len(os.listdir(tmp)) == 0)
+    sys.exit(1 if failures > 0 else 0)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Streaming model merge test: small synthetic checkpoints merged key by key into safetensors file and compared with in-memory merge, cpu only
+"""
+import os
+import sys
+import tempfile
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+os.environ['SD_INSTALL_QUIET'] = '1'
+
+import modules.cmd_args # pylint: disable=wrong-import-position
+import installer # pylint: disable=wrong-import-position
+installer.add_args(modules.cmd_args.parser)
+modules.cmd_args.parsed, _ = modules.cmd_args.parser.parse_known_args([])
+
+import torch # pylint: disable=wrong-import-position
+from safetensors import safe_open # pylint: disable=wrong-import-position
+from safetensors.torch import save_file, load_file # pylint: disable=wrong-import-position
+from modules.merging import merge, merge_stream # pylint: disable=wrong-import-position
+from modules.merging.merge_utils import WeightClass # pylint: disable=wrong-import-position
+
+
+failures = 0
+unet = 'model.diffusion_model.input_blocks.1.0.weight'
+conv = 'model.diffusion_model.input_blocks.0.0.weight'
+te = 'cond_stage_model.transformer.text_model.encoder.weight'
+vae = 'first_stage_model.decoder.weight'
+
+
+def check(name, ok, details=''):
+    global failures # pylint: disable=global-statement
+    if not ok:
+        failures += 1
+    print(f'{"PASS" if ok else "FAIL"}: {name} {details}')
+
+
+def checkpoint(folder, name, value, extra=None, channels=4):
+    state_dict = {
+        unet: torch.full((64, 32), float(value)),
+        conv: torch.full((8, channels, 3, 3), float(value)),
+        te: torch.full((16, 16), float(value), dtype=torch.float16),
+        vae: torch.full((4, 4), float(value)),
+        merge.KEY_POSITION_IDS: torch.zeros((1, merge.MAX_TOKENS), dtype=torch.int64),
+        **(extra or {}),
+    }
+    filename = os.path.join(folder, f'{name}.safetensors')
+    save_file(state_dict, filename)
+    return filename
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        models = {
+            'model_a': checkpoint(tmp, 'a', 1, extra={'model.diffusion_model.only_a': torch.ones(3)}),
+            'model_b': checkpoint(tmp, 'b', 3, extra={'model.diffusion_model.only_b': torch.ones(5)}),
+        }
+        output = os.path.join(tmp, 'merged.safetensors')
+        plan = merge_stream.merge_to_file(output, models, 'weighted_sum', precision='fp32', prune=True, threads=2, window=2, alpha=0.25, metadata={'format': 'pt'})
+        merged = load_file(output)
+        check('merged weights', torch.allclose(merged[unet], torch.full((64, 32), 1.5)), merged[unet][0, 0])
+        check('dtype promoted like in-memory merge', merged[unet].dtype == torch.float32 and merged[te].dtype == torch.float16, f'{merged[unet].dtype} {merged[te].dtype}')
+        check('unpruned keys copied from primary', torch.equal(merged[vae], torch.ones(4, 4)) and 'model.diffusion_model.only_a' in merged)
+        check('keys only in secondary added', 'model.diffusion_model.only_b' in merged)
+        check('position ids fixed', torch.equal(merged[merge.KEY_POSITION_IDS], torch.arange(merge.MAX_TOKENS).unsqueeze(0)))
+        check('written keys match plan', list(plan.keys()) == [k for k in plan if k in merged] and len(merged) == len(plan))
+        with safe_open(output, framework='pt') as f:
+            check('metadata written', f.metadata() == {'format': 'pt'}, f.metadata())
+        check('no temporary file left', not os.path.exists(f'{output}.tmp'))
+
+        thetas = {name: load_file(filename) for name, filename in models.items()}
+        thetas = {name: {k: v.half() for k, v in theta.items() if k.startswith(merge_stream.prune_prefixes)} for name, theta in thetas.items()}
+        reference = merge.simple_merge(thetas, WeightClass(thetas['model_a'], alpha=0.25), 'weighted_sum', precision='fp16', threads=2)
+        merge_stream.merge_to_file(output, models, 'weighted_sum', precision='fp16', prune=True, threads=3, alpha=0.25)
+        merged = load_file(output)
+        same = all(torch.equal(merged[k], reference[k]) for k in [unet, conv, te])
+        check('fp16 streaming matches in-memory merge', same and merged[vae].dtype == torch.float16)
+
+        models['model_b'] = checkpoint(tmp, 'b', 3, channels=9) # inpainting model
+        replace = {vae: torch.full((4, 4), 7.0)}
+        merge_stream.merge_to_file(output, models, 'weighted_sum', precision='fp32', prune=True, threads=2, alpha=0.25, replace=replace)
+        merged = load_file(output)
+        check('larger input used on shape mismatch', list(merged[conv].shape) == [8, 9, 3, 3], list(merged[conv].shape))
+        check('replaced keys written as given', torch.equal(merged[vae], replace[vae]))
+
+        calls = []
+        original = merge_stream.Source.get
+        merge_stream.Source.get = lambda self, key: calls.append(key) or original(self, key)
+        try:
+            merge_stream.merge_to_file(output, {'model_a': models['model_a'], 'model_b': os.path.join(tmp, 'missing.safetensors')}, 'weighted_sum', alpha=0.5)
+            failed = False
+        except Exception:
+            failed = True
+        merge_stream.Source.get = original
+        check('missing input fails before writing', failed and len(calls) == 0 and not os.path.exists(f'{output}.tmp'))
+    sys.exit(1 if failures > 0 else 0)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Metrics registry and OpenMetrics rendering test on CPU with simulated jobs, no server or model required
+"""
+import os
+import sys
+import time
+import threading
+
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+
+from modules import metrics # pylint: disable=wrong-import-position
+
+
+failures = 0
+
+
+def check(name, ok, details=''):
+    global failures # pylint: disable=global-statement
+    if not ok:
+        failures += 1
+    print(f'{"PASS" if ok else "FAIL"}: {name} {details}')
+
+
+def sample(text, line_prefix):
+    values = [line.rsplit(' ', 1)[1] for line in text.splitlines() if line.startswith(line_prefix + ' ')]
+    return float(values[0]) if len(values) > 0 else None
+
+
+for metric in metrics.registry:
+    metric.clear()
+
+for duration in [0.003, 0.02, 0.02, 0.7, 400]:
+    metrics.observe_request('POST', '/sdapi/v1/txt2img', 200, duration)
+metrics.observe_request('GET', '/sdapi/v1/progress', 200, 0.001)
+text = metrics.render()
+route = 'method="POST",route="/sdapi/v1/txt2img",code="200"'
+check('render ends with eof', text.endswith('# EOF\n'))
+check('histogram type line', '# TYPE sdnext_http_request_duration_seconds histogram' in text)
+check('bucket is cumulative', sample(text, f'sdnext_http_request_duration_seconds_bucket{{{route},le="0.025"}}') == 3)
+check('inf bucket equals count', sample(text, f'sdnext_http_request_duration_seconds_bucket{{{route},le="+Inf"}}') == sample(text, f'sdnext_http_request_duration_seconds_count{{{route}}}') == 5)
+check('histogram sum', abs(sample(text, f'sdnext_http_request_duration_seconds_sum{{{route}}}') - 400.743) < 1e-6)
+check('routes are separate series', metrics.http_requests.count(method='GET', route='/sdapi/v1/progress', code=200) == 1)
+
+metrics.observe_request('GET', 'a"b\\c', 404, 0.1)
+check('label values are escaped', 'route="a\\"b\\\\c"' in metrics.render())
+
+lock = threading.Lock()
+timed = metrics.TimedLock(lock, 'generate')
+def hold():
+    with timed:
+        time.sleep(0.2)
+thread = threading.Thread(target=hold)
+thread.start()
+time.sleep(0.05)
+with timed:
+    pass
+thread.join()
+waited = metrics.queue_wait.values[('generate',)]
+check('queue wait recorded per acquire', metrics.queue_wait.count(queue='generate') == 2, f'count={metrics.queue_wait.count(queue="generate")}')
+check('queue wait measures blocked time', 0.1 < waited[1] < 1.0, f'sum={waited[1]:.3f}')
+check('timed lock released', not lock.locked())
+
+records = {'te': 0.5, 'prompt': 0.1, 'pipeline': 8.6, 'hires': 2.0, 'decode': 1.0, 'vae': 0.8, 'save': 0.2, 'post': 0.3, 'init': 0.4} # te and prompt run inside pipeline, vae inside decode
+metrics.observe_process(records, steps=20, images=2, duration=10.0)
+text = metrics.render()
+check('encode phase sums te and prompt', abs(sample(text, 'sdnext_generation_phase_seconds_sum{phase="encode"}') - 0.6) < 1e-9)
+check('denoise phase excludes nested encode', abs(sample(text, 'sdnext_generation_phase_seconds_sum{phase="denoise"}') - 10.0) < 1e-9)
+check('decode phase excludes nested vae', sample(text, 'sdnext_generation_phase_seconds_sum{phase="decode"}') == 1.0)
+check('phases add up to job time', abs(sum(sample(text, f'sdnext_generation_phase_seconds_sum{{phase="{phase}"}}') for phase in metrics.phases) - 12.1) < 1e-9)
+check('unmapped records are not exported', 'phase="init"' not in text)
+check('steps per second', sample(text, 'sdnext_generation_steps_per_second_sum') == 4.0)
+check('steps counter', sample(text, 'sdnext_generation_steps_total') == 40)
+
+for hit in [True, True, True, False]:
+    metrics.cache('prompt', hit)
+metrics.cache('lora', False)
+text = metrics.render()
+check('cache counters', sample(text, 'sdnext_cache_requests_total{cache="prompt",result="hit"}') == 3)
+check('cache hit ratio', sample(text, 'sdnext_cache_hit_ratio{cache="prompt"}') == 0.75)
+check('cache hit ratio without hits', sample(text, 'sdnext_cache_hit_ratio{cache="lora"}') == 0)
+
+metrics.model_load.observe(12.5, op='model')
+metrics.lora_load.observe(0.8)
+text = metrics.render()
+check('model load histogram', sample(text, 'sdnext_model_load_seconds_count{op="model"}') == 1)
+check('lora load histogram', sample(text, 'sdnext_lora_load_seconds_sum') == 0.8)
+
+sys.exit(1 if failures > 0 else 0)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+Deferred model override restore and model-affinity queue ordering test with stub model loader, cpu only
+"""
+import os
+import sys
+import time
+import threading
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+os.environ['SD_INSTALL_QUIET'] = '1'
+
+import modules.cmd_args # pylint: disable=wrong-import-position
+import installer # pylint: disable=wrong-import-position
+installer.add_args(modules.cmd_args.parser)
+modules.cmd_args.parsed, _ = modules.cmd_args.parser.parse_known_args([])
+
+from modules import shared, sd_checkpoint, model_affinity # pylint: disable=wrong-import-position
+
+
+failures = 0
+loads = []
+loaded = {}
+
+
+def check(name, ok, details=''):
+    global failures # pylint: disable=global-statement
+    if not ok:
+        failures += 1
+    print(f'{"PASS" if ok else "FAIL"}: {name} {details}')
+
+
+class Info:
+    def __init__(self, title):
+        self.title = title
+
+
+def stub_reload(key):
+    value = shared.opts.data.get(key, None)
+    if loaded.get(key, None) != value: # same as model reload which skips already loaded model
+        loaded[key] = value
+        loads.append(value)
+
+
+def job(override_settings: dict, restore_afterwards: bool = True):
+    """Override handling as done by processing.process_images."""
+    override_settings = dict(override_settings)
+    originals = model_affinity.resolve(override_settings)
+    for k, v in override_settings.copy().items():
+        if shared.opts.data.get(k, None) == v:
+            override_settings.pop(k, None)
+    stored_opts = {k: originals.get(k, None) or shared.opts.data.get(k, None) for k in override_settings}
+    for k, v in override_settings.items():
+        setattr(shared.opts, k, v)
+        model_affinity.reload(k)
+    used = loaded.get('sd_model_checkpoint', None)
+    model_affinity.restore(stored_opts, override_settings, restore_afterwards)
+    return used
+
+
+def test_restore():
+    for name in ['base', 'other', 'third']:
+        sd_checkpoint.checkpoint_aliases[name] = Info(name)
+    model_affinity.reload = stub_reload
+    model_affinity.pending.clear()
+    shared.opts.sd_model_checkpoint = 'base'
+    shared.opts.sd_restore_deferred = True
+    stub_reload('sd_model_checkpoint')
+    loads.clear()
+
+    ran = [job({'sd_model_checkpoint': 'other'}) for _i in range(5)]
+    check('overridden model used by every job', ran == ['other'] * 5, ran)
+    check('overridden model loaded once', loads == ['other'], loads)
+    check('original kept for restore', model_affinity.pending.get('sd_model_checkpoint', (None,))[0] == 'base', model_affinity.pending)
+    check('settings restored while model stays loaded', shared.opts.sd_model_checkpoint == 'base' and loaded['sd_model_checkpoint'] == 'other', shared.opts.sd_model_checkpoint)
+    check('job key uses original for jobs without override', model_affinity.job_key({})[0] == 'base', model_affinity.job_key({}))
+
+    ran = job({})
+    check('job without override restores original first', ran == 'base' and loads == ['other', 'base'] and len(model_affinity.pending) == 0, loads)
+
+    loads.clear()
+    job({'sd_model_checkpoint': 'other'})
+    job({'sd_model_checkpoint': 'third'})
+    check('switch between overrides loads once', loads == ['other', 'third'], loads)
+    check('original survives override switch', model_affinity.pending['sd_model_checkpoint'][0] == 'base', model_affinity.pending)
+    ran = job({'sd_model_checkpoint': 'base'})
+    check('override back to original clears restore', ran == 'base' and len(model_affinity.pending) == 0 and shared.opts.sd_model_checkpoint == 'base', model_affinity.pending)
+
+    loads.clear()
+    job({'sd_model_checkpoint': 'other'})
+    shared.opts.sd_model_checkpoint = 'third' # changed by user between jobs
+    stub_reload('sd_model_checkpoint') # onchange
+    job({})
+    check('outside change drops pending restore', loads == ['other', 'third'] and shared.opts.sd_model_checkpoint == 'third' and len(model_affinity.pending) == 0, loads)
+
+    loads.clear()
+    shared.opts.sd_model_checkpoint = 'base'
+    stub_reload('sd_model_checkpoint')
+    loads.clear()
+    shared.opts.sd_restore_deferred = False
+    job({'sd_model_checkpoint': 'other'})
+    job({'sd_model_checkpoint': 'other'})
+    check('restore afterwards without deferral', loads == ['other', 'base', 'other', 'base'], loads)
+
+    loads.clear()
+    shared.opts.sd_restore_deferred = True
+    job({'sd_model_checkpoint': 'other'}, restore_afterwards=False)
+    check('permanent override not restored', shared.opts.sd_model_checkpoint == 'other' and len(model_affinity.pending) == 0, model_affinity.pending)
+    shared.opts.sd_model_checkpoint = 'base'
+
+
+def order(max_skips: int, keys: list[str]) -> list[str]:
+    scheduler = model_affinity.Scheduler(max_skips=max_skips)
+    granted = []
+    scheduler.acquire(('a',)) # running job for model a
+    threads = []
+
+    def run(name, key):
+        with scheduler.slot((key,)):
+            granted.append(name)
+
+    for i, key in enumerate(keys):
+        thread = threading.Thread(target=run, args=(f'{key}{i+1}', key))
+        thread.start()
+        threads.append(thread)
+        while len(scheduler.waiting) < i + 1: # enqueue in order
+            time.sleep(0.001)
+    scheduler.release()
+    for thread in threads:
+        thread.join()
+    return granted
+
+
+def test_scheduler():
+    keys = ['b', 'a', 'b', 'a']
+    check('fifo without affinity', order(0, keys) == ['b1', 'a2', 'b3', 'a4'], order(0, keys))
+    check('jobs grouped by loaded model', order(4, keys) == ['a2', 'a4', 'b1', 'b3'], order(4, keys))
+    check('oldest job passed over at most max skips', order(1, keys) == ['a2', 'b1', 'b3', 'a4'], order(1, keys))
+
+    scheduler = model_affinity.Scheduler(max_skips=4)
+    scheduler.acquire(('a',))
+    wait = scheduler.cond.wait
+    scheduler.cond.wait = lambda *args, **kwargs: (_ for _ in ()).throw(KeyboardInterrupt()) # waiting job interrupted
+    try:
+        scheduler.acquire(('b',))
+        interrupted = False
+    except KeyboardInterrupt:
+        interrupted = True
+    scheduler.cond.wait = wait
+    check('interrupted waiter removed', interrupted and len(scheduler.waiting) == 0, len(scheduler.waiting))
+    scheduler.release()
+    granted = threading.Event()
+    thread = threading.Thread(target=lambda: scheduler.acquire(('c',)) and granted.set(), daemon=True)
+    thread.start()
+    check('later job granted after interrupted waiter', granted.wait(5))
+
+
+if __name__ == '__main__':
+    test_restore()
+    test_scheduler()
+    sys.exit(1 if failures > 0 else 0)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Balanced offload prefetch schedule and eviction policy test with simulated module sizes, no gpu required
+"""
+import os
+import sys
+
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+
+from modules import sd_offload_prefetch # pylint: disable=wrong-import-position
+
+
+failures = 0
+
+
+def check(name, ok, details=''):
+    global failures # pylint: disable=global-statement
+    if not ok:
+        failures += 1
+    print(f'{"PASS" if ok else "FAIL"}: {name} {details}')
+
+
+def run(schedule, names):
+    return [schedule.observe(name) for name in names]
+
+
+sizes = {'text_encoder': 1.5, 'text_encoder_2': 4.5, 'unet': 5.0, 'vae': 0.2}
+job = ['text_encoder', 'text_encoder_2'] + ['unet'] * 20 + ['vae'] # hooks fire per forward, unet once per step
+
+schedule = sd_offload_prefetch.Schedule('test')
+ready = run(schedule, job)
+check('first run only records', not any(ready) and not schedule.complete)
+check('repeated forwards collapse', schedule.order == ['text_encoder', 'text_encoder_2', 'unet', 'vae'], schedule.order)
+check('wrap around completes schedule', schedule.observe('text_encoder') and schedule.complete)
+check('upcoming after text encoder', schedule.upcoming(2) == ['text_encoder_2', 'unet'], schedule.upcoming(2))
+run(schedule, ['text_encoder_2', 'unet'])
+check('upcoming wraps to next job', schedule.upcoming(3) == ['vae', 'text_encoder', 'text_encoder_2'], schedule.upcoming(3))
+check('distance to next use', schedule.distance('vae') == 1 and schedule.distance('text_encoder') == 2 and schedule.distance('unknown') == 5)
+
+# unet running, vae fits next to it, text encoders are evicted furthest-first only as far as budget requires
+plan = schedule.plan(resident={'unet': 5.0, 'text_encoder': 1.5, 'text_encoder_2': 4.5}, sizes=sizes, budget=7.0, lookahead=1)
+check('current is kept', plan.current == 'unet' and 'unet' in plan.keep)
+check('next module is prefetched', plan.prefetch == ['vae'], plan)
+check('soonest reused module stays resident', 'text_encoder' in plan.keep and 'text_encoder_2' in plan.evict, plan)
+check('plan fits budget', sum(sizes[name] for name in plan.keep) <= 7.0)
+
+plan = schedule.plan(resident={'unet': 5.0, 'vae': 0.2}, sizes=sizes, budget=20.0, lookahead=2)
+check('large budget evicts nothing', plan.evict == [] and plan.prefetch == ['text_encoder'], plan)
+
+plan = schedule.plan(resident={'unet': 5.0}, sizes=sizes, budget=5.1, lookahead=2)
+check('look-ahead stops at module that does not fit', plan.prefetch == [] and plan.keep == ['unet'], plan)
+
+plan = schedule.plan(resident={'unet': 5.0, 'controlnet': 2.0}, sizes={**sizes, 'controlnet': 2.0}, budget=5.5, lookahead=1)
+check('module outside schedule is evicted first', 'controlnet' in plan.evict, plan)
+
+# skipping a module, e.g. no second text encoder call, keeps schedule
+run(schedule, ['vae', 'text_encoder', 'unet'])
+check('skip ahead keeps schedule', schedule.complete and schedule.order[schedule.position] == 'unet' and schedule.misses == 0)
+
+# unseen module means model or workflow changed, schedule is learned again
+check('unknown module restarts recording', not schedule.observe('transformer') and not schedule.complete and schedule.misses == 1)
+run(schedule, ['vae', 'transformer'])
+check('relearned schedule', schedule.complete and schedule.order == ['transformer', 'vae'], schedule.order)
+
+first = sd_offload_prefetch.get_schedule('model-a')
+check('schedule per model', sd_offload_prefetch.get_schedule('model-a') is first and sd_offload_prefetch.get_schedule('model-b') is not first and 'model-a' not in sd_offload_prefetch.schedules)
+
+sys.exit(1 if failures > 0 else 0)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Per-job settings overlay test: copy-on-write writes, nesting and isolation between threads with different overrides, cpu only
+"""
+import os
+import sys
+import threading
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+os.environ['SD_INSTALL_QUIET'] = '1'
+
+import modules.cmd_args # pylint: disable=wrong-import-position
+import installer # pylint: disable=wrong-import-position
+installer.add_args(modules.cmd_args.parser)
+modules.cmd_args.parsed, _ = modules.cmd_args.parser.parse_known_args([])
+
+from modules import shared # pylint: disable=wrong-import-position
+
+
+failures = 0
+
+
+def check(name, ok, details=''):
+    global failures # pylint: disable=global-statement
+    if not ok:
+        failures += 1
+    print(f'{"PASS" if ok else "FAIL"}: {name} {details}')
+
+
+def test_overlay():
+    opts = shared.opts
+    opts.jpeg_quality = 80
+    with opts.overlay({'jpeg_quality': 50}):
+        check('overlay value visible', opts.jpeg_quality == 50 and opts.data['jpeg_quality'] == 50 and opts.data.get('jpeg_quality') == 50)
+        opts.samples_format = 'webp'
+        check('writes go to overlay', opts.samples_format == 'webp' and dict.get(opts.data, 'samples_format') != 'webp')
+        check('merged view', dict(opts.data.items())['jpeg_quality'] == 50 and 'jpeg_quality' in opts.data)
+        with opts.overlay({'jpeg_quality': 30}):
+            check('nested overlay', opts.jpeg_quality == 30 and opts.samples_format == 'webp')
+        check('nested overlay restored', opts.jpeg_quality == 50)
+    check('global unchanged after overlay', opts.jpeg_quality == 80 and opts.samples_format != 'webp', f'quality={opts.jpeg_quality} format={opts.samples_format}')
+
+
+def test_threads():
+    opts = shared.opts
+    opts.jpeg_quality = 80
+    barrier = threading.Barrier(3)
+    seen = {}
+
+    def job(name, quality):
+        with opts.overlay({'jpeg_quality': quality}):
+            barrier.wait() # all jobs inside their overlay at the same time
+            seen[name] = [opts.jpeg_quality for _i in range(100)]
+            barrier.wait()
+
+    threads = [threading.Thread(target=job, args=(name, quality)) for name, quality in [('a', 10), ('b', 20)]]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    seen['main'] = [opts.jpeg_quality for _i in range(100)]
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    check('thread a sees own override', set(seen['a']) == {10}, set(seen['a']))
+    check('thread b sees own override', set(seen['b']) == {20}, set(seen['b']))
+    check('other threads see global value', set(seen['main']) == {80}, set(seen['main']))
+
+
+def test_save_context():
+    import contextvars
+    opts = shared.opts
+    with opts.overlay({'jpeg_quality': 42}):
+        context = contextvars.copy_context()
+    result = []
+    thread = threading.Thread(target=lambda: result.append(context.run(lambda: opts.jpeg_quality)))
+    thread.start()
+    thread.join()
+    check('captured context carries overlay to worker', result == [42], result)
+
+
+def test_preview_context():
+    from modules import sd_samplers_common
+    opts = shared.opts
+    worker = sd_samplers_common.PreviewWorker()
+    done = threading.Event()
+    result = []
+    with opts.overlay({'jpeg_quality': 43}):
+        worker.submit('key', lambda: opts.jpeg_quality, lambda _key, image: result.append(image) or done.set())
+    done.wait(timeout=10)
+    check('preview worker renders with overlay of submitting job', result == [43], result)
+
+
+def test_persist():
+    import json
+    import tempfile
+    opts = shared.opts
+    opts.jpeg_quality = 80
+    filename, secretsfn = opts.filename, opts.secretsfn
+    with tempfile.TemporaryDirectory() as tmp:
+        opts.filename, opts.secretsfn = os.path.join(tmp, 'config.json'), os.path.join(tmp, 'secrets.json')
+        with opts.overlay({'jpeg_quality': 44}):
+            opts.save_atomic(silent=True)
+            exported = json.loads(opts.dumpjson())['values']['jpeg_quality']
+        with open(opts.filename, encoding='utf8') as f:
+            saved = json.load(f).get('jpeg_quality', None)
+        opts.filename, opts.secretsfn = filename, secretsfn
+    check('save inside overlay writes global values', saved == 80, saved)
+    check('json export inside overlay shows global values', exported == 80, exported)
+
+
+if __name__ == '__main__':
+    test_overlay()
+    test_threads()
+    test_save_context()
+    test_preview_context()
+    test_persist()
+    sys.exit(1 if failures > 0 else 0)
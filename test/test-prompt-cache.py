@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Prompt embedding disk cache test: store and memory-mapped load, size-bounded lru eviction and index rebuild from disk, cpu only
+"""
+import os
+import sys
+import time
+import tempfile
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+os.environ['SD_INSTALL_QUIET'] = '1'
+
+import modules.cmd_args # pylint: disable=wrong-import-position
+import installer # pylint: disable=wrong-import-position
+installer.add_args(modules.cmd_args.parser)
+modules.cmd_args.parsed, _ = modules.cmd_args.parser.parse_known_args([])
+
+import torch # pylint: disable=wrong-import-position
+from modules import shared, devices, prompt_parser_cache # pylint: disable=wrong-import-position
+
+
+failures = 0
+
+
+def check(name, ok, details=''):
+    global failures # pylint: disable=global-statement
+    if not ok:
+        failures += 1
+    print(f'{"PASS" if ok else "FAIL"}: {name} {details}')
+
+
+def values(seed):
+    generator = torch.Generator().manual_seed(seed)
+    embed = torch.randn(1, 77, 256, generator=generator, dtype=torch.float16) # ~40kb per tensor, ~80kb per entry
+    return [embed, None, None, embed.neg(), None, None]
+
+
+if __name__ == '__main__':
+    devices.device = torch.device('cpu')
+    with tempfile.TemporaryDirectory() as tmp:
+        prompt_parser_cache.folder = lambda: tmp
+        prompt_parser_cache.index = None
+        shared.opts.sd_textencoder_disk_cache = 0.35 # mb, fits four entries
+        check('enabled', prompt_parser_cache.enabled())
+        check('miss on empty cache', prompt_parser_cache.get('missing') is None)
+
+        prompt_parser_cache.put('a', values(1))
+        cached = prompt_parser_cache.get('a')
+        check('hit returns stored tensors', cached is not None and torch.equal(cached['prompt_embed'], values(1)[0]) and torch.equal(cached['negative_embed'], values(1)[3]))
+        check('missing outputs stay none', cached is not None and cached['positive_pooled'] is None and cached['prompt_attention_mask'] is None)
+
+        prompt_parser_cache.put('skip', [[values(2)[0]], None, None, None, None, None])
+        check('non tensor outputs are not stored', 'skip' not in prompt_parser_cache.index)
+
+        for i, key in enumerate(['b', 'c', 'd']):
+            time.sleep(0.01) # distinct mtime per file
+            prompt_parser_cache.put(key, values(i + 2))
+        time.sleep(0.01)
+        prompt_parser_cache.get('a') # a becomes most recently used
+        time.sleep(0.01)
+        prompt_parser_cache.put('e', values(9))
+        keys = list(prompt_parser_cache.index)
+        check('least recently used evicted', 'b' not in keys and 'a' in keys, keys)
+        check('evicted file removed', not os.path.exists(prompt_parser_cache.filename('b')))
+        limit = shared.opts.sd_textencoder_disk_cache * 1024 * 1024
+        check('size within limit', prompt_parser_cache.total <= limit, f'total={prompt_parser_cache.total} limit={limit}')
+
+        prompt_parser_cache.index = None # simulate restart
+        rebuilt = list(prompt_parser_cache.load_index())
+        check('index rebuilt from disk in lru order', rebuilt == keys, rebuilt)
+
+        prompt_parser_cache.clear()
+        check('clear removes all files', len([f for f in os.listdir(tmp) if f.endswith('.safetensors')]) == 0)
+    sys.exit(1 if failures > 0 else 0)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Image save pool test: concurrent producers saving into same folder with single worker and full queue, per-job wait, cpu only
+"""
+import os
+import sys
+import tempfile
+import threading
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+os.environ['SD_INSTALL_QUIET'] = '1'
+
+import modules.cmd_args # pylint: disable=wrong-import-position
+import installer # pylint: disable=wrong-import-position
+installer.add_args(modules.cmd_args.parser)
+modules.cmd_args.parsed, _ = modules.cmd_args.parser.parse_known_args([])
+
+from PIL import Image # pylint: disable=wrong-import-position
+from modules import shared, script_callbacks # pylint: disable=wrong-import-position
+from modules.image import save # pylint: disable=wrong-import-position
+
+
+failures = 0
+
+
+def check(name, ok, details=''):
+    global failures # pylint: disable=global-statement
+    if not ok:
+        failures += 1
+    print(f'{"PASS" if ok else "FAIL"}: {name} {details}')
+
+
+def job(folder, name):
+    image = Image.new('RGB', (64, 64), (128, 64, 32))
+    filename = os.path.join(folder, name)
+    params = script_callbacks.ImageSaveParams(image, None, filename + '.png', {'parameters': name})
+    return save.SaveJob(image, filename, '.png', params, name, None, False)
+
+
+def test_producers(folder):
+    pool = save.SavePool(workers=1, depth=1)
+    submitted = {}
+
+    def producer(name):
+        submitted[name] = [pool.submit(job(folder, f'{name}-{i:03}')) for i in range(20)]
+
+    threads = [threading.Thread(target=producer, args=(name, ), daemon=True) for name in ['a', 'b', 'c']]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    finished = not any(thread.is_alive() for thread in threads) and pool.wait(timeout=30)
+    check('concurrent producers with single worker finish', finished)
+    check('all images saved', pool.stats()['saved'] == 60 and len(os.listdir(folder)) == 60, pool.stats())
+    return submitted
+
+
+def test_wait(folder):
+    pool = save.SavePool(workers=2)
+    gate = threading.Event()
+    slow = job(folder, 'slow')
+    original = slow.image.save
+    slow.image.save = lambda *args, **kwargs: gate.wait(10) and original(*args, **kwargs)
+    pool.submit(slow) # job of another request still encoding
+    own = pool.submit(job(os.path.join(folder, 'own'), 'own'))
+    check('own saves returned without waiting for other jobs', save.wait_saved([own], timeout=10) and not slow.done.is_set())
+    gate.set()
+    check('pool wait includes all jobs', pool.wait(timeout=10) and slow.done.is_set())
+
+
+if __name__ == '__main__':
+    shared.opts.save_txt = False
+    shared.opts.save_log_fn = ''
+    with tempfile.TemporaryDirectory() as tmp:
+        test_producers(tmp)
+        os.makedirs(os.path.join(tmp, 'wait', 'own'))
+        test_wait(os.path.join(tmp, 'wait'))
+    sys.exit(1 if failures > 0 else 0)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Sampler cache test: repeated sampler creation reuses cached scheduler, set_timesteps schedules are memoized and restored per job, cpu only
+"""
+import os
+import sys
+import copy
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+os.environ['SD_INSTALL_QUIET'] = '1'
+
+import modules.cmd_args # pylint: disable=wrong-import-position
+import installer # pylint: disable=wrong-import-position
+installer.add_args(modules.cmd_args.parser)
+modules.cmd_args.parsed, _ = modules.cmd_args.parser.parse_known_args([])
+
+import torch # pylint: disable=wrong-import-position
+import diffusers # pylint: disable=wrong-import-position
+from modules import shared, metrics, sd_samplers, sd_samplers_diffusers # pylint: disable=wrong-import-position
+
+
+failures = 0
+
+
+def check(name, ok, details=''):
+    global failures # pylint: disable=global-statement
+    if not ok:
+        failures += 1
+    print(f'{"PASS" if ok else "FAIL"}: {name} {details}')
+
+
+class StableDiffusionPipeline:
+    def __init__(self):
+        self.scheduler = diffusers.EulerDiscreteScheduler()
+
+
+def test_scheduler(pipe):
+    sd_samplers_diffusers.schedulers_cache.clear()
+    first = sd_samplers.create_sampler('DPM++ 2M', pipe)
+    second = sd_samplers.create_sampler('DPM++ 2M', pipe)
+    check('cached scheduler returned', len(sd_samplers_diffusers.schedulers_cache) == 1 and type(first) is type(second), len(sd_samplers_diffusers.schedulers_cache))
+    check('cached scheduler is distinct instance', first is not second and first.config == second.config)
+    check('scheduler assigned to model', pipe.scheduler is second)
+    shared.opts.schedulers_use_loworder = False
+    third = sd_samplers.create_sampler('DPM++ 2M', pipe)
+    shared.opts.schedulers_use_loworder = True
+    check('config change creates new scheduler', len(sd_samplers_diffusers.schedulers_cache) == 2 and third.config.lower_order_final is False)
+    other = StableDiffusionPipeline()
+    sd_samplers.create_sampler('DPM++ 2M', other)
+    check('other model not shared', len(sd_samplers_diffusers.schedulers_cache) == 3)
+
+
+def test_schedule(pipe):
+    sd_samplers_diffusers.schedules_cache.clear()
+    scheduler = sd_samplers.create_sampler('Euler', pipe)
+    scheduler.set_timesteps(20, device='cpu')
+    timesteps, sigmas = scheduler.timesteps.clone(), scheduler.sigmas.clone()
+    scheduler._step_index = 7 # pylint: disable=protected-access
+    scheduler.timesteps[0] = -1
+    cached = len(sd_samplers_diffusers.schedules_cache)
+    scheduler.set_timesteps(20, device='cpu')
+    check('schedule memoized', cached == 1 and len(sd_samplers_diffusers.schedules_cache) == 1)
+    check('memoized schedule equal', torch.equal(scheduler.timesteps, timesteps) and torch.equal(scheduler.sigmas, sigmas))
+    check('scheduler state reset', scheduler.step_index is None, scheduler.step_index)
+    scheduler.noise_sampler_seed = [1234] # per-job attribute set by pipeline before set_timesteps
+    scheduler.set_timesteps(20, device='cpu')
+    check('memo hit keeps per-job attributes', scheduler.noise_sampler_seed == [1234], scheduler.noise_sampler_seed)
+    scheduler.set_timesteps(30, device='cpu')
+    check('different steps computed', len(sd_samplers_diffusers.schedules_cache) == 2 and len(scheduler.timesteps) == 30)
+    copied = copy.deepcopy(scheduler)
+    copied.set_timesteps(10, device='cpu')
+    check('copied scheduler memo bound to copy', len(copied.timesteps) == 10 and len(scheduler.timesteps) == 30)
+    reference = diffusers.EulerDiscreteScheduler.from_config(scheduler.config)
+    reference.set_timesteps(20, device='cpu')
+    scheduler.set_timesteps(20, device='cpu')
+    check('memoized schedule matches fresh scheduler', torch.equal(scheduler.sigmas, reference.sigmas))
+    check('cache hits reported', metrics.cache_requests.values.get(('schedule', 'hit'), 0) >= 2 and metrics.cache_requests.values.get(('scheduler', 'hit'), 0) >= 1)
+
+
+def test_res4lyf(pipe):
+    sd_samplers_diffusers.schedules_cache.clear()
+    scheduler = sd_samplers.create_sampler('RES-Multistep 2M', pipe)
+    if scheduler is None or scheduler.__class__.__name__ == 'EulerDiscreteScheduler':
+        check('res4lyf sampler created', False, scheduler.__class__.__name__ if scheduler is not None else None)
+        return
+    scheduler.set_timesteps(12, device='cpu')
+    sigmas = scheduler.sigmas.clone()
+    scheduler.set_timesteps(12, device='cpu')
+    check('res4lyf schedule memoized', len(sd_samplers_diffusers.schedules_cache) == 1 and torch.equal(scheduler.sigmas, sigmas), scheduler.__class__.__name__)
+
+
+def test_disabled(pipe):
+    shared.opts.sd_sampler_cache = 0
+    sd_samplers_diffusers.schedulers_cache.clear()
+    sd_samplers_diffusers.schedules_cache.clear()
+    scheduler = sd_samplers.create_sampler('Euler', pipe)
+    scheduler.set_timesteps(20, device='cpu')
+    check('cache disabled', len(sd_samplers_diffusers.schedulers_cache) == 0 and len(sd_samplers_diffusers.schedules_cache) == 0)
+    shared.opts.sd_sampler_cache = 16
+
+
+if __name__ == '__main__':
+    sd_samplers.list_samplers()
+    shared.opts.sd_sampler_cache = 16
+    model = StableDiffusionPipeline()
+    test_scheduler(model)
+    test_schedule(model)
+    test_res4lyf(model)
+    test_disabled(model)
+    sys.exit(1 if failures > 0 else 0)
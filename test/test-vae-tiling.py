@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+VAE tiling planner test on CPU with a tiny AutoencoderKL and simulated memory budget
+"""
+import os
+import sys
+import torch
+from diffusers import AutoencoderKL
+
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+os.chdir(script_dir)
+
+from modules.vae import sd_vae_tiling # pylint: disable=wrong-import-position
+
+
+failures = 0
+
+
+def check(name, ok, details=''):
+    global failures # pylint: disable=global-statement
+    if not ok:
+        failures += 1
+    print(f'{"PASS" if ok else "FAIL"}: {name} {details}')
+
+
+vae = AutoencoderKL(block_out_channels=[16, 32, 32], down_block_types=['DownEncoderBlock2D'] * 3, up_block_types=['UpDecoderBlock2D'] * 3, latent_channels=4, norm_num_groups=8, layers_per_block=1, sample_size=256).eval()
+latents = torch.randn(1, 4, 192, 192) # 768x768 image
+dtype_bytes = latents.element_size()
+
+full = sd_vae_tiling.plan(vae, latents.shape, dtype_bytes, budget=None)
+check('no budget keeps full decode', full is not None and not full.tiled, full)
+check('estimate scales with batch', sd_vae_tiling.estimate((2, 4, 192, 192), [16, 32, 32], 4) == 2 * sd_vae_tiling.estimate((1, 4, 192, 192), [16, 32, 32], 4))
+
+large = sd_vae_tiling.plan(vae, latents.shape, dtype_bytes, budget=full.estimate)
+check('budget fits full decode', not large.tiled, large)
+
+small = sd_vae_tiling.plan(vae, latents.shape, dtype_bytes, budget=full.estimate // 2)
+check('small budget tiles', small.tiled and small.estimate <= small.budget, small)
+smaller = sd_vae_tiling.plan(vae, latents.shape, dtype_bytes, budget=full.estimate // 4)
+check('smaller budget uses more tiles', smaller.tiled and smaller.tiles > small.tiles and smaller.estimate <= smaller.budget, smaller)
+tiny = sd_vae_tiling.plan(vae, latents.shape, dtype_bytes, budget=1)
+check('impossible budget uses smallest tile', tiny.tiled and tiny.tile == min(t for t in sd_vae_tiling.tile_sizes if t // 4 >= 8), tiny)
+check('video latents unsupported', sd_vae_tiling.plan(vae, (1, 4, 8, 192, 192), dtype_bytes, budget=1) is None)
+
+with torch.no_grad():
+    sd_vae_tiling.apply(vae, full)
+    reference = vae.decode(latents, return_dict=False)[0]
+    sd_vae_tiling.apply(vae, small)
+    check('apply enables tiling', vae.use_tiling and vae.tile_sample_min_size == small.tile, f'tile={vae.tile_sample_min_size}')
+    tiled = vae.decode(latents, return_dict=False)[0]
+check('tiled decode shape', tiled.shape == reference.shape, list(tiled.shape))
+
+vae.disable_tiling()
+user = (vae.tile_sample_min_size, vae.tile_latent_min_size)
+sd_vae_tiling.apply(vae, small)
+sd_vae_tiling.restore(vae, small)
+check('user tiling state restored', not vae.use_tiling and (vae.tile_sample_min_size, vae.tile_latent_min_size) == user, f'tiling={vae.use_tiling} tile={vae.tile_sample_min_size}')
+vae.enable_tiling()
+sd_vae_tiling.apply(vae, full)
+check('full decode plan disables tiling', not vae.use_tiling)
+sd_vae_tiling.restore(vae, full)
+check('user tiling enabled again', vae.use_tiling)
+vae.disable_tiling()
+
+sd_vae_tiling.corrections.clear()
+estimate = full.estimate
+for _i in range(20):
+    sd_vae_tiling.record(full, 2 * estimate)
+    full = sd_vae_tiling.plan(vae, latents.shape, dtype_bytes, budget=None)
+check('correction converges to measured peak', abs(full.estimate - 2 * estimate) < 0.05 * estimate, f'estimate={full.estimate} actual={2 * estimate}')
+replanned = sd_vae_tiling.plan(vae, latents.shape, dtype_bytes, budget=estimate)
+check('corrected estimate switches to tiling', replanned.tiled, replanned)
+
+sys.exit(1 if failures > 0 else 0)
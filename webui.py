@@ -14,12 +14,14 @@ from modules.logger import log
 from modules import timer
 import modules.loader
 import modules.hashes
+import modules.files_cache
 import modules.paths
 import modules.devices
 import modules.migrate
 from modules import shared
 from modules.call_queue import queue_lock, wrap_queued_call, wrap_gradio_gpu_call # pylint: disable=unused-import
 import modules.gr_tempdir
+import modules.image.save
 import modules.modeldata
 import modules.extensions
 import modules.modelloader
@@ -78,6 +80,10 @@ def initialize():
 
     modules.sd_checkpoint.init_metadata()
     modules.hashes.load_cache()
+    if shared.opts.files_cache_snapshot:
+        modules.files_cache.snapshot_load()
+    modules.files_cache.watch_start(shared.opts.files_cache_watch)
+    shared.opts.onchange("files_cache_watch", lambda: modules.files_cache.watch_start(shared.opts.files_cache_watch), call=False)
 
     modules.sd_samplers.list_samplers()
     timer.startup.record("samplers")
@@ -111,6 +117,20 @@ def initialize():
                 log.error(f'Scan error: {name} {e}')
     timer.startup.record("scans")
 
+    # scans above were served from persisted folder snapshot, rescan in background and refresh lists if anything changed
+    def _revalidate():
+        try:
+            changed = modules.files_cache.snapshot_revalidate()
+            if len(changed) > 0:
+                log.info(f'Files snapshot: changed={len(changed)} refreshing model lists')
+                for fn in [_scan_vae, _scan_unet, _scan_te, _scan_lora]:
+                    fn()
+                modules.sd_checkpoint.list_models()
+        except Exception as e:
+            log.error(f'Files snapshot: {e}')
+    if len(modules.files_cache.snapshot_pending) > 0:
+        Thread(target=_revalidate, name='sdnext-revalidate', daemon=True).start()
+
     shared.prompt_styles.reload()
     timer.startup.record("styles")
 
@@ -186,6 +206,7 @@ def load_model():
     shared.opts.onchange("sd_unet", wrap_queued_call(lambda: modules.sd_unet.load_unet(shared.sd_model)), call=False)
     shared.opts.onchange("sd_text_encoder", wrap_queued_call(lambda: modules.sd_models.reload_text_encoder()), call=False)
     shared.opts.onchange("temp_dir", modules.gr_tempdir.on_tmpdir_changed)
+    shared.opts.onchange("save_workers", lambda: modules.image.save.save_pool.resize(shared.opts.save_workers), call=False)
     timer.startup.record("onchange")
 
 